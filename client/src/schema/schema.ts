@@ -616,6 +616,13 @@ export interface paths {
          */
         post: operations["create_from_store_api_histories__history_id__contents_from_store_post"];
     };
+    "/api/histories/{history_id}/copy_async": {
+        /**
+         * Launch a task to copy a history.
+         * @description The task reports the number of copied items with the `PROGRESS` state while copying.
+         */
+        post: operations["copy_async_api_histories__history_id__copy_async_post"];
+    };
     "/api/histories/{history_id}/custom_builds_metadata": {
         /** Returns meta data for custom builds. */
         get: operations["get_custom_builds_metadata_api_histories__history_id__custom_builds_metadata_get"];
@@ -786,6 +793,13 @@ export interface paths {
         /** Prepare a workflow invocation export-style download and write to supplied URI. */
         post: operations["write_store_api_invocations__invocation_id__write_store_post"];
     };
+    "/api/job_limits": {
+        /**
+         * Job Limits Usage
+         * @description Get the configured job concurrency limits and the number of active jobs counted against them.
+         */
+        get: operations["job_limits_usage_api_job_limits_get"];
+    };
     "/api/job_lock": {
         /**
          * Job Lock Status
@@ -1867,6 +1881,23 @@ export interface components {
         ConvertedDatasetsMap: {
             [key: string]: string | undefined;
         };
+        /**
+         * CopyHistoryPayload
+         * @description Base model definition with common configuration used by all derived models.
+         */
+        CopyHistoryPayload: {
+            /**
+             * All Datasets
+             * @description Whether to copy also deleted HDAs/HDCAs.
+             * @default true
+             */
+            all_datasets?: boolean;
+            /**
+             * Name
+             * @description The new history name, `Copy of '<history name>'` by default.
+             */
+            name?: string;
+        };
         /**
          * CreateHistoryContentFromStore
          * @description Base model definition with common configuration used by all derived models.
@@ -4931,6 +4962,40 @@ export interface components {
          * @enum {string}
          */
         JobIndexViewEnum: "collection" | "admin_job_list";
+        /** JobLimitsUsage */
+        JobLimitsUsage: {
+            /**
+             * Destinations
+             * @description Number of dispatched jobs per destination.
+             */
+            destinations: {
+                [key: string]: number | undefined;
+            };
+            /**
+             * Groups
+             * @description Number of dispatched jobs of the members of groups with a limit.
+             */
+            groups: {
+                [key: string]: number | undefined;
+            };
+            /**
+             * Limits
+             * @description The configured job concurrency limits.
+             */
+            limits: Record<string, never>;
+            /**
+             * Tools
+             * @description Number of dispatched jobs per tool.
+             */
+            tools: {
+                [key: string]: number | undefined;
+            };
+            /**
+             * Users
+             * @description Job usage of users with active jobs.
+             */
+            users: components["schemas"]["UserJobLimitsUsage"][];
+        };
         /** JobLock */
         JobLock: {
             /**
@@ -7306,6 +7371,34 @@ export interface components {
              */
             id: string;
         };
+        /** UserJobLimitsUsage */
+        UserJobLimitsUsage: {
+            /**
+             * Active jobs
+             * @description Number of queued, running or resubmitted jobs.
+             */
+            active_jobs: number;
+            /**
+             * Destinations
+             * @description Number of dispatched jobs per destination.
+             */
+            destinations: {
+                [key: string]: number | undefined;
+            };
+            /**
+             * ID
+             * @description The encoded ID of the user.
+             * @example 0123456789ABCDEF
+             */
+            id: string;
+            /**
+             * Tools
+             * @description Number of dispatched jobs per tool.
+             */
+            tools: {
+                [key: string]: number | undefined;
+            };
+        };
         /**
          * UserModel
          * @description User in a transaction context.
@@ -9806,6 +9899,41 @@ export interface operations {
             };
         };
     };
+    copy_async_api_histories__history_id__copy_async_post: {
+        /**
+         * Launch a task to copy a history.
+         * @description The task reports the number of copied items with the `PROGRESS` state while copying.
+         */
+        parameters: {
+            /** @description The user ID that will be used to effectively make this API call. Only admins and designated users can make API calls on behalf of other users. */
+            header?: {
+                "run-as"?: string;
+            };
+            /** @description The encoded database identifier of the History. */
+            path: {
+                history_id: string;
+            };
+        };
+        requestBody: {
+            content: {
+                "application/json": components["schemas"]["CopyHistoryPayload"];
+            };
+        };
+        responses: {
+            /** @description Successful Response */
+            200: {
+                content: {
+                    "application/json": components["schemas"]["AsyncTaskResultSummary"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
     show_recent_api_histories_most_recently_used_get: {
         /** Returns the most recently used history of the user. */
         parameters?: {
@@ -10107,6 +10235,10 @@ export interface operations {
              * @deprecated
              * @description Legacy name for the `dataset_details` parameter.
              */
+            /**
+             * @description Return the contents following the item at this position in the order, instead of using `offset`. The position is the `hid` of the last item of the previous page when ordering by `hid`, and its `create_time` or `update_time` and `hid` separated by a comma when ordering by time. Only supported when ordering by one of `hid`, `create_time` or `update_time`.
+             * @example 2023-03-14T10:00:00.123456,42
+             */
             /**
              * @deprecated
              * @description A comma-separated list of encoded `HDA/HDCA` IDs. If this list is provided, only information about the specific datasets will be returned. Also, setting this value will return `all` details of the content item.
@@ -10143,6 +10275,7 @@ export interface operations {
             query?: {
                 v?: string;
                 details?: string;
+                after?: string;
                 ids?: string;
                 types?: string[];
                 deleted?: boolean;
@@ -12042,6 +12175,32 @@ export interface operations {
             };
         };
     };
+    job_limits_usage_api_job_limits_get: {
+        /**
+         * Job Limits Usage
+         * @description Get the configured job concurrency limits and the number of active jobs counted against them.
+         */
+        parameters?: {
+            /** @description The user ID that will be used to effectively make this API call. Only admins and designated users can make API calls on behalf of other users. */
+            header?: {
+                "run-as"?: string;
+            };
+        };
+        responses: {
+            /** @description Successful Response */
+            200: {
+                content: {
+                    "application/json": components["schemas"]["JobLimitsUsage"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
     job_lock_status_api_job_lock_get: {
         /**
          * Job Lock Status
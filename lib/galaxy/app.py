@@ -392,7 +392,7 @@ class MinimalGalaxyApplication(BasicSharedApp, HaltableContainer, SentryClientMi
         self.object_store = build_object_store_from_config(self.config, **kwds)
 
     def _configure_security(self):
-        self.security = IdEncodingHelper(id_secret=self.config.id_secret)
+        self.security = IdEncodingHelper(id_secret=self.config.id_secret, id_cache_size=self.config.id_cache_size)
         BaseDatabaseIdField.security = self.security
 
     def _configure_engines(self, db_url, install_db_url, combined_install_database):
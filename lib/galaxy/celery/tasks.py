@@ -8,6 +8,7 @@ from typing import (
     Optional,
 )
 
+from celery.backends.base import DisabledBackend
 from sqlalchemy import (
     exists,
     select,
@@ -28,6 +29,7 @@ from galaxy.managers.datasets import (
     DatasetManager,
 )
 from galaxy.managers.hdas import HDAManager
+from galaxy.managers.histories import HistoryManager
 from galaxy.managers.lddas import LDDAManager
 from galaxy.managers.markdown_util import generate_branded_pdf
 from galaxy.managers.model_stores import ModelStoreManager
@@ -37,6 +39,7 @@ from galaxy.model.scoped_session import galaxy_scoped_session
 from galaxy.objectstore import BaseObjectStore
 from galaxy.schema.tasks import (
     ComputeDatasetHashTaskRequest,
+    CopyHistoryTaskRequest,
     GenerateHistoryContentDownload,
     GenerateHistoryDownload,
     GenerateInvocationDownload,
@@ -283,6 +286,30 @@ def export_history(
     model_store_manager.setup_history_export_job(request)
 
 
+@galaxy_task(bind=True, action="copy a history")
+def copy_history(
+    self,
+    request: CopyHistoryTaskRequest,
+    history_manager: HistoryManager,
+    app: MinimalManagerApp,
+    sa_session: galaxy_scoped_session,
+) -> int:
+    """Copy a history in bulk, reporting the number of copied items as task state ``PROGRESS``."""
+
+    def progress(copied: int, total: int):
+        if not isinstance(self.backend, DisabledBackend) and self.request.id:
+            self.update_state(state="PROGRESS", meta={"copied": copied, "total": total})
+
+    history = sa_session.query(model.History).get(request.history_id)
+    user = sa_session.query(model.User).get(request.user.user_id)
+    new_history = history_manager.copy(
+        history, user, name=request.name, all_datasets=request.all_datasets, progress=progress
+    )
+    app.security_agent.history_set_default_permissions(new_history)
+    sa_session.flush()
+    return new_history.id
+
+
 @galaxy_task(action="preparing compressed file for collection download")
 def prepare_dataset_collection_download(
     request: PrepareDatasetCollectionDownload,
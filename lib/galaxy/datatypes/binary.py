@@ -58,6 +58,7 @@ from galaxy.datatypes.metadata import (
     FileParameter,
     ListParameter,
     MetadataElement,
+    MetadataMetrics,
     MetadataParameter,
 )
 from galaxy.datatypes.protocols import (
@@ -94,6 +95,18 @@ log = logging.getLogger(__name__)
 # Can be be removed once https://github.com/pysam-developers/pysam/issues/939 is resolved.
 pysam.set_verbosity(0)
 
+
+def samtools_threads() -> int:
+    """
+    Number of threads for sorting and indexing with samtools, the number of
+    cores the job destination allocates to the job.
+    """
+    try:
+        return max(int(os.environ.get("GALAXY_SLOTS", 1)), 1)
+    except ValueError:
+        return 1
+
+
 # Currently these supported binary data types must be manually set on upload
 
 
@@ -584,15 +597,24 @@ class BamNative(CompressedArchive, _BamOrSam):
         if not self.dataset_content_needs_grooming(file_name):
             # Don't re-sort if already sorted
             return
+        timer = util.ExecutionTimer()
         tmp_dir = tempfile.mkdtemp()
         tmp_sorted_dataset_file_name_prefix = os.path.join(tmp_dir, "sorted")
         sorted_file_name = f"{tmp_sorted_dataset_file_name_prefix}.bam"
-        slots = os.environ.get("GALAXY_SLOTS", 1)
         sort_args = []
         if self.sort_flag:
             sort_args = [self.sort_flag]
         sort_args.extend(
-            [f"-@{slots}", file_name, "-T", tmp_sorted_dataset_file_name_prefix, "-O", "BAM", "-o", sorted_file_name]
+            [
+                f"-@{samtools_threads()}",
+                file_name,
+                "-T",
+                tmp_sorted_dataset_file_name_prefix,
+                "-O",
+                "BAM",
+                "-o",
+                sorted_file_name,
+            ]
         )
         try:
             pysam.sort(*sort_args)  # type: ignore[attr-defined]
@@ -603,6 +625,7 @@ class BamNative(CompressedArchive, _BamOrSam):
         shutil.move(sorted_file_name, file_name)
         # Remove temp file and empty temporary directory
         os.rmdir(tmp_dir)
+        MetadataMetrics.add("bam_sort_seconds", timer.elapsed)
 
     def get_chunk(self, trans, dataset: HasFileName, offset: int = 0, ck_size: Optional[int] = None) -> str:
         if not offset == -1:
@@ -741,6 +764,7 @@ class Bam(BamNative):
         # is to actually index them.
         index_flag = self.get_index_flag(file_name)
         index_name = tempfile.NamedTemporaryFile(prefix="bam_index").name
+        threads = samtools_threads()
         try:
             # If pysam fails to index a file it will write to stderr,
             # and this causes the set_meta script to fail. So instead
@@ -750,13 +774,13 @@ class Bam(BamNative):
                 cmd = [
                     "python",
                     "-c",
-                    f"import pysam; pysam.set_verbosity(0); pysam.index('-o', '{index_name}', '{file_name}')",
+                    f"import pysam; pysam.set_verbosity(0); pysam.index('-@{threads}', '-o', '{index_name}', '{file_name}')",
                 ]
             else:
                 cmd = [
                     "python",
                     "-c",
-                    f"import pysam; pysam.set_verbosity(0); pysam.index('{index_flag}', '-o', '{index_name}', '{file_name}')",
+                    f"import pysam; pysam.set_verbosity(0); pysam.index('{index_flag}', '-@{threads}', '-o', '{index_name}', '{file_name}')",
                 ]
             with open(os.devnull, "w") as devnull:
                 subprocess.check_call(cmd, stderr=devnull, shell=False)
@@ -785,13 +809,34 @@ class Bam(BamNative):
             index_file = dataset.metadata.spec[spec_key].param.new_file(
                 dataset=dataset, metadata_tmp_files_dir=metadata_tmp_files_dir
             )
-        if index_flag == "-b":
-            # IOError: No such file or directory: '-b' if index_flag is set to -b (pysam 0.15.4)
-            pysam.index("-o", index_file.file_name, dataset.file_name)  # type: ignore [attr-defined]
+        timer = util.ExecutionTimer()
+        tool_index = self.get_tool_provided_index(dataset.file_name, index_flag)
+        if tool_index:
+            shutil.move(tool_index, index_file.file_name)
+            MetadataMetrics.add("bam_indexes_reused", 1)
         else:
-            pysam.index(index_flag, "-o", index_file.file_name, dataset.file_name)  # type: ignore [attr-defined]
+            threads_flag = f"-@{samtools_threads()}"
+            if index_flag == "-b":
+                # IOError: No such file or directory: '-b' if index_flag is set to -b (pysam 0.15.4)
+                pysam.index(threads_flag, "-o", index_file.file_name, dataset.file_name)  # type: ignore [attr-defined]
+            else:
+                pysam.index(index_flag, threads_flag, "-o", index_file.file_name, dataset.file_name)  # type: ignore [attr-defined]
+            MetadataMetrics.add("bam_index_seconds", timer.elapsed)
         dataset.metadata.bam_index = index_file
 
+    def get_tool_provided_index(self, file_name: str, index_flag: str) -> Optional[str]:
+        """
+        Return the path of an index written next to the BAM file by the tool
+        (e.g. with ``samtools index``) if it is at least as recent as the BAM file.
+        """
+        index_name = f"{file_name}.bai" if index_flag == "-b" else f"{file_name}.csi"
+        try:
+            if os.path.getmtime(index_name) >= os.path.getmtime(file_name):
+                return index_name
+        except OSError:
+            pass
+        return None
+
     def sniff(self, filename: str) -> bool:
         return super().sniff(filename) and not self.dataset_content_needs_grooming(filename)
 
@@ -980,7 +1025,9 @@ class CRAM(Binary):
 
     def set_index_file(self, dataset: HasFileName, index_file) -> bool:
         try:
-            pysam.index("-o", index_file.file_name, dataset.file_name)  # type: ignore [attr-defined]
+            timer = util.ExecutionTimer()
+            pysam.index(f"-@{samtools_threads()}", "-o", index_file.file_name, dataset.file_name)  # type: ignore [attr-defined]
+            MetadataMetrics.add("cram_index_seconds", timer.elapsed)
             return True
         except Exception as exc:
             log.warning("%s, set_index_file Exception: %s", self, exc)
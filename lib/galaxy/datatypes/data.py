@@ -1,6 +1,9 @@
+import codecs
+import io
 import logging
 import mimetypes
 import os
+import re
 import shutil
 import string
 import tempfile
@@ -12,7 +15,9 @@ from typing import (
     Generator,
     IO,
     Iterable,
+    Iterator,
     List,
+    NamedTuple,
     Optional,
     Tuple,
     TYPE_CHECKING,
@@ -48,7 +53,6 @@ from galaxy.util import (
     file_reader,
     FILENAME_VALID_CHARS,
     inflector,
-    iter_start_of_line,
     unicodify,
 )
 from galaxy.util.bunch import Bunch
@@ -521,24 +525,21 @@ class Data(metaclass=DataMeta):
                 ] = "application/octet-stream"  # force octet-stream so Safari doesn't append mime extensions to filename
                 headers["Content-Disposition"] = f'attachment; filename="{filename}"'
                 return open(dataset.file_name, "rb"), headers
-        if not os.path.exists(dataset.file_name):
-            raise ObjectNotFound(f"File Not Found ({dataset.file_name}).")
         max_peek_size = DEFAULT_MAX_PEEK_SIZE  # 1 MB
         if isinstance(dataset.datatype, text.Html):
             max_peek_size = 10000000  # 10 MB for html
         preview = util.string_as_bool(preview)
-        if (
-            not preview
-            or isinstance(dataset.datatype, images.Image)
-            or os.stat(dataset.file_name).st_size < max_peek_size
-        ):
+        if not preview or isinstance(dataset.datatype, images.Image) or dataset.get_size() < max_peek_size:
+            if not os.path.exists(dataset.file_name):
+                raise ObjectNotFound(f"File Not Found ({dataset.file_name}).")
             return self._yield_user_file_content(trans, dataset, dataset.file_name, headers), headers
         else:
             headers["content-type"] = "text/html"
+            # Only read the start of the dataset, this avoids fetching large datasets from remote object stores
             return (
                 trans.fill_template_mako(
                     "/dataset/large_file.mako",
-                    truncated_data=open(dataset.file_name, "rb").read(max_peek_size),
+                    truncated_data=dataset.dataset.get_data(count=max_peek_size),
                     data=dataset,
                 ),
                 headers,
@@ -998,21 +999,14 @@ class Text(Data):
         Count the number of lines of data in dataset,
         skipping all blank lines and comments.
         """
-        CHUNK_SIZE = 2**15  # 32Kb
-        data_lines = 0
-        with compression_utils.get_fileobj(dataset.file_name) as in_file:
-            # FIXME: Potential encoding issue can prevent the ability to iterate over lines
-            # causing set_meta process to fail otherwise OK jobs. A better solution than
-            # a silent try/except is desirable.
-            try:
-                for line in iter_start_of_line(in_file, CHUNK_SIZE):
-                    line = line.strip()
-                    if line and not line.startswith("#"):
-                        data_lines += 1
-            except UnicodeDecodeError:
-                log.error(f"Unable to count lines in file {dataset.file_name}")
-                return None
-        return data_lines
+        # FIXME: Potential encoding issue can prevent the ability to count lines
+        # causing set_meta process to fail otherwise OK jobs. A better solution than
+        # a silent try/except is desirable.
+        try:
+            return count_lines(dataset.file_name).data_lines
+        except UnicodeDecodeError:
+            log.error(f"Unable to count lines in file {dataset.file_name}")
+            return None
 
     def set_peek(self, dataset: DatasetProtocol, **kwd) -> None:
         """
@@ -1024,31 +1018,42 @@ class Text(Data):
         line_wrap = kwd.get("line_wrap", True)
 
         if not dataset.dataset.purged:
-            # The file must exist on disk for the get_file_peek() method
-            dataset.peek = get_file_peek(dataset.file_name, width=width, skipchars=skipchars, line_wrap=line_wrap)
-            if line_count is None:
-                # See if line_count is stored in the metadata
-                if dataset.metadata.data_lines:
-                    dataset.blurb = f"{util.commaify(str(dataset.metadata.data_lines))} {inflector.cond_plural(dataset.metadata.data_lines, self.line_class)}"
+            if line_count is None and not dataset.metadata.data_lines:
+                # Number of lines is not known ( this should not happen ), and auto-detect is
+                # needed to set metadata
+                # This can happen when the file is larger than max_optional_metadata_filesize.
+                # The file must exist on disk to read the peek, and count or estimate the lines at the same time.
+                file_size = int(dataset.get_size())
+                summary = summarize_text_file(
+                    dataset.file_name,
+                    width=width,
+                    skipchars=skipchars,
+                    line_wrap=line_wrap,
+                    count=file_size <= COUNT_LINES_CHUNK_SIZE,
+                )
+                dataset.peek = summary.peek
+                if file_size <= COUNT_LINES_CHUNK_SIZE:
+                    # Small dataset, recount all lines.
+                    if summary.line_counts is not None:
+                        lc = summary.line_counts.data_lines
+                        dataset.metadata.data_lines = lc
+                        dataset.blurb = f"{util.commaify(str(lc))} {inflector.cond_plural(lc, self.line_class)}"
+                    else:
+                        dataset.blurb = "Error: Cannot count lines in dataset"
                 else:
-                    # Number of lines is not known ( this should not happen ), and auto-detect is
-                    # needed to set metadata
-                    # This can happen when the file is larger than max_optional_metadata_filesize.
-                    if int(dataset.get_size()) <= 1048576:
-                        # Small dataset, recount all lines and reset peek afterward.
-                        lc = self.count_data_lines(dataset)
-                        if lc is not None:
-                            dataset.metadata.data_lines = lc
-                            dataset.blurb = f"{util.commaify(str(lc))} {inflector.cond_plural(lc, self.line_class)}"
-                        else:
-                            dataset.blurb = "Error: Cannot count lines in dataset"
+                    est_lines = None
+                    if summary.sample_lines is not None:
+                        est_lines = int(summary.sample_lines * (float(file_size) / float(COUNT_LINES_CHUNK_SIZE)))
+                    if est_lines is not None:
+                        dataset.blurb = f"~{util.commaify(util.roundify(str(est_lines)))} {inflector.cond_plural(est_lines, self.line_class)}"
                     else:
-                        est_lines = self.estimate_file_lines(dataset)
-                        if est_lines is not None:
-                            dataset.blurb = f"~{util.commaify(util.roundify(str(est_lines)))} {inflector.cond_plural(est_lines, self.line_class)}"
-                        else:
-                            dataset.blurb = "Error: Cannot estimate lines in dataset"
+                        dataset.blurb = "Error: Cannot estimate lines in dataset"
             else:
+                # The file must exist on disk for the get_file_peek() method
+                dataset.peek = get_file_peek(dataset.file_name, width=width, skipchars=skipchars, line_wrap=line_wrap)
+                if line_count is None:
+                    # line_count is stored in the metadata
+                    line_count = dataset.metadata.data_lines
                 dataset.blurb = f"{util.commaify(str(line_count))} {inflector.cond_plural(line_count, self.line_class)}"
         else:
             dataset.peek = "file does not exist"
@@ -1198,6 +1203,16 @@ class Nexus(Text):
 # datatypes.
 nice_size = util.nice_size
 
+# Number of bytes read at once when counting lines, and sampled to estimate them
+COUNT_LINES_CHUNK_SIZE = 2**20
+# Number of bytes kept of lines longer than a chunk when counting lines
+MAX_LINE_START_SIZE = 2**16
+# Characters other than newlines that str.strip() removes, encoded in UTF-8
+_WHITESPACE = (
+    rb"(?:[\t\x0b\x0c\x1c-\x1f ]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)"
+)
+_INDENTED_LINE_RE = re.compile(b"\n" + _WHITESPACE + b"+")
+
 
 def get_test_fname(fname):
     """Returns test data filename"""
@@ -1219,6 +1234,12 @@ def get_file_peek(file_name, width=256, line_count=5, skipchars=None, line_wrap=
     >>> assert_peek_is('4.bed', u'chr22\\t30128507\\t31828507\\tuc003bnx.1_cds_2_0_chr22_29227_f\\t0\\t+\\n', line_count=1)
     >>> assert_peek_is('1.bed', u'chr1\\t147962192\\t147962580\\tCCDS989.1_cds_0_0_chr1_147962193_r\\t0\\t-\\nchr1\\t147984545\\t147984630\\tCCDS990.1_cds_0_0_chr1_147984546_f\\t0\\t+\\n', line_count=2)
     """
+    with compression_utils.get_fileobj(file_name) as temp:
+        return _read_file_peek(temp, width=width, line_count=line_count, skipchars=skipchars, line_wrap=line_wrap)
+
+
+def _read_file_peek(temp, width=256, line_count=5, skipchars=None, line_wrap=True):
+    """Returns the first line_count lines of the text file object temp wrapped to width."""
     # Set size for file.readline() to a negative number to force it to
     # read until either a newline or EOF.  Needed for datasets with very
     # long lines.
@@ -1230,30 +1251,181 @@ def get_file_peek(file_name, width=256, line_count=5, skipchars=None, line_wrap=
     count = 0
 
     last_line_break = False
-    with compression_utils.get_fileobj(file_name) as temp:
-        while count < line_count:
-            try:
-                line = temp.readline(width)
-            except UnicodeDecodeError:
-                return "binary file"
-            if line == "":
-                break
-            last_line_break = False
-            if line.endswith("\n"):
-                line = line[:-1]
-                last_line_break = True
-            elif not line_wrap:
-                for i in file_reader(temp, 1):
-                    if i == "\n":
-                        last_line_break = True
-                    if not i or i == "\n":
-                        break
-            skip_line = False
-            for skipchar in skipchars:
-                if line.startswith(skipchar):
-                    skip_line = True
+    while count < line_count:
+        try:
+            line = temp.readline(width)
+        except UnicodeDecodeError:
+            return "binary file"
+        if line == "":
+            break
+        last_line_break = False
+        if line.endswith("\n"):
+            line = line[:-1]
+            last_line_break = True
+        elif not line_wrap:
+            for i in file_reader(temp, 1):
+                if i == "\n":
+                    last_line_break = True
+                if not i or i == "\n":
                     break
-            if not skip_line:
-                lines.append(line)
-                count += 1
+        skip_line = False
+        for skipchar in skipchars:
+            if line.startswith(skipchar):
+                skip_line = True
+                break
+        if not skip_line:
+            lines.append(line)
+            count += 1
     return "\n".join(lines) + ("\n" if last_line_break else "")
+
+
+class LineCounts(NamedTuple):
+    """Numbers of lines of a text file, see ``count_lines``."""
+
+    lines: int
+    blank_lines: int
+    # number of lines starting with each requested prefix, after any whitespace
+    starting: Dict[bytes, int]
+
+    @property
+    def data_lines(self) -> int:
+        """Number of lines that are neither blank nor comments starting with ``#``."""
+        return self.lines - self.blank_lines - self.starting.get(b"#", 0)
+
+
+class TextFileSummary(NamedTuple):
+    """Peek and numbers of lines of a text file, see ``summarize_text_file``."""
+
+    peek: str
+    # None if the lines were not counted or the file is not UTF-8 encoded
+    line_counts: Optional[LineCounts]
+    # number of lines in the first COUNT_LINES_CHUNK_SIZE bytes, None if these are not UTF-8 encoded
+    sample_lines: Optional[int]
+
+
+def count_lines(file_name: str, line_starts: Tuple[bytes, ...] = (b"#",)) -> LineCounts:
+    """
+    Count the lines of a (possibly compressed) text file, and its blank lines and
+    lines starting with each of ``line_starts``, in large binary chunks. Lines
+    are split and stripped as when reading the file in text mode, and
+    ``UnicodeDecodeError`` is raised if it is not UTF-8 encoded.
+
+    >>> counts = count_lines(get_test_fname('1.sam'), (b"#", b"@"))
+    >>> counts.lines, counts.blank_lines, counts.starting
+    (97, 0, {b'#': 0, b'@': 1})
+    >>> count_lines(get_test_fname('1.bed')).data_lines
+    65
+    """
+    with compression_utils.get_fileobj(file_name, "rb") as fh:
+        return _count_line_chunks(_iter_line_chunks(fh), line_starts)
+
+
+def summarize_text_file(
+    file_name: str,
+    width=256,
+    line_count=5,
+    skipchars=None,
+    line_wrap=True,
+    count=True,
+    line_starts: Tuple[bytes, ...] = (b"#",),
+) -> TextFileSummary:
+    """
+    Read the peek of a text file (see ``get_file_peek``) and, if ``count`` is
+    true, count its lines (see ``count_lines``) in a single pass over the file.
+
+    >>> summary = summarize_text_file(get_test_fname('1.bed'), line_count=1)
+    >>> summary.peek == get_file_peek(get_test_fname('1.bed'), line_count=1)
+    True
+    >>> summary.line_counts.data_lines, summary.sample_lines
+    (65, 65)
+    """
+    with compression_utils.get_fileobj(file_name, "rb") as fh:
+        head = fh.read(COUNT_LINES_CHUNK_SIZE)
+        try:
+            head_text = codecs.getincrementaldecoder("utf-8")().decode(head)
+        except UnicodeDecodeError:
+            # the peek may still be readable
+            return TextFileSummary(
+                get_file_peek(file_name, width=width, line_count=line_count, skipchars=skipchars, line_wrap=line_wrap),
+                None,
+                None,
+            )
+        head_fh = io.StringIO(head_text, newline=None)
+        peek = _read_file_peek(head_fh, width=width, line_count=line_count, skipchars=skipchars, line_wrap=line_wrap)
+        if len(head) == COUNT_LINES_CHUNK_SIZE and head_fh.tell() > len(head_fh.getvalue()) - io.DEFAULT_BUFFER_SIZE:
+            # the peek may go on after the head of the file, and text mode decodes a buffer ahead of it
+            peek = get_file_peek(
+                file_name, width=width, line_count=line_count, skipchars=skipchars, line_wrap=line_wrap
+            )
+        sample_lines = head_fh.getvalue().count("\n")
+        line_counts = None
+        if count:
+            try:
+                line_counts = _count_line_chunks(_iter_line_chunks(fh, head), line_starts)
+            except UnicodeDecodeError:
+                log.error(f"Unable to count lines in file {file_name}")
+    return TextFileSummary(peek, line_counts, sample_lines)
+
+
+def _count_line_chunks(line_chunks: Iterator[bytes], line_starts: Tuple[bytes, ...]) -> LineCounts:
+    lines = 0
+    blank_lines = 0
+    starting = dict.fromkeys(line_starts, 0)
+    for chunk in line_chunks:
+        lines += chunk.count(b"\n")
+        # every line of the chunk now follows a newline, lines without leading
+        # whitespace are counted with bytes.count() and the others one by one
+        text = b"\n" + chunk
+        if b"\n\n\n" in text:
+            # a run of n newlines holds n - 1 empty lines
+            squeezed = text
+            while b"\n\n" in squeezed:
+                squeezed = squeezed.replace(b"\n\n", b"\n")
+            blank_lines += len(text) - len(squeezed)
+        else:
+            blank_lines += text.count(b"\n\n")
+        for line_start in line_starts:
+            starting[line_start] += text.count(b"\n" + line_start)
+        for match in _INDENTED_LINE_RE.finditer(text):
+            end = match.end()
+            if text.startswith(b"\n", end):
+                blank_lines += 1
+            for line_start in line_starts:
+                if text.startswith(line_start, end):
+                    starting[line_start] += 1
+    return LineCounts(lines, blank_lines, starting)
+
+
+def _iter_line_chunks(fh: IO[bytes], head: bytes = b"") -> Iterator[bytes]:
+    """
+    Yield the contents of the binary file object ``fh``, after ``head`` if its
+    start has already been read, in chunks of complete newline terminated lines.
+    Newlines are translated and the contents decoded as in text mode, which
+    raises ``UnicodeDecodeError`` if they are not UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    partial_line = b""
+    chunk = head or fh.read(COUNT_LINES_CHUNK_SIZE)
+    while chunk:
+        if not chunk.isascii() or decoder.getstate()[0]:
+            decoder.decode(chunk)
+        next_chunk = fh.read(COUNT_LINES_CHUNK_SIZE)
+        text = partial_line + chunk
+        carriage_return = b""
+        if next_chunk and text.endswith(b"\r"):
+            # the \r may start a \r\n newline
+            text, carriage_return = text[:-1], b"\r"
+        if b"\r" in text:
+            text = text.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        if next_chunk:
+            end = text.rfind(b"\n") + 1
+            # The start of a line is enough to know if it is blank or a comment,
+            # don't keep all of very long lines
+            partial_line = text[end : end + MAX_LINE_START_SIZE] + carriage_return
+            text = text[:end]
+        elif text and not text.endswith(b"\n"):
+            text += b"\n"
+        if text:
+            yield text
+        chunk = next_chunk
+    decoder.decode(b"", final=True)
@@ -15,6 +15,7 @@ from galaxy.model.metadata import (
     MetadataCollection,
     MetadataElement,
     MetadataElementSpec,
+    MetadataMetrics,
     MetadataParameter,
     MetadataSpecCollection,
     MetadataTempFile,
@@ -41,4 +42,5 @@ __all__ = (
     "PythonObjectParameter",
     "FileParameter",
     "MetadataTempFile",
+    "MetadataMetrics",
 )
@@ -2,6 +2,8 @@
 Sequence classes
 """
 
+import gzip
+import io
 import json
 import logging
 import math
@@ -9,7 +11,11 @@ import os
 import re
 import string
 import subprocess
-from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from itertools import (
+    count,
+    islice,
+)
 from typing import (
     Any,
     Callable,
@@ -51,6 +57,16 @@ from . import data
 
 log = logging.getLogger(__name__)
 
+# Split files are scanned and copied this many bytes at a time
+SPLIT_CHUNK_SIZE = data.COUNT_LINES_CHUNK_SIZE
+# Number of parts of a file copied at the same time when splitting it
+SPLIT_COPY_THREADS = 4
+# Byte offsets of every LINE_OFFSETS_INTERVAL-th line of uncompressed FASTQ
+# files are kept in their metadata to find where to split them, the interval
+# doubles as needed to keep at most MAX_LINE_OFFSETS offsets.
+LINE_OFFSETS_INTERVAL = 2**14
+MAX_LINE_OFFSETS = 1024
+
 
 @build_sniff_from_prefix
 class SequenceSplitLocations(data.Text):
@@ -110,21 +126,10 @@ class Sequence(data.Text):
         """
         Set the number of sequences and the number of data lines in dataset.
         """
-        data_lines = 0
-        sequences = 0
-        with compression_utils.get_fileobj(dataset.file_name) as fh:
-            for line in fh:
-                line = line.strip()
-                if line and line.startswith("#"):
-                    # We don't count comment lines for sequence data types
-                    continue
-                if line and line.startswith(">"):
-                    sequences += 1
-                    data_lines += 1
-                else:
-                    data_lines += 1
-            dataset.metadata.data_lines = data_lines
-            dataset.metadata.sequences = sequences
+        line_counts = data.count_lines(dataset.file_name, (b"#", b">"))
+        # We don't count comment lines for sequence data types
+        dataset.metadata.data_lines = line_counts.lines - line_counts.starting[b"#"]
+        dataset.metadata.sequences = line_counts.starting[b">"]
 
     def set_peek(self, dataset: DatasetProtocol, **kwd) -> None:
         if not dataset.dataset.purged:
@@ -142,7 +147,7 @@ class Sequence(data.Text):
         if split_params["split_mode"] == "number_of_parts":
             # legacy basic mode - split into a specified number of parts
             parts = int(split_params["split_size"])
-            sequences_per_file = [total_sequences / parts for i in range(parts)]
+            sequences_per_file = [total_sequences // parts for i in range(parts)]
             for i in range(total_sequences % parts):
                 sequences_per_file[i] += 1
         elif split_params["split_mode"] == "to_size":
@@ -159,17 +164,34 @@ class Sequence(data.Text):
 
     @classmethod
     def do_slow_split(cls, input_datasets, subdir_generator_function, split_params):
+        compressed = any(_is_compressed(ds.file_name) for ds in input_datasets)
         # count the sequences so we can split
         # TODO: if metadata is present, take the number of lines / 4
         if input_datasets[0].metadata is not None and input_datasets[0].metadata.sequences is not None:
             total_sequences = input_datasets[0].metadata.sequences
+        elif not compressed:
+            total_sequences = _count_lines(input_datasets[0].file_name) // 4
         else:
             with compression_utils.get_fileobj(input_datasets[0].file_name) as in_file:
                 total_sequences = sum(1 for line in in_file)
-            total_sequences /= 4
+            total_sequences //= 4
 
         sequences_per_file = cls.get_sequences_per_file(total_sequences, split_params)
-        return cls.write_split_files(input_datasets, None, subdir_generator_function, sequences_per_file)
+        byte_ranges = None
+        if not compressed:
+            # Find where each part starts once, so that tasks copy their part
+            # of the files instead of reading them from the start.
+            start_lines = [0]
+            for sequences in sequences_per_file:
+                start_lines.append(start_lines[-1] + sequences * 4)
+            byte_ranges = []
+            for ds in input_datasets:
+                line_offsets = ds.metadata.line_offsets if ds.metadata is not None else None
+                offsets = _line_start_offsets(ds.file_name, start_lines, line_offsets)
+                byte_ranges.append(list(zip(offsets[:-1], offsets[1:])))
+        return cls.write_split_files(
+            input_datasets, None, subdir_generator_function, sequences_per_file, byte_ranges=byte_ranges
+        )
 
     @classmethod
     def do_fast_split(cls, input_datasets, toc_file_datasets, subdir_generator_function, split_params):
@@ -182,7 +204,9 @@ class Sequence(data.Text):
         return cls.write_split_files(input_datasets, toc_file_datasets, subdir_generator_function, sequences_per_file)
 
     @classmethod
-    def write_split_files(cls, input_datasets, toc_file_datasets, subdir_generator_function, sequences_per_file):
+    def write_split_files(
+        cls, input_datasets, toc_file_datasets, subdir_generator_function, sequences_per_file, byte_ranges=None
+    ):
         directories = []
 
         def get_subdir(idx):
@@ -211,6 +235,9 @@ class Sequence(data.Text):
                 if toc_file_datasets is not None:
                     toc = toc_file_datasets[ds_no]
                     split_data["args"]["toc_file"] = toc.file_name
+                elif byte_ranges is not None:
+                    start_offset, end_offset = byte_ranges[ds_no][part_no]
+                    split_data["args"].update(start_offset=start_offset, end_offset=end_offset)
                 with open(os.path.join(dir, f"split_info_{base_name}.json"), "w") as f:
                     json.dump(split_data, f)
             start_sequence += sequences_per_file[part_no]
@@ -244,6 +271,34 @@ class Sequence(data.Text):
         >>> Sequence.get_split_commands_with_toc('./input.gz', './output.gz', dict(sections=three_sections), start_sequence=5, sequence_count=20)
         ['(dd bs=1 skip=0 count=74 if=./input.gz 2> /dev/null )| zcat | ( tail -n +21 2> /dev/null) | head -20 | gzip -c >> ./output.gz', 'dd bs=1 skip=74 count=74 if=./input.gz 2> /dev/null >> ./output.gz', '(dd bs=1 skip=148 count=76 if=./input.gz 2> /dev/null )| zcat | ( tail -n +1 2> /dev/null) | head -20 | gzip -c >> ./output.gz']
         """
+        result = []
+        copy_chunk_cmd = "dd bs=1 skip=%s count=%s if=%s 2> /dev/null >> %s"
+        for start_copy, end_copy, skip_lines, line_count in Sequence.get_split_ranges_with_toc(
+            toc_file, start_sequence, sequence_count
+        ):
+            if line_count is None:
+                result.append(copy_chunk_cmd % (start_copy, end_copy - start_copy, input_name, output_name))
+            else:
+                # extract, unzip, trim, recompress
+                result.append(
+                    "(dd bs=1 skip=%s count=%s if=%s 2> /dev/null )| zcat | ( tail -n +%s 2> /dev/null) | head -%s | gzip -c >> %s"
+                    % (start_copy, end_copy - start_copy, input_name, skip_lines + 1, line_count, output_name)
+                )
+        return result
+
+    @staticmethod
+    def get_split_ranges_with_toc(toc_file: Any, start_sequence: int, sequence_count: int) -> List:
+        """
+        Uses a Table of Contents dict, parsed from an FQTOC file, to find the byte ranges of the
+        gzip members containing the sequences to extract. Returns (start, end, skip_lines, line_count)
+        tuples, line_count is None for consecutive members that are copied whole.
+
+        >>> three_sections=[dict(start=0, end=74, sequences=10), dict(start=74, end=148, sequences=10), dict(start=148, end=148+76, sequences=10)]
+        >>> Sequence.get_split_ranges_with_toc(dict(sections=three_sections), start_sequence=5, sequence_count=20)
+        [(0, 74, 20, 20), (74, 148, 0, None), (148, 224, 0, 20)]
+        >>> Sequence.get_split_ranges_with_toc(dict(sections=three_sections), start_sequence=0, sequence_count=20)
+        [(0, 148, 0, None)]
+        """
         sections = toc_file["sections"]
         result = []
 
@@ -260,12 +315,10 @@ class Sequence(data.Text):
         # can be copied verbatim (without decompressing)
         start_chunk = int(-1)
         end_chunk = int(-1)
-        copy_chunk_cmd = "dd bs=1 skip=%s count=%s if=%s 2> /dev/null >> %s"
 
         while sequence_count > 0 and i < len(sections):
             # we need to extract partial data. So, find the byte offsets of the chunks that contain the data we need
-            # use a combination of dd (to pull just the right sections out) tail (to skip lines) and head (to get the
-            # right number of lines
+            # and the lines to skip and keep once they are decompressed
             sequences = int(sections[i]["sequences"])
             skip_sequences = start_sequence - current_sequence
             sequences_to_extract = min(sequence_count, sequences - skip_sequences)
@@ -273,20 +326,9 @@ class Sequence(data.Text):
             end_copy = int(sections[i]["end"])
             if sequences_to_extract < sequences:
                 if start_chunk > -1:
-                    result.append(copy_chunk_cmd % (start_chunk, end_chunk - start_chunk, input_name, output_name))
+                    result.append((start_chunk, end_chunk, 0, None))
                     start_chunk = -1
-                # extract, unzip, trim, recompress
-                result.append(
-                    "(dd bs=1 skip=%s count=%s if=%s 2> /dev/null )| zcat | ( tail -n +%s 2> /dev/null) | head -%s | gzip -c >> %s"
-                    % (
-                        start_copy,
-                        end_copy - start_copy,
-                        input_name,
-                        skip_sequences * 4 + 1,
-                        sequences_to_extract * 4,
-                        output_name,
-                    )
-                )
+                result.append((start_copy, end_copy, skip_sequences * 4, sequences_to_extract * 4))
             else:  # whole section - add it to the start_chunk/end_chunk accumulator
                 if start_chunk == -1:
                     start_chunk = start_copy
@@ -296,7 +338,7 @@ class Sequence(data.Text):
             current_sequence += sequences
             i += 1
         if start_chunk > -1:
-            result.append(copy_chunk_cmd % (start_chunk, end_chunk - start_chunk, input_name, output_name))
+            result.append((start_chunk, end_chunk, 0, None))
 
         if sequence_count > 0:
             raise Exception(f"{sequence_count} sequences not found in file")
@@ -455,73 +497,40 @@ class Fasta(Sequence):
         """Split a FASTA file into chunks based on size on disk.
 
         This does of course preserve complete records - it only splits at the
-        start of a new FASTQ sequence record.
+        start of a new FASTA sequence record.
         """
         log.debug("Attemping to split FASTA file %s into chunks of %i bytes" % (input_file, chunk_size))
-        with open(input_file) as f:
-            part_file = None
-            try:
-                # Note if the input FASTA file has no sequences, we will
-                # produce just one sub-file which will be a copy of it.
-                part_dir = subdir_generator_function()
-                part_path = os.path.join(part_dir, os.path.basename(input_file))
-                part_file = open(part_path, "w")
-                log.debug(f"Writing {input_file} part to {part_path}")
-                start_offset = 0
-                for line in iter(f.readline, ""):
-                    offset = f.tell()
-                    if not line:
+        try:
+            part_starts = [0]
+            with open(input_file, "rb") as f:
+                while True:
+                    # A new part starts with the first record after chunk_size bytes of the previous one
+                    f.seek(part_starts[-1] + max(chunk_size, 1) - 1)
+                    record_offsets = _separator_offsets(f, b"\n>", [1])
+                    if not record_offsets:
                         break
-                    if line[0] == ">" and offset - start_offset >= chunk_size:
-                        # Start a new sub-file
-                        part_file.close()
-                        part_dir = subdir_generator_function()
-                        part_path = os.path.join(part_dir, os.path.basename(input_file))
-                        part_file = open(part_path, "w")
-                        log.debug(f"Writing {input_file} part to {part_path}")
-                        start_offset = f.tell()
-                    part_file.write(line)
-            except Exception as e:
-                log.error("Unable to size split FASTA file: %s", util.unicodify(e))
-                raise
-            finally:
-                if part_file:
-                    part_file.close()
+                    part_starts.append(record_offsets[0] - 1)
+            _write_parts(input_file, part_starts, subdir_generator_function)
+        except Exception as e:
+            log.error("Unable to size split FASTA file: %s", util.unicodify(e))
+            raise
 
     @classmethod
     def _count_split(cls, input_file: str, chunk_size: int, subdir_generator_function: Callable) -> None:
         """Split a FASTA file into chunks based on counting records."""
         log.debug("Attemping to split FASTA file %s into chunks of %i sequences" % (input_file, chunk_size))
-        with open(input_file) as f:
-            part_file = None
-            try:
-                # Note if the input FASTA file has no sequences, we will
-                # produce just one sub-file which will be a copy of it.
-                part_dir = subdir_generator_function()
-                part_path = os.path.join(part_dir, os.path.basename(input_file))
-                part_file = open(part_path, "w")
-                log.debug(f"Writing {input_file} part to {part_path}")
-                rec_count = 0
-                for line in f:
-                    if not line:
-                        break
-                    if line[0] == ">":
-                        rec_count += 1
-                        if rec_count > chunk_size:
-                            # Start a new sub-file
-                            part_file.close()
-                            part_dir = subdir_generator_function()
-                            part_path = os.path.join(part_dir, os.path.basename(input_file))
-                            part_file = open(part_path, "w")
-                            log.debug(f"Writing {input_file} part to {part_path}")
-                            rec_count = 1
-                    part_file.write(line)
-            except Exception as e:
-                log.error("Unable to count split FASTA file: %s", util.unicodify(e))
-                raise
-            finally:
-                if part_file:
-                    part_file.close()
+        try:
+            with open(input_file, "rb") as f:
+                # Records after the first one start after a newline
+                first_records = 1 if f.read(1) == b">" else 0
+                f.seek(0)
+                part_record_offsets = _separator_offsets(
+                    f, b"\n>", count(start=chunk_size + 1 - first_records, step=chunk_size)
+                )
+            _write_parts(input_file, [0] + [offset - 1 for offset in part_record_offsets], subdir_generator_function)
+        except Exception as e:
+            log.error("Unable to count split FASTA file: %s", util.unicodify(e))
+            raise
 
 
 @build_sniff_from_prefix
@@ -688,28 +697,52 @@ class BaseFastq(Sequence):
     file_ext = "fastq"
     bases_regexp = re.compile(r"^[NGTAC 0123\.]*$", re.IGNORECASE)
 
+    MetadataElement(
+        name="line_offsets",
+        default=None,
+        param=DictParameter,
+        desc="Byte offsets of every interval-th line",
+        readonly=True,
+        visible=False,
+        optional=True,
+        no_value=None,
+    )
+
     def set_meta(self, dataset: DatasetProtocol, overwrite: bool = True, **kwd) -> None:
         """
         Set the number of sequences and the number of data lines
-        in dataset.
+        in dataset, and the offsets of lines of uncompressed files.
         FIXME: This does not properly handle line wrapping
         """
         if self.max_optional_metadata_filesize >= 0 and dataset.get_size() > self.max_optional_metadata_filesize:
             dataset.metadata.data_lines = None
             dataset.metadata.sequences = None
+            dataset.metadata.line_offsets = None
             return
         data_lines = 0
         sequences = 0
         seq_counter = 0  # blocks should be 4 lines long
-        with compression_utils.get_fileobj(dataset.file_name) as in_file:
-            for line in in_file:
+        compressed_format, in_file = compression_utils.get_fileobj_raw(dataset.file_name, "rb")
+        interval = LINE_OFFSETS_INTERVAL
+        offsets: Optional[List[int]] = [] if compressed_format is None else None
+        offset = 0
+        with in_file:
+            for line_number, line in enumerate(in_file):
+                if offsets is not None:
+                    if not line_number % interval:
+                        if len(offsets) == MAX_LINE_OFFSETS:
+                            interval *= 2
+                            del offsets[1::2]
+                        if not line_number % interval:
+                            offsets.append(offset)
+                    offset += len(line)
                 line = line.strip()
-                if line and line.startswith("#") and not data_lines:
+                if line and line.startswith(b"#") and not data_lines:
                     # We don't count comment lines for sequence data types
                     continue
                 seq_counter += 1
                 data_lines += 1
-                if line and line.startswith("@"):
+                if line and line.startswith(b"@"):
                     if seq_counter >= 4:
                         # count previous block
                         # blocks should be 4 lines long
@@ -720,6 +753,10 @@ class BaseFastq(Sequence):
                 sequences += 1
             dataset.metadata.data_lines = data_lines
             dataset.metadata.sequences = sequences
+            # the offset of the first line alone doesn't help splitting
+            dataset.metadata.line_offsets = (
+                dict(interval=interval, offsets=offsets) if offsets and len(offsets) > 1 else None
+            )
 
     def sniff_prefix(self, file_prefix: FilePrefix) -> bool:
         """
@@ -833,9 +870,12 @@ class BaseFastq(Sequence):
         if "toc_file" in args:
             with open(args["toc_file"]) as f:
                 toc_file = json.load(f)
-            commands = Sequence.get_split_commands_with_toc(
-                input_name, output_name, toc_file, start_sequence, sequence_count
-            )
+            ranges = Sequence.get_split_ranges_with_toc(toc_file, start_sequence, sequence_count)
+            _extract_gzip_ranges(input_name, output_name, ranges)
+            return True
+        elif "start_offset" in args:
+            _copy_byte_range(input_name, output_name, int(args["start_offset"]), int(args["end_offset"]))
+            return True
         else:
             commands = Sequence.get_split_commands_sequential(
                 is_gzip(input_name), input_name, output_name, start_sequence, sequence_count
@@ -1495,3 +1535,141 @@ class MemePsp(Sequence):
         # We've checked the first 100 lines and they are compatible with the memepsp format
         # and contain at least one valid entry
         return got_header and got_priors
+
+
+def _is_compressed(filename: str) -> bool:
+    compressed_format, fh = compression_utils.get_fileobj_raw(filename, "rb")
+    fh.close()
+    return compressed_format is not None
+
+
+def _count_lines(filename: str) -> int:
+    """Count the lines of a file, including a last line without a trailing newline."""
+    lines = 0
+    last_chunk = b""
+    with open(filename, "rb") as fh:
+        for chunk in iter(lambda: fh.read(SPLIT_CHUNK_SIZE), b""):
+            lines += chunk.count(b"\n")
+            last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+def _separator_offsets(fh, separator: bytes, targets: Iterable[int]) -> List[int]:
+    """
+    Return the offsets following the n-th occurrence of ``separator`` after
+    the current position of ``fh``, for each n of the ascending ``targets``,
+    until the end of the file.
+
+    >>> _separator_offsets(io.BytesIO(b"a\\nbb\\nccc\\n"), b"\\n", [0, 1, 3, 4])
+    [0, 2, 9]
+    >>> _separator_offsets(io.BytesIO(b">a\\nA\\n>b\\nC\\n>c\\n"), b"\\n>", count(1))
+    [6, 11]
+    """
+    offsets = []
+    targets = iter(targets)
+    target = next(targets, None)
+    position = fh.tell()
+    while target is not None and target <= 0:
+        offsets.append(position)
+        target = next(targets, None)
+    seen = 0
+    tail = b""
+    while target is not None:
+        chunk = fh.read(SPLIT_CHUNK_SIZE)
+        if not chunk:
+            break
+        # Keep the end of the previous chunk to find separators across chunks
+        chunk_data = tail + chunk
+        chunk_start = position - len(tail)
+        position += len(chunk)
+        occurrences = chunk_data.count(separator)
+        # Only look for the separators of this chunk up to the last target in it
+        chunk_seen = 0
+        end = 0
+        while target is not None and seen + occurrences >= target:
+            while seen + chunk_seen < target:
+                end = chunk_data.find(separator, end) + len(separator)
+                chunk_seen += 1
+            offsets.append(chunk_start + end)
+            target = next(targets, None)
+        seen += occurrences
+        tail = chunk_data[len(chunk_data) - len(separator) + 1 :]
+    return offsets
+
+
+def _line_start_offsets(filename: str, line_numbers: List[int], line_offsets: Optional[Dict] = None) -> List[int]:
+    """
+    Return the byte offsets of the starts of the lines with the given ascending
+    numbers, or the size of the file for lines past its end. ``line_offsets``
+    metadata is used to read the file from the closest known offset.
+    """
+    file_size = os.path.getsize(filename)
+    with open(filename, "rb") as fh:
+        if not line_offsets:
+            offsets = _separator_offsets(fh, b"\n", line_numbers)
+        else:
+            interval = line_offsets["interval"]
+            known_offsets = line_offsets["offsets"]
+            offsets = []
+            for line_number in line_numbers:
+                index = min(line_number // interval, len(known_offsets) - 1)
+                fh.seek(known_offsets[index])
+                found = _separator_offsets(fh, b"\n", [line_number - index * interval])
+                if not found:
+                    break
+                offsets.extend(found)
+    offsets = [min(offset, file_size) for offset in offsets]
+    return offsets + [file_size] * (len(line_numbers) - len(offsets))
+
+
+def _copy_byte_range(input_name: str, output_name: str, start: int, end: int, append: bool = False) -> None:
+    """Copy bytes from ``start`` to ``end`` of one file to another without reading them in Python if possible."""
+    with open(input_name, "rb") as src, open(output_name, "ab" if append else "wb") as dst:
+        offset = start
+        try:
+            while offset < end:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, min(end - offset, 2**30))
+                if not sent:
+                    return
+                offset += sent
+        except (AttributeError, OSError):
+            # sendfile between files is not supported by every platform
+            while offset < end:
+                chunk = os.pread(src.fileno(), min(end - offset, SPLIT_CHUNK_SIZE), offset)
+                if not chunk:
+                    return
+                dst.write(chunk)
+                offset += len(chunk)
+
+
+def _write_parts(input_file: str, part_starts: List[int], subdir_generator_function: Callable) -> None:
+    """Copy the parts of a file starting at the given offsets to new sub-directories, in parallel."""
+    part_ends = part_starts[1:] + [os.path.getsize(input_file)]
+    part_paths = []
+    for _ in part_starts:
+        part_path = os.path.join(subdir_generator_function(), os.path.basename(input_file))
+        log.debug(f"Writing {input_file} part to {part_path}")
+        part_paths.append(part_path)
+    with ThreadPoolExecutor(max_workers=SPLIT_COPY_THREADS) as executor:
+        # list() to raise copy errors
+        list(executor.map(_copy_byte_range, [input_file] * len(part_paths), part_paths, part_starts, part_ends))
+
+
+def _extract_gzip_ranges(input_name: str, output_name: str, ranges: List) -> None:
+    """
+    Write the gzip members in the byte ranges of an FQTOC split to a file, keeping only
+    the given lines of members split between parts.
+    """
+    with open(output_name, "wb"):
+        pass
+    for start, end, skip_lines, line_count in ranges:
+        if line_count is None:
+            _copy_byte_range(input_name, output_name, start, end, append=True)
+        else:
+            with open(input_name, "rb") as src:
+                compressed = os.pread(src.fileno(), end - start, start)
+            lines = io.BytesIO(gzip.decompress(compressed)).readlines()[skip_lines : skip_lines + line_count]
+            with open(output_name, "ab") as dst:
+                dst.write(gzip.compress(b"".join(lines)))
@@ -5,18 +5,22 @@ Tabular datatype
 import abc
 import binascii
 import csv
+import itertools
 import logging
-import os
 import re
 import shutil
 import subprocess
 import tempfile
 from json import dumps
 from typing import (
+    Callable,
     cast,
     Dict,
+    Iterator,
     List,
     Optional,
+    Sequence,
+    Tuple,
     Union,
 )
 
@@ -79,6 +83,244 @@ from . import dataproviders
 log = logging.getLogger(__name__)
 
 MAX_DATA_LINES = 100000
+# Number of characters read at once when setting tabular metadata
+SET_META_CHUNK_SIZE = 2**20
+# Column types from the most specific to the most general, a column gets the most general type of its fields
+COLUMN_TYPES = ["int", "float", "list", "str"]
+COLUMN_TYPE_RANKS = {None: -1, **{column_type: rank for rank, column_type in enumerate(COLUMN_TYPES)}}
+# Newline separated fields that int() and float() certainly accept (they also accept other spellings,
+# which are left to guess_column_type), or that are empty. int() rejects more digits than
+# sys.get_int_max_str_digits(), which can't be less than 640.
+INT_FIELDS_RE = re.compile(r"(?:[+-]?[0-9]{1,640})?(?:\n(?:[+-]?[0-9]{1,640})?)*")
+FLOAT_FIELDS_RE = re.compile(
+    r"(?:[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)?"
+    r"(?:\n(?:[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)?)*"
+)
+# Blank and comment lines, at the start of every newline terminated line of a text
+COMMENT_LINE_RE = re.compile(r"^[#\n]", re.MULTILINE)
+
+
+def guess_column_type(column_text: str) -> Optional[str]:
+    """
+    Guess the column type of a single field, None for an empty field.
+
+    >>> [guess_column_type(text) for text in ["1", "-1.5", "NA", "1,2", "1_000", "chr1", ""]]
+    ['int', 'float', 'float', 'list', 'str', 'str', None]
+    """
+    if not column_text:
+        return None
+    # Don't allow underscores in numeric literals (PEP 515)
+    if "_" not in column_text:
+        try:
+            int(column_text)
+            return "int"
+        except ValueError:
+            pass
+        try:
+            float(column_text)
+            return "float"
+        except ValueError:
+            if column_text.strip().lower() == "na":
+                return "float"  # na is special cased to be a float
+    if "," in column_text:
+        return "list"
+    return "str"
+
+
+def guess_fields_column_type(fields: Sequence[str], column_type: Optional[str] = None) -> Optional[str]:
+    """
+    Return the most general of ``column_type`` and the column types of ``fields``.
+
+    Runs of plain ints and floats are recognized with a single regular expression
+    match, other fields are checked one by one with ``guess_column_type``.
+
+    >>> guess_fields_column_type(["1", "", "2"])
+    'int'
+    >>> guess_fields_column_type(["1", "2.5"], "int")
+    'float'
+    >>> guess_fields_column_type(["1", "na"])
+    'float'
+    >>> guess_fields_column_type(["1", "a,b"], "float")
+    'list'
+    >>> guess_fields_column_type(["", ""]) is None
+    True
+    """
+    rank = COLUMN_TYPE_RANKS[column_type]
+    if rank == COLUMN_TYPE_RANKS["str"]:
+        return column_type
+    text = "\n".join(fields)
+    if not text.strip("\n"):
+        return column_type
+    if rank <= COLUMN_TYPE_RANKS["int"] and INT_FIELDS_RE.fullmatch(text):
+        return "int"
+    if rank <= COLUMN_TYPE_RANKS["float"] and FLOAT_FIELDS_RE.fullmatch(text):
+        return "float"
+    for field in set(fields):
+        field_type = guess_column_type(field)
+        if COLUMN_TYPE_RANKS[field_type] > rank:
+            column_type = field_type
+            rank = COLUMN_TYPE_RANKS[field_type]
+            if field_type == "str":
+                break
+    return column_type
+
+
+def count_lines(text: str) -> Tuple[int, int]:
+    """
+    Count the data lines and the blank or comment lines of ``text``.
+
+    >>> count_lines("a\\n#b\\n\\nc\\n#d")
+    (2, 3)
+    """
+    lines = text.count("\n")
+    comment_lines = len(COMMENT_LINE_RE.findall(text))
+    if text and not text.endswith("\n"):
+        # unterminated last line
+        lines += 1
+    return lines - comment_lines, comment_lines
+
+
+def iter_line_chunks(fh: FileObjTypeStr, chunk_size: int = SET_META_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read ``fh`` in chunks of complete lines of about ``chunk_size`` characters,
+    ``chunk_size`` 1 reads a line at a time.
+    """
+    while True:
+        lines = fh.readlines(chunk_size)
+        if not lines:
+            break
+        yield "".join(lines)
+
+
+class TabularMetadataCollector:
+    """
+    Count the lines and guess the column types of a tabular file chunk by chunk,
+    see ``Tabular.set_meta`` for the meaning of the parameters.
+    """
+
+    def __init__(
+        self,
+        get_column_names: Callable[[str], Optional[List[str]]],
+        skip: Optional[int] = None,
+        max_data_lines: Optional[int] = None,
+        max_guess_type_data_lines: Optional[int] = None,
+    ):
+        self.get_column_names = get_column_names
+        # Store original skip value to check with later
+        self.requested_skip = skip
+        self.skip = skip or 0
+        self.max_data_lines = max_data_lines
+        self.max_guess_type_data_lines = max_guess_type_data_lines
+        self.lines = 0
+        self.data_lines = 0
+        self.comment_lines = 0
+        self.column_names: Optional[List[str]] = None
+        self.column_types: List[Optional[str]] = []
+        self.first_line_column_types: List[Optional[str]] = [COLUMN_TYPES[-1]]  # default is one column of type str
+
+    @property
+    def done(self) -> bool:
+        return self.max_data_lines is not None and self.data_lines >= self.max_data_lines
+
+    def read(self, line_chunks: Iterator[str]) -> str:
+        """
+        Add the lines of ``line_chunks`` until ``max_data_lines`` data lines have
+        been read, return what is left of the last chunk read.
+        """
+        for text in line_chunks:
+            lines = text.split("\n")
+            # the last item is empty if the text ends with a newline, and not a line on its own
+            last_line = len(lines) - 1 if text.endswith("\n") else len(lines)
+            read = 0
+            # The first line may be a header, and skipped lines are comments whatever they contain,
+            # so these are added one by one.
+            while read < last_line and (self.lines == 0 or self.lines < self.skip) and not self.done:
+                self.add_line(lines[read])
+                read += 1
+            if read < last_line and not self.done:
+                read += self.add_lines(lines[read:last_line])
+            if self.done:
+                return "\n".join(lines[read:])
+        return ""
+
+    def add_line(self, line: str) -> None:
+        if self.lines == 0:
+            self.column_names = self.get_column_names(line)
+        if self.lines < self.skip or not line or line.startswith("#"):
+            # We'll call blank lines comments
+            self.comment_lines += 1
+        else:
+            self.data_lines += 1
+            if self.max_guess_type_data_lines is None or self.data_lines <= self.max_guess_type_data_lines:
+                self.add_rows([line.split("\t")])
+            if self.lines == 0 and self.requested_skip is None:
+                # This is our first line, people seem to like to upload files that have a header line, but do not
+                # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
+                # that the first line is always a header (this was previous behavior - it was always skipped).  When
+                # the requested skip is None, we only use the data from the first line if we have no other data for
+                # a column.  This is far from perfect, as
+                # 1,2,3	1.1	2.2	qwerty
+                # 0	0		1,2,3
+                # will be detected as
+                # "column_types": ["int", "int", "float", "list"]
+                # instead of
+                # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
+                # observation that the first line should be included as data.  The old method would have detected as
+                # "column_types": ["int", "int", "str", "list"]
+                self.first_line_column_types = self.column_types
+                self.column_types = [None for col in self.first_line_column_types]
+        self.lines += 1
+
+    def add_lines(self, lines: List[str]) -> int:
+        """
+        Add data and comment lines in bulk, return how many were added before
+        reaching ``max_data_lines``.
+        """
+        data = [line for line in lines if line and not line.startswith("#")]
+        if self.max_data_lines is not None and self.data_lines + len(data) >= self.max_data_lines:
+            data = data[: self.max_data_lines - self.data_lines]
+            # stop at the last of these data lines
+            count = len(data)
+            for end, line in enumerate(lines):
+                if line and not line.startswith("#"):
+                    count -= 1
+                    if not count:
+                        break
+            lines = lines[: end + 1]
+        guess_lines = len(data)
+        if self.max_guess_type_data_lines is not None:
+            guess_lines = max(0, min(guess_lines, self.max_guess_type_data_lines - self.data_lines))
+        if guess_lines:
+            self.add_rows([line.split("\t") for line in data[:guess_lines]])
+        self.lines += len(lines)
+        self.data_lines += len(data)
+        self.comment_lines += len(lines) - len(data)
+        return len(lines)
+
+    def add_rows(self, rows: List[List[str]]) -> None:
+        # guess the types of the fields of all rows column by column
+        column_types = self.column_types
+        for field_count, fields in enumerate(itertools.zip_longest(*rows, fillvalue="")):
+            if field_count >= len(column_types):  # found a previously unknown column, we append None
+                column_types.append(None)
+            column_types[field_count] = guess_fields_column_type(fields, column_types[field_count])
+
+    def get_column_types(self) -> List[str]:
+        column_types = list(self.column_types)
+        first_line_column_types = self.first_line_column_types
+        # we error on the larger number of columns
+        # first we pad our column_types by using data from first line
+        if len(first_line_column_types) > len(column_types):
+            for column_type in first_line_column_types[len(column_types) :]:
+                column_types.append(column_type)
+        # Now we fill any unknown (None) column_types with data from first line
+        for i in range(len(column_types)):
+            if column_types[i] is None:
+                if len(first_line_column_types) <= i or first_line_column_types[i] is None:
+                    column_types[i] = COLUMN_TYPES[-1]
+                else:
+                    column_types[i] = first_line_column_types[i]
+        return cast(List[str], column_types)
 
 
 @dataproviders.decorators.has_dataproviders
@@ -187,7 +429,7 @@ class TabularData(Text):
             # We should add a new datatype 'matrix', with its own draw method, suitable for this kind of data.
             # For now, default to the old behavior, ugly as it is.  Remove this after adding 'matrix'.
             max_peek_size = 1000000  # 1 MB
-            if os.stat(dataset.file_name).st_size < max_peek_size:
+            if dataset.get_size() < max_peek_size:
                 self._clean_and_set_mime_type(trans, dataset.get_mime(), headers)
                 return open(dataset.file_name, mode="rb"), headers
             else:
@@ -195,7 +437,7 @@ class TabularData(Text):
                 return (
                     trans.fill_template_mako(
                         "/dataset/large_file.mako",
-                        truncated_data=open(dataset.file_name).read(max_peek_size),
+                        truncated_data=dataset.dataset.get_data(count=max_peek_size),
                         data=dataset,
                     ),
                     headers,
@@ -427,10 +669,11 @@ class Tabular(TabularData):
         max_data_lines parameter is used because various tabular data types
         reuse this function, and their data type classes are responsible to
         determine how many data lines should be processed to ensure that the
-        non-optional metadata parameters are properly set; if used, optional
-        metadata parameters will be set to None, unless the entire file has
-        already been read. Using None for max_data_lines will process all data
-        lines.
+        non-optional metadata parameters are properly set; if used, the lines
+        after these are only counted, or, if the dataset is larger than
+        max_optional_metadata_filesize, optional metadata parameters will be set
+        to None, unless the entire file has already been read. Using None for
+        max_data_lines will process all data lines.
 
         Items of interest:
 
@@ -441,142 +684,54 @@ class Tabular(TabularData):
            Since metadata can now be processed on cluster nodes, we've merged the line count portion
            of the set_peek() processing here, and we now check the entire contents of the file.
         """
-        # Store original skip value to check with later
-        requested_skip = skip
-        if skip is None:
-            skip = 0
-        column_type_set_order = ["int", "float", "list", "str"]  # Order to set column types in
-        default_column_type = column_type_set_order[-1]  # Default column type is lowest in list
-        column_type_compare_order = list(column_type_set_order)  # Order to compare column types
-        column_type_compare_order.reverse()
-
-        def type_overrules_type(column_type1, column_type2):
-            if column_type1 is None or column_type1 == column_type2:
-                return False
-            if column_type2 is None:
-                return True
-            for column_type in column_type_compare_order:
-                if column_type1 == column_type:
-                    return True
-                if column_type2 == column_type:
-                    return False
-            # neither column type was found in our ordered list, this cannot happen
-            raise ValueError(f"Tried to compare unknown column types: {column_type1} and {column_type2}")
-
-        def is_int(column_text):
-            # Don't allow underscores in numeric literals (PEP 515)
-            if "_" in column_text:
-                return False
-            try:
-                int(column_text)
-                return True
-            except ValueError:
-                return False
-
-        def is_float(column_text):
-            # Don't allow underscores in numeric literals (PEP 515)
-            if "_" in column_text:
-                return False
-            try:
-                float(column_text)
-                return True
-            except ValueError:
-                if column_text.strip().lower() == "na":
-                    return True  # na is special cased to be a float
-                return False
-
-        def is_list(column_text):
-            return "," in column_text
-
-        def is_str(column_text):
-            # anything, except an empty string, is True
-            if column_text == "":
-                return False
-            return True
-
-        is_column_type = {}  # Dict to store column type string to checking function
-        for column_type in column_type_set_order:
-            is_column_type[column_type] = locals()[f"is_{column_type}"]
-
-        def guess_column_type(column_text):
-            for column_type in column_type_set_order:
-                if is_column_type[column_type](column_text):
-                    return column_type
-            return None
-
-        data_lines = 0
-        comment_lines = 0
-        column_names = None
-        column_types: List = []
-        first_line_column_types = [default_column_type]  # default value is one column of type str
+        collector = TabularMetadataCollector(self.get_column_names, skip, max_data_lines, max_guess_type_data_lines)
+        lines_unknown = False
         if dataset.has_data():
             # NOTE: if skip > num_check_lines, we won't detect any metadata, and will use default
             with compression_utils.get_fileobj(dataset.file_name) as dataset_fh:
-                i = 0
-                for line in iter(dataset_fh.readline, ""):
-                    line = line.rstrip("\r\n")
-                    if i == 0:
-                        column_names = self.get_column_names(first_line=line)
-                    if i < skip or not line or line.startswith("#"):
-                        # We'll call blank lines comments
-                        comment_lines += 1
-                    else:
-                        data_lines += 1
-                        if max_guess_type_data_lines is None or data_lines <= max_guess_type_data_lines:
-                            fields = line.split("\t")
-                            for field_count, field in enumerate(fields):
-                                if field_count >= len(
-                                    column_types
-                                ):  # found a previously unknown column, we append None
-                                    column_types.append(None)
-                                column_type = guess_column_type(field)
-                                if type_overrules_type(column_type, column_types[field_count]):
-                                    column_types[field_count] = column_type
-                        if i == 0 and requested_skip is None:
-                            # This is our first line, people seem to like to upload files that have a header line, but do not
-                            # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
-                            # that the first line is always a header (this was previous behavior - it was always skipped).  When
-                            # the requested skip is None, we only use the data from the first line if we have no other data for
-                            # a column.  This is far from perfect, as
-                            # 1,2,3	1.1	2.2	qwerty
-                            # 0	0		1,2,3
-                            # will be detected as
-                            # "column_types": ["int", "int", "float", "list"]
-                            # instead of
-                            # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
-                            # observation that the first line should be included as data.  The old method would have detected as
-                            # "column_types": ["int", "int", "str", "list"]
-                            first_line_column_types = column_types
-                            column_types = [None for col in first_line_column_types]
-                    if max_data_lines is not None and data_lines >= max_data_lines:
-                        if dataset_fh.tell() != dataset.get_size():
-                            # Clear optional data_lines metadata value
-                            data_lines = None  # type: ignore [assignment]
-                            # Clear optional comment_lines metadata value; additional comment lines could appear below this point
-                            comment_lines = None  # type: ignore [assignment]
-                        break
-                    i += 1
+                line_chunks = iter_line_chunks(dataset_fh, SET_META_CHUNK_SIZE)
+                try:
+                    remaining = collector.read(line_chunks) or next(line_chunks, "")
+                    if remaining:
+                        # max_data_lines was reached before the end of the file, count the remaining lines
+                        # without parsing them, unless optional metadata is only set for smaller files
+                        lines_unknown = (
+                            self.max_optional_metadata_filesize >= 0
+                            and dataset.get_size() > self.max_optional_metadata_filesize
+                        )
+                        if not lines_unknown:
+                            for text in itertools.chain([remaining], line_chunks):
+                                more_data_lines, more_comment_lines = count_lines(text)
+                                collector.data_lines += more_data_lines
+                                collector.comment_lines += more_comment_lines
+                except UnicodeDecodeError:
+                    if not collector.done and max_data_lines is None:
+                        raise
+                    lines_unknown = True
+            if lines_unknown and not collector.done:
+                # The file can't be decoded after some line, read the sampled lines again one by one, so that
+                # only these need to be decoded
+                collector = TabularMetadataCollector(
+                    self.get_column_names, skip, max_data_lines, max_guess_type_data_lines
+                )
+                with compression_utils.get_fileobj(dataset.file_name) as dataset_fh:
+                    collector.read(iter_line_chunks(dataset_fh, 1))
 
-        # we error on the larger number of columns
-        # first we pad our column_types by using data from first line
-        if len(first_line_column_types) > len(column_types):
-            for column_type in first_line_column_types[len(column_types) :]:
-                column_types.append(column_type)
-        # Now we fill any unknown (None) column_types with data from first line
-        for i in range(len(column_types)):
-            if column_types[i] is None:
-                if len(first_line_column_types) <= i or first_line_column_types[i] is None:
-                    column_types[i] = default_column_type
-                else:
-                    column_types[i] = first_line_column_types[i]
         # Set the discovered metadata values for the dataset
-        dataset.metadata.data_lines = data_lines
-        dataset.metadata.comment_lines = comment_lines
+        column_types = collector.get_column_types()
+        if lines_unknown:
+            # Clear optional data_lines and comment_lines metadata values;
+            # additional comment lines could appear below this point
+            dataset.metadata.data_lines = None
+            dataset.metadata.comment_lines = None
+        else:
+            dataset.metadata.data_lines = collector.data_lines
+            dataset.metadata.comment_lines = collector.comment_lines
         dataset.metadata.column_types = column_types
         dataset.metadata.columns = len(column_types)
         dataset.metadata.delimiter = "\t"
-        if column_names is not None:
-            dataset.metadata.column_names = column_names
+        if collector.column_names is not None:
+            dataset.metadata.column_names = collector.column_names
 
     def as_gbrowse_display_file(self, dataset: HasFileName, **kwd) -> Union[FileObjType, str]:
         return open(dataset.file_name, "rb")
@@ -53,13 +53,19 @@ from galaxy.job_execution.setup import (
 from galaxy.jobs.mapper import (
     JobMappingException,
     JobRunnerMapper,
+    RuleDecisionCache,
 )
+from galaxy.jobs.prefetch import DEFAULT_PREFETCH_CONCURRENCY
 from galaxy.jobs.runners import (
     BaseJobRunner,
     JobState,
 )
 from galaxy.metadata import get_metadata_compute_strategy
 from galaxy.model import store
+from galaxy.model.metadata import (
+    METADATA_METRIC_PLUGIN,
+    MetadataMetrics,
+)
 from galaxy.model.store.discover import MaxDiscoveredFilesExceededError
 from galaxy.objectstore import ObjectStorePopulator
 from galaxy.structured_app import MinimalManagerApp
@@ -326,6 +332,9 @@ class JobConfiguration(ConfiguresHandlers):
         self.handler_assignment_methods_configured = False
         self.handler_max_grab = None
         self.handler_ready_window_size = None
+        self.handler_readiness_index = False
+        self.handler_prefetch_inputs = False
+        self.handler_prefetch_concurrency = DEFAULT_PREFETCH_CONCURRENCY
         self.destinations = {}
         self.default_destination_id = None
         self.tools = {}
@@ -342,7 +351,12 @@ class JobConfiguration(ConfiguresHandlers):
             output_size=None,
             destination_user_concurrent_jobs={},
             destination_total_concurrent_jobs={},
+            tool_user_concurrent_jobs={},
+            tool_total_concurrent_jobs={},
+            group_concurrent_jobs={},
         )
+        # Results of dynamic rules of destinations with a cache_ttl param
+        self.rule_decision_cache = RuleDecisionCache()
 
         default_resubmits = []
         default_resubmit_condition = self.app.config.default_job_resubmission_condition
@@ -437,6 +451,11 @@ class JobConfiguration(ConfiguresHandlers):
         self.handler_ready_window_size = int(
             handling_config_dict.get("ready_window_size", JobConfiguration.DEFAULT_HANDLER_READY_WINDOW_SIZE)
         )
+        self.handler_readiness_index = util.asbool(handling_config_dict.get("readiness_index", False))
+        self.handler_prefetch_inputs = util.asbool(handling_config_dict.get("prefetch_inputs", False))
+        self.handler_prefetch_concurrency = int(
+            handling_config_dict.get("prefetch_concurrency", DEFAULT_PREFETCH_CONCURRENCY)
+        )
 
         # Parse environments
         job_metrics = self.app.job_metrics
@@ -564,6 +583,13 @@ class JobConfiguration(ConfiguresHandlers):
                     self.limits.destination_total_concurrent_jobs[id] = int(limit_value)
                 else:
                     self.limits.destination_user_concurrent_jobs[id] = int(limit_value)
+            elif limit_type in ("tool_user_concurrent_jobs", "tool_total_concurrent_jobs", "group_concurrent_jobs"):
+                # keyed by tool id or group name
+                id = limit_dict.get("id")
+                if not id:
+                    log.error(f"Job limit '{limit_type}' has no id, ignoring it")
+                    continue
+                getattr(self.limits, limit_type)[id] = int(limit_value)
             elif limit_type == "total_walltime":
                 self.limits.total_walltime["window"] = int(limit_dict.get("window")) or 30
                 self.limits.total_walltime["raw"] = types.get(limit_type, str)(limit_value)
@@ -2126,6 +2152,9 @@ class MinimalJobWrapper(HasResourceParameters):
             for metric_name, metric_value in properties.items():
                 if metric_value is not None:
                     has_metrics.add_metric(plugin, metric_name, metric_value)
+        # Timings of the metadata steps, e.g. sorting and indexing BAM outputs
+        for metric_name, metric_value in MetadataMetrics.read(os.path.join(self.working_directory, "metadata")).items():
+            has_metrics.add_metric(METADATA_METRIC_PLUGIN, metric_name, metric_value)
 
     def get_output_sizes(self):
         sizes = []
@@ -2501,7 +2530,9 @@ class JobWrapper(MinimalJobWrapper):
         super().__init__(job, app=queue.app, use_persisted_destination=use_persisted_destination)
         self.queue = queue
         self.tool = self.app.toolbox.get_tool(job.tool_id, job.tool_version, exact=True)
-        self.job_runner_mapper = JobRunnerMapper(self, queue.dispatcher.url_to_destination, self.app.job_config)
+        self.job_runner_mapper = JobRunnerMapper(
+            self, queue.dispatcher.url_to_destination, self.app.job_config, get_job_counts=queue.get_rule_job_counts
+        )
         if use_persisted_destination:
             self.job_runner_mapper.cached_job_destination = JobDestination(from_job=job)
 
@@ -8,7 +8,12 @@ import os
 import re
 import sys
 from functools import reduce
-from typing import Set
+from typing import (
+    Any,
+    Dict,
+    Set,
+    Tuple,
+)
 
 import numpy as np
 import yaml
@@ -43,6 +48,12 @@ A correction for another word.
 """
 max_edit_dist = 2
 
+"""
+Validated configurations by config and job config paths, with the modification
+time of the config, the app they were validated for and the verbose setting.
+"""
+parsed_configs: Dict[Tuple[str, str], Tuple[float, Any, Any, bool]] = {}
+
 """
 List of valid categories that can be expected in the configuration.
 """
@@ -671,6 +682,26 @@ class RuleValidator:
         return valid_rule, rule
 
 
+def parse_yaml_if_modified(path: str, job_conf_path: str, app=None):
+    """
+    Get the validated configuration at path like ``parse_yaml``, reusing the
+    one validated for the same app until the file is modified.
+    """
+    global verbose
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        # relative to the galaxy root, or missing
+        return parse_yaml(path, job_conf_path, app)
+    cached = parsed_configs.get((path, job_conf_path))
+    if cached is not None and cached[0] == mtime and cached[1] is app:
+        verbose = cached[3]
+        return cached[2]
+    config = parse_yaml(path, job_conf_path, app)
+    parsed_configs[(path, job_conf_path)] = (mtime, app, config, verbose)
+    return config
+
+
 def parse_yaml(
     path: str = "/config/tool_destinations.yml",
     job_conf_path: str = "/config/job_conf.xml",
@@ -1308,7 +1339,11 @@ def map_tool_to_destination(job, app, tool, user_email, test=False, path=None, j
         job_conf_path = app.config.job_config_file
 
     try:
-        config = parse_yaml(path, job_conf_path, app)
+        if test:
+            # validate the config for every job in test mode
+            config = parse_yaml(path, job_conf_path, app)
+        else:
+            config = parse_yaml_if_modified(path, job_conf_path, app)
     except MalformedYMLException as e:
         raise JobMappingException(e)
 
@@ -12,13 +12,13 @@ from queue import (
 from typing import (
     Dict,
     List,
+    Optional,
     Tuple,
 )
 
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.sql.expression import (
     and_,
-    func,
     not_,
     null,
     or_,
@@ -33,7 +33,14 @@ from galaxy.jobs import (
     JobWrapper,
     TaskWrapper,
 )
+from galaxy.jobs.limits import JobLimitCounts
 from galaxy.jobs.mapper import JobNotReadyException
+from galaxy.jobs.prefetch import JobInputPrefetcher
+from galaxy.jobs.readiness import (
+    JobReadinessIndex,
+    query_ready_jobs,
+)
+from galaxy.jobs.rule_helper import JobCounts
 from galaxy.structured_app import MinimalManagerApp
 from galaxy.util import unicodify
 from galaxy.util.custom_logging import get_logger
@@ -214,6 +221,13 @@ class BaseJobHandlerQueue(Monitors):
         # This queue is not used if track_jobs_in_database is True.
         self.queue: Queue[Tuple[int, str]] = Queue()
 
+    def get_rule_job_counts(self) -> Optional[JobCounts]:
+        """
+        Return the job counts shared by dynamic rules mapping jobs of this queue,
+        None to have them query the database.
+        """
+        return None
+
 
 class JobHandlerQueue(BaseJobHandlerQueue):
     """
@@ -231,8 +245,24 @@ class JobHandlerQueue(BaseJobHandlerQueue):
         self.waiting_jobs: List[int] = []
         # Contains wrappers of jobs that are limited or ready (so they aren't created unnecessarily/multiple times)
         self.job_wrappers: Dict[int, JobWrapper] = {}
+        # Incrementally tracks unready inputs of new jobs (only use from monitor thread)
+        self.readiness_index = None
+        if self.track_jobs_in_database and self.app.job_config.handler_readiness_index:
+            self.readiness_index = JobReadinessIndex(
+                self.app.config.server_name,
+                self.app.job_config.handler_ready_window_size,
+                user_activation_on=self.app.config.user_activation_on,
+            )
         name = "JobHandlerQueue.monitor_thread"
         self._init_monitor_thread(name, target=self.__monitor, config=app.config)
+        # Fetches inputs of ready jobs into the object store cache before they are dispatched
+        self.input_prefetcher = None
+        if self.app.job_config.handler_prefetch_inputs:
+            self.input_prefetcher = JobInputPrefetcher(
+                self.app.object_store,
+                self.app.job_config.handler_prefetch_concurrency,
+                on_fetched=self.sleeper.wake,
+            )
         self.job_grabber = None
         handler_assignment_method = ItemGrabber.get_grabbable_handler_assignment_method(
             self.app.job_config.handler_assignment_methods
@@ -403,66 +433,21 @@ class JobHandlerQueue(BaseJobHandlerQueue):
             # Clear the session so we get fresh states for job and all datasets
             self.sa_session.expunge_all()
             # Fetch all new jobs
-            hda_not_ready = (
-                self.sa_session.query(model.Job.id)
-                .enable_eagerloads(False)
-                .join(model.JobToInputDatasetAssociation)
-                .join(model.HistoryDatasetAssociation)
-                .join(model.Dataset)
-                .filter(
-                    and_(
-                        model.Job.state == model.Job.states.NEW, model.Dataset.state.in_(model.Dataset.non_ready_states)
-                    )
-                )
-                .subquery()
-            )
-            ldda_not_ready = (
-                self.sa_session.query(model.Job.id)
-                .enable_eagerloads(False)
-                .join(model.JobToInputLibraryDatasetAssociation)
-                .join(model.LibraryDatasetDatasetAssociation)
-                .join(model.Dataset)
-                .filter(
-                    and_(
-                        model.Job.state == model.Job.states.NEW, model.Dataset.state.in_(model.Dataset.non_ready_states)
-                    )
-                )
-                .subquery()
-            )
-            rank = func.rank().over(partition_by=model.Job.table.c.user_id, order_by=model.Job.table.c.id).label("rank")
-            job_filter_conditions = (
-                (model.Job.state == model.Job.states.NEW),
-                (model.Job.handler == self.app.config.server_name),
-                ~model.Job.table.c.id.in_(select(hda_not_ready)),
-                ~model.Job.table.c.id.in_(select(ldda_not_ready)),
-            )
-            if self.app.config.user_activation_on:
-                job_filter_conditions = job_filter_conditions + (
-                    or_((model.Job.user_id == null()), (model.User.active == true())),
-                )
-            if self.sa_session.bind.name == "sqlite":
-                query_objects = (model.Job,)
+            if self.readiness_index is not None:
+                jobs_to_check = self.readiness_index.ready_jobs(self.sa_session)
             else:
-                query_objects = (model.Job, rank)
-            ready_query = (
-                self.sa_session.query(*query_objects)
-                .enable_eagerloads(False)
-                .outerjoin(model.User)
-                .filter(and_(*job_filter_conditions))
-                .order_by(model.Job.id)
-            )
-            if self.sa_session.bind.name == "sqlite":
-                jobs_to_check = ready_query.all()
-            else:
-                ranked = ready_query.subquery()
-                jobs_to_check = (
-                    self.sa_session.query(model.Job)
-                    .join(ranked, model.Job.id == ranked.c.id)
-                    .filter(ranked.c.rank <= self.app.job_config.handler_ready_window_size)
-                    .all()
+                jobs_to_check = query_ready_jobs(
+                    self.sa_session,
+                    self.app.config.server_name,
+                    self.app.job_config.handler_ready_window_size,
+                    user_activation_on=self.app.config.user_activation_on,
                 )
             # Filter jobs with invalid input states
-            jobs_to_check = self.__filter_jobs_with_invalid_input_states(jobs_to_check)
+            checked_jobs = self.__filter_jobs_with_invalid_input_states(jobs_to_check)
+            if self.readiness_index is not None:
+                # Inputs of filtered jobs may have regressed, reload them if the job is still new
+                self.readiness_index.invalidate({j.id for j in jobs_to_check} - {j.id for j in checked_jobs})
+            jobs_to_check = checked_jobs
             # Fetch all "resubmit" jobs
             resubmit_jobs = (
                 self.sa_session.query(model.Job)
@@ -500,7 +485,7 @@ class JobHandlerQueue(BaseJobHandlerQueue):
             # Reassemble resubmit job destination from persisted value
             jw = self.__recover_job_wrapper(job)
             if jw.is_ready_for_resubmission(job):
-                self.increase_running_job_count(job.user_id, jw.job_destination.id)
+                self.increase_running_job_count(job.user_id, jw.job_destination.id, job.tool_id)
                 self.dispatcher.put(jw)
         # Iterate over new and waiting jobs and look for any that are
         # ready to run
@@ -534,6 +519,10 @@ class JobHandlerQueue(BaseJobHandlerQueue):
                 elif job_state == JOB_INPUT_DELETED:
                     log.info("(%d) Job unable to run: one or more inputs deleted" % job.id)
                 elif job_state == JOB_READY:
+                    if self.input_prefetcher is not None and not self.input_prefetcher.inputs_ready(job):
+                        # Hold the job until its inputs are in the object store cache
+                        new_waiting_jobs.append(job.id)
+                        continue
                     self.dispatcher.put(self.job_wrappers.pop(job.id))
                     log.info("(%d) Job dispatched" % job.id)
                 elif job_state == JOB_DELETED:
@@ -567,6 +556,8 @@ class JobHandlerQueue(BaseJobHandlerQueue):
         # Remove cached wrappers for any jobs that are no longer being tracked
         for id in set(self.job_wrappers.keys()) - set(new_waiting_jobs):
             del self.job_wrappers[id]
+        if self.input_prefetcher is not None:
+            self.input_prefetcher.retain(new_waiting_jobs)
         # Flush, if we updated the state
         self.sa_session.flush()
         # Done with the session
@@ -682,7 +673,7 @@ class JobHandlerQueue(BaseJobHandlerQueue):
 
         if state == JOB_READY:
             # PASS.  increase usage by one job (if caching) so that multiple jobs aren't dispatched on this queue iteration
-            self.increase_running_job_count(job.user_id, job_destination.id)
+            self.increase_running_job_count(job.user_id, job_destination.id, job.tool_id)
             for job_to_input_dataset_association in job.input_datasets:
                 # We record the input dataset version, now that we know the inputs are ready
                 if job_to_input_dataset_association.dataset:
@@ -718,11 +709,7 @@ class JobHandlerQueue(BaseJobHandlerQueue):
             job_wrapper.fail(failure_message)
             return JOB_ERROR, job_destination
         # job is ready to run, check limits
-        # TODO: these checks should be refactored to minimize duplication and made more modular/pluggable
-        state = self.__check_destination_jobs(job, job_wrapper)
-
-        if state == JOB_READY:
-            state = self.__check_user_jobs(job, job_wrapper)
+        state = self.__check_job_limits(job, job_wrapper)
         if state == JOB_READY and self.app.quota_agent.is_over_quota(self.app, job, job_destination):
             return JOB_USER_OVER_QUOTA, job_destination
         # Check total walltime limits
@@ -801,222 +788,25 @@ class JobHandlerQueue(BaseJobHandlerQueue):
         return None
 
     def __clear_job_count(self):
-        self.user_job_count = None
-        self.user_job_count_per_destination = None
-        self.total_job_count_per_destination = None
-
-    def get_user_job_count(self, user_id):
-        self.__cache_user_job_count()
-        # This could have been incremented by a previous job dispatched on this iteration, even if we're not caching
-        rval = self.user_job_count.get(user_id, 0)
-        if not self.app.config.cache_user_job_count:
-            result = self.sa_session.execute(
-                select([func.count(model.Job.table.c.id)]).where(
-                    and_(
-                        model.Job.table.c.state.in_(
-                            (model.Job.states.QUEUED, model.Job.states.RUNNING, model.Job.states.RESUBMITTED)
-                        ),
-                        (model.Job.table.c.user_id == user_id),
-                    )
-                )
-            )
-            for row in result:
-                # there should only be one row
-                rval += row[0]
-        return rval
-
-    def __cache_user_job_count(self):
-        # Cache the job count if necessary
-        if self.user_job_count is None and self.app.config.cache_user_job_count:
-            self.user_job_count = {}
-            query = self.sa_session.execute(
-                select([model.Job.table.c.user_id, func.count(model.Job.table.c.user_id)])
-                .where(
-                    and_(
-                        model.Job.table.c.state.in_(
-                            (model.Job.states.QUEUED, model.Job.states.RUNNING, model.Job.states.RESUBMITTED)
-                        ),
-                        (model.Job.table.c.user_id != null()),
-                    )
-                )
-                .group_by(model.Job.table.c.user_id)
-            )
-            for row in query:
-                self.user_job_count[row[0]] = row[1]
-        elif self.user_job_count is None:
-            self.user_job_count = {}
-
-    def get_user_job_count_per_destination(self, user_id):
-        self.__cache_user_job_count_per_destination()
-        cached = self.user_job_count_per_destination.get(user_id, {})
-        if self.app.config.cache_user_job_count:
-            rval = cached
-        else:
-            # The cached count is still used even when we're not caching, it is
-            # incremented when a job is run by this handler to ensure that
-            # multiple jobs can't get past the limits in one iteration of the
-            # queue.
-            rval = {}
-            rval.update(cached)
-            result = self.sa_session.execute(
-                select(
-                    [model.Job.table.c.destination_id, func.count(model.Job.table.c.destination_id).label("job_count")]
-                )
-                .where(
-                    and_(
-                        model.Job.table.c.state.in_((model.Job.states.QUEUED, model.Job.states.RUNNING)),
-                        (model.Job.table.c.user_id == user_id),
-                    )
-                )
-                .group_by(model.Job.table.c.destination_id)
-            )
-            for row in result:
-                # Add the count from the database to the cached count
-                rval[row["destination_id"]] = rval.get(row["destination_id"], 0) + row["job_count"]
-        return rval
-
-    def __cache_user_job_count_per_destination(self):
-        # Cache the job count if necessary
-        if self.user_job_count_per_destination is None and self.app.config.cache_user_job_count:
-            self.user_job_count_per_destination = {}
-            result = self.sa_session.execute(
-                select(
-                    [
-                        model.Job.table.c.user_id,
-                        model.Job.table.c.destination_id,
-                        func.count(model.Job.table.c.user_id).label("job_count"),
-                    ]
-                )
-                .where(and_(model.Job.table.c.state.in_((model.Job.states.QUEUED, model.Job.states.RUNNING))))
-                .group_by(model.Job.table.c.user_id, model.Job.table.c.destination_id)
-            )
-            for row in result:
-                if row["user_id"] not in self.user_job_count_per_destination:
-                    self.user_job_count_per_destination[row["user_id"]] = {}
-                self.user_job_count_per_destination[row["user_id"]][row["destination_id"]] = row["job_count"]
-        elif self.user_job_count_per_destination is None:
-            self.user_job_count_per_destination = {}
-
-    def increase_running_job_count(self, user_id, destination_id):
-        if (
-            self.app.job_config.limits.registered_user_concurrent_jobs
-            or self.app.job_config.limits.anonymous_user_concurrent_jobs
-            or self.app.job_config.limits.destination_user_concurrent_jobs
-        ):
-            if self.user_job_count is None:
-                self.user_job_count = {}
-            if self.user_job_count_per_destination is None:
-                self.user_job_count_per_destination = {}
-            self.user_job_count[user_id] = self.user_job_count.get(user_id, 0) + 1
-            if user_id not in self.user_job_count_per_destination:
-                self.user_job_count_per_destination[user_id] = {}
-            self.user_job_count_per_destination[user_id][destination_id] = (
-                self.user_job_count_per_destination[user_id].get(destination_id, 0) + 1
-            )
-        if self.app.job_config.limits.destination_total_concurrent_jobs:
-            if self.total_job_count_per_destination is None:
-                self.total_job_count_per_destination = {}
-            self.total_job_count_per_destination[destination_id] = (
-                self.total_job_count_per_destination.get(destination_id, 0) + 1
-            )
+        self.job_limit_counts = JobLimitCounts(
+            self.sa_session, self.app.job_config, cache_user_job_count=self.app.config.cache_user_job_count
+        )
+        self.rule_job_counts = JobCounts(self.sa_session)
+
+    def get_rule_job_counts(self) -> Optional[JobCounts]:
+        return self.rule_job_counts
 
-    def __check_user_jobs(self, job, job_wrapper):
+    def increase_running_job_count(self, user_id, destination_id, tool_id=None):
+        self.job_limit_counts.add_job(user_id, destination_id, tool_id)
+
+    def __check_job_limits(self, job, job_wrapper):
         # TODO: Update output datasets' _state = LIMITED or some such new
         # state, so the UI can reflect what jobs are waiting due to concurrency
         # limits
-        if job.user:
-            # Check the hard limit first
-            if self.app.job_config.limits.registered_user_concurrent_jobs:
-                count = self.get_user_job_count(job.user_id)
-                # Check the user's number of dispatched jobs against the overall limit
-                if count >= self.app.job_config.limits.registered_user_concurrent_jobs:
-                    return JOB_WAIT
-            # If we pass the hard limit, also check the per-destination count
-            id = job_wrapper.job_destination.id
-            count_per_id = self.get_user_job_count_per_destination(job.user_id)
-            if id in self.app.job_config.limits.destination_user_concurrent_jobs:
-                count = count_per_id.get(id, 0)
-                # Check the user's number of dispatched jobs in the assigned destination id against the limit for that id
-                if count >= self.app.job_config.limits.destination_user_concurrent_jobs[id]:
-                    return JOB_WAIT
-            # If we pass the destination limit (if there is one), also check limits on any tags (if any)
-            if job_wrapper.job_destination.tags:
-                for tag in job_wrapper.job_destination.tags:
-                    # Check each tag for this job's destination
-                    if tag in self.app.job_config.limits.destination_user_concurrent_jobs:
-                        # Only if there's a limit defined for this tag
-                        count = 0
-                        for id in [d.id for d in self.app.job_config.get_destinations(tag)]:
-                            # Add up the aggregate job total for this tag
-                            count += count_per_id.get(id, 0)
-                        if count >= self.app.job_config.limits.destination_user_concurrent_jobs[tag]:
-                            return JOB_WAIT
-        elif job.galaxy_session:
-            # Anonymous users only get the hard limit
-            if self.app.job_config.limits.anonymous_user_concurrent_jobs:
-                count = (
-                    self.sa_session.query(model.Job)
-                    .enable_eagerloads(False)
-                    .filter(
-                        and_(
-                            model.Job.session_id == job.galaxy_session.id,
-                            or_(
-                                model.Job.state == model.Job.states.RUNNING, model.Job.state == model.Job.states.QUEUED
-                            ),
-                        )
-                    )
-                    .count()
-                )
-                if count >= self.app.job_config.limits.anonymous_user_concurrent_jobs:
-                    return JOB_WAIT
-        else:
-            log.warning(
-                f"Job {job.id} is not associated with a user or session so job concurrency limit cannot be checked."
-            )
-        return JOB_READY
-
-    def __cache_total_job_count_per_destination(self):
-        # Cache the job count if necessary
-        if self.total_job_count_per_destination is None:
-            self.total_job_count_per_destination = {}
-            result = self.sa_session.execute(
-                select(
-                    [model.Job.table.c.destination_id, func.count(model.Job.table.c.destination_id).label("job_count")]
-                )
-                .where(and_(model.Job.table.c.state.in_((model.Job.states.QUEUED, model.Job.states.RUNNING))))
-                .group_by(model.Job.table.c.destination_id)
-            )
-            for row in result:
-                self.total_job_count_per_destination[row["destination_id"]] = row["job_count"]
-
-    def get_total_job_count_per_destination(self):
-        self.__cache_total_job_count_per_destination()
-        # Always use caching (at worst a job will have to wait one iteration,
-        # and this would be more fair anyway as it ensures FIFO scheduling,
-        # insofar as FIFO would be fair...)
-        return self.total_job_count_per_destination
-
-    def __check_destination_jobs(self, job, job_wrapper):
-        if self.app.job_config.limits.destination_total_concurrent_jobs:
-            id = job_wrapper.job_destination.id
-            count_per_id = self.get_total_job_count_per_destination()
-            if id in self.app.job_config.limits.destination_total_concurrent_jobs:
-                count = count_per_id.get(id, 0)
-                # Check the number of dispatched jobs in the assigned destination id against the limit for that id
-                if count >= self.app.job_config.limits.destination_total_concurrent_jobs[id]:
-                    return JOB_WAIT
-            # If we pass the destination limit (if there is one), also check limits on any tags (if any)
-            if job_wrapper.job_destination.tags:
-                for tag in job_wrapper.job_destination.tags:
-                    # Check each tag for this job's destination
-                    if tag in self.app.job_config.limits.destination_total_concurrent_jobs:
-                        # Only if there's a limit defined for this tag
-                        count = 0
-                        for id in [d.id for d in self.app.job_config.get_destinations(tag)]:
-                            # Add up the aggregate job total for this tag
-                            count += count_per_id.get(id, 0)
-                        if count >= self.app.job_config.limits.destination_total_concurrent_jobs[tag]:
-                            return JOB_WAIT
+        exceeded_limit = self.job_limit_counts.exceeded_limit(job, job_wrapper.job_destination)
+        if exceeded_limit:
+            log.trace("(%s) Job is waiting, %s limit reached", job.id, exceeded_limit)
+            return JOB_WAIT
         return JOB_READY
 
     def put(self, job_id, tool_id):
@@ -1038,6 +828,8 @@ class JobHandlerQueue(BaseJobHandlerQueue):
             # A message could still be received while shutting down, should be ok since they will be picked up on next startup.
             self.sleeper.wake()
             self.shutdown_monitor()
+            if self.input_prefetcher is not None:
+                self.input_prefetcher.shutdown()
             log.info("job handler queue stopped")
             self.dispatcher.shutdown()
 
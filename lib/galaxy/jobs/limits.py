@@ -0,0 +1,247 @@
+"""
+Accounting of the job concurrency limits configured in the job configuration.
+"""
+import logging
+from collections import (
+    Counter,
+    defaultdict,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+from sqlalchemy.sql.expression import (
+    and_,
+    false,
+    func,
+    select,
+)
+
+from galaxy import model
+
+log = logging.getLogger(__name__)
+
+# Jobs counted against the per user limit, resubmitted jobs will be dispatched again
+USER_ACTIVE_STATES = (model.Job.states.QUEUED, model.Job.states.RUNNING, model.Job.states.RESUBMITTED)
+# Jobs counted against all other limits
+DISPATCHED_STATES = (model.Job.states.QUEUED, model.Job.states.RUNNING)
+CONCURRENCY_LIMIT_TYPES = (
+    "registered_user_concurrent_jobs",
+    "anonymous_user_concurrent_jobs",
+    "destination_user_concurrent_jobs",
+    "destination_total_concurrent_jobs",
+    "tool_user_concurrent_jobs",
+    "tool_total_concurrent_jobs",
+    "group_concurrent_jobs",
+)
+
+
+class JobUsage:
+    """Numbers of active jobs per user, destination, tool and group."""
+
+    def __init__(self, user_groups: Optional[Dict[int, List[str]]] = None):
+        self.user_groups = user_groups or {}
+        self.user: Dict[Optional[int], int] = Counter()
+        self.user_destination: Dict[Optional[int], Dict[str, int]] = defaultdict(Counter)
+        self.user_tool: Dict[Optional[int], Dict[str, int]] = defaultdict(Counter)
+        self.destination: Dict[str, int] = Counter()
+        self.tool: Dict[str, int] = Counter()
+        self.group: Dict[str, int] = Counter()
+
+    def add(self, user_id, destination_id, tool_id, state=model.Job.states.QUEUED, count=1):
+        if user_id is not None and state in USER_ACTIVE_STATES:
+            self.user[user_id] += count
+        if state not in DISPATCHED_STATES:
+            return
+        self.destination[destination_id] += count
+        self.tool[tool_id] += count
+        if user_id is not None:
+            self.user_destination[user_id][destination_id] += count
+            self.user_tool[user_id][tool_id] += count
+            for group in self.user_groups.get(user_id, ()):
+                self.group[group] += count
+
+
+class JobLimitCounts:
+    """
+    Enforces job concurrency limits of a job handler queue.
+
+    Active jobs are counted with a single grouped query the first time they
+    are needed and jobs dispatched afterwards are added in memory with
+    ``add_job``, so that jobs dispatched in the same iteration of the queue
+    are counted against the limits before they reach the database. Handler
+    queues create a new instance for each iteration.
+
+    If ``cache_user_job_count`` is false, the jobs of a user are counted again
+    for each job checked against per user limits, so that handlers sharing
+    users are less likely to dispatch jobs past the limits.
+    """
+
+    def __init__(self, sa_session, job_config, cache_user_job_count=True):
+        self.sa_session = sa_session
+        self.job_config = job_config
+        self.limits = job_config.limits
+        self.cache_user_job_count = cache_user_job_count
+        self._usage: Optional[JobUsage] = None
+        # jobs dispatched since the usage was loaded, as (user_id, destination_id, tool_id)
+        self._dispatched: List[tuple] = []
+
+    @property
+    def has_concurrency_limits(self) -> bool:
+        return any(getattr(self.limits, limit_type, None) for limit_type in CONCURRENCY_LIMIT_TYPES)
+
+    @property
+    def usage(self) -> JobUsage:
+        if self._usage is None:
+            self._usage = self._load_usage()
+        return self._usage
+
+    def add_job(self, user_id, destination_id, tool_id=None):
+        """Count a job dispatched since the usage was loaded."""
+        if not self.has_concurrency_limits:
+            return
+        self.usage.add(user_id, destination_id, tool_id)
+        self._dispatched.append((user_id, destination_id, tool_id))
+
+    def exceeded_limit(self, job, job_destination) -> Optional[str]:
+        """
+        Return the type of the first concurrency limit that dispatching
+        ``job`` to ``job_destination`` would exceed, None if it can be
+        dispatched.
+        """
+        limits = self.limits
+        if not self.has_concurrency_limits:
+            return None
+        usage = self.usage
+        if self._over_destination_limit(limits.destination_total_concurrent_jobs, usage.destination, job_destination):
+            return "destination_total_concurrent_jobs"
+        if job.tool_id in limits.tool_total_concurrent_jobs:
+            if usage.tool[job.tool_id] >= limits.tool_total_concurrent_jobs[job.tool_id]:
+                return "tool_total_concurrent_jobs"
+        if job.user_id is not None:
+            for group in usage.user_groups.get(job.user_id, ()):
+                if usage.group[group] >= limits.group_concurrent_jobs[group]:
+                    return "group_concurrent_jobs"
+            user_usage = usage if self.cache_user_job_count else self._load_user_usage(job.user_id)
+            if limits.registered_user_concurrent_jobs:
+                if user_usage.user[job.user_id] >= limits.registered_user_concurrent_jobs:
+                    return "registered_user_concurrent_jobs"
+            if self._over_destination_limit(
+                limits.destination_user_concurrent_jobs, user_usage.user_destination[job.user_id], job_destination
+            ):
+                return "destination_user_concurrent_jobs"
+            if job.tool_id in limits.tool_user_concurrent_jobs:
+                if user_usage.user_tool[job.user_id][job.tool_id] >= limits.tool_user_concurrent_jobs[job.tool_id]:
+                    return "tool_user_concurrent_jobs"
+        elif job.galaxy_session:
+            # Anonymous users only get the hard limit
+            if limits.anonymous_user_concurrent_jobs:
+                if self._session_job_count(job.galaxy_session.id) >= limits.anonymous_user_concurrent_jobs:
+                    return "anonymous_user_concurrent_jobs"
+        else:
+            log.warning(
+                f"Job {job.id} is not associated with a user or session so job concurrency limit cannot be checked."
+            )
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Current usage of the configured concurrency limits."""
+        usage = self.usage
+        users = [
+            {
+                "id": user_id,
+                "active_jobs": usage.user[user_id],
+                "destinations": _counts_dict(usage.user_destination[user_id]),
+                "tools": _counts_dict(usage.user_tool[user_id]),
+            }
+            for user_id in sorted(set(usage.user) | set(usage.user_destination))
+            if user_id is not None
+        ]
+        return {
+            "limits": {
+                limit_type: getattr(self.limits, limit_type, None)
+                for limit_type in CONCURRENCY_LIMIT_TYPES
+                if getattr(self.limits, limit_type, None)
+            },
+            "destinations": _counts_dict(usage.destination),
+            "tools": _counts_dict(usage.tool),
+            "groups": {group: usage.group[group] for group in self.limits.group_concurrent_jobs},
+            "users": users,
+        }
+
+    def _over_destination_limit(self, limits, count_per_destination, job_destination) -> bool:
+        if job_destination.id in limits:
+            # Check the number of dispatched jobs in the assigned destination id against the limit for that id
+            if count_per_destination.get(job_destination.id, 0) >= limits[job_destination.id]:
+                return True
+        # If we pass the destination limit (if there is one), also check limits on any tags (if any)
+        for tag in job_destination.tags or ():
+            if tag in limits:
+                count = sum(
+                    count_per_destination.get(destination.id, 0)
+                    for destination in self.job_config.get_destinations(tag)
+                )
+                if count >= limits[tag]:
+                    return True
+        return False
+
+    def _load_usage(self, user_id=None) -> JobUsage:
+        job_table = model.Job.table
+        query = select(
+            [
+                job_table.c.user_id,
+                job_table.c.destination_id,
+                job_table.c.tool_id,
+                job_table.c.state,
+                func.count(job_table.c.id),
+            ]
+        ).where(job_table.c.state.in_(USER_ACTIVE_STATES))
+        if user_id is not None:
+            query = query.where(job_table.c.user_id == user_id)
+        query = query.group_by(job_table.c.user_id, job_table.c.destination_id, job_table.c.tool_id, job_table.c.state)
+        # the groups of users are only needed to count the jobs of all users
+        usage = JobUsage(self._load_user_groups() if user_id is None else None)
+        for row_user_id, destination_id, tool_id, state, job_count in self.sa_session.execute(query):
+            usage.add(row_user_id, destination_id, tool_id, state, job_count)
+        return usage
+
+    def _load_user_usage(self, user_id) -> JobUsage:
+        usage = self._load_usage(user_id=user_id)
+        # Jobs dispatched by this handler on this iteration may not have been flushed yet
+        for dispatched_user_id, destination_id, tool_id in self._dispatched:
+            if dispatched_user_id == user_id:
+                usage.add(dispatched_user_id, destination_id, tool_id)
+        return usage
+
+    def _load_user_groups(self) -> Dict[int, List[str]]:
+        user_groups: Dict[int, List[str]] = defaultdict(list)
+        if self.limits.group_concurrent_jobs:
+            result = self.sa_session.execute(
+                select([model.UserGroupAssociation.table.c.user_id, model.Group.table.c.name])
+                .select_from(model.UserGroupAssociation.table.join(model.Group.table))
+                .where(
+                    and_(
+                        model.Group.table.c.name.in_(list(self.limits.group_concurrent_jobs)),
+                        model.Group.table.c.deleted == false(),
+                    )
+                )
+            )
+            for user_id, group in result:
+                user_groups[user_id].append(group)
+        return user_groups
+
+    def _session_job_count(self, session_id) -> int:
+        return (
+            self.sa_session.query(model.Job)
+            .enable_eagerloads(False)
+            .filter(and_(model.Job.session_id == session_id, model.Job.state.in_(DISPATCHED_STATES)))
+            .count()
+        )
+
+
+def _counts_dict(counts) -> Dict[str, int]:
+    # jobs may not have a destination yet
+    return {key: count for key, count in counts.items() if key is not None and count}
@@ -1,13 +1,29 @@
+import copy
 import importlib
 import logging
+import os
+import threading
+import time
+from functools import lru_cache
 from inspect import getfullargspec
 from types import ModuleType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
 
 import galaxy.jobs.rules
 from galaxy.jobs import stock_rules
 from galaxy.jobs.dynamic_tool_destination import map_tool_to_destination
 from galaxy.util.submodules import import_submodules
-from .rule_helper import RuleHelper
+from .rule_helper import (
+    JobCounts,
+    RuleHelper,
+)
 
 log = logging.getLogger(__name__)
 
@@ -20,6 +36,18 @@ ERROR_MESSAGE_RULE_FUNCTION_NOT_FOUND = (
 )
 ERROR_MESSAGE_RULE_EXCEPTION = "Encountered an unhandled exception while caching job destination dynamic rule."
 
+# Rule function arguments that differ for every job, rules taking them are never cached
+PER_JOB_RULE_ARGS = [
+    "job",
+    "job_id",
+    "job_wrapper",
+    "resource_params",
+    "workflow_invocation_uuid",
+    "workflow_resource_params",
+]
+# Maximum number of rule decisions cached, expired ones are dropped beyond that
+MAX_CACHED_RULE_DECISIONS = 10000
+
 
 class JobMappingConfigurationException(Exception):
     pass
@@ -44,6 +72,54 @@ STOCK_RULES = dict(
 )
 
 
+class RuleDecisionCache:
+    """
+    Results of dynamic rules, kept for the number of seconds set as the
+    ``cache_ttl`` parameter of the dynamic destinations calling them.
+    """
+
+    def __init__(self, max_size: int = MAX_CACHED_RULE_DECISIONS):
+        self.max_size = max_size
+        self._decisions: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        decision = self._decisions.get(key)
+        if decision is not None and decision[0] > time.monotonic():
+            return decision[1]
+        return None
+
+    def put(self, key: Tuple, value: Any, ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._decisions) >= self.max_size:
+                self._decisions = {k: v for k, v in self._decisions.items() if v[0] > now}
+                if len(self._decisions) >= self.max_size:
+                    self._decisions.clear()
+            self._decisions[key] = (now + ttl, value)
+
+
+@lru_cache(maxsize=None)
+def _rule_arg_names(rule_function) -> List[str]:
+    return getfullargspec(rule_function).args
+
+
+# rules module name -> (modification times of its directories, its submodules)
+_rule_modules_cache: Dict[str, Tuple[Tuple[float, ...], List[ModuleType]]] = {}
+
+
+def _import_rule_modules(rules_module: ModuleType) -> List[ModuleType]:
+    """
+    Import the submodules of ``rules_module`` like ``import_submodules``, only
+    looking for them again once files are added or removed.
+    """
+    mtimes = tuple(os.stat(path).st_mtime for path in rules_module.__path__)
+    cached = _rule_modules_cache.get(rules_module.__name__)
+    if cached is None or cached[0] != mtimes:
+        cached = _rule_modules_cache[rules_module.__name__] = (mtimes, import_submodules(rules_module, ordered=True))
+    return cached[1]
+
+
 class JobRunnerMapper:
     """
     This class is responsible to managing the mapping of jobs
@@ -52,10 +128,18 @@ class JobRunnerMapper:
 
     rules_module: ModuleType
 
-    def __init__(self, job_wrapper, url_to_destination, job_config):
+    def __init__(
+        self,
+        job_wrapper,
+        url_to_destination,
+        job_config,
+        get_job_counts: Optional[Callable[[], Optional[JobCounts]]] = None,
+    ):
         self.job_wrapper = job_wrapper
         self.url_to_destination = url_to_destination
         self.job_config = job_config
+        # returns the job counts shared by rules mapping jobs at the same time, if any
+        self.get_job_counts = get_job_counts
 
         self.rules_module = galaxy.jobs.rules
 
@@ -64,14 +148,59 @@ class JobRunnerMapper:
             self.rules_module = importlib.import_module(module_name)
 
     def __invoke_expand_function(self, expand_function, destination):
-        function_arg_names = getfullargspec(expand_function).args
+        function_arg_names = _rule_arg_names(expand_function)
+        cache_key = None
+        cache_ttl = float(destination.params.get("cache_ttl") or 0)
+        if cache_ttl > 0:
+            cache_key = self.__rule_cache_key(expand_function, function_arg_names, destination)
+            if cache_key is not None:
+                job_destination = self.job_config.rule_decision_cache.get(cache_key)
+                if job_destination is not None:
+                    log.debug(
+                        "(%s) Reusing cached result of rule %s", self.job_wrapper.job_id, expand_function.__name__
+                    )
+                    return copy.deepcopy(job_destination)
+        rule_timer = self.job_wrapper.app.execution_timer_factory.get_timer(
+            f"internals.galaxy.jobs.mapper.rules.{expand_function.__name__}",
+            f"Dynamic rule {expand_function.__name__} for job ${{job_id}} executed",
+        )
+        job_destination = self.__call_expand_function(expand_function, function_arg_names, destination)
+        log.debug(rule_timer.to_str(job_id=self.job_wrapper.job_id))
+        if cache_key is not None and job_destination is not None:
+            self.job_config.rule_decision_cache.put(cache_key, copy.deepcopy(job_destination), cache_ttl)
+        return job_destination
+
+    def __rule_cache_key(self, expand_function, function_arg_names, destination):
+        """
+        Return the key the result of a rule is cached with: the rule, the
+        parameters of its destination, the tool and the user if it takes it.
+        """
+        per_job_args = [arg for arg in function_arg_names if arg in PER_JOB_RULE_ARGS and arg not in destination.params]
+        if per_job_args:
+            log.warning(
+                "Not caching result of rule %s, it takes job specific arguments %s",
+                expand_function.__name__,
+                ", ".join(per_job_args),
+            )
+            return None
+        tool = self.job_wrapper.tool
+        user_id = None
+        if "user" in function_arg_names or "user_email" in function_arg_names:
+            user_id = self.job_wrapper.get_job().user_id
+        params = tuple(sorted((key, repr(value)) for key, value in destination.params.items()))
+        return (expand_function, destination.id, params, tool.id, tool.version, user_id)
+
+    def __job_counts(self) -> Optional[JobCounts]:
+        return self.get_job_counts() if self.get_job_counts is not None else None
+
+    def __call_expand_function(self, expand_function, function_arg_names, destination):
         app = self.job_wrapper.app
         possible_args = {
             "job_id": self.job_wrapper.job_id,
             "tool": self.job_wrapper.tool,
             "tool_id": self.job_wrapper.tool.id,
             "job_wrapper": self.job_wrapper,
-            "rule_helper": RuleHelper(app),
+            "rule_helper": RuleHelper(app, job_counts=self.__job_counts()),
             "app": app,
             "referrer": destination,
         }
@@ -180,7 +309,7 @@ class JobRunnerMapper:
             rules_module = importlib.import_module(rules_module_name)
         else:
             rules_module = self.rules_module
-        return import_submodules(rules_module, ordered=True)
+        return _import_rule_modules(rules_module)
 
     def __last_matching_function_in_modules(self, rule_modules, function_name):
         # self.rule_modules is sorted in reverse order, so find first
@@ -225,11 +354,23 @@ class JobRunnerMapper:
             # Recursively handle chained dynamic destinations
             if job_destination.runner == DYNAMIC_RUNNER_NAME:
                 return self.__determine_job_destination(params, raw_job_destination=job_destination)
+            self.__count_mapped_job(job_destination)
         else:
             job_destination = raw_job_destination
             log.debug("(%s) Mapped job to destination id: %s", self.job_wrapper.job_id, job_destination.id)
         return job_destination
 
+    def __count_mapped_job(self, job_destination):
+        """
+        Count a job mapped by a dynamic rule in the job counts shared by rules,
+        if they were read, so that rules mapping the next jobs take it into account.
+        """
+        job_counts = self.__job_counts()
+        if job_counts is not None and job_counts.loaded:
+            user = self.job_wrapper.get_job().user
+            if user is not None:
+                job_counts.add_job(user.email, job_destination.id)
+
     def __cache_job_destination(self, params, raw_job_destination=None):
         try:
             self.cached_job_destination = self.__determine_job_destination(
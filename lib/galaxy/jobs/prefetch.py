@@ -0,0 +1,116 @@
+"""
+Warm the object store cache with the inputs of jobs that are ready to run.
+
+Job runners resolve the file names of job inputs while preparing a job. For
+object stores that keep a local cache of remote storage this downloads missing
+inputs on a runner worker thread, so a burst of jobs with remote inputs can
+occupy every runner thread with downloads. :class:`JobInputPrefetcher` fetches
+the inputs of ready jobs in a bounded pool of background threads instead, the
+job handler only dispatches a job once its inputs are local.
+"""
+import threading
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+from galaxy import model
+from galaxy.util.bunch import Bunch
+from galaxy.util.custom_logging import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_PREFETCH_CONCURRENCY = 4
+
+
+def job_input_datasets(job) -> List[model.Dataset]:
+    """Return the datasets of the inputs of ``job`` that are stored in the object store."""
+    datasets = {}
+    for assoc in job.input_datasets + job.input_library_datasets:
+        dataset_instance = assoc.dataset
+        if dataset_instance is None:
+            continue
+        dataset = dataset_instance.dataset
+        if dataset.state != model.Dataset.states.OK or dataset.purged or dataset.external_filename:
+            # Deferred, purged and external datasets have nothing to fetch
+            continue
+        datasets[dataset.id] = dataset
+    return list(datasets.values())
+
+
+class JobInputPrefetcher:
+    """Fetch the inputs of ready jobs into the object store cache in the background.
+
+    Fetches of a dataset used by several jobs are shared. Only the job handler
+    monitor thread should call :meth:`inputs_ready` and :meth:`retain`.
+    """
+
+    def __init__(
+        self,
+        object_store,
+        concurrency: int = DEFAULT_PREFETCH_CONCURRENCY,
+        on_fetched: Optional[Callable[[], None]] = None,
+    ):
+        self.object_store = object_store
+        self.on_fetched = on_fetched
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="JobInputPrefetcher")
+        self._lock = threading.Lock()
+        # dataset id -> fetch in progress, shared by all jobs using the dataset
+        self._fetches: Dict[int, Future] = {}
+        # job id -> fetches of the job's inputs
+        self._jobs: Dict[int, List[Future]] = {}
+
+    def inputs_ready(self, job) -> bool:
+        """Start fetching the inputs of ``job`` if needed, return ``True`` once all of them are local."""
+        fetches = self._jobs.get(job.id)
+        if fetches is None:
+            fetches = [self._fetch(dataset) for dataset in job_input_datasets(job)]
+            self._jobs[job.id] = fetches
+        if all(fetch.done() for fetch in fetches):
+            del self._jobs[job.id]
+            return True
+        return False
+
+    def retain(self, job_ids: Iterable[int]):
+        """Stop tracking jobs that are not in ``job_ids`` (e.g. jobs that have been deleted while waiting)."""
+        job_ids = set(job_ids)
+        for job_id in set(self._jobs) - job_ids:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _fetch(self, dataset) -> Future:
+        dataset_id = dataset.id
+        with self._lock:
+            fetch = self._fetches.get(dataset_id)
+            if fetch is not None:
+                return fetch
+            # Don't share ORM objects with the fetching thread, the job handler session is cleared on every cycle
+            detached = Bunch(id=dataset_id, uuid=dataset.uuid, object_store_id=dataset.object_store_id)
+            fetch = self._executor.submit(self._get_filename, detached)
+            self._fetches[dataset_id] = fetch
+        # Runs immediately if the fetch already completed, so register it without holding the lock
+        fetch.add_done_callback(lambda _: self._fetched(dataset_id, fetch))
+        return fetch
+
+    def _fetched(self, dataset_id, fetch):
+        with self._lock:
+            if self._fetches.get(dataset_id) is fetch:
+                del self._fetches[dataset_id]
+        if self.on_fetched:
+            self.on_fetched()
+
+    def _get_filename(self, dataset):
+        try:
+            self.object_store.get_filename(dataset)
+        except Exception:
+            # The job fails with a proper message when the runner prepares it
+            log.exception("Failed to prefetch dataset %s into the object store cache", dataset.id)
@@ -0,0 +1,324 @@
+"""
+Determine which ``new`` jobs assigned to a job handler have all of their inputs ready.
+
+Two strategies are provided. :func:`query_ready_jobs` evaluates readiness from
+scratch on every call with anti-joins over the input associations of every
+queued job. :class:`JobReadinessIndex` maintains a per-job count of unready
+inputs across monitor cycles that is updated from job and dataset state
+transitions.
+"""
+import datetime
+from collections import defaultdict
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from sqlalchemy.sql.expression import (
+    and_,
+    func,
+    not_,
+    null,
+    or_,
+    select,
+    true,
+)
+
+from galaxy import model
+from galaxy.model.orm.now import now
+from galaxy.util import chunk_iterable
+from galaxy.util.custom_logging import get_logger
+
+log = get_logger(__name__)
+
+# Number of ids to place in a single ``IN`` clause.
+ID_CHUNK_SIZE = 1000
+
+INPUT_ASSOCIATIONS = (
+    (
+        model.JobToInputDatasetAssociation,
+        model.JobToInputDatasetAssociation.dataset_id,
+        model.HistoryDatasetAssociation,
+    ),
+    (
+        model.JobToInputLibraryDatasetAssociation,
+        model.JobToInputLibraryDatasetAssociation.ldda_id,
+        model.LibraryDatasetDatasetAssociation,
+    ),
+)
+
+
+def query_ready_jobs(sa_session, handler: str, ready_window_size: int, user_activation_on: bool = False):
+    """Return ``new`` jobs for ``handler`` none of whose inputs are in a non-ready state.
+
+    At most ``ready_window_size`` jobs are returned per user (the window is not
+    applied on SQLite, which lacks the required window function support in older
+    versions).
+    """
+    hda_not_ready = (
+        sa_session.query(model.Job.id)
+        .enable_eagerloads(False)
+        .join(model.JobToInputDatasetAssociation)
+        .join(model.HistoryDatasetAssociation)
+        .join(model.Dataset)
+        .filter(and_(model.Job.state == model.Job.states.NEW, model.Dataset.state.in_(model.Dataset.non_ready_states)))
+        .subquery()
+    )
+    ldda_not_ready = (
+        sa_session.query(model.Job.id)
+        .enable_eagerloads(False)
+        .join(model.JobToInputLibraryDatasetAssociation)
+        .join(model.LibraryDatasetDatasetAssociation)
+        .join(model.Dataset)
+        .filter(and_(model.Job.state == model.Job.states.NEW, model.Dataset.state.in_(model.Dataset.non_ready_states)))
+        .subquery()
+    )
+    rank = func.rank().over(partition_by=model.Job.table.c.user_id, order_by=model.Job.table.c.id).label("rank")
+    job_filter_conditions = (
+        (model.Job.state == model.Job.states.NEW),
+        (model.Job.handler == handler),
+        ~model.Job.table.c.id.in_(select(hda_not_ready)),
+        ~model.Job.table.c.id.in_(select(ldda_not_ready)),
+    )
+    if user_activation_on:
+        job_filter_conditions = job_filter_conditions + (
+            or_((model.Job.user_id == null()), (model.User.active == true())),
+        )
+    if sa_session.bind.name == "sqlite":
+        query_objects = (model.Job,)
+    else:
+        query_objects = (model.Job, rank)
+    ready_query = (
+        sa_session.query(*query_objects)
+        .enable_eagerloads(False)
+        .outerjoin(model.User)
+        .filter(and_(*job_filter_conditions))
+        .order_by(model.Job.id)
+    )
+    if sa_session.bind.name == "sqlite":
+        return ready_query.all()
+    ranked = ready_query.subquery()
+    return (
+        sa_session.query(model.Job)
+        .join(ranked, model.Job.id == ranked.c.id)
+        .filter(ranked.c.rank <= ready_window_size)
+        .all()
+    )
+
+
+class JobReadinessIndex:
+    """Incrementally maintained index of unready inputs for a handler's ``new`` jobs.
+
+    The inputs of a job are loaded once, when the job is first seen in the
+    ``new`` state, and the job is tracked with the set of its input datasets
+    that are still in one of :attr:`galaxy.model.Dataset.non_ready_states`.
+    Subsequent updates only look at jobs and datasets whose ``update_time``
+    changed since the previous update (both columns are indexed and bumped on
+    every state change), so the cost of a monitor cycle depends on the number of
+    state transitions rather than on the number of queued jobs. A job becomes a
+    dispatch candidate as soon as its unready input count drops to zero.
+
+    Timestamps are set by the Galaxy processes, so each incremental update
+    overlaps the previous one by ``update_time_slack`` and every
+    ``full_sync_interval`` updates the index is reconciled against all ``new``
+    jobs to recover from missed transitions (e.g. clock skew or raw SQL
+    updates). The index must only be used from the job handler monitor thread.
+    """
+
+    def __init__(
+        self,
+        handler: str,
+        ready_window_size: int,
+        user_activation_on: bool = False,
+        full_sync_interval: int = 60,
+        update_time_slack: datetime.timedelta = datetime.timedelta(seconds=30),
+    ):
+        self.handler = handler
+        self.ready_window_size = ready_window_size
+        self.user_activation_on = user_activation_on
+        self.full_sync_interval = full_sync_interval
+        self.update_time_slack = update_time_slack
+        # job id -> ids of input datasets that are not ready yet
+        self._blocking: Dict[int, Set[int]] = {}
+        # dataset id -> ids of jobs waiting on that dataset
+        self._waiters: Dict[int, Set[int]] = defaultdict(set)
+        # job id -> user id, used to apply the per-user ready window
+        self._user_ids: Dict[int, Optional[int]] = {}
+        # ids of invalidated jobs to reload on the next update
+        self._recheck: Set[int] = set()
+        self._max_job_id = 0
+        self._since: Optional[datetime.datetime] = None
+        self._updates_since_full_sync = 0
+
+    def __len__(self):
+        return len(self._blocking)
+
+    def __contains__(self, job_id):
+        return job_id in self._blocking
+
+    def unready_count(self, job_id: int) -> Optional[int]:
+        """Return the number of unready inputs of a tracked job, or ``None`` if it is not tracked."""
+        blocking = self._blocking.get(job_id)
+        return None if blocking is None else len(blocking)
+
+    @property
+    def ready_job_ids(self) -> List[int]:
+        return sorted(job_id for job_id, blocking in self._blocking.items() if not blocking)
+
+    def update(self, sa_session) -> List[int]:
+        """Synchronize the index with the database and return the ids of jobs with no unready inputs."""
+        update_start = now()
+        if self._since is None or self._updates_since_full_sync >= self.full_sync_interval:
+            self._full_sync(sa_session)
+            self._updates_since_full_sync = 0
+        else:
+            self._incremental_sync(sa_session, self._since)
+            self._updates_since_full_sync += 1
+        self._since = update_start - self.update_time_slack
+        return self.ready_job_ids
+
+    def ready_jobs(self, sa_session):
+        """Update the index and load the ready jobs, limited to ``ready_window_size`` per user."""
+        per_user: Dict[Optional[int], int] = defaultdict(int)
+        windowed_job_ids = []
+        for job_id in self.update(sa_session):
+            user_id = self._user_ids[job_id]
+            per_user[user_id] += 1
+            if per_user[user_id] <= self.ready_window_size:
+                windowed_job_ids.append(job_id)
+        jobs = []
+        for job_ids in chunk_iterable(windowed_job_ids, ID_CHUNK_SIZE):
+            stmt = (
+                select(model.Job)
+                .where(and_(model.Job.id.in_(job_ids), self._tracked_job_condition()))
+                .order_by(model.Job.id)
+            )
+            jobs.extend(sa_session.scalars(stmt))
+        # Jobs that left the new state since the last update
+        for job_id in set(windowed_job_ids) - {job.id for job in jobs}:
+            self._discard(job_id)
+        return jobs
+
+    def invalidate(self, job_ids: Iterable[int]):
+        """Stop tracking the given jobs, their inputs are reloaded if they are still ``new`` on the next update."""
+        for job_id in job_ids:
+            self._discard(job_id)
+            self._recheck.add(job_id)
+
+    def clear(self):
+        self._blocking.clear()
+        self._waiters.clear()
+        self._user_ids.clear()
+        self._recheck.clear()
+        self._max_job_id = 0
+        self._since = None
+
+    def _tracked_job_condition(self):
+        return and_(model.Job.state == model.Job.states.NEW, model.Job.handler == self.handler)
+
+    def _select_new_jobs(self):
+        stmt = select(model.Job.id, model.Job.user_id).where(self._tracked_job_condition())
+        if self.user_activation_on:
+            stmt = stmt.outerjoin(model.User).where(or_((model.Job.user_id == null()), (model.User.active == true())))
+        return stmt
+
+    def _full_sync(self, sa_session):
+        new_jobs = dict(sa_session.execute(self._select_new_jobs()).all())
+        self._blocking.clear()
+        self._waiters.clear()
+        self._user_ids.clear()
+        self._recheck.clear()
+        self._track(sa_session, new_jobs, all_new=True)
+
+    def _incremental_sync(self, sa_session, since: datetime.datetime):
+        # Jobs that changed handler or state, or were deleted, since the last update
+        left_jobs = sa_session.scalars(
+            select(model.Job.id).where(and_(model.Job.update_time >= since, not_(self._tracked_job_condition())))
+        )
+        for job_id in left_jobs:
+            self._discard(job_id)
+        # Newly created jobs and jobs that (re-)entered the new state
+        stmt = self._select_new_jobs().where(or_(model.Job.id > self._max_job_id, model.Job.update_time >= since))
+        new_jobs = dict(sa_session.execute(stmt).all())
+        for chunk in chunk_iterable(sorted(self._recheck), ID_CHUNK_SIZE):
+            new_jobs.update(sa_session.execute(self._select_new_jobs().where(model.Job.id.in_(chunk))).all())
+        self._recheck.clear()
+        self._track(sa_session, new_jobs)
+        if not self._blocking:
+            return
+        if self._waiters:
+            # Datasets that transitioned to a ready state since the last update
+            stmt = select(model.Dataset.id).where(
+                and_(
+                    model.Dataset.update_time >= since,
+                    model.Dataset.state.not_in(model.Dataset.non_ready_states),
+                )
+            )
+            self._release(dataset_id for dataset_id in sa_session.scalars(stmt) if dataset_id in self._waiters)
+        # Inputs of tracked jobs that went back to a non-ready state (e.g. rerun, remapped or metadata reset)
+        for job_to_input, input_id, input_association in INPUT_ASSOCIATIONS:
+            stmt = (
+                select(job_to_input.job_id, model.Dataset.id)
+                .join(input_association, input_id == input_association.id)
+                .join(model.Dataset, input_association.dataset_id == model.Dataset.id)
+                .where(
+                    and_(
+                        model.Dataset.update_time >= since,
+                        model.Dataset.state.in_(model.Dataset.non_ready_states),
+                    )
+                )
+            )
+            self._block(
+                (job_id, dataset_id) for job_id, dataset_id in sa_session.execute(stmt) if job_id in self._blocking
+            )
+
+    def _track(self, sa_session, jobs: Dict[int, Optional[int]], all_new: bool = False):
+        job_ids = jobs.keys() - self._blocking.keys()
+        if not job_ids:
+            return
+        for job_id in job_ids:
+            self._blocking[job_id] = set()
+            self._user_ids[job_id] = jobs[job_id]
+        self._max_job_id = max(self._max_job_id, max(job_ids))
+        if all_new:
+            # Loading the inputs of all new jobs at once is much cheaper than chunking over job ids
+            job_conditions = [self._tracked_job_condition()]
+        else:
+            job_conditions = [model.Job.id.in_(chunk) for chunk in chunk_iterable(sorted(job_ids), ID_CHUNK_SIZE)]
+        for job_condition in job_conditions:
+            for job_to_input, input_id, input_association in INPUT_ASSOCIATIONS:
+                stmt = (
+                    select(model.Job.id, model.Dataset.id)
+                    .join(job_to_input, job_to_input.job_id == model.Job.id)
+                    .join(input_association, input_id == input_association.id)
+                    .join(model.Dataset, input_association.dataset_id == model.Dataset.id)
+                    .where(and_(job_condition, model.Dataset.state.in_(model.Dataset.non_ready_states)))
+                )
+                for job_id, dataset_id in sa_session.execute(stmt):
+                    if job_id in job_ids:
+                        self._blocking[job_id].add(dataset_id)
+                        self._waiters[dataset_id].add(job_id)
+        log.trace("Tracking readiness of %d new job(s)", len(job_ids))
+
+    def _block(self, job_dataset_ids: Iterable[Tuple[int, int]]):
+        for job_id, dataset_id in job_dataset_ids:
+            self._blocking[job_id].add(dataset_id)
+            self._waiters[dataset_id].add(job_id)
+
+    def _release(self, dataset_ids: Iterable[int]):
+        for dataset_id in dataset_ids:
+            for job_id in self._waiters.pop(dataset_id, ()):
+                self._blocking[job_id].discard(dataset_id)
+
+    def _discard(self, job_id: int):
+        self._user_ids.pop(job_id, None)
+        for dataset_id in self._blocking.pop(job_id, ()):
+            waiters = self._waiters.get(dataset_id)
+            if waiters is not None:
+                waiters.discard(job_id)
+                if not waiters:
+                    del self._waiters[dataset_id]
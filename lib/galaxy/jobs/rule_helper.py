@@ -1,9 +1,19 @@
 import hashlib
 import logging
 import random
+import threading
+from collections import defaultdict
 from datetime import datetime
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+)
 
-from sqlalchemy import func
+from sqlalchemy import (
+    func,
+    select,
+)
 
 from galaxy import (
     model,
@@ -16,6 +26,82 @@ log = logging.getLogger(__name__)
 VALID_JOB_HASH_STRATEGIES = ["job", "user", "history", "workflow_invocation"]
 
 
+class JobCounts:
+    """Numbers of unfinished jobs per user, destination and state.
+
+    They are read with a single query the first time they are needed, job
+    handlers share one between all the jobs they map in an iteration of their
+    queue so that rules counting jobs don't query the database for each job.
+    """
+
+    states = model.Job.non_ready_states
+
+    def __init__(self, sa_session):
+        self.sa_session = sa_session
+        self._counts: Optional[Dict[Tuple[str, Optional[str], str], int]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._counts is not None
+
+    def can_count(self, for_job_states=None, created_in_last=None, updated_in_last=None, **kwds) -> bool:
+        return (
+            created_in_last is None
+            and updated_in_last is None
+            and for_job_states is not None
+            and all(state in self.states for state in for_job_states)
+        )
+
+    def count(self, for_user_email=None, for_destination=None, for_destinations=None, for_job_states=None, **kwds):
+        if for_destination is not None:
+            for_destinations = [for_destination]
+        return sum(
+            job_count
+            for (user_email, destination_id, state), job_count in self._get_counts().items()
+            if (for_user_email is None or user_email == for_user_email)
+            and (for_destinations is None or destination_id in for_destinations)
+            and state in for_job_states
+        )
+
+    def add_job(self, user_email, destination_id, state=model.Job.states.QUEUED):
+        """Count a job mapped to a destination since the numbers were read.
+
+        The job is moved from the ``new`` jobs of the user without a
+        destination, it was counted there if it was created before the numbers
+        were read.
+        """
+        counts = self._get_counts()
+        with self._lock:
+            unmapped = (user_email, None, model.Job.states.NEW)
+            if counts.get(unmapped):
+                counts[unmapped] -= 1
+            counts[(user_email, destination_id, state)] += 1
+
+    def _get_counts(self):
+        with self._lock:
+            if self._counts is None:
+                # jobs without users are not counted, as in RuleHelper._filter_job_query
+                result = self.sa_session.execute(
+                    select(
+                        [
+                            model.User.table.c.email,
+                            model.Job.table.c.destination_id,
+                            model.Job.table.c.state,
+                            func.count(model.Job.table.c.id),
+                        ]
+                    )
+                    .select_from(model.Job.table.join(model.User.table))
+                    .where(model.Job.table.c.state.in_(self.states))
+                    .group_by(model.User.table.c.email, model.Job.table.c.destination_id, model.Job.table.c.state)
+                )
+                counts: Dict[Tuple[str, Optional[str], str], int] = defaultdict(int)
+                for user_email, destination_id, state, job_count in result:
+                    counts[(user_email, destination_id, state)] += job_count
+                self._counts = counts
+            return self._counts
+
+
 class RuleHelper:
     """Utility to allow job rules to interface cleanly with the rest of
     Galaxy and shield them from low-level details of models, metrics, etc....
@@ -24,8 +110,10 @@ class RuleHelper:
     could interface with other stuff as well.
     """
 
-    def __init__(self, app):
+    def __init__(self, app, job_counts: Optional[JobCounts] = None):
         self.app = app
+        # unfinished jobs are counted from this snapshot instead of the database if set
+        self.job_counts = job_counts
 
     def supports_container(self, job_or_tool, container_type):
         """
@@ -73,6 +161,8 @@ class RuleHelper:
         return self.supports_container(job_or_tool, container_type="singularity")
 
     def job_count(self, **kwds):
+        if self.job_counts is not None and self.job_counts.can_count(**kwds):
+            return self.job_counts.count(**kwds)
         query = self.query(model.Job)
         return self._filter_job_query(query, **kwds).count()
 
@@ -36,6 +36,7 @@ from galaxy.tool_util.deps.dependencies import (
 )
 from galaxy.tool_util.output_checker import DETECTED_JOB_STATE
 from galaxy.util import (
+    chunk_iterable,
     DATABASE_MAX_STRING_SIZE,
     ExecutionTimer,
     in_directory,
@@ -780,6 +781,10 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
     to the correct methods (queue, finish, cleanup) at appropriate times..
     """
 
+    # Maximum number of watched jobs passed to check_watched_items_batch at once,
+    # ``None`` checks all watched jobs in a single batch.
+    MAX_WATCHED_ITEMS_PER_BATCH: typing.Optional[int] = 1000
+
     def __init__(self, app, nworkers, **kwargs):
         super().__init__(app, nworkers, **kwargs)
         # 'watched' and 'queue' are both used to keep track of jobs to watch.
@@ -839,17 +844,31 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
         This method is responsible for iterating over self.watched and handling
         state changes and updating self.watched with a new list of watched job
         states. Subclasses can opt to override this directly (as older job runners will
-        initially) or just override check_watched_item and allow the list processing to
-        reuse the logic here.
+        initially), override check_watched_items_batch to query the state of many jobs
+        with a single request to the resource manager, or just override
+        check_watched_item and allow the list processing to reuse the logic here.
         """
         new_watched = []
-        for async_job_state in self.watched:
+        batch_size = self.MAX_WATCHED_ITEMS_PER_BATCH or max(len(self.watched), 1)
+        for job_states in chunk_iterable(self.watched, batch_size):
+            new_watched.extend(self.check_watched_items_batch(list(job_states)))
+        self.watched = new_watched
+
+    def check_watched_items_batch(self, job_states):
+        """
+        Check the state of up to ``MAX_WATCHED_ITEMS_PER_BATCH`` watched jobs and
+        return the job states that should remain watched. The default implementation
+        checks each job individually with check_watched_item.
+        """
+        new_watched = []
+        for async_job_state in job_states:
             new_async_job_state = self.check_watched_item(async_job_state)
             if new_async_job_state:
                 new_watched.append(new_async_job_state)
-        self.watched = new_watched
+        return new_watched
 
-    # Subclasses should implement this unless they override check_watched_items all together.
+    # Subclasses should implement this unless they override check_watched_items or
+    # check_watched_items_batch all together.
     def check_watched_item(self, job_state):
         raise NotImplementedError()
 
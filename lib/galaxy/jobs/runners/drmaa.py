@@ -262,7 +262,7 @@ class DRMAAJobRunner(AsynchronousJobRunner):
     def check_watched_item(self, ajs, new_watched):
         """
         look at a single watched job, determine its state, and deal with errors
-        that could happen in this process. to be called from check_watched_items()
+        that could happen in this process. to be called from check_watched_items_batch()
         returns the state or None if exceptions occurred
         in the latter case the job is appended to new_watched if a
 
@@ -270,13 +270,13 @@ class DRMAAJobRunner(AsynchronousJobRunner):
         2 drmaa.InvalidJobExceptionnot, or
         3 drmaa.DrmCommunicationException occurred
 
-        (which causes the job to be tested again in the next iteration of check_watched_items)
+        (which causes the job to be tested again in the next iteration of check_watched_items_batch)
 
         - the job is finished as errored if any other exception occurs
         - the job is finished OK or errored after the maximum number of retries
           depending on the exception
 
-        Note that None is returned in all cases where the loop in check_watched_items
+        Note that None is returned in all cases where the loop in check_watched_items_batch
         is to be continued
         """
         external_job_id = ajs.job_id
@@ -333,17 +333,39 @@ class DRMAAJobRunner(AsynchronousJobRunner):
             return None
         return state
 
-    def check_watched_items(self):
+    def get_job_states(self, job_ids):
         """
-        Called by the monitor thread to look at each watched job and deal
+        Return a dictionary mapping external job ids to DRMAA job states for as
+        many of ``job_ids`` as can be determined with a single query to the DRM.
+        Jobs missing from the result are checked individually with
+        ``self.ds.job_status()``. DRMAA has no bulk status call, so the default
+        implementation returns an empty dictionary; subclasses should override this
+        if the DRM offers a way to list the state of many jobs at once.
+        """
+        return {}
+
+    def check_watched_items_batch(self, job_states):
+        """
+        Called by the monitor thread to look at a batch of watched jobs and deal
         with state changes.
         """
         new_watched = []
-        for ajs in self.watched:
+        try:
+            batch_states = self.get_job_states([ajs.job_id for ajs in job_states])
+        except Exception:
+            log.exception("Unable to check the state of %d jobs at once, checking jobs individually", len(job_states))
+            batch_states = {}
+        for ajs in job_states:
             external_job_id = ajs.job_id
             galaxy_id_tag = ajs.job_wrapper.get_id_tag()
             old_state = ajs.old_state
-            state = self.check_watched_item(ajs, new_watched)
+            state = batch_states.get(external_job_id)
+            if state is None:
+                state = self.check_watched_item(ajs, new_watched)
+            else:
+                # Reset exception retries
+                for retry_exception in RETRY_EXCEPTIONS_LOWER:
+                    setattr(ajs, f"{retry_exception}_retries", 0)
             if state is None:
                 continue
             if state != old_state:
@@ -365,8 +387,7 @@ class DRMAAJobRunner(AsynchronousJobRunner):
                 continue
             ajs.old_state = state
             new_watched.append(ajs)
-        # Replace the watch list with the updated version
-        self.watched = new_watched
+        return new_watched
 
     def stop_job(self, job_wrapper):
         """Attempts to delete a job from the DRM queue"""
@@ -6,6 +6,7 @@ import logging
 import math
 import os
 import re
+from collections import defaultdict
 from datetime import datetime
 
 import yaml
@@ -25,6 +26,7 @@ from galaxy.jobs.runners.util.pykube_util import (
     ensure_pykube,
     find_ingress_object_by_name,
     find_job_object_by_name,
+    find_job_objects_by_selector,
     find_pod_object_by_name,
     find_service_object_by_name,
     galaxy_instance_id,
@@ -188,6 +190,9 @@ class KubernetesJobRunner(AsynchronousJobRunner):
 
         k8s_job_prefix = self.__produce_k8s_job_prefix()
         k8s_job_obj = job_object_dict(self.runner_params, k8s_job_prefix, self.__get_k8s_job_spec(ajs))
+        # Label the job object itself (and not only its pod template) so that the
+        # monitor thread can list all jobs of this handler with a single request.
+        k8s_job_obj["metadata"]["labels"] = self.__get_k8s_job_selector()
 
         job = Job(self._pykube_api, k8s_job_obj)
         try:
@@ -312,6 +317,13 @@ class KubernetesJobRunner(AsynchronousJobRunner):
         instance_id = self._galaxy_instance_id or ""
         return produce_k8s_job_prefix(app_prefix="gxy", instance_id=instance_id)
 
+    def __get_k8s_job_selector(self):
+        """Labels identifying the k8s jobs submitted by this Galaxy handler."""
+        return {
+            "app.kubernetes.io/instance": self.__produce_k8s_job_prefix(),
+            "app.galaxyproject.org/handler": self.__force_label_conformity(self.app.config.server_name),
+        }
+
     def __get_k8s_job_spec(self, ajs):
         """Creates the k8s Job spec. For a Job spec, the only requirement is to have a .spec.template.
         If the job hangs around unlimited it will be ended after k8s wall time limit, which sets activeDeadlineSeconds
@@ -697,12 +709,41 @@ class KubernetesJobRunner(AsynchronousJobRunner):
                 new_params[each_param] = job_destination.params[each_param]
         return new_params
 
+    def check_watched_items_batch(self, job_states):
+        """Checks the state of many jobs with a single request listing the k8s jobs of this handler.
+
+        Jobs that are not part of the listing (e.g. jobs submitted before k8s jobs were
+        labelled by handler, or recovered from another handler) are checked individually.
+        """
+        k8s_jobs_by_name = defaultdict(list)
+        try:
+            k8s_jobs = find_job_objects_by_selector(
+                self._pykube_api, self.__get_k8s_job_selector(), self.runner_params["k8s_namespace"]
+            )
+            for item in k8s_jobs.response["items"]:
+                k8s_jobs_by_name[item["metadata"]["name"]].append(item)
+        except HTTPError:
+            log.exception("Unable to list Kubernetes jobs, checking jobs individually")
+        new_watched = []
+        for job_state in job_states:
+            items = k8s_jobs_by_name.get(job_state.job_id)
+            if items is None:
+                new_job_state = self.check_watched_item(job_state)
+            else:
+                new_job_state = self._check_k8s_job_items(job_state, items)
+            if new_job_state:
+                new_watched.append(new_job_state)
+        return new_watched
+
     def check_watched_item(self, job_state):
         """Checks the state of a job already submitted on k8s. Job state is an AsynchronousJobState"""
         jobs = find_job_object_by_name(self._pykube_api, job_state.job_id, self.runner_params["k8s_namespace"])
+        return self._check_k8s_job_items(job_state, jobs.response["items"])
 
-        if len(jobs.response["items"]) == 1:
-            job = Job(self._pykube_api, jobs.response["items"][0])
+    def _check_k8s_job_items(self, job_state, items):
+        """Update a watched job from the k8s job objects found under its name."""
+        if len(items) == 1:
+            job = Job(self._pykube_api, items[0])
             job_destination = job_state.job_wrapper.job_destination
             succeeded = 0
             active = 0
@@ -762,7 +803,7 @@ class KubernetesJobRunner(AsynchronousJobRunner):
             else:
                 return self._handle_job_failure(job, job_state)
 
-        elif len(jobs.response["items"]) == 0:
+        elif len(items) == 0:
             if job_state.job_wrapper.get_job().state == model.Job.states.DELETED:
                 # Job has been deleted via stop_job and job has been deleted,
                 # cleanup and remove from watched_jobs by returning `None`
@@ -31,11 +31,69 @@ SLURM_MEMORY_LIMIT_EXCEEDED_PARTIAL_WARNINGS = [
 OUT_OF_MEMORY_MSG = "This job was terminated because it used more memory than it was allocated."
 PROBABLY_OUT_OF_MEMORY_MSG = "This job was cancelled probably because it used more memory than it was allocated."
 
+# Non-terminal SLURM job states that can be trusted from a single squeue listing
+# of many jobs, mapped to the name of the corresponding DRMAA job state. Jobs in
+# any other state (including terminal states and jobs no longer known to
+# slurmctld) are checked individually through DRMAA so that their exit status and
+# resource usage are collected as before.
+SLURM_TO_DRMAA_ACTIVE_STATES = {
+    "PENDING": "QUEUED_ACTIVE",
+    "CONFIGURING": "RUNNING",
+    "RUNNING": "RUNNING",
+}
+
+
+def parse_squeue_states(stdout):
+    """
+    Parse the output of ``squeue -h -o "%i %T"`` into a dictionary mapping job
+    ids to SLURM job states. Lines that are not job records (e.g. the
+    ``CLUSTER: name`` header printed when ``-M`` is used) are ignored.
+    """
+    states = {}
+    for line in stdout.splitlines():
+        fields = line.split()
+        if len(fields) != 2 or fields[0] == "CLUSTER:":
+            continue
+        states[fields[0]] = fields[1]
+    return states
+
 
 class SlurmJobRunner(DRMAAJobRunner):
     runner_name = "SlurmRunner"
     restrict_job_name_length = False
 
+    def get_job_states(self, job_ids):
+        """
+        Determine the state of all watched jobs that are pending or running with
+        a single squeue call per cluster, instead of one DRMAA status request per
+        job.
+        """
+        job_ids_by_cluster = {}
+        for external_job_id in job_ids:
+            if "." in external_job_id:
+                # custom slurm-drmaa-with-cluster-support job id syntax
+                job_id, cluster = external_job_id.split(".", 1)
+            else:
+                job_id, cluster = external_job_id, None
+            job_ids_by_cluster.setdefault(cluster, {})[job_id] = external_job_id
+        job_states = {}
+        for cluster, external_job_ids in job_ids_by_cluster.items():
+            cmd = ["squeue", "-h", "-o", "%i %T"]
+            if cluster:
+                cmd.extend(["-M", cluster])
+            cmd.extend(["-j", ",".join(external_job_ids)])
+            try:
+                stdout = commands.execute(cmd)
+            except commands.CommandLineException as e:
+                # e.g. all jobs have already left slurmctld, fall back to checking jobs individually
+                log.debug("Unable to list the state of %d SLURM jobs: %s", len(external_job_ids), e)
+                continue
+            for job_id, slurm_state in parse_squeue_states(stdout).items():
+                drmaa_state = SLURM_TO_DRMAA_ACTIVE_STATES.get(slurm_state)
+                if job_id in external_job_ids and drmaa_state is not None:
+                    job_states[external_job_ids[job_id]] = getattr(self.drmaa_job_states, drmaa_state)
+        return job_states
+
     def _complete_terminal_job(self, ajs, drmaa_state, **kwargs):
         def _get_slurm_state_with_sacct(job_id, cluster):
             cmd = ["sacct", "-n", "-o", "state%-32"]
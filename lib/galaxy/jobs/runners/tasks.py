@@ -1,8 +1,11 @@
 import errno
 import logging
 import os
+import time
 from time import sleep
 
+from sqlalchemy import select
+
 from galaxy import model
 from galaxy.jobs import TaskWrapper
 from galaxy.jobs.runners import BaseJobRunner
@@ -11,6 +14,9 @@ log = logging.getLogger(__name__)
 
 __all__ = ("TaskedJobRunner",)
 
+# Job metrics plugin name of the metrics recorded for split jobs and their tasks
+TASKS_METRIC_PLUGIN = "tasks"
+
 
 class TaskedJobRunner(BaseJobRunner):
     """
@@ -59,22 +65,28 @@ class TaskedJobRunner(BaseJobRunner):
                 job_wrapper.change_state(model.Job.states.ERROR)
                 job_wrapper.fail(f"Job Splitting Failed, no match for '{parallelism}'")
                 return
+            split_start = time.time()
             tasks = splitter.do_split(job_wrapper)
+            split_seconds = time.time() - split_start
             # Not an option for now.  Task objects don't *do* anything
             # useful yet, but we'll want them tracked outside this thread
             # to do anything.
             # if track_tasks_in_database:
             task_wrappers = []
             for task in tasks:
+                task.add_metric(TASKS_METRIC_PLUGIN, "input_bytes", _split_input_bytes(task.working_directory))
                 self.sa_session.add(task)
             self.sa_session.flush()
             # Must flush prior to the creation and queueing of task wrappers.
+            dispatch_time = time.time()
             for task in tasks:
                 tw = TaskWrapper(task, job_wrapper.queue)
                 task_wrappers.append(tw)
                 self.app.job_manager.job_handler.dispatcher.put(tw)
+            # Outputs of finished tasks are merged while the others run if the splitter supports it
+            merger = splitter.output_merger(job_wrapper, task_wrappers) if hasattr(splitter, "output_merger") else None
             tasks_complete = False
-            count_complete = 0
+            finished_tasks = set()
             sleep_time = 1
             # sleep/loop until no more progress can be made. That is when
             # all tasks are one of { OK, ERROR, DELETED }. If a task
@@ -91,12 +103,14 @@ class TaskedJobRunner(BaseJobRunner):
             # Deleted tasks are not included right now.
             #
             while tasks_complete is False:
-                count_complete = 0
                 tasks_complete = True
-                for tw in task_wrappers:
-                    task_state = tw.get_state()
+                progress = False
+                # Check the state of all tasks with a single query
+                task_states = self._get_task_states(job_wrapper.job_id)
+                for index, tw in enumerate(task_wrappers):
+                    task_state, task_exit_code = task_states[tw.task_id]
                     if model.Task.states.ERROR == task_state:
-                        job_exit_code = tw.get_exit_code()
+                        job_exit_code = task_exit_code
                         log.debug("Canceling job %d: Task %s returned an error" % (tw.job_id, tw.task_id))
                         self._cancel_job(job_wrapper, task_wrappers)
                         tasks_complete = True
@@ -104,15 +118,33 @@ class TaskedJobRunner(BaseJobRunner):
                     elif task_state not in completed_states:
                         tasks_complete = False
                     else:
-                        job_exit_code = tw.get_exit_code()
-                        count_complete = count_complete + 1
+                        job_exit_code = task_exit_code
+                        if index not in finished_tasks:
+                            finished_tasks.add(index)
+                            progress = True
+                            self._record_task_elapsed(tw, time.time() - dispatch_time)
+                            if merger and task_state == model.Task.states.OK:
+                                merger.task_finished(index)
                 if tasks_complete is False:
+                    if progress:
+                        sleep_time = 1
                     sleep(sleep_time)
                     if sleep_time < 8:
                         sleep_time *= 2
             job_wrapper.reclaim_ownership()  # if running as the actual user, change ownership before merging.
             log.debug(f"execution finished - beginning merge: {command_line}")
-            stdout, stderr = splitter.do_merge(job_wrapper, task_wrappers)
+            if merger:
+                stdout, stderr = merger.finish()
+                merge_seconds = merger.merge_seconds
+            else:
+                merge_start = time.time()
+                stdout, stderr = splitter.do_merge(job_wrapper, task_wrappers)
+                merge_seconds = time.time() - merge_start
+            job = job_wrapper.get_job()
+            job.add_metric(TASKS_METRIC_PLUGIN, "task_count", len(task_wrappers))
+            job.add_metric(TASKS_METRIC_PLUGIN, "split_seconds", split_seconds)
+            job.add_metric(TASKS_METRIC_PLUGIN, "merge_seconds", merge_seconds)
+            self.sa_session.flush()
         except Exception:
             job_wrapper.fail("failure running job", exception=True)
             log.exception("failure running job %d", job_wrapper.job_id)
@@ -164,6 +196,20 @@ class TaskedJobRunner(BaseJobRunner):
             model.Job.states.ERROR, info="This job was killed when Galaxy was restarted.  Please retry the job."
         )
 
+    def _get_task_states(self, job_id):
+        result = self.sa_session.execute(
+            select([model.Task.table.c.id, model.Task.table.c.state, model.Task.table.c.exit_code]).where(
+                model.Task.table.c.job_id == job_id
+            )
+        )
+        return {task_id: (state, exit_code) for task_id, state, exit_code in result}
+
+    def _record_task_elapsed(self, task_wrapper, elapsed_seconds):
+        # Time from the dispatch of the task to its completion being noticed
+        task = task_wrapper.get_task()
+        task.add_metric(TASKS_METRIC_PLUGIN, "elapsed_seconds", elapsed_seconds)
+        self.sa_session.flush()
+
     def _cancel_job(self, job_wrapper, task_wrappers):
         """
         Cancel the given job. The job's state will be set to ERROR.
@@ -244,3 +290,12 @@ class TaskedJobRunner(BaseJobRunner):
                 return
         else:
             log.warning("_stop_pid(): %s: PID %d refuses to die after signaling TERM/KILL" % (job_id, pid))
+
+
+def _split_input_bytes(task_directory):
+    # Shared inputs are symlinked into task directories, only count the split parts
+    input_bytes = 0
+    for entry in os.scandir(task_directory):
+        if entry.is_file(follow_symlinks=False):
+            input_bytes += entry.stat().st_size
+    return input_bytes
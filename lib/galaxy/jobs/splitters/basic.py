@@ -25,3 +25,9 @@ def do_merge(job_wrapper, task_wrappers):
     # add in the missing information for splitting the one input and merging the one output
     set_basic_defaults(job_wrapper)
     return multi.do_merge(job_wrapper, task_wrappers)
+
+
+def output_merger(job_wrapper, task_wrappers):
+    # add in the missing information for splitting the one input and merging the one output
+    set_basic_defaults(job_wrapper)
+    return multi.output_merger(job_wrapper, task_wrappers)
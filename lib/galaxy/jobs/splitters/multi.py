@@ -1,11 +1,13 @@
 import logging
 import os
 import shutil
+import time
 
 from galaxy import (
     model,
     util,
 )
+from galaxy.datatypes.data import Data
 
 log = logging.getLogger(__name__)
 
@@ -109,82 +111,177 @@ def do_split(job_wrapper):
     return tasks
 
 
+def output_merger(job_wrapper, task_wrappers):
+    return TaskOutputMerger(job_wrapper, task_wrappers)
+
+
 def do_merge(job_wrapper, task_wrappers):
-    parallel_settings = job_wrapper.get_parallelism().attributes
-    # Syntax: merge_outputs="export" pickone_outputs="genomesize"
-    # Designates outputs to be merged, or selected from as a representative
-    merge_outputs = parallel_settings.get("merge_outputs")
-    if merge_outputs is None:
-        merge_outputs = []
-    else:
-        merge_outputs = [x.strip() for x in merge_outputs.split(",")]
-    pickone_outputs = parallel_settings.get("pickone_outputs")
-    if pickone_outputs is None:
-        pickone_outputs = []
-    else:
-        pickone_outputs = [x.strip() for x in pickone_outputs.split(",")]
+    return output_merger(job_wrapper, task_wrappers).finish()
 
-    illegal_outputs = [x for x in merge_outputs if x in pickone_outputs]
-    if len(illegal_outputs) > 0:
-        return ("Tool file error", f"Outputs have conflicting parallelism attributes: {str(illegal_outputs)}")
 
-    stdout = ""
-    stderr = ""
+class TaskOutputMerger:
+    """
+    Merges the outputs of the tasks of a split job into the job outputs.
 
-    try:
-        working_directory = job_wrapper.working_directory
-        task_dirs = [os.path.join(working_directory, x) for x in os.listdir(working_directory) if x.startswith("task_")]
-        assert task_dirs, "Should be at least one sub-task!"
-        # TODO: Output datasets can be very complex. This doesn't handle metadata files
-        outputs = job_wrapper.job_io.get_output_hdas_and_fnames()
-        output_paths = job_wrapper.job_io.get_output_fnames()
-        pickone_done = []
-        task_dirs = [os.path.join(working_directory, x) for x in os.listdir(working_directory) if x.startswith("task_")]
-        task_dirs.sort(key=lambda x: int(x.split("task_")[-1]))
-        for index, output in enumerate(outputs):
-            output_file_name = str(output_paths[index])  # Use false_path if set, else real path.
-            base_output_name = os.path.basename(output_file_name)
-            if output in merge_outputs:
-                output_type = outputs[output][0].datatype
-                output_files = [os.path.join(dir, base_output_name) for dir in task_dirs]
-                # Just include those files f in the output list for which the
-                # file f exists; some files may not exist if a task fails.
-                output_files = [f for f in output_files if os.path.exists(f)]
-                if output_files:
-                    log.debug(f"files {output_files} ")
-                    if len(output_files) < len(task_dirs):
-                        log.debug(
-                            "merging only %i out of expected %i files for %s"
-                            % (len(output_files), len(task_dirs), output_file_name)
-                        )
-                    output_type.merge(output_files, output_file_name)
-                    log.debug(f"merge finished: {output_file_name}")
+    Outputs of datatypes merged by concatenation are appended to with
+    ``task_finished`` as soon as the tasks producing their next parts are
+    complete, so that only the parts of the last tasks are left to merge
+    once all tasks are done. Other outputs are merged by ``finish``.
+    """
+
+    def __init__(self, job_wrapper, task_wrappers):
+        self.job_wrapper = job_wrapper
+        self.task_wrappers = task_wrappers
+        parallel_settings = job_wrapper.get_parallelism().attributes
+        # Syntax: merge_outputs="export" pickone_outputs="genomesize"
+        # Designates outputs to be merged, or selected from as a representative
+        self.merge_outputs = _names(parallel_settings.get("merge_outputs"))
+        self.pickone_outputs = _names(parallel_settings.get("pickone_outputs"))
+        # Outputs of tasks run as the real user can only be read once ownership of the working directory is reclaimed
+        self.stream = not job_wrapper.get_destination_configuration("external_chown_script", None)
+        self.merge_seconds = 0.0
+        self._finished_tasks = set()
+        # Number of leading tasks whose outputs were appended by task_finished
+        self._streamed_tasks = 0
+        self._streamed_files = {}
+        self._task_dirs = None
+        self._outputs = None
+
+    @property
+    def task_dirs(self):
+        if self._task_dirs is None:
+            working_directory = self.job_wrapper.working_directory
+            task_dirs = [
+                os.path.join(working_directory, x) for x in os.listdir(working_directory) if x.startswith("task_")
+            ]
+            task_dirs.sort(key=lambda x: int(x.split("task_")[-1]))
+            self._task_dirs = task_dirs
+        return self._task_dirs
+
+    @property
+    def outputs(self):
+        """List of output name, datatype, file name (false_path if set, else real path) tuples."""
+        if self._outputs is None:
+            # TODO: Output datasets can be very complex. This doesn't handle metadata files
+            outputs = self.job_wrapper.job_io.get_output_hdas_and_fnames()
+            output_paths = self.job_wrapper.job_io.get_output_fnames()
+            self._outputs = [
+                (output, outputs[output][0].datatype, str(output_paths[index])) for index, output in enumerate(outputs)
+            ]
+        return self._outputs
+
+    def task_finished(self, index):
+        """
+        Record that the task with the given index in ``task_wrappers`` is
+        complete and append the outputs of the tasks complete in order.
+        """
+        if not self.stream or self.merge_outputs_conflict:
+            return
+        self._finished_tasks.add(index)
+        start = time.time()
+        try:
+            while self._streamed_tasks in self._finished_tasks:
+                task_dir = self.task_dirs[self._streamed_tasks]
+                for output, datatype, output_file_name in self.outputs:
+                    if output in self.merge_outputs and _merges_by_concatenation(datatype):
+                        task_file_name = os.path.join(task_dir, os.path.basename(output_file_name))
+                        if os.path.exists(task_file_name):
+                            streamed_files = self._streamed_files.setdefault(output, [])
+                            _append_files([task_file_name], output_file_name, truncate=not streamed_files)
+                            streamed_files.append(task_file_name)
+                self._streamed_tasks += 1
+        except Exception:
+            log.exception("Failed to merge outputs of finished tasks, outputs will be merged once all tasks are done")
+            self.stream = False
+            self._streamed_files = {}
+        self.merge_seconds += time.time() - start
+
+    @property
+    def merge_outputs_conflict(self):
+        return [x for x in self.merge_outputs if x in self.pickone_outputs]
+
+    def finish(self):
+        """Merge the outputs left to merge and return the stdout and stderr of the job."""
+        illegal_outputs = self.merge_outputs_conflict
+        if len(illegal_outputs) > 0:
+            return ("Tool file error", f"Outputs have conflicting parallelism attributes: {str(illegal_outputs)}")
+
+        stdout = ""
+        stderr = ""
+
+        start = time.time()
+        try:
+            task_dirs = self.task_dirs
+            assert task_dirs, "Should be at least one sub-task!"
+            pickone_done = []
+            for output, output_type, output_file_name in self.outputs:
+                base_output_name = os.path.basename(output_file_name)
+                if output in self.merge_outputs:
+                    output_files = [os.path.join(dir, base_output_name) for dir in task_dirs]
+                    # Just include those files f in the output list for which the
+                    # file f exists; some files may not exist if a task fails.
+                    output_files = [f for f in output_files if os.path.exists(f)]
+                    if output_files:
+                        log.debug(f"files {output_files} ")
+                        if len(output_files) < len(task_dirs):
+                            log.debug(
+                                "merging only %i out of expected %i files for %s"
+                                % (len(output_files), len(task_dirs), output_file_name)
+                            )
+                        streamed_files = self._streamed_files.get(output)
+                        if streamed_files:
+                            # Parts of tasks completed first were appended already
+                            remaining_files = output_files[len(streamed_files) :]
+                            assert output_files[: len(streamed_files)] == streamed_files
+                            _append_files(remaining_files, output_file_name)
+                        else:
+                            output_type.merge(output_files, output_file_name)
+                        log.debug(f"merge finished: {output_file_name}")
+                    else:
+                        msg = "nothing to merge for %s (expected %i files)" % (output_file_name, len(task_dirs))
+                        log.debug(msg)
+                        stderr += f"{msg}\n"
+                elif output in self.pickone_outputs:
+                    # just pick one of them
+                    if output not in pickone_done:
+                        task_file_name = os.path.join(task_dirs[0], base_output_name)
+                        shutil.move(task_file_name, output_file_name)
+                        pickone_done.append(output)
                 else:
-                    msg = "nothing to merge for %s (expected %i files)" % (output_file_name, len(task_dirs))
-                    log.debug(msg)
-                    stderr += f"{msg}\n"
-            elif output in pickone_outputs:
-                # just pick one of them
-                if output not in pickone_done:
-                    task_file_name = os.path.join(task_dirs[0], base_output_name)
-                    shutil.move(task_file_name, output_file_name)
-                    pickone_done.append(output)
-            else:
-                log_error = f"The output '{output}' does not define a method for implementing parallelism"
-                log.exception(log_error)
-                raise Exception(log_error)
-    except Exception as e:
-        stdout = "Error merging files"
-        log.exception(stdout)
-        stderr = util.unicodify(e)
-
-    for tw in task_wrappers:
-        # Prevent repetitive output, e.g. "Sequence File Aligned"x20
-        # Eventually do a reduce for jobs that output "N reads mapped", combining all N for tasks.
-        out = tw.get_task().stdout.strip()
-        err = tw.get_task().stderr.strip()
-        if len(out) > 0:
-            stdout += f"\n{tw.working_directory}:\n{out}"
-        if len(err) > 0:
-            stderr += f"\n{tw.working_directory}:\n{err}"
-    return (stdout, stderr)
+                    log_error = f"The output '{output}' does not define a method for implementing parallelism"
+                    log.exception(log_error)
+                    raise Exception(log_error)
+        except Exception as e:
+            stdout = "Error merging files"
+            log.exception(stdout)
+            stderr = util.unicodify(e)
+        self.merge_seconds += time.time() - start
+
+        for tw in self.task_wrappers:
+            # Prevent repetitive output, e.g. "Sequence File Aligned"x20
+            # Eventually do a reduce for jobs that output "N reads mapped", combining all N for tasks.
+            out = tw.get_task().stdout.strip()
+            err = tw.get_task().stderr.strip()
+            if len(out) > 0:
+                stdout += f"\n{tw.working_directory}:\n{out}"
+            if len(err) > 0:
+                stderr += f"\n{tw.working_directory}:\n{err}"
+        return (stdout, stderr)
+
+
+def _names(setting):
+    if setting is None:
+        return []
+    return [x.strip() for x in setting.split(",")]
+
+
+def _merges_by_concatenation(datatype):
+    return type(datatype).merge is Data.merge
+
+
+def _append_files(split_files, output_file, truncate=False):
+    # Same as Data.merge, one part at a time
+    with open(output_file, "wb" if truncate else "ab") as fdst:
+        for fsrc in split_files:
+            with open(fsrc, "rb") as fh:
+                shutil.copyfileobj(fh, fdst)
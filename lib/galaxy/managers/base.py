@@ -34,6 +34,7 @@ from typing import (
     Callable,
     Dict,
     Generic,
+    Iterable,
     List,
     NamedTuple,
     Optional,
@@ -738,6 +739,16 @@ class ModelSerializer(HasAModelManager[T]):
         # Note: it may not be best to encode the id at this layer
         return self.app.security.encode_id(id) if id is not None else None
 
+    def encode_ids_of(self, items: Iterable[Any], keys: Iterable[str] = ("id",)):
+        """
+        Encode the id attributes named `keys` of all `items` at once, so that
+        `serialize_id` finds them already encoded when serializing each item.
+        """
+        ids = {getattr(item, key) for item in items for key in keys}
+        ids.discard(None)
+        if ids:
+            self.app.security.encode_ids(ids)
+
     def serialize_type_id(self, item: Any, key: str, **context):
         """
         Serialize an type-id for `item`.
@@ -1,9 +1,12 @@
 import logging
+from collections import defaultdict
 from typing import (
     Any,
     Dict,
     List,
     overload,
+    Set,
+    Tuple,
     Union,
 )
 from zipfile import ZipFile
@@ -11,6 +14,8 @@ from zipfile import ZipFile
 from sqlalchemy.orm import (
     joinedload,
     Query,
+    selectinload,
+    undefer,
 )
 from typing_extensions import Literal
 
@@ -38,7 +43,10 @@ from galaxy.model.tags import GalaxyTagHandler
 from galaxy.schema.schema import DatasetCollectionInstanceType
 from galaxy.schema.tasks import PrepareDatasetCollectionDownload
 from galaxy.security.idencoding import IdEncodingHelper
-from galaxy.util import validation
+from galaxy.util import (
+    chunk_iterable,
+    validation,
+)
 from galaxy.web.short_term_storage import (
     ShortTermStorageMonitor,
     storage_context,
@@ -48,6 +56,7 @@ log = logging.getLogger(__name__)
 
 ERROR_INVALID_ELEMENTS_SPECIFICATION = "Create called with invalid parameters, must specify element identifiers."
 ERROR_NO_COLLECTION_TYPE = "Create called without specifying a collection type."
+ELEMENT_LOAD_CHUNK_SIZE = 1000
 
 
 class DatasetCollectionManager:
@@ -575,6 +584,15 @@ class DatasetCollectionManager:
         elements.update(new_elements)
 
     def __load_elements(self, trans, element_identifiers, hide_source_items=False, copy_elements=False, history=None):
+        # keep references to the preloaded objects, the session only holds them weakly
+        loaded_objects = self.__load_element_objects(
+            element_identifiers,
+            load_tags=not copy_elements and any(e.get("tags") for e in element_identifiers),
+            # hidden datasets get a new version recording their metadata, copies copy it
+            load_metadata=hide_source_items or copy_elements,
+        )
+        tag_handler = self.tag_handler.create_tag_handler_session()
+        tag_handler.load_tags(_element_tags_str(element_identifier) for element_identifier in element_identifiers)
         elements = {}
         for element_identifier in element_identifiers:
             elements[element_identifier["name"]] = self.__load_element(
@@ -583,10 +601,67 @@ class DatasetCollectionManager:
                 hide_source_items=hide_source_items,
                 copy_elements=copy_elements,
                 history=history,
+                loaded_objects=loaded_objects,
+                tag_handler=tag_handler,
             )
         return elements
 
-    def __load_element(self, trans, element_identifier, hide_source_items, copy_elements, history=None):
+    def __load_element_objects(
+        self, element_identifiers, load_tags=False, load_metadata=False
+    ) -> Dict[Tuple[str, int], Any]:
+        """
+        Load the datasets and collections referenced by decoded ids in element
+        identifiers with one query per type and chunk of ids, along with the
+        relationships needed to check access to them, keyed by (src, id).
+        """
+        ids_by_src: Dict[str, Set[int]] = defaultdict(set)
+        for element_identifier in element_identifiers:
+            if "__object__" in element_identifier:
+                continue
+            element_id = element_identifier.get("id")
+            if isinstance(element_id, int):
+                ids_by_src[element_identifier.get("src", "hda")].add(element_id)
+        hda_options = [
+            joinedload(model.HistoryDatasetAssociation.dataset).joinedload(model.Dataset.actions),
+            joinedload(model.HistoryDatasetAssociation.history),
+        ]
+        if load_tags:
+            hda_options.append(selectinload(model.HistoryDatasetAssociation.tags))
+        if load_metadata:
+            hda_options.append(undefer(model.HistoryDatasetAssociation._metadata))
+        loaders = {
+            "hda": (model.HistoryDatasetAssociation, hda_options),
+            "ldda": (
+                model.LibraryDatasetDatasetAssociation,
+                [
+                    joinedload(model.LibraryDatasetDatasetAssociation.dataset).joinedload(model.Dataset.actions),
+                    joinedload(model.LibraryDatasetDatasetAssociation.library_dataset),
+                ],
+            ),
+            "hdca": (
+                model.HistoryDatasetCollectionAssociation,
+                [joinedload(model.HistoryDatasetCollectionAssociation.history)],
+            ),
+        }
+        context = self.model.context
+        loaded_objects: Dict[Tuple[str, int], Any] = {}
+        for src_type, (model_class, options) in loaders.items():
+            for ids in chunk_iterable(sorted(ids_by_src[src_type]), size=ELEMENT_LOAD_CHUNK_SIZE):
+                query = context.query(model_class).filter(model_class.table.c.id.in_(ids)).options(*options)
+                for item in query:
+                    loaded_objects[(src_type, item.id)] = item
+        return loaded_objects
+
+    def __load_element(
+        self,
+        trans,
+        element_identifier,
+        hide_source_items,
+        copy_elements,
+        history=None,
+        loaded_objects=None,
+        tag_handler=None,
+    ):
         # if not isinstance( element_identifier, dict ):
         #    # Is allowing this to just be the id of an hda too clever? Somewhat
         #    # consistent with other API methods though.
@@ -613,30 +688,33 @@ class DatasetCollectionManager:
             message = message_template % element_identifier
             raise RequestParameterInvalidException(message)
 
-        tags = element_identifier.pop("tags", None)
-        tag_str = ""
-        if tags:
-            tag_str = ",".join(str(_) for _ in tags)
+        tag_str = _element_tags_str(element_identifier)
+        element_identifier.pop("tags", None)
+        tag_handler = tag_handler or self.tag_handler
         if src_type == "hda":
-            hda = self.hda_manager.get_accessible(element_id, trans.user)
+            hda = (loaded_objects or {}).get(("hda", element_id))
+            if hda is None:
+                hda = self.hda_manager.get_accessible(element_id, trans.user)
+            else:
+                self.hda_manager.error_unless_accessible(hda, trans.user)
             if copy_elements:
                 element: model.HistoryDatasetAssociation = self.hda_manager.copy(
                     hda, history=history or trans.history, hide_copy=True, flush=False
                 )
             else:
                 element = hda
-            if hide_source_items and self.hda_manager.get_owned(
-                hda.id, user=trans.user, current_history=history or trans.history
+            if hide_source_items and self.hda_manager.error_unless_owner(
+                hda, trans.user, current_history=history or trans.history
             ):
                 hda.visible = False
-            self.tag_handler.apply_item_tags(user=trans.user, item=element, tags_str=tag_str, flush=False)
+            tag_handler.apply_item_tags(user=trans.user, item=element, tags_str=tag_str, flush=False)
             return element
         elif src_type == "ldda":
             element2 = self.ldda_manager.get(trans, element_id, check_accessible=True)
             element3 = element2.to_history_dataset_association(
                 history or trans.history, add_to_history=True, visible=not hide_source_items
             )
-            self.tag_handler.apply_item_tags(user=trans.user, item=element3, tags_str=tag_str, flush=False)
+            tag_handler.apply_item_tags(user=trans.user, item=element3, tags_str=tag_str, flush=False)
             return element3
         elif src_type == "hdca":
             # TODO: Option to copy? Force copy? Copy or allow if not owned?
@@ -845,3 +923,8 @@ class DatasetCollectionManager:
             collection_instance = self.model.context.query(model.HistoryDatasetCollectionAssociation).get(instance_id)
             with ZipFile(target.path, "w") as zip_f:
                 write_dataset_collection(collection_instance, zip_f)
+
+
+def _element_tags_str(element_identifier) -> str:
+    tags = element_identifier.get("tags")
+    return ",".join(str(_) for _ in tags) if tags else ""
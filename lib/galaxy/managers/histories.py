@@ -43,6 +43,10 @@ from galaxy.managers.base import (
     StorageCleanerManager,
 )
 from galaxy.managers.export_tracker import StoreExportTracker
+from galaxy.model.history_copy import (
+    HistoryCopier,
+    ProgressCallback,
+)
 from galaxy.schema.fields import DecodedDatabaseIdField
 from galaxy.schema.schema import (
     ExportObjectMetadata,
@@ -86,11 +90,14 @@ class HistoryManager(sharable.SharableModelManager, deletable.PurgableManagerMix
         self.contents_manager = contents_manager
         self.contents_filters = contents_filters
 
-    def copy(self, history, user, **kwargs):
+    def copy(self, history, user, progress: Optional[ProgressCallback] = None, **kwargs):
         """
         Copy and return the given `history`.
+
+        `progress` is called with the number of items copied so far and the
+        total number of items of the history.
         """
-        return history.copy(target_user=user, **kwargs)
+        return HistoryCopier(history, progress=progress).copy(target_user=user, **kwargs)
 
     # .... sharable
     # overriding to handle anonymous users' current histories in both cases
@@ -676,12 +683,12 @@ class HistorySerializer(sharable.SharableModelSerializer, deletable.PurgableSeri
             state_counts[state] = 0
 
         # TODO:?? collections and coll. states?
-        for hda in history.datasets:
-            if exclude_deleted and hda.deleted:
-                continue
-            if exclude_hidden and not hda.visible:
-                continue
-            state_counts[hda.state] = state_counts[hda.state] + 1
+        hda_state_counts = self.manager.contents_manager.state_counts(
+            history, history_content_type="dataset", exclude_deleted=exclude_deleted, exclude_hidden=exclude_hidden
+        )
+        for state, count in hda_state_counts.items():
+            if state in state_counts:
+                state_counts[state] = count
         return state_counts
 
     # TODO: remove this (is state used/useful?)
@@ -2,24 +2,31 @@
 Heterogenous lists/contents are difficult to query properly since unions are
 not easily made.
 """
+import datetime
 import json
 import logging
+import operator
 from typing import (
     Any,
     Dict,
-    List,
+    NamedTuple,
+    Optional,
 )
 
 from sqlalchemy import (
+    and_,
     asc,
+    case,
     cast,
     desc,
+    exists,
     false,
     func,
     Integer,
     literal,
     nullsfirst,
     nullslast,
+    or_,
     select,
     sql,
     true,
@@ -54,6 +61,38 @@ from .base import (
 
 log = logging.getLogger(__name__)
 
+#: the attributes contents can be ordered by when paginating with a keyset
+KEYSET_ORDER_ATTRIBUTES = ("hid", "create_time", "update_time")
+
+
+class ContentsKeyset(NamedTuple):
+    """The order of a keyset paginated contents listing and the position a page starts after.
+
+    Items ordered by time are ordered by hid among equal times, ``value`` and ``hid`` are
+    the values of the order attribute and the hid of the last item of the previous page
+    (``None`` for the first page).
+    """
+
+    attribute: str
+    descending: bool
+    value: Any = None
+    hid: Optional[int] = None
+
+    def order_by(self):
+        direction = desc if self.descending else asc
+        if self.attribute == "hid":
+            return (direction("hid"),)
+        return (direction(self.attribute), direction("hid"))
+
+    def filter(self, columns):
+        """Return a clause selecting the items after the keyset, using the `columns` mapping names to columns."""
+        after = operator.lt if self.descending else operator.gt
+        hid_after = after(columns["hid"], self.hid)
+        if self.attribute == "hid":
+            return hid_after
+        column = columns[self.attribute]
+        return or_(after(column, self.value), and_(column == self.value, hid_after))
+
 
 # into its own class to have it's own filters, etc.
 # TODO: but can't inherit from model manager (which assumes only one model)
@@ -165,26 +204,60 @@ class HistoryContentsManager(base.SortableManager):
             "Unknown order_by", order_by=order_by_string, available=available
         )
 
+    def parse_keyset(self, order_by_string, after=None):
+        """Return the keyset for paginating contents ordered by `order_by_string`.
+
+        `after` is the position of the last item of the previous page: its hid when ordering
+        by hid, else its create or update time and hid separated by a comma (e.g.
+        ``2023-03-14T10:00:00.123456,42``). Returns ``None`` if the order does not support
+        keyset pagination and no position is given.
+        """
+        attribute, _, direction = order_by_string.partition("-")
+        if attribute not in KEYSET_ORDER_ATTRIBUTES or "," in order_by_string or direction not in ("", "asc", "dsc"):
+            if after is None:
+                return None
+            raise glx_exceptions.RequestParameterInvalidException(
+                "Keyset pagination requires ordering by a single attribute",
+                order_by=order_by_string,
+                available=KEYSET_ORDER_ATTRIBUTES,
+            )
+        keyset = ContentsKeyset(attribute, descending=direction != "asc")
+        if after is None:
+            return keyset
+        try:
+            if attribute == "hid":
+                return keyset._replace(hid=int(after))
+            value, hid = after.rsplit(",", 1)
+            return keyset._replace(value=datetime.datetime.fromisoformat(value.rstrip("Z")), hid=int(hid))
+        except ValueError:
+            raise glx_exceptions.RequestParameterInvalidException(
+                "Unparsable keyset pagination position", order_by=order_by_string, after=after
+            )
+
     # history specific methods
-    def state_counts(self, history):
+    def state_counts(self, history, history_content_type=None, exclude_deleted=True, exclude_hidden=True):
         """
         Return a dictionary containing the counts of all contents in each state
         keyed by the distinct states.
 
-        Note: does not include deleted/hidden contents.
+        Note: does not include deleted/hidden contents by default.
         """
-        filters = [
-            base.ModelFilterParser.parsed_filter("orm", sql.column("deleted") == false()),
-            base.ModelFilterParser.parsed_filter("orm", sql.column("visible") == true()),
-        ]
-        contents_subquery = self._union_of_contents_query(history, filters=filters).subquery()
+        summary = model.HistoryContentSummary
         statement = (
-            sql.select([sql.column("state"), func.count("*")])
-            .select_from(contents_subquery)
-            .group_by(sql.column("state"))
+            select(summary.state, cast(func.sum(summary.count), Integer))
+            .where(summary.history_id == history.id)
+            .group_by(summary.state)
+            .having(func.sum(summary.count) > 0)
         )
+        if history_content_type:
+            statement = statement.where(summary.history_content_type == history_content_type)
+        if exclude_deleted:
+            statement = statement.where(summary.deleted == false())
+        if exclude_hidden:
+            statement = statement.where(summary.visible == true())
         counts = self.app.model.context.execute(statement).fetchall()
-        return dict(counts)
+        # contents without a dataset or collection have no state
+        return {state or None: count for state, count in counts}
 
     def active_counts(self, history):
         """
@@ -194,30 +267,27 @@ class HistoryContentsManager(base.SortableManager):
         Note: counts for deleted and hidden overlap; In other words, a dataset that's
         both deleted and hidden will be added to both totals.
         """
-        hda_select = self._active_counts_statement(model.HistoryDatasetAssociation, history.id)
-        hdca_select = self._active_counts_statement(model.HistoryDatasetCollectionAssociation, history.id)
-        subquery = hda_select.union_all(hdca_select).subquery()
+        summary = model.HistoryContentSummary
+
+        def count_where(condition):
+            return cast(func.sum(case((condition, summary.count), else_=0)), Integer)
+
         statement = select(
-            cast(func.sum(subquery.c.deleted), Integer).label("deleted"),
-            cast(func.sum(subquery.c.hidden), Integer).label("hidden"),
-            cast(func.sum(subquery.c.active), Integer).label("active"),
-        )
+            count_where(summary.deleted == true()).label("deleted"),
+            count_where(summary.visible == false()).label("hidden"),
+            count_where(and_(summary.deleted == false(), summary.visible == true())).label("active"),
+        ).where(summary.history_id == history.id)
         returned = self.app.model.context.execute(statement).one()
         return dict(returned)
 
-    def _active_counts_statement(self, model_class, history_id):
-        deleted_attr = model_class.deleted
-        visible_attr = model_class.visible
-        table_attr = model_class.table
-        return (
-            select(
-                func.sum(cast(deleted_attr, Integer)).label("deleted"),
-                func.sum(cast(visible_attr == false(), Integer)).label("hidden"),
-                func.sum(func.abs(cast(visible_attr, Integer) * (cast(deleted_attr, Integer) - 1))).label("active"),
-            )
-            .select_from(table_attr)
-            .filter_by(history_id=history_id)
-        )
+    def recalculate_summary(self, history):
+        """
+        Recompute the content counts and size of `history` from its contents.
+
+        These are maintained by the database as contents change, this repairs them
+        should they have been changed with the database triggers disabled.
+        """
+        model.HistoryContentSummary.recalculate(self._session(), history.id)
 
     def map_datasets(self, history, fn, **kwargs):
         """
@@ -255,42 +325,82 @@ class HistoryContentsManager(base.SortableManager):
         Returns a limited and offset list of both types of contents, filtered
         and in some order.
         """
-        contents_results = self._union_of_contents_query(container, **kwargs).all()
         if not expand_models:
-            return contents_results
+            return self._union_of_contents_query(container, **kwargs).all()
 
-        # partition ids into a map of { component_class names -> list of ids } from the above union query
-        id_map: Dict[str, List[int]] = dict(
-            [(self.contained_class_type_name, []), (self.subcontainer_class_type_name, [])]
-        )
-        for result in contents_results:
-            result_type = self._get_union_type(result)
-            contents_id = self._get_union_id(result)
-            if result_type in id_map:
-                id_map[result_type].append(contents_id)
-            else:
-                raise TypeError("Unknown contents type:", result_type)
-
-        # query 2 & 3: use the ids to query each component_class, returning an id->full component model map
-        contained_ids = id_map[self.contained_class_type_name]
-        id_map[self.contained_class_type_name] = self._contained_id_map(contained_ids)
-        subcontainer_ids = id_map[self.subcontainer_class_type_name]
-        serialization_params = kwargs.get("serialization_params", None)
-        id_map[self.subcontainer_class_type_name] = self._subcontainer_id_map(
-            subcontainer_ids, serialization_params=serialization_params
+        filters = kwargs.get("filters") or []
+        if any(filter_fn.filter_type == "function" for filter_fn in filters):
+            # function filters can only be applied to the models, so limit and offset the filtered models
+            limit = kwargs.pop("limit", None)
+            offset = kwargs.pop("offset", None) or 0
+            contents = [
+                content
+                for content in self._contents_models(container, **kwargs)
+                if self.passes_filters(content, filters)
+            ]
+            return contents[offset : None if limit is None else offset + limit]
+        return self._contents_models(container, **kwargs)
+
+    def _contents_models(self, container, serialization_params=None, **kwargs):
+        """
+        Returns the models of the contents selected by the union query, loading them
+        and their relations used in serialization with a single query.
+        """
+        order_by = self._contents_order_by(kwargs.pop("order_by", None), kwargs.get("keyset"))
+        page = self._union_of_contents_query(container, order_by=order_by, **kwargs).subquery()
+        contained_class = self.contained_class
+        subcontainer_class = self.subcontainer_class
+        query = (
+            self._session()
+            .query(contained_class, subcontainer_class)
+            .select_from(page)
+            .outerjoin(
+                contained_class,
+                and_(page.c.history_content_type == self.contained_class_type_name, contained_class.id == page.c.id),
+            )
+            .outerjoin(
+                subcontainer_class,
+                and_(
+                    page.c.history_content_type == self.subcontainer_class_type_name,
+                    subcontainer_class.id == page.c.id,
+                ),
+            )
+            .order_by(*self._order_by_page_columns(order_by, page))
+            .options(undefer(contained_class._metadata))
+            .options(joinedload(contained_class.dataset).joinedload(model.Dataset.actions))
+            .options(joinedload(contained_class.tags))
+            .options(joinedload(contained_class.annotations))  # type: ignore[attr-defined]
+            .options(joinedload(subcontainer_class.collection))
+            .options(joinedload(subcontainer_class.tags))
+            .options(joinedload(subcontainer_class.annotations))
         )
+        # This will conditionally join a potentially costly job_state summary
+        if serialization_params and serialization_params.keys:
+            if "job_state_summary" in serialization_params.keys:
+                query = query.options(joinedload(subcontainer_class.job_state_summary))
+        return [contained or subcontainer for contained, subcontainer in query]
+
+    def _order_by_page_columns(self, order_by, page):
+        """Return the `order_by` expressions of a contents query referring to the columns of its subquery `page`."""
+
+        def page_column(element):
+            if element.__visit_name__ == "textual_label_reference":
+                return page.c[element.element]
+            if element.__visit_name__ == "column" and element.table is None:
+                return page.c[element.name]
+            return None
+
+        return [
+            page.c[clause] if isinstance(clause, str) else sql.visitors.replacement_traverse(clause, {}, page_column)
+            for clause in order_by
+        ]
 
-        # cycle back over the union query to create an ordered list of the objects returned in queries 2 & 3 above
-        contents = []
-        filters = kwargs.get("filters") or []
-        # TODO: or as generator?
-        for result in contents_results:
-            result_type = self._get_union_type(result)
-            contents_id = self._get_union_id(result)
-            content = id_map[result_type][contents_id]
-            if self.passes_filters(content, filters):
-                contents.append(content)
-        return contents
+    def _contents_order_by(self, order_by=None, keyset=None):
+        """Return the expressions contents are ordered by as a tuple."""
+        if keyset is not None:
+            order_by = keyset.order_by()
+        order_by = order_by if order_by is not None else self.default_order_by
+        return order_by if isinstance(order_by, (tuple, list)) else (order_by,)
 
     @staticmethod
     def passes_filters(content, filters):
@@ -301,14 +411,16 @@ class HistoryContentsManager(base.SortableManager):
         return True
 
     def _union_of_contents_query(
-        self, container, filters=None, limit=None, offset=None, order_by=None, user_id=None, **kwargs
+        self, container, filters=None, limit=None, offset=None, order_by=None, user_id=None, keyset=None, **kwargs
     ):
         """
         Returns a query for a limited and offset list of both types of contents,
         filtered and in some order.
+
+        If a `keyset` is given, it determines the order and only contents after its
+        position are returned.
         """
-        order_by = order_by if order_by is not None else self.default_order_by
-        order_by = order_by if isinstance(order_by, (tuple, list)) else (order_by,)
+        order_by = self._contents_order_by(order_by, keyset)
 
         # TODO: 3 queries and 3 iterations over results - this is undoubtedly better solved in the actual SQL layer
         # via one common table for contents, Some Yonder Resplendent and Fanciful Join, or ORM functionality
@@ -336,6 +448,9 @@ class HistoryContentsManager(base.SortableManager):
             elif orm_filter.filter_type == "orm":
                 contained_query = self._apply_orm_filter(contained_query, orm_filter)
                 subcontainer_query = self._apply_orm_filter(subcontainer_query, orm_filter)
+        if keyset is not None and keyset.hid is not None:
+            contained_query = self._apply_keyset(contained_query, keyset)
+            subcontainer_query = self._apply_keyset(subcontainer_query, keyset)
 
         contents_query = contained_query.union_all(subcontainer_query)
         contents_query = contents_query.order_by(*order_by)
@@ -357,6 +472,10 @@ class HistoryContentsManager(base.SortableManager):
                 qry = qry.filter(new_filter)
         return qry
 
+    def _apply_keyset(self, qry, keyset):
+        columns = {col["name"]: col["expr"] for col in qry.column_descriptions}
+        return qry.filter(keyset.filter(columns))
+
     def _contents_common_columns(self, component_class, **kwargs):
         columns = []
         # pull column from class by name or override with kwargs if listed there, then label
@@ -428,45 +547,6 @@ class HistoryContentsManager(base.SortableManager):
         """Return the id for this row in the union results"""
         return union[2]
 
-    def _contained_id_map(self, id_list):
-        """Return an id to model map of all contained-type models in the id_list."""
-        if not id_list:
-            return []
-        component_class = self.contained_class
-        query = (
-            self._session()
-            .query(component_class)
-            .filter(component_class.id.in_(id_list))
-            .options(undefer(component_class._metadata))
-            .options(joinedload(component_class.dataset).joinedload(model.Dataset.actions))
-            .options(joinedload(component_class.tags))
-            .options(joinedload(component_class.annotations))  # type: ignore[attr-defined]
-        )
-        return {row.id: row for row in query.all()}
-
-    def _subcontainer_id_map(self, id_list, serialization_params=None):
-        """Return an id to model map of all subcontainer-type models in the id_list."""
-        if not id_list:
-            return []
-        component_class = self.subcontainer_class
-        query = (
-            self._session()
-            .query(component_class)
-            .filter(component_class.id.in_(id_list))
-            .options(joinedload(component_class.collection))
-            .options(joinedload(component_class.tags))
-            .options(joinedload(component_class.annotations))
-        )
-
-        # This will conditionally join a potentially costly job_state summary
-        # All the paranoia if-checking makes me wonder if serialization_params
-        # should really be a property of the manager class instance
-        if serialization_params and serialization_params.keys:
-            if "job_state_summary" in serialization_params.keys:
-                query = query.options(joinedload(component_class.job_state_summary))
-
-        return {row.id: row for row in query.all()}
-
 
 class HistoryContentsSerializer(base.ModelSerializer, deletable.PurgableSerializerMixin):
     """
@@ -641,9 +721,36 @@ class HistoryContentsFilters(
         """
         return [self.decode_type_id(type_id) for type_id in type_id_list_string.split(sep)]
 
+    def create_annotation_filter(self, attr, op, val):
+        """
+        Filter contents to those whose owner's annotation contains `val`.
+        """
+
+        def _create_annotation_filter(model_class=None):
+            if op not in ("has", "contains"):
+                raise_filter_err(attr, op, val, "bad op in filter")
+            if model_class is None:
+                return True
+            if model_class is model.HistoryDatasetAssociation:
+                annotation_class = model.HistoryDatasetAssociationAnnotationAssociation
+                item_id = annotation_class.history_dataset_association_id
+            else:
+                annotation_class = model.HistoryDatasetCollectionAssociationAnnotationAssociation
+                item_id = annotation_class.history_dataset_collection_id
+            owner_id = select(model.History.user_id).where(model.History.id == model_class.history_id).scalar_subquery()
+            return exists().where(
+                item_id == model_class.id,
+                annotation_class.user_id == owner_id,
+                annotation_class.annotation.contains(val, autoescape=True),
+            )
+
+        return _create_annotation_filter
+
     def _add_parsers(self):
         super()._add_parsers()
         annotatable.AnnotatableFilterMixin._add_parsers(self)
+        # filter annotations in the database so they can be combined with limit and offset
+        del self.fn_filter_parsers["annotation"]
         genomes.GenomeFilterMixin._add_parsers(self)
         deletable.PurgableFiltersMixin._add_parsers(self)
         taggable.TaggableFilterMixin._add_parsers(self)
@@ -660,5 +767,6 @@ class HistoryContentsFilters(
                 "visible": {"op": ("eq"), "val": parse_bool},
                 "create_time": {"op": ("le", "ge", "lt", "gt"), "val": self.parse_date},
                 "update_time": {"op": ("le", "ge", "lt", "gt"), "val": self.parse_date},
+                "annotation": self.create_annotation_filter,
             }
         )
@@ -31,6 +31,7 @@ from galaxy.job_metrics import (
     RawMetric,
     Safety,
 )
+from galaxy.jobs.limits import JobLimitCounts
 from galaxy.managers.collections import DatasetCollectionManager
 from galaxy.managers.datasets import DatasetManager
 from galaxy.managers.hdas import HDAManager
@@ -40,6 +41,7 @@ from galaxy.model.index_filter_util import (
     text_column_filter,
 )
 from galaxy.model.scoped_session import galaxy_scoped_session
+from galaxy.schema.fields import EncodedDatabaseIdField
 from galaxy.schema.schema import (
     JobIndexQueryPayload,
     JobIndexSortByEnum,
@@ -64,6 +66,27 @@ class JobLock(BaseModel):
     active: bool = Field(title="Job lock status", description="If active, jobs will not dispatch")
 
 
+class UserJobLimitsUsage(BaseModel):
+    id: EncodedDatabaseIdField = Field(title="ID", description="The encoded ID of the user.")
+    active_jobs: int = Field(title="Active jobs", description="Number of queued, running or resubmitted jobs.")
+    destinations: typing.Dict[str, int] = Field(
+        title="Destinations", description="Number of dispatched jobs per destination."
+    )
+    tools: typing.Dict[str, int] = Field(title="Tools", description="Number of dispatched jobs per tool.")
+
+
+class JobLimitsUsage(BaseModel):
+    limits: typing.Dict[str, typing.Any] = Field(title="Limits", description="The configured job concurrency limits.")
+    destinations: typing.Dict[str, int] = Field(
+        title="Destinations", description="Number of dispatched jobs per destination."
+    )
+    tools: typing.Dict[str, int] = Field(title="Tools", description="Number of dispatched jobs per tool.")
+    groups: typing.Dict[str, int] = Field(
+        title="Groups", description="Number of dispatched jobs of the members of groups with a limit."
+    )
+    users: typing.List[UserJobLimitsUsage] = Field(title="Users", description="Job usage of users with active jobs.")
+
+
 def get_path_key(path_tuple):
     path_key = ""
     tuple_elements = len(path_tuple)
@@ -213,6 +236,10 @@ class JobManager:
     def job_lock(self) -> JobLock:
         return JobLock(active=self.app.job_manager.job_lock)
 
+    def job_limits(self) -> JobLimitsUsage:
+        job_limit_counts = JobLimitCounts(self.app.model.context, self.app.job_config)
+        return JobLimitsUsage(**job_limit_counts.to_dict())
+
     def update_job_lock(self, job_lock: JobLock):
         self.app.queue_worker.send_control_task(
             "admin_job_lock", kwargs={"job_lock": job_lock.active}, get_response=True
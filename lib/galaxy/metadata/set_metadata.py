@@ -17,7 +17,10 @@ import os
 import sys
 import traceback
 from pathlib import Path
-from typing import Optional
+from typing import (
+    Dict,
+    Optional,
+)
 
 try:
     from pulsar.client.staging import COMMAND_VERSION_FILENAME
@@ -46,7 +49,10 @@ from galaxy.model import (
     store,
 )
 from galaxy.model.custom_types import total_size
-from galaxy.model.metadata import MetadataTempFile
+from galaxy.model.metadata import (
+    MetadataMetrics,
+    MetadataTempFile,
+)
 from galaxy.model.store.discover import MaxDiscoveredFilesExceededError
 from galaxy.objectstore import (
     build_object_store_from_config,
@@ -159,6 +165,7 @@ def set_metadata_portable(
     tool_job_working_directory = Path(tool_job_working_directory or os.path.abspath(os.getcwd()))
     metadata_tmp_files_dir = os.path.join(tool_job_working_directory, "metadata")
     metadata_params = get_metadata_params(tool_job_working_directory)
+    metadata_metrics: Dict[str, float] = {}
     if not is_celery_task:
         if not extended_metadata_collection:
             # Legacy handling for datatypes that don't pass metadata_tmp_files_dir from set_meta kwargs
@@ -177,13 +184,14 @@ def set_metadata_portable(
     def set_meta(new_dataset_instance, file_dict):
         if not extended_metadata_collection:
             set_meta_kwds["metadata_tmp_files_dir"] = metadata_tmp_files_dir
-        set_meta_with_tool_provided(
-            new_dataset_instance,
-            file_dict,
-            set_meta_kwds,
-            datatypes_registry,
-            max_metadata_value_size,
-        )
+        with MetadataMetrics.collect(metadata_metrics):
+            set_meta_with_tool_provided(
+                new_dataset_instance,
+                file_dict,
+                set_meta_kwds,
+                datatypes_registry,
+                max_metadata_value_size,
+            )
 
     try:
         object_store = get_object_store(
@@ -477,6 +485,7 @@ def set_metadata_portable(
         export_store.push_metadata_files()
         export_store._finalize()
     write_job_metadata(tool_job_working_directory, job_metadata, set_meta, tool_provided_metadata)
+    MetadataMetrics.write(metadata_tmp_files_dir, metadata_metrics)
 
 
 def validate_and_load_datatypes_config(datatypes_config):
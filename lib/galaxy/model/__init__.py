@@ -66,7 +66,6 @@ from sqlalchemy import (
     Index,
     inspect,
     Integer,
-    join,
     not_,
     Numeric,
     or_,
@@ -126,6 +125,7 @@ from galaxy.model.item_attrs import (
 )
 from galaxy.model.orm.now import now
 from galaxy.model.orm.util import add_object_to_object_session
+from galaxy.model.triggers import history_summary as history_summary_triggers
 from galaxy.model.view import HistoryDatasetCollectionJobStateSummary
 from galaxy.objectstore import ObjectStore
 from galaxy.security import get_permitted_actions
@@ -2745,6 +2745,48 @@ class HistoryAudit(Base, RepresentById):
         sa_session.execute(q)
 
 
+class HistoryContentSummary(Base, RepresentById):
+    """Number of contents of a history of a type, state and deleted and visible flags.
+
+    Maintained by database triggers (see ``galaxy.model.triggers.history_summary``), the
+    state of contents without a dataset or collection is stored as an empty string.
+    """
+
+    __tablename__ = "history_content_summary"
+    __table_args__ = (UniqueConstraint("history_id", "history_content_type", "state", "deleted", "visible"),)
+
+    id = Column(Integer, primary_key=True)
+    history_id = Column(Integer, ForeignKey("history.id"), nullable=False)
+    history_content_type = Column(TrimmedString(32), nullable=False)
+    state = Column(TrimmedString(64), nullable=False)
+    deleted = Column(Boolean, nullable=False)
+    visible = Column(Boolean, nullable=False)
+    count = Column(Integer, nullable=False)
+
+    # This class should never be instantiated, rows are created by the triggers.
+    __init__ = None  # type: ignore[assignment]
+
+    @classmethod
+    def recalculate(cls, sa_session, history_id):
+        """Recompute the summaries of the history ``history_id`` from its contents."""
+        sa_session.execute(cls.__table__.delete().where(cls.history_id == history_id))
+        sa_session.execute(HistoryDiskSize.__table__.delete().where(HistoryDiskSize.history_id == history_id))
+        for statement in history_summary_triggers.get_summarize_sql(history_id):
+            sa_session.execute(text(statement))
+
+
+class HistoryDiskSize(Base, RepresentById):
+    """Size of the unique, unpurged datasets of a history, maintained by database triggers."""
+
+    __tablename__ = "history_disk_size"
+
+    history_id = Column(Integer, ForeignKey("history.id"), primary_key=True)
+    disk_size = Column(Numeric(15, 0), nullable=False)
+
+    # This class should never be instantiated, rows are created by the triggers.
+    __init__ = None  # type: ignore[assignment]
+
+
 class History(Base, HasTags, Dictifiable, UsesAnnotations, HasName, Serializable):
     __tablename__ = "history"
     __table_args__ = (Index("ix_history_slug", "slug", mysql_length=200),)
@@ -3148,19 +3190,9 @@ class History(Base, HasTags, Dictifiable, UsesAnnotations, HasName, Serializable
         """
         # non-.expression part of hybrid.hybrid_property: called when an instance is the namespace (not the class)
         db_session = object_session(self)
-        rval = db_session.query(
-            func.sum(
-                db_session.query(HistoryDatasetAssociation.dataset_id, Dataset.total_size)
-                .join(Dataset)
-                .filter(HistoryDatasetAssociation.table.c.history_id == self.id)
-                .filter(HistoryDatasetAssociation.purged != true())
-                .filter(Dataset.purged != true())
-                # unique datasets only
-                .distinct()
-                .subquery()
-                .c.total_size
-            )
-        ).first()[0]
+        rval = db_session.execute(
+            select(HistoryDiskSize.disk_size).where(HistoryDiskSize.history_id == self.id)
+        ).scalar()
         if rval is None:
             rval = 0
         return rval
@@ -3171,36 +3203,10 @@ class History(Base, HasTags, Dictifiable, UsesAnnotations, HasName, Serializable
         Return a query scalar that will get any history's size in bytes by summing
         the 'total_size's of all non-purged, unique datasets within it.
         """
-        # .expression acts as a column_property and should return a scalar
-        # first, get the distinct datasets within a history that are not purged
-        hda_to_dataset_join = join(
-            HistoryDatasetAssociation, Dataset, HistoryDatasetAssociation.table.c.dataset_id == Dataset.table.c.id
-        )
-        distinct_datasets = (
-            select(
-                [
-                    # use labels here to better access from the query above
-                    HistoryDatasetAssociation.table.c.history_id.label("history_id"),
-                    Dataset.total_size.label("dataset_size"),
-                    Dataset.id.label("dataset_id"),
-                ]
-            )
-            .where(HistoryDatasetAssociation.table.c.purged != true())
-            .where(Dataset.table.c.purged != true())
-            .select_from(hda_to_dataset_join)
-            # TODO: slow (in general) but most probably here - index total_size for easier sorting/distinct?
-            .distinct()
-        )
-        # postgres needs an alias on FROM
-        distinct_datasets_alias = aliased(distinct_datasets.subquery(), name="datasets")
-        # then, bind as property of history using the cls.id
-        size_query = (
-            select([func.coalesce(func.sum(distinct_datasets_alias.c.dataset_size), 0)])
-            .select_from(distinct_datasets_alias)
-            .where(distinct_datasets_alias.c.history_id == cls.id)
-        )
+        # the size is maintained by triggers as datasets are added or change (see HistoryDiskSize)
+        size_query = select(HistoryDiskSize.disk_size).where(HistoryDiskSize.history_id == cls.id).scalar_subquery()
         # label creates a scalar
-        return size_query.label("disk_size")
+        return func.coalesce(size_query, 0).label("disk_size")
 
     @property
     def disk_nice_size(self):
@@ -3871,6 +3877,18 @@ class Dataset(Base, StorableObject, Serializable):
 
     file_name = property(get_file_name, set_file_name)
 
+    def get_data(self, start=0, count=-1) -> bytes:
+        """Read at most `count` bytes of the dataset starting at `start`.
+
+        Unlike reading from `file_name`, object stores backed by remote
+        storage serve small reads without fetching the whole dataset.
+        """
+        if self.external_filename:
+            with open(self.external_filename, "rb") as f:
+                f.seek(start)
+                return f.read(count)
+        return self._assert_object_store_set().get_data(self, start=start, count=count)
+
     def _assert_object_store_set(self):
         assert self.object_store is not None, f"Object Store has not been initialized for dataset {self.id}"
         return self.object_store
@@ -6396,6 +6414,7 @@ class HistoryDatasetCollectionAssociation(
     """Associates a DatasetCollection with a History."""
 
     __tablename__ = "history_dataset_collection_association"
+    __table_args__ = (Index("ix_history_dataset_collection_association_history_id_hid", "history_id", "hid"),)
 
     id = Column(Integer, primary_key=True)
     collection_id = Column(Integer, ForeignKey("dataset_collection.id"), index=True)
@@ -7973,7 +7992,7 @@ class WorkflowInvocation(Base, UsesCreateAndUpdateTime, Dictifiable, Serializabl
         return [wid for wid in query.all()]
 
     @staticmethod
-    def poll_active_workflow_ids(engine, scheduler=None, handler=None):
+    def _active_workflow_conditions(scheduler=None, handler=None):
         and_conditions = [
             or_(
                 WorkflowInvocation.state == WorkflowInvocation.states.NEW,
@@ -7984,13 +8003,65 @@ class WorkflowInvocation(Base, UsesCreateAndUpdateTime, Dictifiable, Serializabl
             and_conditions.append(WorkflowInvocation.scheduler == scheduler)
         if handler is not None:
             and_conditions.append(WorkflowInvocation.handler == handler)
+        return and_conditions
 
+    @staticmethod
+    def poll_active_workflow_ids(engine, scheduler=None, handler=None):
+        and_conditions = WorkflowInvocation._active_workflow_conditions(scheduler=scheduler, handler=handler)
         stmt = select(WorkflowInvocation.id).filter(and_(*and_conditions)).order_by(WorkflowInvocation.id.asc())
         # Immediately just load all ids into memory so time slicing logic
         # is relatively intutitive.
         with engine.connect() as conn:
             return conn.scalars(stmt).all()
 
+    @staticmethod
+    def poll_woken_workflow_ids(engine, since, scheduler=None, handler=None):
+        """
+        Return the ids of active workflow invocations that may have been
+        unblocked since ``since``: the invocation itself was updated, a job
+        in its history left the non-ready job states or a step of an
+        invocation in its history (e.g. of a subworkflow) was updated.
+        """
+        and_conditions = WorkflowInvocation._active_workflow_conditions(scheduler=scheduler, handler=handler)
+        job_finished = exists(Job.id).where(
+            and_(
+                Job.history_id == WorkflowInvocation.history_id,
+                Job.update_time >= since,
+                Job.state.notin_(Job.non_ready_states),
+            )
+        )
+        history_invocation = aliased(WorkflowInvocation)
+        step_updated = exists(WorkflowInvocationStep.id).where(
+            and_(
+                history_invocation.history_id == WorkflowInvocation.history_id,
+                WorkflowInvocationStep.workflow_invocation_id == history_invocation.id,
+                WorkflowInvocationStep.update_time >= since,
+            )
+        )
+        and_conditions.append(or_(WorkflowInvocation.update_time >= since, job_finished, step_updated))
+        stmt = select(WorkflowInvocation.id).filter(and_(*and_conditions)).order_by(WorkflowInvocation.id.asc())
+        with engine.connect() as conn:
+            return conn.scalars(stmt).all()
+
+    @staticmethod
+    def history_and_user_ids(engine, invocation_ids, chunk_size=1000):
+        """
+        Return a dictionary mapping the ids of the given workflow invocations
+        to the ids of their history and of the owner of the history.
+        """
+        invocation_ids = list(invocation_ids)
+        rval = {}
+        with engine.connect() as conn:
+            for i in range(0, len(invocation_ids), chunk_size):
+                stmt = (
+                    select(WorkflowInvocation.id, WorkflowInvocation.history_id, History.user_id)
+                    .join(History, WorkflowInvocation.history_id == History.id)
+                    .where(WorkflowInvocation.id.in_(invocation_ids[i : i + chunk_size]))
+                )
+                for invocation_id, history_id, user_id in conn.execute(stmt):
+                    rval[invocation_id] = (history_id, user_id)
+        return rval
+
     def add_output(self, workflow_output, step, output_object):
         if not hasattr(output_object, "history_content_type"):
             # assuming this is a simple type, just JSON-ify it and stick in the database. In the future
@@ -10253,6 +10324,7 @@ HistoryDatasetAssociation.table = Table(
     Column(
         "hidden_beneath_collection_instance_id", ForeignKey("history_dataset_collection_association.id"), nullable=True
     ),
+    Index("ix_history_dataset_association_history_id_hid", "history_id", "hid"),
 )
 
 LibraryDatasetDatasetAssociation.table = Table(
@@ -48,6 +48,7 @@ class MatchingCollections:
         self.collections = {}
         self.subcollection_types = {}
         self.action_tuples = {}
+        self.permissions = {}
         self.when_values = None
 
     def __attempt_add_to_linked_match(self, input_name, hdca, collection_type_description, subcollection_type):
@@ -88,6 +89,19 @@ class MatchingCollections:
             self.action_tuples[input_name] = collection_instance.collection.dataset_action_tuples
         return self.action_tuples[input_name]
 
+    def map_over_permissions(self, input_name):
+        """Return the permissions of all datasets mapped over for ``input_name``.
+
+        Permissions are returned as a dictionary mapping actions to sets of role ids, every
+        job of the map-over records them for its input so they are aggregated only once.
+        """
+        if input_name not in self.permissions:
+            permissions = {}
+            for action, role_id in self.map_over_action_tuples(input_name):
+                permissions.setdefault(action, set()).add(role_id)
+            self.permissions[input_name] = permissions
+        return self.permissions[input_name]
+
     def is_mapped_over(self, input_name):
         return input_name in self.collections
 
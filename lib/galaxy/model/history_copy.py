@@ -0,0 +1,522 @@
+"""
+Copy histories with set-based SQL.
+
+:meth:`galaxy.model.History.copy` copies a history through the ORM: every
+dataset, collection, collection element, tag and annotation is loaded, copied
+and flushed as an object, which takes minutes and a lot of memory for
+histories with tens of thousands of items. :class:`HistoryCopier` produces the
+same copy with ``INSERT ... SELECT`` statements that each clone a chunk of
+datasets (and their tags and annotations) inside the database, and bulk
+inserts for the collections and their elements, whose rows don't record what
+they were copied from and so need their new ids to be allocated upfront.
+
+Datasets with metadata files are still copied through the ORM, since their
+metadata files need to be copied along with them.
+"""
+import logging
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from sqlalchemy import (
+    and_,
+    bindparam,
+    exists,
+    func,
+    insert,
+    literal,
+    not_,
+    select,
+    update,
+)
+from sqlalchemy.orm import object_session
+
+from galaxy.model import (
+    Dataset,
+    DatasetCollection,
+    DatasetCollectionElement,
+    History,
+    HistoryDatasetAssociation,
+    HistoryDatasetAssociationAnnotationAssociation,
+    HistoryDatasetAssociationTagAssociation,
+    HistoryDatasetCollectionAssociation,
+    HistoryDatasetCollectionAssociationAnnotationAssociation,
+    HistoryDatasetCollectionTagAssociation,
+    LibraryDatasetDatasetAssociation,
+    MetadataFile,
+)
+from galaxy.model.orm.now import now
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+# columns of the copied HDAs taken from the source HDAs, as in HistoryDatasetAssociation.copy
+HDA_COPIED_COLUMNS = (
+    "hid",
+    "name",
+    "info",
+    "blurb",
+    "peek",
+    "tool_version",
+    "extension",
+    "dataset_id",
+    "visible",
+    "deleted",
+    "purged",
+    "metadata",
+)
+COLLECTION_COPIED_COLUMNS = ("collection_type", "populated_state", "populated_state_message", "element_count")
+ELEMENT_COPIED_COLUMNS = ("ldda_id", "element_index", "element_identifier")
+
+# called with the number of copied items (datasets and collections) and the total number of items
+ProgressCallback = Callable[[int, int], None]
+
+hda_table = HistoryDatasetAssociation.__table__
+hdca_table = HistoryDatasetCollectionAssociation.__table__
+collection_table = DatasetCollection.__table__
+element_table = DatasetCollectionElement.__table__
+dataset_table = Dataset.__table__
+history_table = History.__table__
+
+
+class HistoryCopier:
+    """Copy a history and its contents in bulk.
+
+    The copy is equivalent to :meth:`galaxy.model.History.copy` with
+    ``minimize_copies``: datasets of copied collections that are copied with
+    the history are shared with the copied collections, other datasets of the
+    collections are copied once as hidden datasets. Contents are copied in
+    chunks of ``chunk_size`` items, ``progress`` is called after each chunk.
+    """
+
+    def __init__(
+        self, history: History, chunk_size: int = CHUNK_SIZE, progress: Optional[ProgressCallback] = None
+    ) -> None:
+        self.history = history
+        self.session = object_session(history)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self._copied = 0
+        self._total = 0
+        self._last_hda_id = 0
+
+    def copy(self, name=None, target_user=None, activatable=False, all_datasets=False) -> History:
+        """
+        Return a copy of the history using the given `name` and `target_user`.
+        If `activatable`, copy only non-deleted datasets. If `all_datasets`, copy
+        non-deleted, deleted, and purged datasets.
+        """
+        session = self.session
+        transaction = nullcontext() if session.in_transaction() else session.begin()
+        with transaction:
+            new_history = self._copy(name, target_user, activatable, all_datasets)
+        return new_history
+
+    def _copy(self, name, target_user, activatable, all_datasets) -> History:
+        history = self.history
+        session = self.session
+        new_history = History(name=name or history.name, user=target_user)
+        session.add(new_history)
+        session.flush([new_history])
+        if target_user:
+            history.copy_item_annotation(session, history.user, history, target_user, new_history)
+            new_history.copy_tags_from(target_user=target_user, source=history)
+
+        hda_ids = self._source_hda_ids(activatable, all_datasets)
+        hdcas = self._source_hdcas(all_datasets)
+        self._total = len(hda_ids) + len(hdcas)
+        for chunk in _chunks(hda_ids, self.chunk_size):
+            # source ids are sorted, copy them by id range
+            self._copy_hdas(
+                new_history,
+                and_(self._hda_filter(activatable, all_datasets), hda_table.c.id.between(chunk[0], chunk[-1])),
+                target_user=target_user,
+            )
+            self._report(len(chunk))
+        if hdcas:
+            self._copy_hdcas(new_history, hdcas, target_user)
+
+        new_history.hid_counter = history.hid_counter
+        if target_user and target_user != history.user:
+            self._adjust_disk_usage(new_history, target_user)
+        session.flush()
+        return new_history
+
+    def _report(self, copied: int) -> None:
+        self._copied += copied
+        if self.progress:
+            self.progress(self._copied, self._total)
+
+    def _hda_filter(self, activatable, all_datasets):
+        condition = hda_table.c.history_id == self.history.id
+        if activatable:
+            condition = and_(
+                condition,
+                hda_table.c.dataset_id.in_(select(dataset_table.c.id).where(not_(dataset_table.c.deleted))),
+            )
+        elif not all_datasets:
+            condition = and_(condition, not_(hda_table.c.deleted))
+        return condition
+
+    def _source_hda_ids(self, activatable, all_datasets) -> List[int]:
+        stmt = select(hda_table.c.id).where(self._hda_filter(activatable, all_datasets)).order_by(hda_table.c.id)
+        return list(self.session.execute(stmt).scalars())
+
+    def _source_hdcas(self, all_datasets) -> List[Any]:
+        stmt = select(hdca_table).where(hdca_table.c.history_id == self.history.id)
+        if not all_datasets:
+            stmt = stmt.where(not_(hdca_table.c.deleted))
+        return list(self.session.execute(stmt.order_by(hdca_table.c.hid, hdca_table.c.id)))
+
+    def _copy_hdas(
+        self,
+        new_history: History,
+        condition,
+        target_user=None,
+        hidden=False,
+    ) -> List[Tuple[int, int]]:
+        """Copy the HDAs matching ``condition`` to ``new_history``.
+
+        Copies of history items get the tags of their source HDAs and the
+        annotation of the source history's owner, if copied for ``target_user``.
+        Copies of collection elements (``hidden``) are not visible and keep
+        their tags as they are. Return pairs of new and source HDA ids.
+        """
+        session = self.session
+        history = self.history
+        has_metadata_files = exists().where(MetadataFile.__table__.c.hda_id == hda_table.c.id)
+        # keyed by column name, some HDA columns have different attribute keys
+        values: Dict[str, Any] = {column.name: column for column in hda_table.c if column.name in HDA_COPIED_COLUMNS}
+        values.update(
+            history_id=literal(new_history.id),
+            copied_from_history_dataset_association_id=hda_table.c.id,
+            create_time=literal(now()),
+            update_time=literal(now()),
+            validated_state=literal("unknown"),
+            version=literal(1),
+            metadata_deferred=literal(False),
+        )
+        if hidden:
+            values["visible"] = literal(False)
+        columns = [column for column in hda_table.c if column.name in values]
+        source = select(*(values[column.name] for column in columns)).where(condition, not_(has_metadata_files))
+        session.execute(insert(hda_table).from_select(columns, source.order_by(hda_table.c.hid, hda_table.c.id)))
+
+        # new rows of this chunk are the rows of the new history with larger ids
+        new_hda = hda_table.alias("new_hda")
+        new_rows = and_(new_hda.c.history_id == new_history.id, new_hda.c.id > self._last_hda_id)
+        copied_from = new_hda.c.copied_from_history_dataset_association_id
+        if hidden or target_user:
+            tag_table = HistoryDatasetAssociationTagAssociation.__table__
+            tag_user_id = tag_table.c.user_id if hidden else literal(target_user.id)
+            tags = select(
+                new_hda.c.id,
+                tag_table.c.tag_id,
+                tag_user_id,
+                tag_table.c.user_tname,
+                tag_table.c.value,
+                tag_table.c.user_value,
+            ).where(new_rows, tag_table.c.history_dataset_association_id == copied_from)
+            session.execute(
+                insert(tag_table).from_select(
+                    ["history_dataset_association_id", "tag_id", "user_id", "user_tname", "value", "user_value"],
+                    tags,
+                )
+            )
+        if not hidden and target_user and history.user:
+            self._copy_annotations(
+                HistoryDatasetAssociationAnnotationAssociation.__table__,
+                "history_dataset_association_id",
+                new_hda,
+                new_rows,
+                copied_from,
+                target_user,
+            )
+
+        # metadata files need to be copied with their datasets, leave these to the ORM
+        for hda in session.query(HistoryDatasetAssociation).filter(condition, has_metadata_files):
+            if hidden:
+                new_hda_object = hda.copy(flush=False, copy_tags=hda.tags)
+                new_hda_object.visible = False
+            else:
+                new_hda_object = hda.copy(flush=False)
+            new_history.add_dataset(new_hda_object, set_hid=False, quota=False)
+            if target_user and not hidden:
+                new_hda_object.copy_item_annotation(session, history.user, hda, target_user, new_hda_object)
+                new_hda_object.copy_tags_from(target_user, hda)
+        session.flush()
+
+        pairs = [
+            (new_id, source_id)
+            for new_id, source_id in session.execute(select(new_hda.c.id, copied_from).where(new_rows))
+        ]
+        if pairs:
+            self._last_hda_id = max(new_id for new_id, _ in pairs)
+        return pairs
+
+    def _copy_annotations(self, annotation_table, item_column, new_item, new_rows, copied_from, target_user):
+        """Copy the annotations of the source history's owner to the new items."""
+        # like get_item_annotation_obj, use the first annotation of every item
+        first_annotations = (
+            select(func.min(annotation_table.c.id).label("id"))
+            .where(
+                annotation_table.c[item_column].in_(select(copied_from).where(new_rows)),
+                annotation_table.c.user_id == self.history.user.id,
+            )
+            .group_by(annotation_table.c[item_column])
+            .subquery()
+        )
+        annotations = (
+            select(new_item.c.id, literal(target_user.id), annotation_table.c.annotation)
+            .join_from(first_annotations, annotation_table, annotation_table.c.id == first_annotations.c.id)
+            .join(new_item, copied_from == annotation_table.c[item_column])
+            .where(new_rows, annotation_table.c.annotation != "")
+        )
+        self.session.execute(insert(annotation_table).from_select([item_column, "user_id", "annotation"], annotations))
+
+    def _copy_hdcas(self, new_history: History, hdcas: List[Any], target_user) -> None:
+        session = self.session
+        collections, elements = self._load_collections(hdca.collection_id for hdca in hdcas)
+
+        tree_sizes: Dict[int, int] = {}
+
+        def tree_size(collection_id):
+            if collection_id not in tree_sizes:
+                tree_sizes[collection_id] = 1 + sum(
+                    tree_size(element.child_collection_id)
+                    for element in elements[collection_id]
+                    if element.child_collection_id
+                )
+            return tree_sizes[collection_id]
+
+        new_collection_ids = iter(
+            self._allocate_ids(collection_table, sum(tree_size(hdca.collection_id) for hdca in hdcas))
+        )
+        collection_rows = []
+        # (new collection id, source element, copied HDCA's source id) of every element to copy
+        element_copies = []
+
+        def copy_collection(collection_id, hdca_id):
+            new_collection_id = next(new_collection_ids)
+            collection = collections[collection_id]
+            row = {column: collection._mapping[column] for column in COLLECTION_COPIED_COLUMNS}
+            row.update(id=new_collection_id, create_time=now(), update_time=now())
+            collection_rows.append(row)
+            for element in elements[collection_id]:
+                child_collection_id = None
+                if element.child_collection_id:
+                    child_collection_id = copy_collection(element.child_collection_id, hdca_id)
+                element_copies.append((new_collection_id, element, child_collection_id, hdca_id))
+            return new_collection_id
+
+        hdca_rows = []
+        for hdca in hdcas:
+            hdca_rows.append(
+                dict(
+                    collection_id=copy_collection(hdca.collection_id, hdca.id),
+                    history_id=new_history.id,
+                    name=hdca.name,
+                    hid=hdca.hid,
+                    visible=hdca.visible,
+                    deleted=hdca.deleted,
+                    copied_from_history_dataset_collection_association_id=hdca.id,
+                    job_id=None if hdca.implicit_collection_jobs_id else hdca.job_id,
+                    implicit_collection_jobs_id=hdca.implicit_collection_jobs_id,
+                    create_time=now(),
+                    update_time=now(),
+                )
+            )
+        for chunk in _chunks(collection_rows, self.chunk_size):
+            session.execute(insert(collection_table), chunk)
+        new_hdca = hdca_table.alias("new_hdca")
+        copied_from = new_hdca.c.copied_from_history_dataset_collection_association_id
+        for chunk in _chunks(hdca_rows, self.chunk_size):
+            session.execute(insert(hdca_table), chunk)
+            self._report(len(chunk))
+        new_rows = new_hdca.c.history_id == new_history.id
+        new_hdca_ids = {
+            source_id: new_id
+            for new_id, source_id in session.execute(select(new_hdca.c.id, copied_from).where(new_rows))
+        }
+
+        # HistoryDatasetCollectionAssociation.copy copies the tags as the source history's owner
+        tag_owner = target_user or self.history.user
+        tag_table = HistoryDatasetCollectionTagAssociation.__table__
+        tags = select(
+            new_hdca.c.id,
+            tag_table.c.tag_id,
+            literal(tag_owner.id if tag_owner else None),
+            tag_table.c.user_tname,
+            tag_table.c.value,
+            tag_table.c.user_value,
+        ).where(new_rows, tag_table.c.history_dataset_collection_id == copied_from)
+        session.execute(
+            insert(tag_table).from_select(
+                ["history_dataset_collection_id", "tag_id", "user_id", "user_tname", "value", "user_value"], tags
+            )
+        )
+        if target_user and self.history.user:
+            self._copy_annotations(
+                HistoryDatasetCollectionAssociationAnnotationAssociation.__table__,
+                "history_dataset_collection_id",
+                new_hdca,
+                new_rows,
+                copied_from,
+                target_user,
+            )
+
+        # the copied HDCA each element HDA is found in first
+        element_hdca_ids: Dict[int, int] = {}
+        for _, element, _, hdca_id in element_copies:
+            if element.hda_id:
+                element_hdca_ids.setdefault(element.hda_id, new_hdca_ids[hdca_id])
+        new_element_hda_ids = self._element_hdas(new_history, element_hdca_ids)
+        element_rows = []
+        for new_collection_id, element, child_collection_id, _ in element_copies:
+            row = {column: element._mapping[column] for column in ELEMENT_COPIED_COLUMNS}
+            row.update(
+                dataset_collection_id=new_collection_id,
+                hda_id=new_element_hda_ids.get(element.hda_id),
+                child_collection_id=child_collection_id,
+            )
+            element_rows.append(row)
+        for chunk in _chunks(element_rows, self.chunk_size):
+            session.execute(insert(element_table), chunk)
+
+    def _load_collections(self, collection_ids: Iterable[int]) -> Tuple[Dict[int, Any], Dict[int, List[Any]]]:
+        """Load the rows of the collections and their elements, nested collections included."""
+        session = self.session
+        collections: Dict[int, Any] = {}
+        elements: Dict[int, List[Any]] = defaultdict(list)
+        pending = set(collection_ids)
+        while pending:
+            child_collection_ids = set()
+            for chunk in _chunks(sorted(pending), self.chunk_size):
+                for row in session.execute(select(collection_table).where(collection_table.c.id.in_(chunk))):
+                    collections[row.id] = row
+                element_rows = session.execute(
+                    select(element_table)
+                    .where(element_table.c.dataset_collection_id.in_(chunk))
+                    .order_by(element_table.c.element_index, element_table.c.id)
+                )
+                for row in element_rows:
+                    elements[row.dataset_collection_id].append(row)
+                    if row.child_collection_id:
+                        child_collection_ids.add(row.child_collection_id)
+            pending = child_collection_ids - collections.keys()
+        return collections, elements
+
+    def _element_hdas(self, new_history: History, element_hdca_ids: Dict[int, int]) -> Dict[int, int]:
+        """Map the HDAs of the copied collections' elements to HDAs of the new history.
+
+        Elements use the HDA of the new history with the same hid and dataset,
+        other HDAs are copied to the new history as hidden datasets, hidden
+        beneath the new HDCA they are found in first if the source HDA was
+        hidden beneath a collection.
+        """
+        session = self.session
+        new_hdas = {
+            (row.hid, row.dataset_id): row.id
+            for row in session.execute(
+                select(hda_table.c.id, hda_table.c.hid, hda_table.c.dataset_id)
+                .where(hda_table.c.history_id == new_history.id)
+                .order_by(hda_table.c.id)
+            )
+        }
+        new_hda_ids = {}
+        to_copy = []
+        for chunk in _chunks(sorted(element_hdca_ids), self.chunk_size):
+            for row in session.execute(
+                select(hda_table.c.id, hda_table.c.hid, hda_table.c.dataset_id).where(hda_table.c.id.in_(chunk))
+            ):
+                new_hda_id = new_hdas.get((row.hid, row.dataset_id))
+                if new_hda_id:
+                    new_hda_ids[row.id] = new_hda_id
+                else:
+                    to_copy.append(row.id)
+        hidden_beneath = []
+        for chunk in _chunks(to_copy, self.chunk_size):
+            for new_id, source_id in self._copy_hdas(new_history, hda_table.c.id.in_(chunk), hidden=True):
+                new_hda_ids[source_id] = new_id
+            hidden_beneath.extend(
+                {"b_id": new_hda_ids[source_id], "b_hdca_id": element_hdca_ids[source_id]}
+                for source_id in session.execute(
+                    select(hda_table.c.id).where(
+                        hda_table.c.id.in_(chunk), hda_table.c.hidden_beneath_collection_instance_id.isnot(None)
+                    )
+                ).scalars()
+            )
+        if hidden_beneath:
+            session.execute(
+                update(hda_table)
+                .where(hda_table.c.id == bindparam("b_id"))
+                .values(hidden_beneath_collection_instance_id=bindparam("b_hdca_id")),
+                hidden_beneath,
+            )
+        return new_hda_ids
+
+    def _allocate_ids(self, table, count: int) -> List[int]:
+        """Reserve ``count`` primary keys of ``table`` for rows inserted with explicit ids."""
+        if not count:
+            return []
+        session = self.session
+        if session.get_bind().dialect.name == "postgresql":
+            sequence = func.pg_get_serial_sequence(table.name, "id")
+            return list(
+                session.execute(select(func.nextval(sequence)).select_from(func.generate_series(1, count))).scalars()
+            )
+        # SQLite holds the database write lock for the rest of the transaction
+        # since the new history was inserted, other databases lock the last row
+        max_id = session.execute(select(func.max(table.c.id)).with_for_update()).scalar() or 0
+        return list(range(max_id + 1, max_id + 1 + count))
+
+    def _adjust_disk_usage(self, new_history: History, target_user) -> None:
+        """Add the datasets of the new history that the user doesn't own yet to the user's disk usage."""
+        ldda_table = LibraryDatasetDatasetAssociation.__table__
+        other_hda = hda_table.alias("other_hda")
+        # not correlated, a per dataset lookup would be planned on the unselective purged index
+        owned_elsewhere = (
+            select(other_hda.c.dataset_id)
+            .join(history_table, history_table.c.id == other_hda.c.history_id)
+            .where(
+                history_table.c.user_id == target_user.id,
+                history_table.c.id != new_history.id,
+                other_hda.c.dataset_id.isnot(None),
+                not_(other_hda.c.purged),
+            )
+        )
+        stmt = (
+            select(
+                dataset_table.c.object_store_id,
+                func.sum(func.coalesce(dataset_table.c.total_size, dataset_table.c.file_size, 0)),
+            )
+            .where(
+                dataset_table.c.id.in_(
+                    select(hda_table.c.dataset_id).where(
+                        hda_table.c.history_id == new_history.id, not_(hda_table.c.purged)
+                    )
+                ),
+                not_(dataset_table.c.purged),
+                not_(exists().where(ldda_table.c.dataset_id == dataset_table.c.id)),
+                dataset_table.c.id.not_in(owned_elsewhere),
+            )
+            .group_by(dataset_table.c.object_store_id)
+        )
+        quota_source_map = Dataset.object_store.get_quota_source_map()
+        for object_store_id, disk_usage in self.session.execute(stmt):
+            quota_source_info = quota_source_map.get_quota_source_info(object_store_id)
+            if quota_source_info.use and disk_usage:
+                target_user.adjust_total_disk_usage(int(disk_usage), quota_source_info.label)
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
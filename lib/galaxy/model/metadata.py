@@ -11,9 +11,12 @@ import tempfile
 import weakref
 from collections import OrderedDict
 from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
 from os.path import abspath
 from typing import (
     Any,
+    Dict,
     Iterator,
     Optional,
     TYPE_CHECKING,
@@ -43,6 +46,8 @@ if TYPE_CHECKING:
 log = logging.getLogger(__name__)
 
 STATEMENTS = "__galaxy_statements__"  # this is the name of the property in a Datatype class where new metadata spec element Statements are stored
+METADATA_METRICS_FILE = "metadata_metrics.json"  # written to the metadata directory of the job working directory
+METADATA_METRIC_PLUGIN = "metadata"
 
 
 class Statement:
@@ -731,6 +736,56 @@ class MetadataTempFile:
             log.debug("Failed to cleanup MetadataTempFile temp files from %s: %s", filename, unicodify(e))
 
 
+# metrics of the metadata being set in the current context, None if they aren't collected
+_metadata_metrics: ContextVar[Optional[Dict[str, float]]] = ContextVar("metadata_metrics", default=None)
+
+
+class MetadataMetrics:
+    """
+    Timings of expensive metadata steps (e.g. sorting and indexing BAM files).
+
+    Datatypes add them while setting metadata, the set_metadata script collects
+    and writes them to ``METADATA_METRICS_FILE`` and they are recorded as job
+    metrics when the job finishes. Metrics added outside of ``collect`` are
+    dropped.
+    """
+
+    @staticmethod
+    @contextmanager
+    def collect(metrics: Optional[Dict[str, float]] = None) -> Iterator[Dict[str, float]]:
+        """Collect the metrics added in this context into ``metrics`` (a new dict by default)."""
+        if metrics is None:
+            metrics = {}
+        token = _metadata_metrics.set(metrics)
+        try:
+            yield metrics
+        finally:
+            _metadata_metrics.reset(token)
+
+    @staticmethod
+    def add(name: str, value: float) -> None:
+        metrics = _metadata_metrics.get()
+        if metrics is not None:
+            metrics[name] = metrics.get(name, 0) + value
+
+    @staticmethod
+    def write(metadata_dir, metrics: Dict[str, float]) -> None:
+        if metrics:
+            with open(os.path.join(metadata_dir, METADATA_METRICS_FILE), "w") as fh:
+                json.dump(metrics, fh)
+
+    @staticmethod
+    def read(metadata_dir) -> Dict[str, float]:
+        try:
+            with open(os.path.join(metadata_dir, METADATA_METRICS_FILE)) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            log.warning("Failed to read metadata metrics from %s: %s", metadata_dir, unicodify(e))
+            return {}
+
+
 __all__ = (
     "Statement",
     "MetadataElement",
@@ -748,4 +803,5 @@ __all__ = (
     "PythonObjectParameter",
     "FileParameter",
     "MetadataTempFile",
+    "MetadataMetrics",
 )
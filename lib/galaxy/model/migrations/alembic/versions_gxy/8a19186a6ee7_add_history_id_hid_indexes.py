@@ -0,0 +1,34 @@
+"""add history_id, hid indexes to history_dataset_association and history_dataset_collection_association
+
+Revision ID: 8a19186a6ee7
+Revises: 460d0ecd1dd8
+Create Date: 2023-03-16 11:02:37.516810
+
+"""
+from galaxy.model.migrations.util import (
+    create_index,
+    drop_index,
+)
+
+# revision identifiers, used by Alembic.
+revision = "8a19186a6ee7"
+down_revision = "460d0ecd1dd8"
+branch_labels = None
+depends_on = None
+
+
+columns = ["history_id", "hid"]
+indexes = {
+    "history_dataset_association": "ix_history_dataset_association_history_id_hid",
+    "history_dataset_collection_association": "ix_history_dataset_collection_association_history_id_hid",
+}
+
+
+def upgrade():
+    for table_name, index_name in indexes.items():
+        create_index(index_name, table_name, columns)
+
+
+def downgrade():
+    for table_name, index_name in indexes.items():
+        drop_index(index_name, table_name, columns)
@@ -0,0 +1,63 @@
+"""add history_content_summary and history_disk_size tables
+
+Revision ID: f9a4ab7a4f1c
+Revises: 8a19186a6ee7
+Create Date: 2023-03-17 09:41:12.209764
+
+"""
+from alembic import op
+from sqlalchemy import (
+    Boolean,
+    Column,
+    ForeignKey,
+    Integer,
+    Numeric,
+    UniqueConstraint,
+)
+
+from galaxy.model.custom_types import TrimmedString
+from galaxy.model.triggers import history_summary
+
+# revision identifiers, used by Alembic.
+revision = "f9a4ab7a4f1c"
+down_revision = "8a19186a6ee7"
+branch_labels = None
+depends_on = None
+
+
+# database object names used in this revision
+summary_table_name = "history_content_summary"
+size_table_name = "history_disk_size"
+
+
+def upgrade():
+    op.create_table(
+        summary_table_name,
+        Column("id", Integer, primary_key=True),
+        Column("history_id", Integer, ForeignKey("history.id"), nullable=False),
+        Column("history_content_type", TrimmedString(32), nullable=False),
+        Column("state", TrimmedString(64), nullable=False),
+        Column("deleted", Boolean, nullable=False),
+        Column("visible", Boolean, nullable=False),
+        Column("count", Integer, nullable=False),
+        UniqueConstraint("history_id", "history_content_type", "state", "deleted", "visible"),
+    )
+    op.create_table(
+        size_table_name,
+        Column("history_id", Integer, ForeignKey("history.id"), primary_key=True),
+        Column("disk_size", Numeric(15, 0), nullable=False),
+    )
+    variant = op.get_context().dialect.name
+    # install the triggers before summarizing the existing histories, Galaxy isn't running during migrations
+    for statement in history_summary.get_install_sql(variant):
+        op.execute(statement)
+    for statement in history_summary.get_summarize_sql():
+        op.execute(statement)
+
+
+def downgrade():
+    variant = op.get_context().dialect.name
+    for statement in history_summary.get_remove_sql(variant):
+        op.execute(statement)
+    op.drop_table(size_table_name)
+    op.drop_table(summary_table_name)
@@ -425,6 +425,24 @@ class GalaxyTagHandlerSession(GalaxyTagHandler):
         # Avoids creating multiple new tags with the same tag_name, which violates unique key constraint
         return self.created_tags.get(tag_name) or super(GalaxyTagHandler, self)._get_tag(tag_name)
 
+    def get_tag_by_name(self, tag_name):
+        """Get tag from cache or database."""
+        if tag_name:
+            return self.created_tags.get(tag_name.lower()) or super().get_tag_by_name(tag_name)
+        return None
+
+    def load_tags(self, tags_strs):
+        """Cache the existing tags of the given tag strings with a single query."""
+        tag_names = set()
+        for tags_str in tags_strs:
+            for name, _ in self.parse_tags(tags_str):
+                scrubbed_name = self._scrub_tag_name(name and name.lower())
+                if scrubbed_name and scrubbed_name not in self.created_tags:
+                    tag_names.add(scrubbed_name)
+        if tag_names:
+            for tag in self.sa_session.query(galaxy.model.Tag).filter(galaxy.model.Tag.name.in_(tag_names)):
+                self.created_tags[tag.name] = tag
+
     def _create_tag_instance(self, tag_name):
         """Create tag and and store in cache."""
         tag = super()._create_tag_instance(tag_name)
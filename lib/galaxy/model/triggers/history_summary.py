@@ -0,0 +1,269 @@
+"""
+Database triggers maintaining the summaries of history contents
+
+The ``history_content_summary`` table counts the contents of each history by
+type, state and deleted and visible flags, the ``history_disk_size`` table holds
+the size of the (unique, unpurged) datasets of each history. Both are adjusted
+by these triggers as contents are added to histories or their datasets and
+collections change, so summarizing a history doesn't have to scan its contents.
+Datasets and collections change state through the ORM and through plain SQL
+(e.g. ``Job.update_output_states``), so this can't be done in Python.
+"""
+
+from galaxy.model.triggers.utils import execute_statements
+
+HDA = "history_dataset_association"
+HDCA = "history_dataset_collection_association"
+
+# history_content_type, contents table, column referencing the dataset or collection,
+# table of the dataset or collection, column of its state
+CONTENT_TYPES = {
+    "dataset": (HDA, "dataset_id", "dataset", "state"),
+    "dataset_collection": (HDCA, "collection_id", "dataset_collection", "populated_state"),
+}
+
+COUNT_KEY = "history_id, history_content_type, state, deleted, visible"
+COUNT_CONFLICT = f"""
+    ON CONFLICT ({COUNT_KEY})
+    DO UPDATE SET count = history_content_summary.count + excluded.count"""
+SIZE_CONFLICT = """
+    ON CONFLICT (history_id)
+    DO UPDATE SET disk_size = history_disk_size.disk_size + excluded.disk_size"""
+
+
+def install(engine):
+    """Install history summary triggers"""
+    execute_statements(engine, get_install_sql(engine.name))
+
+
+def remove(engine):
+    """Uninstall history summary triggers"""
+    execute_statements(engine, get_remove_sql(engine.name))
+
+
+def get_install_sql(variant):
+    sql = get_remove_sql(variant)
+    for name, source_table, operation, columns, condition, statements in _triggers(variant):
+        sql.extend(_trigger_def(variant, name, source_table, operation, columns, condition, statements))
+    return sql
+
+
+def get_remove_sql(variant):
+    sql = []
+    for name, source_table, *_ in _triggers(variant):
+        if "postgres" in variant:
+            sql.append(f"DROP FUNCTION IF EXISTS fn_{name}() CASCADE;")
+        else:
+            sql.append(f"DROP TRIGGER IF EXISTS trigger_{name};")
+    return sql
+
+
+def get_summarize_sql(history_id=None):
+    """
+    Return statements (re)computing the summaries of all histories, or only the
+    history ``history_id``, from their contents.
+    """
+    history_filter = "" if history_id is None else f"AND content.history_id = {int(history_id)}"
+    sql = []
+    for history_content_type, (table, item_id, item_table, state) in CONTENT_TYPES.items():
+        flags = f"COALESCE(item.{state}, ''), COALESCE(content.deleted, false), COALESCE(content.visible, true)"
+        sql.append(
+            f"""
+            INSERT INTO history_content_summary ({COUNT_KEY}, count)
+            SELECT content.history_id, '{history_content_type}', {flags}, COUNT(*)
+            FROM {table} AS content LEFT OUTER JOIN {item_table} AS item ON item.id = content.{item_id}
+            WHERE content.history_id IS NOT NULL {history_filter}
+            GROUP BY content.history_id, {flags}
+            """
+        )
+    sql.append(
+        f"""
+        INSERT INTO history_disk_size (history_id, disk_size)
+        SELECT history_id, SUM(total_size)
+        FROM (
+            SELECT DISTINCT content.history_id, dataset.id, dataset.total_size
+            FROM {HDA} AS content JOIN dataset ON dataset.id = content.dataset_id
+            WHERE content.purged = false AND dataset.purged = false AND dataset.total_size IS NOT NULL
+            {history_filter}
+        ) AS datasets
+        GROUP BY history_id
+        """
+    )
+    return sql
+
+
+def _triggers(variant):
+    """Yield name, source table, operation, updated columns, condition and statements of each trigger"""
+    for history_content_type, (table, item_id, item_table, state) in CONTENT_TYPES.items():
+        flags = ["history_id", item_id, "deleted", "visible"]
+        yield (
+            f"{table}_summary_air",
+            table,
+            "INSERT",
+            None,
+            None,
+            [_adjust_count("NEW", history_content_type, 1)],
+        )
+        yield (
+            f"{table}_summary_adr",
+            table,
+            "DELETE",
+            None,
+            None,
+            [_adjust_count("OLD", history_content_type, -1)],
+        )
+        yield (
+            f"{table}_summary_aur",
+            table,
+            "UPDATE",
+            flags,
+            _changed(variant, flags),
+            [_adjust_count("OLD", history_content_type, -1), _adjust_count("NEW", history_content_type, 1)],
+        )
+        yield (
+            f"{item_table}_summary_aur",
+            item_table,
+            "UPDATE",
+            [state],
+            _changed(variant, [state]),
+            [_move_state(history_content_type, "OLD", -1), _move_state(history_content_type, "NEW", 1)],
+        )
+    yield (f"{HDA}_size_air", HDA, "INSERT", None, None, [_adjust_size("NEW", "")])
+    yield (f"{HDA}_size_adr", HDA, "DELETE", None, None, [_adjust_size("OLD", "-")])
+    size_flags = ["history_id", "dataset_id", "purged"]
+    yield (
+        f"{HDA}_size_aur",
+        HDA,
+        "UPDATE",
+        size_flags,
+        _changed(variant, size_flags),
+        [_adjust_size("OLD", "-"), _adjust_size("NEW", "")],
+    )
+    dataset_flags = ["total_size", "purged"]
+    yield (
+        "dataset_size_aur",
+        "dataset",
+        "UPDATE",
+        dataset_flags,
+        _changed(variant, dataset_flags),
+        [_resize_dataset()],
+    )
+
+
+def _changed(variant, columns):
+    distinct = "IS DISTINCT FROM" if "postgres" in variant else "IS NOT"
+    return " OR ".join(f"OLD.{column} {distinct} NEW.{column}" for column in columns)
+
+
+def _adjust_count(row, history_content_type, delta):
+    """Add ``delta`` to the count of the contents like the content ``row``."""
+    _, item_id, item_table, state = CONTENT_TYPES[history_content_type]
+    return f"""
+        INSERT INTO history_content_summary ({COUNT_KEY}, count)
+        SELECT
+            {row}.history_id,
+            '{history_content_type}',
+            COALESCE((SELECT {state} FROM {item_table} WHERE id = {row}.{item_id}), ''),
+            COALESCE({row}.deleted, false),
+            COALESCE({row}.visible, true),
+            {delta}
+        WHERE {row}.history_id IS NOT NULL
+        {COUNT_CONFLICT};
+    """
+
+
+def _move_state(history_content_type, row, sign):
+    """Add the contents of the dataset or collection ``row`` to (or remove them from) the counts of its state."""
+    table, item_id, _, state = CONTENT_TYPES[history_content_type]
+    return f"""
+        INSERT INTO history_content_summary ({COUNT_KEY}, count)
+        SELECT
+            history_id,
+            '{history_content_type}',
+            COALESCE({row}.{state}, ''),
+            COALESCE(deleted, false),
+            COALESCE(visible, true),
+            {sign} * COUNT(*)
+        FROM {table}
+        WHERE {item_id} = NEW.id AND history_id IS NOT NULL
+        GROUP BY history_id, COALESCE(deleted, false), COALESCE(visible, true)
+        {COUNT_CONFLICT};
+    """
+
+
+def _adjust_size(row, sign):
+    """Add (or remove) the size of the dataset of the HDA ``row`` unless another HDA of its history has it."""
+    return f"""
+        INSERT INTO history_disk_size (history_id, disk_size)
+        SELECT {row}.history_id, {sign}dataset.total_size
+        FROM dataset
+        WHERE dataset.id = {row}.dataset_id
+            AND {row}.history_id IS NOT NULL
+            AND {row}.purged = false
+            AND dataset.purged = false
+            AND dataset.total_size IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM {HDA} AS other
+                WHERE other.history_id = {row}.history_id
+                    AND other.dataset_id = {row}.dataset_id
+                    AND other.id != {row}.id
+                    AND other.purged = false
+            )
+        {SIZE_CONFLICT};
+    """
+
+
+def _resize_dataset():
+    """Adjust the size of the histories having the dataset ``NEW`` to its new size or purged state."""
+
+    def size(row):
+        return f"CASE WHEN {row}.purged = false THEN COALESCE({row}.total_size, 0) ELSE 0 END"
+
+    return f"""
+        INSERT INTO history_disk_size (history_id, disk_size)
+        SELECT history_id, {size("NEW")} - {size("OLD")}
+        FROM (
+            SELECT DISTINCT history_id FROM {HDA}
+            WHERE dataset_id = NEW.id AND history_id IS NOT NULL AND purged = false
+        ) AS histories
+        WHERE true
+        {SIZE_CONFLICT};
+    """
+
+
+def _trigger_def(variant, name, source_table, operation, columns, condition, statements):
+    event = f"{operation} OF {', '.join(columns)}" if columns else operation
+    if "postgres" in variant:
+        when = f"WHEN ({condition})" if condition else ""
+        return [
+            f"""
+            CREATE OR REPLACE FUNCTION fn_{name}()
+                RETURNS TRIGGER
+                LANGUAGE 'plpgsql'
+            AS $BODY$
+                BEGIN
+                    {"".join(statements)}
+                    RETURN NULL;
+                END;
+            $BODY$;
+            """,
+            f"""
+            CREATE TRIGGER trigger_{name}
+                AFTER {event} ON {source_table}
+                FOR EACH ROW
+                {when}
+                EXECUTE PROCEDURE fn_{name}();
+            """,
+        ]
+    when = f"WHEN {condition}" if condition else ""
+    return [
+        f"""
+        CREATE TRIGGER trigger_{name}
+            AFTER {event} ON {source_table}
+            FOR EACH ROW
+            {when}
+            BEGIN
+                {"".join(statements)}
+            END;
+        """
+    ]
@@ -890,7 +890,7 @@ class DiskObjectStore(ConcreteObjectStore):
 
     def _get_data(self, obj, start=0, count=-1, **kwargs):
         """Override `ObjectStore`'s stub; retrieve data directly from disk."""
-        data_file = open(self._get_filename(obj, **kwargs))  # Should be rb?
+        data_file = open(self._get_filename(obj, **kwargs), "rb")
         data_file.seek(start)
         content = data_file.read(count)
         data_file.close()
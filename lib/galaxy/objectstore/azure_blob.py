@@ -2,11 +2,10 @@
 Object Store plugin for the Microsoft Azure Block Blob Storage system
 """
 
+import io
 import logging
 import os
 import shutil
-import threading
-import time
 from datetime import datetime
 
 try:
@@ -27,10 +26,19 @@ from galaxy.util import (
     unlink,
 )
 from galaxy.util.path import safe_relpath
-from galaxy.util.sleeper import Sleeper
-from . import (
-    ConcreteObjectStore,
-    convert_bytes,
+from . import ConcreteObjectStore
+from .caching import (
+    DEFAULT_CACHE_HIGH_WATERMARK,
+    DEFAULT_CACHE_LOW_WATERMARK,
+    IndexedCacheMixin,
+    parse_cache_watermarks_from_xml,
+)
+from .transfer import (
+    BlockCache,
+    parallel_download,
+    parse_transfer_config_xml,
+    transfer_config_from_dict,
+    transfer_config_to_dict,
 )
 
 NO_BLOBSERVICE_ERROR_MESSAGE = (
@@ -55,6 +63,7 @@ def parse_config_xml(config_xml):
         c_xml = config_xml.findall("cache")[0]
         cache_size = float(c_xml.get("size", -1))
         staging_path = c_xml.get("path", None)
+        cache_watermarks = parse_cache_watermarks_from_xml(c_xml)
 
         tag, attrs = "extra_dir", ("type", "path")
         extra_dirs = config_xml.findall(tag)
@@ -68,6 +77,7 @@ def parse_config_xml(config_xml):
                 "account_name": account_name,
                 "account_key": account_key,
             },
+            "transfer": parse_transfer_config_xml(config_xml),
             "container": {
                 "name": container_name,
                 "max_chunk_size": max_chunk_size,
@@ -75,6 +85,7 @@ def parse_config_xml(config_xml):
             "cache": {
                 "size": cache_size,
                 "path": staging_path,
+                **cache_watermarks,
             },
             "extra_dirs": extra_dirs,
             "private": ConcreteObjectStore.parse_private_from_config_xml(config_xml),
@@ -85,7 +96,7 @@ def parse_config_xml(config_xml):
         raise
 
 
-class AzureBlobObjectStore(ConcreteObjectStore):
+class AzureBlobObjectStore(ConcreteObjectStore, IndexedCacheMixin):
     """
     Object store that stores objects as blobs in an Azure Blob Container. A local
     cache exists that is used as an intermediate location for files between
@@ -109,8 +120,13 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         self.container_name = container_dict.get("name")
         self.max_chunk_size = container_dict.get("max_chunk_size", 250)  # currently unused
 
+        self.transfer_config = transfer_config_from_dict(config_dict.get("transfer"))
+        self._block_cache = BlockCache()
+
         self.cache_size = cache_dict.get("size", -1)
         self.staging_path = cache_dict.get("path") or self.config.object_store_cache_path
+        self.cache_high_watermark = cache_dict.get("high_watermark", DEFAULT_CACHE_HIGH_WATERMARK)
+        self.cache_low_watermark = cache_dict.get("low_watermark", DEFAULT_CACHE_LOW_WATERMARK)
 
         self._initialize()
 
@@ -119,16 +135,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             raise Exception(NO_BLOBSERVICE_ERROR_MESSAGE)
 
         self._configure_connection()
-
-        # Clean cache only if value is set in galaxy.ini
-        if self.cache_size != -1:
-            # Convert GBs to bytes for comparison
-            self.cache_size = self.cache_size * 1073741824
-            # Helper for interruptable sleep
-            self.sleeper = Sleeper()
-            self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
-            self.cache_monitor_thread.start()
-            log.info("Cache cleaner manager started")
+        self.start_cache_monitor()
 
     def to_dict(self):
         as_dict = super().to_dict()
@@ -145,7 +152,10 @@ class AzureBlobObjectStore(ConcreteObjectStore):
                 "cache": {
                     "size": self.cache_size,
                     "path": self.staging_path,
+                    "high_watermark": self.cache_high_watermark,
+                    "low_watermark": self.cache_low_watermark,
                 },
+                "transfer": transfer_config_to_dict(self.transfer_config),
             }
         )
         return as_dict
@@ -266,6 +276,8 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
@@ -275,14 +287,41 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         local_destination = self._get_cache_path(rel_path)
         try:
             log.debug("Pulling '%s' into cache to %s", rel_path, local_destination)
-            if self.cache_size > 0 and self._get_size_in_azure(rel_path) > self.cache_size:
+            size = self._get_size_in_azure(rel_path)
+            if self.cache_size > 0 and size > self.cache_size:
                 log.critical(
                     "File %s is larger (%s) than the cache size (%s). Cannot download.",
                     rel_path,
-                    self._get_size_in_azure(rel_path),
+                    size,
                     self.cache_size,
                 )
                 return False
+            elif size > self.transfer_config.part_size:
+                self.transfer_progress = 0  # Reset transfer progress counter
+                # pin the ranged reads to the version of the blob that is being downloaded
+                properties = self.service.get_blob_properties(self.container_name, rel_path).properties
+                etag = properties.etag
+
+                def read_range(start, end, fileobj):
+                    self.service.get_blob_to_stream(
+                        self.container_name,
+                        rel_path,
+                        fileobj,
+                        start_range=start,
+                        end_range=end,
+                        max_connections=1,
+                        if_match=etag,
+                    )
+
+                parallel_download(
+                    read_range,
+                    size,
+                    local_destination,
+                    self.transfer_config,
+                    version=etag,
+                    progress_callback=self._transfer_cb,
+                )
+                return True
             else:
                 self.transfer_progress = 0  # Reset transfer progress counter
                 self.service.get_blob_to_path(
@@ -332,10 +371,17 @@ class AzureBlobObjectStore(ConcreteObjectStore):
                     rel_path,
                 )
                 self.transfer_progress = 0  # Reset transfer progress counter
+                # the blob service uploads blocks of large files in parallel
                 self.service.create_blob_from_path(
-                    self.container_name, rel_path, source_file, progress_callback=self._transfer_cb
+                    self.container_name,
+                    rel_path,
+                    source_file,
+                    progress_callback=self._transfer_cb,
+                    max_connections=self.transfer_config.concurrency,
                 )
                 end_time = datetime.now()
+                if source_file == self._get_cache_path(rel_path):
+                    self._cache_accessed(rel_path)
                 log.debug(
                     "Pushed cache file '%s' to blob '%s' (%s bytes transfered in %s sec)",
                     source_file,
@@ -470,6 +516,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             # but requires iterating through each individual blob in Azure and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path, entire_dir=True)
                 blobs = self.service.list_blobs(self.container_name, prefix=rel_path)
                 for blob in blobs:
                     log.debug("Deleting from Azure: %s", blob)
@@ -478,6 +525,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             else:
                 # Delete from cache first
                 unlink(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path)
                 # Delete from S3 as well
                 if self._in_azure(rel_path):
                     log.debug("Deleting from Azure: %s", rel_path)
@@ -493,14 +541,42 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         rel_path = self._construct_path(obj, **kwargs)
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
+            if 0 <= count <= self.transfer_config.part_size:
+                # Serve small reads (e.g. dataset previews) without pulling the whole object into the cache
+                return self._get_range(rel_path, start, count)
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_accessed(rel_path)
         # Read the file content from cache
-        data_file = open(self._get_cache_path(rel_path))
+        data_file = open(self._get_cache_path(rel_path), "rb")
         data_file.seek(start)
         content = data_file.read(count)
         data_file.close()
         return content
 
+    def _get_range(self, rel_path, start, count):
+        """Read ``count`` bytes from ``start`` of an object that is not in the cache with ranged reads."""
+        try:
+            properties = self.service.get_blob_properties(self.container_name, rel_path).properties
+        except AzureHttpError:
+            raise ObjectNotFound(f"objectstore.get_data, blob does not exist: {rel_path}")
+        etag = properties.etag
+
+        def read_block(block_start, block_end):
+            block = io.BytesIO()
+            self.service.get_blob_to_stream(
+                self.container_name,
+                rel_path,
+                block,
+                start_range=block_start,
+                end_range=block_end,
+                max_connections=1,
+                if_match=etag,
+            )
+            return block.getvalue()
+
+        return self._block_cache.read((rel_path, etag), properties.content_length, start, count, read_block)
+
     def _get_filename(self, obj, **kwargs):
         rel_path = self._construct_path(obj, **kwargs)
         base_dir = kwargs.get("base_dir", None)
@@ -522,6 +598,8 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            if not dir_only:
+                self._cache_accessed(rel_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self._exists(obj, **kwargs):
@@ -550,6 +628,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
                     if source_file != cache_file:
                         # FIXME? Should this be a `move`?
                         shutil.copy2(source_file, cache_file)
+                        self._cache_accessed(rel_path)
                     self._fix_permissions(cache_file)
                 except OSError:
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
@@ -576,56 +655,6 @@ class AzureBlobObjectStore(ConcreteObjectStore):
     def _get_store_usage_percent(self):
         return 0.0
 
-    ##################
-    # Secret Methods #
-    ##################
-
-    def __cache_monitor(self):
-        time.sleep(2)  # Wait for things to load before starting the monitor
-        while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
-            # Initiate cleaning once within 10% of the defined cache size?
-            cache_limit = self.cache_size * 0.9
-            if total_size > cache_limit:
-                log.info(
-                    "Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
-                    convert_bytes(total_size),
-                    convert_bytes(cache_limit),
-                )
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
-                # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                # Keep deleting datasets from file_list until deleted_amount does not
-                # exceed delete_this_much; start deleting from the front of the file list,
-                # which assumes the oldest files come first on the list.
-                deleted_amount = 0
-                for entry in enumerate(file_list):
-                    if deleted_amount < delete_this_much:
-                        deleted_amount += entry[2]
-                        os.remove(entry[1])
-                        # Debugging code for printing deleted files' stats
-                        # folder, file_name = os.path.split(f[1])
-                        # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                        # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                        #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                        #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-                    else:
-                        log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-
-            self.sleeper.sleep(30)  # Test cache size every 30 seconds?
+    def shutdown(self):
+        self.running = False
+        self._shutdown_cache_monitor()
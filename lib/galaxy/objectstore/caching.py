@@ -0,0 +1,448 @@
+"""Utilities for managing the local cache of object stores backed by remote storage.
+
+Object stores such as S3, Swift, Azure, CloudBridge and iRODS stage objects in
+a local cache directory. Instead of periodically walking that directory to find
+the least recently used files, the cache is tracked in a SQLite index that
+records the size and last access time of every cached file. The index keeps a
+running total of the cache size (maintained by triggers, so it stays correct
+when several Galaxy processes share a cache directory) and is ordered by last
+access, so checking the cache size is a constant time operation and evicting a
+file is a single index lookup.
+
+Only processes running a cache monitor open the index. Accesses are recorded
+in memory and written to the index in batches by the monitor thread, so reading
+a cached file never waits on the index. Files pulled into the cache by other
+processes (e.g. job scripts) are picked up when the monitor periodically
+reconciles the index with the cache directory.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from galaxy.util import unlink
+from galaxy.util.sleeper import Sleeper
+from . import convert_bytes
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_HIGH_WATERMARK = 0.9
+DEFAULT_CACHE_LOW_WATERMARK = 0.8
+CACHE_INDEX_FILENAME = ".galaxy_cache_index.sqlite"
+# Number of least recently used files evicted per index query
+EVICTION_BATCH_SIZE = 1000
+# Increment whenever the schema below changes, the index is rebuilt from the cache directory
+CACHE_INDEX_VERSION = 1
+# Seconds between reconciliations of the index with the content of the cache directory
+CACHE_REINDEX_INTERVAL = 3600
+
+CACHE_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entry_last_access ON cache_entry (last_access);
+CREATE TABLE IF NOT EXISTS cache_total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_total (id, size) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry BEGIN
+    UPDATE cache_total SET size = size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_update AFTER UPDATE OF size ON cache_entry BEGIN
+    UPDATE cache_total SET size = size + NEW.size - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry BEGIN
+    UPDATE cache_total SET size = size - OLD.size WHERE id = 0;
+END;
+"""
+
+
+class CacheTarget(NamedTuple):
+    """Size limits of an object store cache directory."""
+
+    path: str
+    # maximum size of the cache in bytes
+    size: int
+    # fraction of ``size`` above which files are evicted
+    high_watermark: float = DEFAULT_CACHE_HIGH_WATERMARK
+    # fraction of ``size`` the cache is reduced to once eviction is triggered
+    low_watermark: float = DEFAULT_CACHE_LOW_WATERMARK
+
+    @property
+    def high_watermark_size(self) -> int:
+        return int(self.size * self.high_watermark)
+
+    @property
+    def low_watermark_size(self) -> int:
+        return int(self.size * self.low_watermark)
+
+
+def parse_cache_watermarks_from_xml(c_xml) -> dict:
+    """Parse the optional ``high_watermark`` and ``low_watermark`` attributes of a ``cache`` element."""
+    return {
+        "high_watermark": float(c_xml.get("high_watermark", DEFAULT_CACHE_HIGH_WATERMARK)),
+        "low_watermark": float(c_xml.get("low_watermark", DEFAULT_CACHE_LOW_WATERMARK)),
+    }
+
+
+class CacheIndex:
+    """SQLite index of the files in an object store cache directory.
+
+    Paths are stored relative to the cache directory. The index lives in the
+    cache directory itself so it is shared by all processes monitoring that
+    cache. It uses SQLite's default rollback journal, since write-ahead logging
+    does not work on network file systems.
+    """
+
+    def __init__(self, cache_path: str, index_path: Optional[str] = None):
+        self.cache_path = os.path.abspath(cache_path)
+        self.index_path = index_path or os.path.join(self.cache_path, CACHE_INDEX_FILENAME)
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.index_path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.executescript(CACHE_INDEX_SCHEMA)
+
+    @property
+    def is_built(self) -> bool:
+        """Whether the index has been populated from the content of the cache directory."""
+        with self._lock:
+            (version,) = self._connection.execute("PRAGMA user_version").fetchone()
+        return version == CACHE_INDEX_VERSION
+
+    @property
+    def total_size(self) -> int:
+        with self._lock:
+            (size,) = self._connection.execute("SELECT size FROM cache_total WHERE id = 0").fetchone()
+        return size
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._connection.execute("SELECT count(*) FROM cache_entry").fetchone()
+        return count
+
+    def touch(self, rel_path: str, size: Optional[int] = None, last_access: Optional[float] = None):
+        """Record an access to (or the creation of) the cached file at ``rel_path``.
+
+        If ``size`` is not given it is read from the file, entries for files
+        that do not exist (anymore) are removed.
+        """
+        rel_path = self._normalize(rel_path)
+        if size is None:
+            try:
+                size = os.path.getsize(os.path.join(self.cache_path, rel_path))
+            except OSError:
+                self.remove(rel_path)
+                return
+        if last_access is None:
+            last_access = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO cache_entry (path, size, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access",
+                (rel_path, size, last_access),
+            )
+
+    def touch_many(self, accesses: Dict[str, float]):
+        """Record the accesses in ``accesses``, a mapping of paths to access times, in a single transaction.
+
+        Sizes are read from the files, entries for files that no longer exist are removed.
+        """
+        updated = []
+        missing = []
+        for rel_path, last_access in accesses.items():
+            rel_path = self._normalize(rel_path)
+            try:
+                size = os.path.getsize(os.path.join(self.cache_path, rel_path))
+            except OSError:
+                missing.append((rel_path,))
+                continue
+            updated.append((rel_path, size, last_access))
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany(
+                    "INSERT INTO cache_entry (path, size, last_access) VALUES (?, ?, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET size = excluded.size, "
+                    "last_access = max(last_access, excluded.last_access)",
+                    updated,
+                )
+                self._connection.executemany("DELETE FROM cache_entry WHERE path = ?", missing)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def remove(self, rel_path: str, entire_dir: bool = False):
+        """Remove the entry of a cached file or, if ``entire_dir`` is set, all entries below a directory."""
+        rel_path = self._normalize(rel_path)
+        with self._lock:
+            if entire_dir:
+                # '0' is the character following '/', so this is a prefix match using the primary key
+                self._connection.execute(
+                    "DELETE FROM cache_entry WHERE path >= ? AND path < ?", (f"{rel_path}/", f"{rel_path}0")
+                )
+            self._connection.execute("DELETE FROM cache_entry WHERE path = ?", (rel_path,))
+
+    def least_recently_used(self, limit: int = EVICTION_BATCH_SIZE) -> List[Tuple[str, int]]:
+        """Return up to ``limit`` ``(path, size)`` tuples, least recently accessed first."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT path, size FROM cache_entry ORDER BY last_access LIMIT ?", (limit,)
+            ).fetchall()
+
+    def remove_many(self, rel_paths: Iterable[str]):
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany("DELETE FROM cache_entry WHERE path = ?", ((p,) for p in rel_paths))
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def rebuild(self):
+        """Replace the content of the index with the files found in the cache directory.
+
+        Files already in the index keep their recorded last access unless the
+        file system reports a more recent one.
+        """
+        start = time.time()
+        with self._lock:
+            recorded = dict(self._connection.execute("SELECT path, last_access FROM cache_entry"))
+        entries = []
+        for dirpath, _, filenames in os.walk(self.cache_path):
+            for filename in filenames:
+                if filename.startswith(CACHE_INDEX_FILENAME):
+                    continue
+                filepath = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(filepath, self.cache_path)
+                last_access = max(stat.st_atime, stat.st_mtime, recorded.get(rel_path, 0))
+                entries.append((rel_path, stat.st_size, last_access))
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute("DELETE FROM cache_entry")
+                self._connection.executemany(
+                    "INSERT INTO cache_entry (path, size, last_access) VALUES (?, ?, ?)", entries
+                )
+                self._connection.execute(f"PRAGMA user_version = {CACHE_INDEX_VERSION}")
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        log.info(
+            "Indexed %d files (%s) in cache directory %s in %.1f seconds",
+            len(entries),
+            convert_bytes(sum(entry[1] for entry in entries)),
+            self.cache_path,
+            time.time() - start,
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _normalize(self, rel_path: str) -> str:
+        if os.path.isabs(rel_path):
+            rel_path = os.path.relpath(rel_path, self.cache_path)
+        return os.path.normpath(rel_path)
+
+
+def check_cache(cache_target: CacheTarget, cache_index: CacheIndex) -> int:
+    """Evict least recently used files if the cache exceeds its high watermark.
+
+    Files are evicted until the cache is below the low watermark. Returns the
+    number of bytes freed.
+    """
+    total_size = cache_index.total_size
+    if total_size <= cache_target.high_watermark_size:
+        return 0
+    log.info(
+        "Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
+        convert_bytes(total_size),
+        convert_bytes(cache_target.low_watermark_size),
+    )
+    freed = evict(cache_index, total_size - cache_target.low_watermark_size)
+    log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(freed))
+    return freed
+
+
+def evict(cache_index: CacheIndex, delete_this_much: int) -> int:
+    """Delete least recently used files from the cache until ``delete_this_much`` bytes are freed."""
+    freed = 0
+    while freed < delete_this_much:
+        entries = cache_index.least_recently_used()
+        if not entries:
+            break
+        evicted = []
+        for rel_path, size in entries:
+            if freed >= delete_this_much:
+                break
+            unlink(os.path.join(cache_index.cache_path, rel_path), ignore_errors=True)
+            evicted.append(rel_path)
+            freed += size
+        cache_index.remove_many(evicted)
+    return freed
+
+
+class InProcessCacheMonitor:
+    """Thread keeping an object store cache directory within its size limit.
+
+    Accesses recorded with :meth:`record_access` are buffered and written to
+    the index by the monitor thread before each check.
+    """
+
+    def __init__(
+        self,
+        cache_target: CacheTarget,
+        cache_index: CacheIndex,
+        interval: int = 30,
+        reindex_interval: int = CACHE_REINDEX_INTERVAL,
+    ):
+        self.cache_target = cache_target
+        self.cache_index = cache_index
+        self.interval = interval
+        self.reindex_interval = reindex_interval
+        self.running = True
+        self._pending_accesses: Dict[str, float] = {}
+        self._pending_lock = threading.Lock()
+        # Helper for interruptable sleep
+        self.sleeper = Sleeper()
+        self.cache_monitor_thread = threading.Thread(target=self._cache_monitor, name="CacheMonitor", daemon=True)
+        self.cache_monitor_thread.start()
+        log.info("Cache cleaner manager started")
+
+    def _cache_monitor(self):
+        time.sleep(2)  # Wait for things to load before starting the monitor
+        last_reindex = 0.0
+        try:
+            if self.cache_index.is_built:
+                last_reindex = time.time()
+        except Exception:
+            log.exception("Failed to open index of cache directory %s", self.cache_target.path)
+        while self.running:
+            if time.time() - last_reindex > self.reindex_interval:
+                # Pick up files cached by processes that do not record their accesses
+                try:
+                    self.cache_index.rebuild()
+                except Exception:
+                    log.exception("Failed to index cache directory %s", self.cache_target.path)
+                last_reindex = time.time()
+            try:
+                self.flush()
+                check_cache(self.cache_target, self.cache_index)
+            except Exception:
+                log.exception("Failed to clean cache directory %s", self.cache_target.path)
+            self.sleeper.sleep(self.interval)
+
+    def record_access(self, rel_path: str):
+        """Record that ``rel_path`` has been created, updated or read, written to the index on the next flush."""
+        with self._pending_lock:
+            self._pending_accesses[rel_path] = time.time()
+
+    def discard(self, rel_path: str, entire_dir: bool = False):
+        """Drop pending accesses to a removed file or, if ``entire_dir`` is set, to all files below a directory."""
+        rel_path = os.path.normpath(rel_path)
+        with self._pending_lock:
+            for pending in list(self._pending_accesses):
+                normalized = os.path.normpath(pending)
+                if normalized == rel_path or (entire_dir and normalized.startswith(f"{rel_path}{os.sep}")):
+                    del self._pending_accesses[pending]
+
+    def flush(self):
+        """Write the buffered accesses to the index."""
+        with self._pending_lock:
+            accesses, self._pending_accesses = self._pending_accesses, {}
+        if accesses:
+            self.cache_index.touch_many(accesses)
+
+    def wake(self):
+        """Check the cache size now, e.g. after a large file has been pulled into the cache."""
+        self.sleeper.wake()
+
+    def shutdown(self):
+        self.running = False
+        log.debug("Shutting down thread")
+        self.sleeper.wake()
+        self.cache_monitor_thread.join(5)
+
+
+class IndexedCacheMixin:
+    """Maintain a :class:`CacheIndex` and an eviction thread for the cache of an object store.
+
+    Classes using this mixin set ``staging_path``, ``cache_size`` (in GB, -1
+    for an unbounded cache), ``cache_high_watermark``, ``cache_low_watermark``
+    and ``enable_cache_monitor`` and call the ``_cache_*`` hooks whenever files
+    are pulled into, accessed in or removed from the cache. The hooks do nothing
+    in processes that do not run the cache monitor.
+    """
+
+    staging_path: str
+    cache_size: float
+    cache_high_watermark: float = DEFAULT_CACHE_HIGH_WATERMARK
+    cache_low_watermark: float = DEFAULT_CACHE_LOW_WATERMARK
+    enable_cache_monitor: bool = True
+    cache_index: Optional[CacheIndex] = None
+    cache_monitor: Optional[InProcessCacheMonitor] = None
+
+    def start_cache_monitor(self):
+        # Track and clean the cache only if a cache size is set
+        if self.cache_size == -1:
+            return
+        # Convert GBs to bytes for comparison
+        self.cache_size = self.cache_size * 1073741824
+        if not self.enable_cache_monitor:
+            return
+        try:
+            self.cache_index = CacheIndex(self.staging_path)
+        except (OSError, sqlite3.Error):
+            log.exception("Failed to open index of cache directory %s, cache will not be cleaned", self.staging_path)
+            return
+        cache_target = CacheTarget(
+            path=self.staging_path,
+            size=int(self.cache_size),
+            high_watermark=self.cache_high_watermark,
+            low_watermark=self.cache_low_watermark,
+        )
+        self.cache_monitor = InProcessCacheMonitor(cache_target, self.cache_index)
+
+    def _cache_accessed(self, rel_path):
+        """Record that the cached copy of ``rel_path`` has been created, updated or read."""
+        if self.cache_monitor is not None:
+            self.cache_monitor.record_access(rel_path)
+
+    def _cache_pulled(self, rel_path):
+        """Record that ``rel_path`` has been pulled into the cache and let the monitor check the cache size."""
+        if self.cache_monitor is not None:
+            self.cache_monitor.record_access(rel_path)
+            self.cache_monitor.wake()
+
+    def _cache_removed(self, rel_path, entire_dir=False):
+        if self.cache_monitor is None:
+            return
+        self.cache_monitor.discard(rel_path, entire_dir=entire_dir)
+        try:
+            self.cache_index.remove(rel_path, entire_dir=entire_dir)
+        except sqlite3.Error:
+            log.warning("Failed to remove '%s' from the cache index", rel_path, exc_info=True)
+
+    def _shutdown_cache_monitor(self):
+        if self.cache_monitor is not None:
+            self.cache_monitor.shutdown()
@@ -2,14 +2,11 @@
 Object Store plugin for Cloud storage.
 """
 
+import io
 import logging
-import multiprocessing
 import os
 import os.path
 import shutil
-import subprocess
-import threading
-import time
 from datetime import datetime
 
 from galaxy.exceptions import (
@@ -22,12 +19,20 @@ from galaxy.util import (
     umask_fix_perms,
     unlink,
 )
-from galaxy.util.sleeper import Sleeper
-from . import (
-    ConcreteObjectStore,
-    convert_bytes,
+from . import ConcreteObjectStore
+from .caching import (
+    DEFAULT_CACHE_HIGH_WATERMARK,
+    DEFAULT_CACHE_LOW_WATERMARK,
+    IndexedCacheMixin,
 )
 from .s3 import parse_config_xml
+from .transfer import (
+    BlockCache,
+    parallel_download,
+    ranged_url_reader,
+    transfer_config_from_dict,
+    transfer_config_to_dict,
+)
 
 try:
     from cloudbridge.factory import (
@@ -66,12 +71,15 @@ class CloudConfigMixin:
             "cache": {
                 "size": self.cache_size,
                 "path": self.staging_path,
+                "high_watermark": self.cache_high_watermark,
+                "low_watermark": self.cache_low_watermark,
             },
+            "transfer": transfer_config_to_dict(self.transfer_config),
             "enable_cache_monitor": False,
         }
 
 
-class Cloud(ConcreteObjectStore, CloudConfigMixin):
+class Cloud(ConcreteObjectStore, CloudConfigMixin, IndexedCacheMixin):
     """
     Object store that stores objects as items in an cloud storage. A local
     cache exists that is used as an intermediate location for files between
@@ -101,8 +109,13 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         self.is_secure = connection_dict.get("is_secure", True)
         self.conn_path = connection_dict.get("conn_path", "/")
 
+        self.transfer_config = transfer_config_from_dict(config_dict.get("transfer"))
+        self._block_cache = BlockCache()
+
         self.cache_size = cache_dict.get("size", -1)
         self.staging_path = cache_dict.get("path") or self.config.object_store_cache_path
+        self.cache_high_watermark = cache_dict.get("high_watermark", DEFAULT_CACHE_HIGH_WATERMARK)
+        self.cache_low_watermark = cache_dict.get("low_watermark", DEFAULT_CACHE_LOW_WATERMARK)
 
         self._initialize()
 
@@ -113,23 +126,6 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         self.conn = self._get_connection(self.provider, self.credentials)
         self.bucket = self._get_bucket(self.bucket_name)
         self.start_cache_monitor()
-        # Test if 'axel' is available for parallel download and pull the key into cache
-        try:
-            subprocess.call("axel")
-            self.use_axel = True
-        except OSError:
-            self.use_axel = False
-
-    def start_cache_monitor(self):
-        # Clean cache only if value is set in galaxy.ini
-        if self.cache_size != -1 and self.enable_cache_monitor:
-            # Convert GBs to bytes for comparison
-            self.cache_size = self.cache_size * 1073741824
-            # Helper for interruptable sleep
-            self.sleeper = Sleeper()
-            self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
-            self.cache_monitor_thread.start()
-            log.info("Cache cleaner manager started")
 
     @staticmethod
     def _get_connection(provider, credentials):
@@ -250,73 +246,6 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         as_dict.update(self._config_to_dict())
         return as_dict
 
-    def __cache_monitor(self):
-        time.sleep(2)  # Wait for things to load before starting the monitor
-        while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
-            # Initiate cleaning once within 10% of the defined cache size?
-            cache_limit = self.cache_size * 0.9
-            if total_size > cache_limit:
-                log.info(
-                    "Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
-                    convert_bytes(total_size),
-                    convert_bytes(cache_limit),
-                )
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
-                # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                self.__clean_cache(file_list, delete_this_much)
-            self.sleeper.sleep(30)  # Test cache size every 30 seconds?
-
-    def __clean_cache(self, file_list, delete_this_much):
-        """Keep deleting files from the file_list until the size of the deleted
-        files is greater than the value in delete_this_much parameter.
-
-        :type file_list: list
-        :param file_list: List of candidate files that can be deleted. This method
-            will start deleting files from the beginning of the list so the list
-            should be sorted accordingly. The list must contains 3-element tuples,
-            positioned as follows: position 0 holds file last accessed timestamp
-            (as time.struct_time), position 1 holds file path, and position 2 has
-            file size (e.g., (<access time>, /mnt/data/dataset_1.dat), 472394)
-
-        :type delete_this_much: int
-        :param delete_this_much: Total size of files, in bytes, that should be deleted.
-        """
-        # Keep deleting datasets from file_list until deleted_amount does not
-        # exceed delete_this_much; start deleting from the front of the file list,
-        # which assumes the oldest files come first on the list.
-        deleted_amount = 0
-        for entry in enumerate(file_list):
-            if deleted_amount < delete_this_much:
-                deleted_amount += entry[2]
-                os.remove(entry[1])
-                # Debugging code for printing deleted files' stats
-                # folder, file_name = os.path.split(f[1])
-                # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-            else:
-                log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-                return
-
     def _get_bucket(self, bucket_name):
         try:
             bucket = self.conn.storage.buckets.get(bucket_name)
@@ -437,11 +366,16 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
         self.transfer_progress += 10
 
+    def _parallel_transfer_cb(self, complete, total):
+        self.transfer_progress = int(complete * 100 / total)
+
     def _download(self, rel_path):
         try:
             log.debug("Pulling key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
@@ -455,13 +389,24 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
                     self.cache_size,
                 )
                 return False
-            if self.use_axel:
+            url = None
+            if key.size > self.transfer_config.part_size:
+                try:
+                    url = key.generate_url(7200)
+                except Exception:
+                    log.debug("Unable to generate a URL for key '%s', downloading it in a single stream", rel_path)
+            if url:
+                self.transfer_progress = 0  # Reset transfer progress counter
+                parallel_download(
+                    ranged_url_reader(url),
+                    key.size,
+                    self._get_cache_path(rel_path),
+                    self.transfer_config,
+                    version=str(key.last_modified),
+                    progress_callback=self._parallel_transfer_cb,
+                )
                 log.debug("Parallel pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
-                ncores = multiprocessing.cpu_count()
-                url = key.generate_url(7200)
-                ret_code = subprocess.call(f"axel -a -n {ncores} '{url}'")
-                if ret_code == 0:
-                    return True
+                return True
             else:
                 log.debug("Pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
                 self.transfer_progress = 0  # Reset transfer progress counter
@@ -511,6 +456,8 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
                         self.bucket.objects.get(rel_path).upload_from_file(source_file)
 
                     end_time = datetime.now()
+                    if source_file == self._get_cache_path(rel_path):
+                        self._cache_accessed(rel_path)
                     log.debug(
                         "Pushed cache file '%s' to key '%s' (%s bytes transfered in %s sec)",
                         source_file,
@@ -645,6 +592,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
             # but requires iterating through each individual key in S3 and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path, entire_dir=True)
                 results = self.bucket.objects.list(prefix=rel_path)
                 for key in results:
                     log.debug("Deleting key %s", key.name)
@@ -653,6 +601,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
             else:
                 # Delete from cache first
                 unlink(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path)
                 # Delete from S3 as well
                 if self._key_exists(rel_path):
                     key = self.bucket.objects.get(rel_path)
@@ -669,14 +618,33 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         rel_path = self._construct_path(obj, **kwargs)
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
+            if 0 <= count <= self.transfer_config.part_size:
+                # Serve small reads (e.g. dataset previews) without pulling the whole object into the cache
+                return self._get_range(rel_path, start, count)
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_accessed(rel_path)
         # Read the file content from cache
-        data_file = open(self._get_cache_path(rel_path))
+        data_file = open(self._get_cache_path(rel_path), "rb")
         data_file.seek(start)
         content = data_file.read(count)
         data_file.close()
         return content
 
+    def _get_range(self, rel_path, start, count):
+        """Read ``count`` bytes from ``start`` of an object that is not in the cache with ranged reads."""
+        key = self.bucket.objects.get(rel_path)
+        if key is None:
+            raise ObjectNotFound(f"objectstore.get_data, key does not exist: {rel_path}")
+        read_range = ranged_url_reader(key.generate_url(7200))
+
+        def read_block(block_start, block_end):
+            block = io.BytesIO()
+            read_range(block_start, block_end, block)
+            return block.getvalue()
+
+        return self._block_cache.read((rel_path, str(key.last_modified)), key.size, start, count, read_block)
+
     def _get_filename(self, obj, **kwargs):
         base_dir = kwargs.get("base_dir", None)
         dir_only = kwargs.get("dir_only", False)
@@ -698,6 +666,8 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            if not dir_only:
+                self._cache_accessed(rel_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self._exists(obj, **kwargs):
@@ -727,6 +697,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
                     if source_file != cache_file:
                         # FIXME? Should this be a `move`?
                         shutil.copy2(source_file, cache_file)
+                        self._cache_accessed(rel_path)
                     self._fix_permissions(cache_file)
                 except OSError:
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
@@ -752,8 +723,4 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
 
     def shutdown(self):
         self.running = False
-        thread = getattr(self, "cache_monitor_thread", None)
-        if thread:
-            log.debug("Shutting down thread")
-            self.sleeper.wake()
-            thread.join(5)
+        self._shutdown_cache_monitor()
@@ -31,6 +31,12 @@ from galaxy.util import (
 )
 from galaxy.util.path import safe_relpath
 from . import DiskObjectStore
+from .caching import (
+    DEFAULT_CACHE_HIGH_WATERMARK,
+    DEFAULT_CACHE_LOW_WATERMARK,
+    IndexedCacheMixin,
+    parse_cache_watermarks_from_xml,
+)
 
 IRODS_IMPORT_MESSAGE = "The Python irods package is required to use this feature, please install it"
 # 1 MB
@@ -81,6 +87,7 @@ def parse_config_xml(config_xml):
             _config_xml_error("cache")
         cache_size = float(c_xml[0].get("size", -1))
         staging_path = c_xml[0].get("path", None)
+        cache_watermarks = parse_cache_watermarks_from_xml(c_xml[0])
 
         attrs = ("type", "path")
         e_xml = config_xml.findall("extra_dir")
@@ -109,6 +116,7 @@ def parse_config_xml(config_xml):
             "cache": {
                 "size": cache_size,
                 "path": staging_path,
+                **cache_watermarks,
             },
             "extra_dirs": extra_dirs,
             "private": DiskObjectStore.parse_private_from_config_xml(config_xml),
@@ -142,11 +150,13 @@ class CloudConfigMixin:
             "cache": {
                 "size": self.cache_size,
                 "path": self.staging_path,
+                "high_watermark": self.cache_high_watermark,
+                "low_watermark": self.cache_low_watermark,
             },
         }
 
 
-class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
+class IRODSObjectStore(DiskObjectStore, CloudConfigMixin, IndexedCacheMixin):
     """
     Object store that stores files as data objects in an iRODS Zone. A local cache
     exists that is used as an intermediate location for files between Galaxy and iRODS.
@@ -211,6 +221,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         self.staging_path = cache_dict.get("path") or self.config.object_store_cache_path
         if self.staging_path is None:
             _config_dict_error("cache->path")
+        self.cache_high_watermark = cache_dict.get("high_watermark", DEFAULT_CACHE_HIGH_WATERMARK)
+        self.cache_low_watermark = cache_dict.get("low_watermark", DEFAULT_CACHE_LOW_WATERMARK)
 
         extra_dirs = {e["type"]: e["path"] for e in config_dict.get("extra_dirs", [])}
         if not extra_dirs:
@@ -260,6 +272,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             if self.connection_pool_monitor_thread is not None:
                 self.connection_pool_monitor_thread.join(5)
 
+        self._shutdown_cache_monitor()
+
         log.debug("irods_pt shutdown: %s", ipt_timer)
 
     @classmethod
@@ -284,6 +298,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
     def start(self):
         if self.connection_pool_monitor_interval != -1:
             self.start_connection_pool_monitor()
+        self.start_cache_monitor()
 
     def _connection_pool_monitor(self, *args, **kwargs):
         refresh_time = kwargs["refresh_time"]
@@ -424,6 +439,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         log.debug("irods_pt _pull_into_cache: %s", ipt_timer)
         return file_ok
 
@@ -518,6 +535,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
                 self.session.data_objects.put(source_file, data_object_path, **options)
 
                 end_time = datetime.now()
+                if source_file == self._get_cache_path(rel_path):
+                    self._cache_accessed(rel_path)
                 log.debug(
                     "Pushed cache file '%s' to collection '%s' (%s bytes transfered in %s sec)",
                     source_file,
@@ -647,6 +666,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             # but requires iterating through each individual key in irods and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path, entire_dir=True)
 
                 col_path = f"{self.home}/{rel_path}"
                 col = None
@@ -671,6 +691,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             else:
                 # Delete from cache first
                 unlink(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path)
                 # Delete from irods as well
                 p = Path(rel_path)
                 data_object_name = p.stem + p.suffix
@@ -699,8 +720,10 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_accessed(rel_path)
         # Read the file content from cache
-        data_file = open(self._get_cache_path(rel_path))
+        data_file = open(self._get_cache_path(rel_path), "rb")
         data_file.seek(start)
         content = data_file.read(count)
         data_file.close()
@@ -730,6 +753,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            if not dir_only:
+                self._cache_accessed(rel_path)
             log.debug("irods_pt _get_filename: %s", ipt_timer)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
@@ -764,6 +789,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
                     if source_file != cache_file:
                         # FIXME? Should this be a `move`?
                         shutil.copy2(source_file, cache_file)
+                        self._cache_accessed(rel_path)
                     self._fix_permissions(cache_file)
                 except OSError:
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
@@ -372,7 +372,7 @@ class PithosObjectStore(ConcreteObjectStore):
             cache_path = self._pull_into_cache(path)
         else:
             cache_path = self._get_cache_path(path)
-        data_file = open(cache_path)
+        data_file = open(cache_path, "rb")
         data_file.seek(start)
         content = data_file.read(count)
         data_file.close()
@@ -2,10 +2,8 @@
 Object Store plugin for the Amazon Simple Storage Service (S3)
 """
 import logging
-import multiprocessing
 import os
 import shutil
-import subprocess
 import threading
 import time
 from datetime import datetime
@@ -28,15 +26,26 @@ from galaxy.util import (
     string_as_bool,
     umask_fix_perms,
     unlink,
-    which,
 )
 from galaxy.util.path import safe_relpath
-from galaxy.util.sleeper import Sleeper
-from . import (
-    ConcreteObjectStore,
-    convert_bytes,
+from . import ConcreteObjectStore
+from .caching import (
+    DEFAULT_CACHE_HIGH_WATERMARK,
+    DEFAULT_CACHE_LOW_WATERMARK,
+    IndexedCacheMixin,
+    parse_cache_watermarks_from_xml,
+)
+from .s3_multipart_upload import (
+    connection_from_s3server,
+    multipart_upload,
+)
+from .transfer import (
+    BlockCache,
+    parallel_download,
+    parse_transfer_config_xml,
+    transfer_config_from_dict,
+    transfer_config_to_dict,
 )
-from .s3_multipart_upload import multipart_upload
 
 NO_BOTO_ERROR_MESSAGE = (
     "S3/Swift object store configured, but no boto dependency available."
@@ -74,6 +83,7 @@ def parse_config_xml(config_xml):
         cache_size = float(c_xml.get("size", -1))
 
         staging_path = c_xml.get("path", None)
+        cache_watermarks = parse_cache_watermarks_from_xml(c_xml)
 
         tag, attrs = "extra_dir", ("type", "path")
         extra_dirs = config_xml.findall(tag)
@@ -88,6 +98,7 @@ def parse_config_xml(config_xml):
                 "access_key": access_key,
                 "secret_key": secret_key,
             },
+            "transfer": parse_transfer_config_xml(config_xml),
             "bucket": {
                 "name": bucket_name,
                 "use_reduced_redundancy": use_rr,
@@ -103,6 +114,7 @@ def parse_config_xml(config_xml):
             "cache": {
                 "size": cache_size,
                 "path": staging_path,
+                **cache_watermarks,
             },
             "extra_dirs": extra_dirs,
             "private": ConcreteObjectStore.parse_private_from_config_xml(config_xml),
@@ -134,12 +146,15 @@ class CloudConfigMixin:
             "cache": {
                 "size": self.cache_size,
                 "path": self.staging_path,
+                "high_watermark": self.cache_high_watermark,
+                "low_watermark": self.cache_low_watermark,
             },
+            "transfer": transfer_config_to_dict(self.transfer_config),
             "enable_cache_monitor": False,
         }
 
 
-class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
+class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin, IndexedCacheMixin):
     """
     Object store that stores objects as items in an AWS S3 bucket. A local
     cache exists that is used as an intermediate location for files between
@@ -172,8 +187,13 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         self.is_secure = connection_dict.get("is_secure", True)
         self.conn_path = connection_dict.get("conn_path", "/")
 
+        self.transfer_config = transfer_config_from_dict(config_dict.get("transfer"))
+        self._block_cache = BlockCache()
+
         self.cache_size = cache_dict.get("size", -1)
         self.staging_path = cache_dict.get("path") or self.config.object_store_cache_path
+        self.cache_high_watermark = cache_dict.get("high_watermark", DEFAULT_CACHE_HIGH_WATERMARK)
+        self.cache_low_watermark = cache_dict.get("low_watermark", DEFAULT_CACHE_LOW_WATERMARK)
 
         extra_dirs = {e["type"]: e["path"] for e in config_dict.get("extra_dirs", [])}
         self.extra_dirs.update(extra_dirs)
@@ -199,22 +219,6 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         self._configure_connection()
         self._bucket = self._get_bucket(self.bucket)
         self.start_cache_monitor()
-        # Test if 'axel' is available for parallel download and pull the key into cache
-        if which("axel"):
-            self.use_axel = True
-        else:
-            self.use_axel = False
-
-    def start_cache_monitor(self):
-        # Clean cache only if value is set in galaxy.ini
-        if self.cache_size != -1 and self.enable_cache_monitor:
-            # Convert GBs to bytes for comparison
-            self.cache_size = self.cache_size * 1073741824
-            # Helper for interruptable sleep
-            self.sleeper = Sleeper()
-            self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
-            self.cache_monitor_thread.start()
-            log.info("Cache cleaner manager started")
 
     def _configure_connection(self):
         log.debug("Configuring S3 Connection")
@@ -233,73 +237,6 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         as_dict.update(self._config_to_dict())
         return as_dict
 
-    def __cache_monitor(self):
-        time.sleep(2)  # Wait for things to load before starting the monitor
-        while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
-            # Initiate cleaning once within 10% of the defined cache size?
-            cache_limit = self.cache_size * 0.9
-            if total_size > cache_limit:
-                log.info(
-                    "Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
-                    convert_bytes(total_size),
-                    convert_bytes(cache_limit),
-                )
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
-                # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                self.__clean_cache(file_list, delete_this_much)
-            self.sleeper.sleep(30)  # Test cache size every 30 seconds?
-
-    def __clean_cache(self, file_list, delete_this_much):
-        """Keep deleting files from the file_list until the size of the deleted
-        files is greater than the value in delete_this_much parameter.
-
-        :type file_list: list
-        :param file_list: List of candidate files that can be deleted. This method
-            will start deleting files from the beginning of the list so the list
-            should be sorted accordingly. The list must contains 3-element tuples,
-            positioned as follows: position 0 holds file last accessed timestamp
-            (as time.struct_time), position 1 holds file path, and position 2 has
-            file size (e.g., (<access time>, /mnt/data/dataset_1.dat), 472394)
-
-        :type delete_this_much: int
-        :param delete_this_much: Total size of files, in bytes, that should be deleted.
-        """
-        # Keep deleting datasets from file_list until deleted_amount does not
-        # exceed delete_this_much; start deleting from the front of the file list,
-        # which assumes the oldest files come first on the list.
-        deleted_amount = 0
-        for entry in file_list:
-            if deleted_amount < delete_this_much:
-                deleted_amount += entry[2]
-                os.remove(entry[1])
-                # Debugging code for printing deleted files' stats
-                # folder, file_name = os.path.split(f[1])
-                # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-            else:
-                log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-                return
-
     def _get_bucket(self, bucket_name):
         """Sometimes a handle to a bucket is not established right away so try
         it a few times. Raise error is connection is not established."""
@@ -446,11 +383,16 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
         self.transfer_progress += 10
 
+    def _parallel_transfer_cb(self, complete, total):
+        self.transfer_progress = int(complete * 100 / total)
+
     def _download(self, rel_path):
         try:
             log.debug("Pulling key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
@@ -468,19 +410,35 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
                     self.cache_size,
                 )
                 return False
-            if self.use_axel:
+            if key.size > self.transfer_config.part_size:
+                self.transfer_progress = 0  # Reset transfer progress counter
+                # boto connections are not thread-safe, each worker thread downloads through its own connection
+                local = threading.local()
+                bucket_name = self._bucket.name
+
+                def read_range(start, end, fileobj):
+                    if not hasattr(local, "bucket"):
+                        local.bucket = connection_from_s3server(self.s3server).get_bucket(bucket_name, validate=False)
+                    Key(local.bucket, rel_path).get_file(fileobj, headers={"Range": f"bytes={start}-{end}"})
+
+                parallel_download(
+                    read_range,
+                    key.size,
+                    self._get_cache_path(rel_path),
+                    self.transfer_config,
+                    version=key.etag,
+                    progress_callback=self._parallel_transfer_cb,
+                )
                 log.debug("Parallel pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
-                ncores = multiprocessing.cpu_count()
-                url = key.generate_url(7200)
-                ret_code = subprocess.call(["axel", "-a", "-n", str(ncores), url])
-                if ret_code == 0:
-                    return True
+                return True
             else:
                 log.debug("Pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
                 self.transfer_progress = 0  # Reset transfer progress counter
                 key.get_contents_to_filename(self._get_cache_path(rel_path), cb=self._transfer_cb, num_cb=10)
                 return True
-        except S3ResponseError:
+        except Exception:
+            # S3, socket or IO errors, including those of parallel download workers. The cache path is only
+            # written once all parts are transferred, transferred parts are kept to resume on the next pull.
             log.exception("Problem downloading key '%s' from S3 bucket '%s'", rel_path, self._bucket.name)
         return False
 
@@ -512,15 +470,24 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
                         os.path.getsize(source_file),
                         rel_path,
                     )
-                    mb_size = os.path.getsize(source_file) / 1e6
-                    if mb_size < 10 or (not self.multipart):
+                    if os.path.getsize(source_file) <= self.transfer_config.part_size or (not self.multipart):
                         self.transfer_progress = 0  # Reset transfer progress counter
                         key.set_contents_from_filename(
                             source_file, reduced_redundancy=self.use_rr, cb=self._transfer_cb, num_cb=10
                         )
                     else:
-                        multipart_upload(self.s3server, self._bucket, key.name, source_file, mb_size)
+                        self.transfer_progress = 0  # Reset transfer progress counter
+                        multipart_upload(
+                            self.s3server,
+                            self._bucket,
+                            key.name,
+                            source_file,
+                            self.transfer_config,
+                            progress_callback=self._parallel_transfer_cb,
+                        )
                     end_time = datetime.now()
+                    if source_file == self._get_cache_path(rel_path):
+                        self._cache_accessed(rel_path)
                     log.debug(
                         "Pushed cache file '%s' to key '%s' (%s bytes transfered in %s sec)",
                         source_file,
@@ -662,6 +629,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             # but requires iterating through each individual key in S3 and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path, entire_dir=True)
                 results = self._bucket.get_all_keys(prefix=rel_path)
                 for key in results:
                     log.debug("Deleting key %s", key.name)
@@ -670,6 +638,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             else:
                 # Delete from cache first
                 unlink(self._get_cache_path(rel_path), ignore_errors=True)
+                self._cache_removed(rel_path)
                 # Delete from S3 as well
                 if self._key_exists(rel_path):
                     key = Key(self._bucket, rel_path)
@@ -686,14 +655,30 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         rel_path = self._construct_path(obj, **kwargs)
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
+            if 0 <= count <= self.transfer_config.part_size:
+                # Serve small reads (e.g. dataset previews) without pulling the whole object into the cache
+                return self._get_range(rel_path, start, count)
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_accessed(rel_path)
         # Read the file content from cache
-        data_file = open(self._get_cache_path(rel_path))
+        data_file = open(self._get_cache_path(rel_path), "rb")
         data_file.seek(start)
         content = data_file.read(count)
         data_file.close()
         return content
 
+    def _get_range(self, rel_path, start, count):
+        """Read ``count`` bytes from ``start`` of an object that is not in the cache with ranged reads."""
+        key = self._bucket.get_key(rel_path)
+        if key is None:
+            raise ObjectNotFound(f"objectstore.get_data, key does not exist: {rel_path}")
+
+        def read_block(block_start, block_end):
+            return key.get_contents_as_string(headers={"Range": f"bytes={block_start}-{block_end}"})
+
+        return self._block_cache.read((rel_path, key.etag), key.size, start, count, read_block)
+
     def _get_filename(self, obj, **kwargs):
         base_dir = kwargs.get("base_dir", None)
         dir_only = kwargs.get("dir_only", False)
@@ -715,6 +700,8 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            if not dir_only:
+                self._cache_accessed(rel_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self._exists(obj, **kwargs):
@@ -744,6 +731,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
                     if source_file != cache_file:
                         # FIXME? Should this be a `move`?
                         shutil.copy2(source_file, cache_file)
+                        self._cache_accessed(rel_path)
                     self._fix_permissions(cache_file)
                 except OSError:
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
@@ -769,11 +757,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
 
     def shutdown(self):
         self.running = False
-        thread = getattr(self, "cache_monitor_thread", None)
-        if thread:
-            log.debug("Shutting down thread")
-            self.sleeper.wake()
-            thread.join(5)
+        self._shutdown_cache_monitor()
 
 
 class SwiftObjectStore(S3ObjectStore):
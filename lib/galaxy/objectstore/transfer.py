@@ -0,0 +1,288 @@
+"""Parallel ranged downloads and multipart uploads for object stores backed by remote storage.
+
+Large objects are split into parts of a configurable size that are transferred
+concurrently by a thread pool. Downloads are written to a partial file next to
+their destination and completed parts are recorded in a journal, so a download
+interrupted by an error or a restart only fetches the missing parts when it is
+retried.
+
+Reads of a small range of an object that is not in the cache (e.g. previews of
+large datasets) are served with ranged reads of the blocks covering the range,
+recently read blocks are kept in memory by a :class:`BlockCache`.
+"""
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import requests
+
+from galaxy.util import (
+    DEFAULT_SOCKET_TIMEOUT,
+    unlink,
+)
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+DEFAULT_PART_SIZE = 16  # in MB
+DEFAULT_CONCURRENCY = 8
+# S3 requires all parts of a multipart upload but the last one to be at least 5 MB
+# and allows at most 10000 parts.
+MIN_UPLOAD_PART_SIZE = 5 * MB
+MAX_UPLOAD_PARTS = 10000
+PARTIAL_SUFFIX = ".part"
+JOURNAL_SUFFIX = ".parts"
+READ_CHUNK_SIZE = MB
+DEFAULT_BLOCK_SIZE = MB
+DEFAULT_MAX_CACHED_BLOCKS = 32
+
+# Write the bytes ``start`` to ``end`` (inclusive) of the remote object to a file object
+ReadRangeT = Callable[[int, int, Any], None]
+# Upload the given data as part ``part_number`` (starting at 1) of the remote object
+UploadPartT = Callable[[int, bytes], Any]
+ProgressCallbackT = Callable[[int, int], None]
+# Return the bytes ``start`` to ``end`` (inclusive) of the remote object
+ReadBlockT = Callable[[int, int], bytes]
+
+
+class TransferConfig(NamedTuple):
+    # size of the parts objects are split into, in bytes
+    part_size: int = DEFAULT_PART_SIZE * MB
+    # number of parts transferred at once
+    concurrency: int = DEFAULT_CONCURRENCY
+
+
+def parse_transfer_config_xml(config_xml) -> dict:
+    """Parse the optional ``transfer`` element of an object store configuration."""
+    t_xml = config_xml.find("transfer")
+    if t_xml is None:
+        t_xml = {}
+    return {
+        "part_size": float(t_xml.get("part_size", DEFAULT_PART_SIZE)),
+        "concurrency": int(t_xml.get("concurrency", DEFAULT_CONCURRENCY)),
+    }
+
+
+def transfer_config_from_dict(transfer_dict: Optional[dict]) -> TransferConfig:
+    transfer_dict = transfer_dict or {}
+    return TransferConfig(
+        part_size=int(float(transfer_dict.get("part_size", DEFAULT_PART_SIZE)) * MB),
+        concurrency=max(1, int(transfer_dict.get("concurrency", DEFAULT_CONCURRENCY))),
+    )
+
+
+def transfer_config_to_dict(transfer_config: TransferConfig) -> dict:
+    return {
+        "part_size": transfer_config.part_size / MB,
+        "concurrency": transfer_config.concurrency,
+    }
+
+
+def plan_parts(size: int, part_size: int) -> List[Tuple[int, int]]:
+    """Split ``size`` bytes into ``(start, end)`` byte ranges (inclusive) of at most ``part_size`` bytes.
+
+    >>> plan_parts(10, 4)
+    [(0, 3), (4, 7), (8, 9)]
+    >>> plan_parts(0, 4)
+    []
+    """
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def parallel_download(
+    read_range: ReadRangeT,
+    size: int,
+    destination: str,
+    transfer_config: TransferConfig,
+    version: Optional[str] = None,
+    progress_callback: Optional[ProgressCallbackT] = None,
+):
+    """Download an object of ``size`` bytes to ``destination`` with concurrent ranged reads.
+
+    ``version`` identifies the content of the remote object (e.g. its ETag); a
+    partial download is only resumed if the object's size and version did not
+    change.
+    """
+    partial = f"{destination}{PARTIAL_SUFFIX}"
+    journal = f"{destination}{JOURNAL_SUFFIX}"
+    parts = plan_parts(size, transfer_config.part_size)
+    header = f"{size} {transfer_config.part_size} {version or ''}"
+    completed = _read_journal(journal, header) if os.path.exists(partial) else set()
+    if completed:
+        log.debug(
+            "Resuming download to %s, %d of %d parts already transferred", destination, len(completed), len(parts)
+        )
+    else:
+        with open(journal, "w") as journal_fh:
+            journal_fh.write(f"{header}\n")
+        with open(partial, "wb") as partial_fh:
+            partial_fh.truncate(size)
+    lock = threading.Lock()
+    transferred = [sum(parts[i][1] - parts[i][0] + 1 for i in completed)]
+
+    def fetch(index):
+        start, end = parts[index]
+        with open(partial, "r+b") as partial_fh:
+            partial_fh.seek(start)
+            read_range(start, end, partial_fh)
+            written = partial_fh.tell() - start
+        if written != end - start + 1:
+            raise Exception(f"Expected {end - start + 1} bytes for range {start}-{end} of {destination}, got {written}")
+        with lock:
+            with open(journal, "a") as journal_fh:
+                journal_fh.write(f"{index}\n")
+            transferred[0] += written
+            if progress_callback:
+                progress_callback(transferred[0], size)
+
+    _run_all(fetch, [i for i in range(len(parts)) if i not in completed], transfer_config.concurrency)
+    os.replace(partial, destination)
+    unlink(journal, ignore_errors=True)
+
+
+def parallel_upload(
+    upload_part: UploadPartT,
+    source: str,
+    transfer_config: TransferConfig,
+    progress_callback: Optional[ProgressCallbackT] = None,
+) -> List[Any]:
+    """Upload ``source`` in concurrently transferred parts, returns the results of ``upload_part`` in part order."""
+    size = os.path.getsize(source)
+    part_size = max(transfer_config.part_size, MIN_UPLOAD_PART_SIZE, math.ceil(size / MAX_UPLOAD_PARTS))
+    parts = plan_parts(size, part_size)
+    lock = threading.Lock()
+    transferred = [0]
+
+    def send(index):
+        start, end = parts[index]
+        with open(source, "rb") as source_fh:
+            source_fh.seek(start)
+            data = source_fh.read(end - start + 1)
+        result = upload_part(index + 1, data)
+        with lock:
+            transferred[0] += len(data)
+            if progress_callback:
+                progress_callback(transferred[0], size)
+        return result
+
+    return _run_all(send, range(len(parts)), transfer_config.concurrency)
+
+
+def ranged_url_reader(url: str, timeout: int = DEFAULT_SOCKET_TIMEOUT) -> ReadRangeT:
+    """Build a ``read_range`` function fetching byte ranges of ``url`` (e.g. a presigned URL) over HTTP."""
+
+    def read_range(start, end, fileobj):
+        with requests.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise Exception(f"Server does not support range requests for {url}")
+            for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+                fileobj.write(chunk)
+
+    return read_range
+
+
+class BlockCache:
+    """Keep the most recently read fixed-size blocks of remote objects in memory.
+
+    Blocks are keyed on an object key that should include the version of the
+    object (e.g. its path and ETag), so that blocks of an object that has been
+    replaced are never served.
+    """
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE, max_blocks: int = DEFAULT_MAX_CACHED_BLOCKS):
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._blocks: "OrderedDict[Tuple[Hashable, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, key: Hashable, size: int, start: int, count: int, read_block: ReadBlockT) -> bytes:
+        """Read at most ``count`` bytes (all remaining bytes if negative) from ``start`` of an object of ``size`` bytes.
+
+        Blocks that are not cached are fetched with ``read_block``, adjacent
+        missing blocks are fetched with a single read.
+        """
+        end = size if count < 0 else min(start + count, size)
+        if start >= end:
+            return b""
+        first_block = start // self.block_size
+        last_block = (end - 1) // self.block_size
+        blocks: Dict[int, bytes] = {}
+        with self._lock:
+            for index in range(first_block, last_block + 1):
+                block = self._blocks.get((key, index))
+                if block is not None:
+                    self._blocks.move_to_end((key, index))
+                    blocks[index] = block
+        index = first_block
+        while index <= last_block:
+            if index in blocks:
+                index += 1
+                continue
+            run_end = index
+            while run_end + 1 <= last_block and run_end + 1 not in blocks:
+                run_end += 1
+            data = read_block(index * self.block_size, min((run_end + 1) * self.block_size, size) - 1)
+            for offset, block_index in enumerate(range(index, run_end + 1)):
+                blocks[block_index] = data[offset * self.block_size : (offset + 1) * self.block_size]
+            self._store(key, {i: blocks[i] for i in range(index, run_end + 1)})
+            index = run_end + 1
+        data = b"".join(blocks[i] for i in range(first_block, last_block + 1))
+        offset = first_block * self.block_size
+        return data[start - offset : end - offset]
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+    def _store(self, key: Hashable, blocks: Dict[int, bytes]):
+        with self._lock:
+            for index, block in blocks.items():
+                self._blocks[(key, index)] = block
+                self._blocks.move_to_end((key, index))
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+
+def _read_journal(journal: str, header: str) -> Set[int]:
+    try:
+        with open(journal) as journal_fh:
+            lines = journal_fh.read().splitlines()
+    except OSError:
+        return set()
+    if not lines or lines[0] != header:
+        # The remote object or the part size changed, start over
+        return set()
+    # A partially written last line is the sign of an interrupted journal update
+    return {int(line) for line in lines[1:] if line.isdigit()}
+
+
+def _run_all(func, items, concurrency):
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        # stop submitting new parts as soon as one of them failed
+        wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            future.cancel()
+        return [future.result() for future in futures]
@@ -1220,6 +1220,19 @@ class CreateHistoryPayload(Model):
     )
 
 
+class CopyHistoryPayload(Model):
+    name: Optional[str] = Field(
+        default=None,
+        title="Name",
+        description="The new history name, `Copy of '<history name>'` by default.",
+    )
+    all_datasets: bool = Field(
+        default=True,
+        title="All Datasets",
+        description="Whether to copy also deleted HDAs/HDCAs.",
+    )
+
+
 class CollectionElementIdentifier(Model):
     name: Optional[str] = Field(
         None,
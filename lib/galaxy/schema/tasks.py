@@ -95,6 +95,13 @@ class ImportModelStoreTaskRequest(BaseModel):
     model_store_format: Optional[ModelStoreFormat]
 
 
+class CopyHistoryTaskRequest(BaseModel):
+    history_id: int
+    user: RequestUser
+    name: str
+    all_datasets: bool
+
+
 class MaterializeDatasetInstanceTaskRequest(BaseModel):
     history_id: int
     user: RequestUser
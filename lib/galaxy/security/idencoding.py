@@ -1,7 +1,12 @@
 import codecs
 import collections
 import logging
+import threading
 from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
     Optional,
     Union,
 )
@@ -22,6 +27,8 @@ MAXIMUM_ID_SECRET_LENGTH = int(MAXIMUM_ID_SECRET_BITS / 8)
 KIND_TOO_LONG_MESSAGE = (
     "Galaxy coding error, keep encryption 'kinds' smaller to utilize more bites of randomness from id_secret values."
 )
+# Number of most recently encoded, and decoded, ids remembered for each kind
+ID_CACHE_SIZE = 10000
 
 
 class IdEncodingHelper:
@@ -32,17 +39,51 @@ class IdEncodingHelper:
 
         per_kind_id_secret_base = config.get("per_kind_id_secret_base", self.id_secret)
         self.id_ciphers_for_kind = _cipher_cache(per_kind_id_secret_base)
+        cache_size = config.get("id_cache_size", ID_CACHE_SIZE)
+        self.encoded_ids_for_kind: Dict[Optional[str], _LRUCache] = collections.defaultdict(
+            lambda: _LRUCache(cache_size)
+        )
+        self.decoded_ids_for_kind: Dict[Optional[str], _LRUCache] = collections.defaultdict(
+            lambda: _LRUCache(cache_size)
+        )
 
     def encode_id(self, obj_id, kind=None):
         if obj_id is None:
             raise galaxy.exceptions.MalformedId("Attempted to encode None id")
-        id_cipher = self.__id_cipher(kind)
+        encoded_ids = self.__encoded_ids(kind)
+        cacheable = type(obj_id) in (int, str)
+        if cacheable:
+            encoded_id = encoded_ids.get(obj_id)
+            if encoded_id is not None:
+                return encoded_id
         # Convert to bytes
         s = smart_str(obj_id)
         # Pad to a multiple of 8 with leading "!"
         s = (b"!" * (8 - len(s) % 8)) + s
         # Encrypt
-        return unicodify(codecs.encode(id_cipher.encrypt(s), "hex"))
+        encoded_id = self.__id_cipher(kind).encrypt(s).hex()
+        if cacheable:
+            encoded_ids.put(obj_id, encoded_id)
+        return encoded_id
+
+    def encode_ids(self, obj_ids: Iterable[Any], kind=None) -> List[str]:
+        """
+        Encode all ``obj_ids`` as ``encode_id`` does, encrypting those that have
+        not been encoded recently with a single call to the cipher.
+        """
+        obj_ids = list(obj_ids)
+        if any(obj_id is None for obj_id in obj_ids):
+            raise galaxy.exceptions.MalformedId("Attempted to encode None id")
+        encoded_ids = self.__encoded_ids(kind)
+        rval = [encoded_ids.get(obj_id) if type(obj_id) in (int, str) else None for obj_id in obj_ids]
+        missing = [i for i, encoded_id in enumerate(rval) if encoded_id is None]
+        if missing:
+            id_cipher = self.__id_cipher(kind)
+            for i, encoded_id in zip(missing, _encrypt_ids(id_cipher, [obj_ids[i] for i in missing])):
+                rval[i] = encoded_id
+                if type(obj_ids[i]) in (int, str):
+                    encoded_ids.put(obj_ids[i], encoded_id)
+        return rval  # type: ignore[return-value]
 
     def encode_dict_ids(self, a_dict, kind=None, skip_startswith=None):
         """
@@ -61,33 +102,58 @@ class IdEncodingHelper:
         with '_id' excluding `tool_id` which are consumed and produced as is
         via the API.
         """
+        to_encode: List[tuple] = []
+        rval = self._collect_all_ids(rval, recursive, to_encode)
+        if to_encode:
+            obj_ids = [i for _, _, value in to_encode for i in (value if isinstance(value, list) else [value])]
+            try:
+                encoded_ids = iter(self.encode_ids(obj_ids))
+            except Exception:
+                # encode each id on its own to leave the ones failing as they are
+                for container, key, value in to_encode:
+                    try:
+                        if isinstance(value, list):
+                            container[key] = [self.encode_id(i) for i in value]
+                        else:
+                            container[key] = self.encode_id(value)
+                    except Exception:
+                        pass  # probably already encoded
+            else:
+                for container, key, value in to_encode:
+                    if isinstance(value, list):
+                        container[key] = [next(encoded_ids) for _ in value]
+                    else:
+                        container[key] = next(encoded_ids)
+        return rval
+
+    def _collect_all_ids(self, rval, recursive, to_encode):
         if not isinstance(rval, dict):
             return rval
         for k, v in rval.items():
+            is_nested = recursive and isinstance(v, (dict, list))
             if (k == "id" or k.endswith("_id")) and v is not None and k not in ["tool_id", "external_id"]:
-                try:
-                    rval[k] = self.encode_id(v)
-                except Exception:
-                    pass  # probably already encoded
+                if not is_nested:
+                    to_encode.append((rval, k, v))
             if k.endswith("_ids") and isinstance(v, list):
-                try:
-                    o = []
-                    for i in v:
-                        o.append(self.encode_id(i))
-                    rval[k] = o
-                except Exception:
-                    pass
-            else:
-                if recursive and isinstance(v, dict):
-                    rval[k] = self.encode_all_ids(v, recursive)
-                elif recursive and isinstance(v, list):
-                    rval[k] = [self.encode_all_ids(el, True) for el in v]
+                if None not in v:
+                    to_encode.append((rval, k, v))
+            elif is_nested:
+                if isinstance(v, dict):
+                    rval[k] = self._collect_all_ids(v, recursive, to_encode)
+                else:
+                    rval[k] = [self._collect_all_ids(el, True, to_encode) for el in v]
         return rval
 
     def decode_id(self, obj_id, kind=None, object_name: Optional[str] = None):
+        decoded_ids = self.__decoded_ids(kind)
+        cacheable = type(obj_id) is str
+        if cacheable:
+            decoded_id = decoded_ids.get(obj_id)
+            if decoded_id is not None:
+                return decoded_id
         try:
             id_cipher = self.__id_cipher(kind)
-            return int(unicodify(id_cipher.decrypt(codecs.decode(obj_id, "hex"))).lstrip("!"))
+            decoded_id = int(unicodify(id_cipher.decrypt(codecs.decode(obj_id, "hex"))).lstrip("!"))
         except TypeError:
             raise galaxy.exceptions.MalformedId(
                 f"Malformed {object_name if object_name is not None else ''} id ( {obj_id} ) specified, unable to decode."
@@ -96,6 +162,39 @@ class IdEncodingHelper:
             raise galaxy.exceptions.MalformedId(
                 f"Wrong {object_name if object_name is not None else ''} id ( {obj_id} ) specified, unable to decode."
             )
+        if cacheable:
+            decoded_ids.put(obj_id, decoded_id)
+        return decoded_id
+
+    def decode_ids(self, obj_ids: Iterable[Any], kind=None, object_name: Optional[str] = None) -> List[int]:
+        """
+        Decode all ``obj_ids`` as ``decode_id`` does, decrypting those that have
+        not been decoded recently with a single call to the cipher.
+        """
+        obj_ids = list(obj_ids)
+        decoded_ids = self.__decoded_ids(kind)
+        rval = [decoded_ids.get(obj_id) if type(obj_id) is str else None for obj_id in obj_ids]
+        missing = [i for i, decoded_id in enumerate(rval) if decoded_id is None]
+        if missing:
+            try:
+                blocks = [codecs.decode(obj_ids[i], "hex") for i in missing]
+                if any(len(block) % 8 for block in blocks):
+                    raise ValueError("Input strings must be a multiple of 8 in length")
+                decrypted = self.__id_cipher(kind).decrypt(b"".join(blocks))
+                start = 0
+                missing_decoded = []
+                for block in blocks:
+                    end = start + len(block)
+                    missing_decoded.append(int(unicodify(decrypted[start:end]).lstrip("!")))
+                    start = end
+            except (TypeError, ValueError):
+                # decode each id on its own to raise the error of the first invalid one
+                return [self.decode_id(obj_id, kind=kind, object_name=object_name) for obj_id in obj_ids]
+            for i, decoded_id in zip(missing, missing_decoded):
+                rval[i] = decoded_id
+                if type(obj_ids[i]) is str:
+                    decoded_ids.put(obj_ids[i], decoded_id)
+        return rval  # type: ignore[return-value]
 
     def encode_guid(self, session_key):
         # Session keys are strings
@@ -129,6 +228,12 @@ class IdEncodingHelper:
             id_cipher = self.id_ciphers_for_kind[kind]
         return id_cipher
 
+    def __encoded_ids(self, kind) -> "_LRUCache":
+        return self.encoded_ids_for_kind[kind or None]
+
+    def __decoded_ids(self, kind) -> "_LRUCache":
+        return self.decoded_ids_for_kind[kind or None]
+
 
 class _cipher_cache(collections.defaultdict):
     def __init__(self, secret_base):
@@ -137,7 +242,49 @@ class _cipher_cache(collections.defaultdict):
     def __missing__(self, key):
         assert len(key) < 15, KIND_TOO_LONG_MESSAGE
         secret = f"{self.secret_base}__{key}"
-        return Blowfish.new(_last_bits(secret), mode=Blowfish.MODE_ECB)
+        cipher = self[key] = Blowfish.new(_last_bits(secret), mode=Blowfish.MODE_ECB)
+        return cipher
+
+
+class _LRUCache:
+    """Mapping keeping the ``size`` most recently used items, safe to share between threads."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: "collections.OrderedDict[Any, Any]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+def _encrypt_ids(id_cipher, obj_ids: Iterable[Any]) -> List[str]:
+    """Encrypt ``obj_ids`` with a single call to ``id_cipher``, returning them hex encoded."""
+    blocks = []
+    for obj_id in obj_ids:
+        # Convert to bytes
+        s = smart_str(obj_id)
+        # Pad to a multiple of 8 with leading "!"
+        blocks.append((b"!" * (8 - len(s) % 8)) + s)
+    encrypted = id_cipher.encrypt(b"".join(blocks)).hex()
+    encoded_ids = []
+    start = 0
+    for block in blocks:
+        end = start + 2 * len(block)
+        encoded_ids.append(encrypted[start:end])
+        start = end
+    return encoded_ids
 
 
 def _last_bits(secret):
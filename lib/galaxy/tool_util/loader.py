@@ -1,4 +1,5 @@
 from galaxy.util.xml_macros import (
+    expand_references,
     imported_macro_paths,
     load,
     load_with_references,
@@ -11,6 +12,7 @@ load_tool_with_refereces = load_with_references
 raw_tool_xml_tree = raw_xml_tree
 
 __all__ = (
+    "expand_references",
     "imported_macro_paths",
     "load_tool",
     "load_tool_with_refereces",
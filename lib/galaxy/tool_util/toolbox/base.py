@@ -37,6 +37,10 @@ from galaxy.util.dictifiable import Dictifiable
 from .filters import FilterFactory
 from .integrated_panel import ManagesIntegratedToolPanelMixin
 from .lineages import LineageMap
+from .loading import (
+    ToolLoadTimings,
+    ToolSourcePreloader,
+)
 from .panel import (
     panel_item_types,
     ToolPanelElements,
@@ -172,6 +176,8 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         self._tool_config_watcher = self.app.watchers.tool_config_watcher
         self._filter_factory = FilterFactory(self)
         self._tool_tag_manager = self.tool_tag_manager()
+        self._tool_load_timings = ToolLoadTimings()
+        self._tool_source_preloader: Optional[ToolSourcePreloader] = None
         self._init_tools_from_configs(config_filenames)
 
         if self.app.name == "galaxy" and self._integrated_tool_panel_config_has_contents:
@@ -229,6 +235,13 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
     def create_dynamic_tool(self, dynamic_tool):
         raise NotImplementedError()
 
+    def load_tool_source(self, config_file, tool_cache_data_dir=None):
+        """Return the tool source with expanded macros for ``config_file``.
+
+        Must be safe to call from several threads when parallel tool loading is enabled.
+        """
+        raise NotImplementedError()
+
     def can_load_config_file(self, config_filename):
         return True
 
@@ -254,23 +267,36 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
                 ]
                 config_filenames.remove(config_filename)
                 config_filenames.extend(directory_config_files)
-        for config_filename in config_filenames:
-            if not self.can_load_config_file(config_filename):
-                continue
-            try:
-                self._init_tools_from_config(config_filename)
-            except etree.ParseError:
-                # Occasionally we experience "Missing required parameter 'shed_tool_conf'."
-                # This happens if parsing the shed_tool_conf fails, so we just sleep a second and try again.
-                # TODO: figure out why this fails occasionally (try installing hundreds of tools in batch ...).
-                time.sleep(1)
+        tool_loading_workers = getattr(self.app.config, "tool_loading_workers", 0) or 0
+        if tool_loading_workers > 1:
+            self._tool_source_preloader = ToolSourcePreloader(self.load_tool_source, tool_loading_workers)
+        try:
+            for config_filename in config_filenames:
+                if not self.can_load_config_file(config_filename):
+                    continue
                 try:
                     self._init_tools_from_config(config_filename)
+                except etree.ParseError:
+                    # Occasionally we experience "Missing required parameter 'shed_tool_conf'."
+                    # This happens if parsing the shed_tool_conf fails, so we just sleep a second and try again.
+                    # TODO: figure out why this fails occasionally (try installing hundreds of tools in batch ...).
+                    time.sleep(1)
+                    try:
+                        self._init_tools_from_config(config_filename)
+                    except Exception:
+                        raise
                 except Exception:
-                    raise
-            except Exception:
-                log.exception("Error loading tools defined in config %s", config_filename)
-        log.debug("Reading tools from config files finished %s", execution_timer)
+                    log.exception("Error loading tools defined in config %s", config_filename)
+        finally:
+            if self._tool_source_preloader:
+                self._tool_source_preloader.shutdown()
+                self._tool_source_preloader = None
+        log.debug(
+            "Reading tools from config files finished %s (%s, %s)",
+            execution_timer,
+            "%d loading threads" % tool_loading_workers if tool_loading_workers > 1 else "serial",
+            self._tool_load_timings,
+        )
 
     def _init_tools_from_config(self, config_filename):
         """
@@ -321,7 +347,10 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         tool_path = self.__resolve_tool_path(tool_path, config_filename)
         # Only load the panel_dict under certain conditions.
         load_panel_dict = not self._integrated_tool_panel_config_has_contents
-        for item in tool_conf_source.parse_items():
+        items = tool_conf_source.parse_items()
+        if self._tool_source_preloader:
+            self._preload_tool_sources(items, tool_path, tool_cache_data_dir)
+        for item in items:
             index = self._index
             self._index += 1
             if parsing_shed_tool_conf:
@@ -345,6 +374,30 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
                     config_elems=config_elems,
                 )
                 self._dynamic_tool_confs.append(shed_tool_conf_dict)
+        if self._tool_source_preloader:
+            # Forget the sources of tools that ended up not being loaded
+            self._tool_source_preloader.discard()
+
+    def _preload_tool_sources(self, items, tool_path, tool_cache_data_dir):
+        """Start loading the sources of the tools in ``items`` in the preloader's threads.
+
+        The tools are then constructed and inserted into the panel in order by ``load_item``.
+        """
+        for item in items:
+            item = ensure_tool_conf_item(item)
+            if item.type == "section":
+                self._preload_tool_sources(item.items, tool_path, tool_cache_data_dir)
+            elif item.type == "tool":
+                concrete_path = self._tool_item_path(item, tool_path)
+                if os.path.exists(concrete_path) and not self.load_tool_from_cache(concrete_path):
+                    self._tool_source_preloader.preload(concrete_path, tool_cache_data_dir=tool_cache_data_dir)
+
+    def _get_tool_source(self, config_file, tool_cache_data_dir=None):
+        """Return the tool source for ``config_file``, preloaded if parallel tool loading is enabled."""
+        preloaded = self._tool_source_preloader and self._tool_source_preloader.pop(config_file)
+        if preloaded:
+            return preloaded.result()
+        return self.load_tool_source(config_file, tool_cache_data_dir=tool_cache_data_dir)
 
     def _get_tool_by_uuid(self, tool_uuid):
         if tool_uuid in self._tools_by_uuid:
@@ -824,10 +877,8 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         tool_cache_data_dir=None,
     ):
         try:
-            path_template = item.get("file")
-            template_kwds = self._path_template_kwds()
-            path = string.Template(path_template).safe_substitute(**template_kwds)
-            concrete_path = os.path.join(tool_path, path)
+            path = item.get("file")
+            concrete_path = self._tool_item_path(item, tool_path)
             if not os.path.exists(concrete_path):
                 # This is a lot faster than attempting to load a non-existing tool
                 raise OSError(ENOENT, os.strerror(ENOENT))
@@ -873,9 +924,11 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
                     tool.version = item.elem.find("version").text
                 if item.has_elem:
                     self._tool_tag_manager.handle_tags(tool.id, item.elem)
-                self.__add_tool(tool, load_panel_dict, panel_dict)
+                with self._tool_load_timings.phase("panel insert"):
+                    self.__add_tool(tool, load_panel_dict, panel_dict)
             # Always load the tool into the integrated_panel_dict, or it will not be included in the integrated_tool_panel.xml file.
-            integrated_panel_dict.update_or_append(index, key, tool)
+            with self._tool_load_timings.phase("panel insert"):
+                integrated_panel_dict.update_or_append(index, key, tool)
             # If labels were specified in the toolbox config, attach them to
             # the tool.
             labels = item.labels
@@ -887,6 +940,12 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         except Exception:
             log.exception("Error reading tool from path: %s", path)
 
+    def _tool_item_path(self, item, tool_path):
+        path_template = item.get("file")
+        template_kwds = self._path_template_kwds()
+        path = string.Template(path_template).safe_substitute(**template_kwds)
+        return os.path.join(tool_path, path)
+
     def get_tool_repository_from_xml_item(self, elem, path):
         tool_shed = elem.find("tool_shed").text
         repository_name = elem.find("repository_name").text
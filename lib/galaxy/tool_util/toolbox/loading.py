@@ -0,0 +1,78 @@
+"""Helpers for loading the tools of a toolbox.
+
+Loading a tool consists of parsing its XML, expanding its macros, constructing
+the ``Tool`` and inserting it into the tool panel. Parsing and macro expansion
+don't touch the toolbox, :class:`ToolSourcePreloader` runs them for all tools
+of a tool configuration file in a thread pool (lxml releases the GIL while
+parsing) ahead of the toolbox constructing and registering the tools one by
+one in the order of the configuration file.
+"""
+import threading
+import time
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
+from contextlib import contextmanager
+from typing import (
+    Callable,
+    Dict,
+    Optional,
+)
+
+TOOL_LOADING_PHASES = ("parse", "macro expand", "tool construct", "panel insert")
+
+
+class ToolLoadTimings:
+    """Accumulate the time spent in each phase of loading tools.
+
+    Phases may run concurrently in several threads, the times of a phase are
+    summed up over all threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds: Dict[str, float] = dict.fromkeys(TOOL_LOADING_PHASES, 0.0)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._seconds[name] += elapsed
+
+    def seconds(self, name: str) -> float:
+        return self._seconds[name]
+
+    def __str__(self):
+        return ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self._seconds.items())
+
+
+class ToolSourcePreloader:
+    """Load tool sources in a pool of threads ahead of the toolbox requesting them."""
+
+    def __init__(self, load_tool_source: Callable, workers: int):
+        self._load_tool_source = load_tool_source
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ToolSourcePreloader")
+        self._loads: Dict[str, Future] = {}
+
+    def preload(self, config_file: str, **kwds):
+        if config_file not in self._loads:
+            self._loads[config_file] = self._executor.submit(self._load_tool_source, config_file, **kwds)
+
+    def pop(self, config_file: str) -> Optional[Future]:
+        """Return the load of ``config_file`` started by :meth:`preload` and forget it."""
+        return self._loads.pop(config_file, None)
+
+    def discard(self):
+        """Cancel and forget all loads that have not been requested."""
+        for load in self._loads.values():
+            load.cancel()
+        self._loads.clear()
+
+    def shutdown(self):
+        self.discard()
+        self._executor.shutdown(wait=True)
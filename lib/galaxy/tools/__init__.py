@@ -46,6 +46,7 @@ from galaxy.tool_util.deps import (
 )
 from galaxy.tool_util.fetcher import ToolLocationFetcher
 from galaxy.tool_util.loader import (
+    expand_references,
     imported_macro_paths,
     raw_tool_xml_tree,
     template_macro_params,
@@ -380,6 +381,7 @@ class ToolBox(AbstractToolBox):
         self._reload_count = 0
         self.tool_location_fetcher = ToolLocationFetcher()
         self.cache_regions = {}
+        self._cache_regions_lock = threading.Lock()
         # This is here to deal with the old default value, which doesn't make
         # sense in an "installed Galaxy" world.
         # FIXME: ./
@@ -478,20 +480,24 @@ class ToolBox(AbstractToolBox):
         # Deprecated method, TODO - eliminate calls to this in test/.
         return self._tools_by_id
 
-    def get_cache_region(self, tool_cache_data_dir):
-        if self.app.config.enable_tool_document_cache:
-            if tool_cache_data_dir not in self.cache_regions:
-                self.cache_regions[tool_cache_data_dir] = ToolDocumentCache(cache_dir=tool_cache_data_dir)
-            return self.cache_regions[tool_cache_data_dir]
-
     def create_tool(self, config_file, tool_cache_data_dir=None, **kwds):
+        tool_source = self._get_tool_source(config_file, tool_cache_data_dir=tool_cache_data_dir)
+        with self._tool_load_timings.phase("tool construct"):
+            tool = self._create_tool_from_source(tool_source, config_file=config_file, **kwds)
+            if not self.app.config.delay_tool_initialization:
+                tool.assert_finalized(raise_if_invalid=True)
+        return tool
+
+    def load_tool_source(self, config_file, tool_cache_data_dir=None):
         cache = self.get_cache_region(tool_cache_data_dir or self.app.config.tool_cache_data_dir)
         if config_file.endswith(".xml") and cache and not cache.disabled:
             tool_document = cache.get(config_file)
             if tool_document:
+                with self._tool_load_timings.phase("parse"):
+                    xml_tree = etree.ElementTree(etree.fromstring(tool_document["document"].encode("utf-8")))
                 tool_source = self.get_expanded_tool_source(
                     config_file=config_file,
-                    xml_tree=etree.ElementTree(etree.fromstring(tool_document["document"].encode("utf-8"))),
+                    xml_tree=xml_tree,
                     macro_paths=tool_document["macro_paths"],
                 )
             else:
@@ -499,13 +505,24 @@ class ToolBox(AbstractToolBox):
                 cache.set(config_file, tool_source)
         else:
             tool_source = self.get_expanded_tool_source(config_file)
-        tool = self._create_tool_from_source(tool_source, config_file=config_file, **kwds)
-        if not self.app.config.delay_tool_initialization:
-            tool.assert_finalized(raise_if_invalid=True)
-        return tool
+        return tool_source
+
+    def get_cache_region(self, tool_cache_data_dir):
+        if self.app.config.enable_tool_document_cache:
+            with self._cache_regions_lock:
+                if tool_cache_data_dir not in self.cache_regions:
+                    self.cache_regions[tool_cache_data_dir] = ToolDocumentCache(cache_dir=tool_cache_data_dir)
+                return self.cache_regions[tool_cache_data_dir]
 
     def get_expanded_tool_source(self, config_file, **kwargs):
         try:
+            if "xml_tree" not in kwargs and config_file.endswith(".xml") and "://" not in config_file:
+                # Same as get_tool_source would do, but timing each phase
+                with self._tool_load_timings.phase("parse"):
+                    xml_tree = raw_tool_xml_tree(config_file)
+                with self._tool_load_timings.phase("macro expand"):
+                    kwargs["macro_paths"] = expand_references(xml_tree, config_file)
+                kwargs["xml_tree"] = xml_tree
             return get_tool_source(
                 config_file,
                 enable_beta_formats=getattr(self.app.config, "enable_beta_tool_formats", False),
@@ -2048,6 +2065,7 @@ class Tool(Dictifiable):
         preferred_object_store_id=None,
         flush_job=True,
         skip=False,
+        defer_history_additions=False,
     ):
         """
         Return a pair with whether execution is successful as well as either
@@ -2067,6 +2085,7 @@ class Tool(Dictifiable):
                 preferred_object_store_id=preferred_object_store_id,
                 flush_job=flush_job,
                 skip=skip,
+                defer_history_additions=defer_history_additions,
             )
             job = rval[0]
             out_data = rval[1]
@@ -129,15 +129,18 @@ class DefaultToolAction(ToolAction):
                 # Checked security of whole collection all at once if mapping over this input, else
                 # fetch dataset details for this input from the database.
                 if collection_info and collection_info.is_mapped_over(input_name):
-                    action_tuples = collection_info.map_over_action_tuples(input_name)
-                    if not trans.user_is_admin and not trans.app.security_agent.can_access_datasets(
-                        current_user_roles, action_tuples
-                    ):
-                        raise ItemAccessibilityException(
-                            "User does not have permission to use a dataset provided for input."
-                        )
-                    for action, role_id in action_tuples:
-                        record_permission(action, role_id)
+                    if input_name not in collection_info.permissions:
+                        # First job of the map-over, later jobs reuse the aggregated permissions
+                        action_tuples = collection_info.map_over_action_tuples(input_name)
+                        if not trans.user_is_admin and not trans.app.security_agent.can_access_datasets(
+                            current_user_roles, action_tuples
+                        ):
+                            raise ItemAccessibilityException(
+                                "User does not have permission to use a dataset provided for input."
+                            )
+                    for action, role_ids in collection_info.map_over_permissions(input_name).items():
+                        for role_id in role_ids:
+                            record_permission(action, role_id)
                 else:
                     if not trans.user_is_admin and not trans.app.security_agent.can_access_dataset(
                         current_user_roles, data.dataset
@@ -370,11 +373,14 @@ class DefaultToolAction(ToolAction):
         preferred_object_store_id=None,
         flush_job=True,
         skip=False,
+        defer_history_additions=False,
     ):
         """
         Executes a tool, creating job and tool outputs, associating them, and
         submitting the job to the job queue. If history is not specified, use
-        trans.history as destination for tool's output datasets.
+        trans.history as destination for tool's output datasets. If
+        ``defer_history_additions`` is set the outputs are only staged for addition,
+        the caller is responsible for adding the pending items to the history.
         """
         trans.check_user_activation()
         incoming = incoming or {}
@@ -635,7 +641,8 @@ class DefaultToolAction(ToolAction):
             if name not in incoming and name not in child_dataset_names:
                 # don't add already existing datasets, i.e. async created
                 history.stage_addition(data)
-        history.add_pending_items(set_output_hid=set_output_hid)
+        if not defer_history_additions:
+            history.add_pending_items(set_output_hid=set_output_hid)
 
         log.info(add_datasets_timer)
         job_setup_timer = ExecutionTimer()
@@ -1,20 +1,32 @@
 import json
 import logging
 import os
-import shutil
 import sqlite3
-import tempfile
 import zlib
 from threading import Lock
-
-from sqlitedict import SqliteDict
+from typing import (
+    Dict,
+    Optional,
+)
+from urllib.parse import quote
 
 from galaxy.util import unicodify
 from galaxy.util.hash_util import md5_hash_file
 
 log = logging.getLogger(__name__)
 
-CURRENT_TOOL_CACHE_VERSION = 0
+CURRENT_TOOL_CACHE_VERSION = 1
+TOOL_DOCUMENT_CACHE_FILENAME = "tool_documents.sqlite"
+TOOL_DOCUMENT_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_document (
+    config_file TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    tool_cache_version INTEGER NOT NULL,
+    document BLOB NOT NULL
+)
+"""
+# Seconds to wait for another process writing to the cache
+CACHE_BUSY_TIMEOUT = 5
 
 
 def encoder(obj):
@@ -26,104 +38,135 @@ def decoder(obj):
 
 
 class ToolDocumentCache:
+    """
+    Cache expanded tool XML documents, so that macros don't need to be expanded
+    again when Galaxy restarts.
+
+    Each tool is a row of a SQLite database in WAL mode, entries are committed
+    as they are added and Galaxy processes sharing the cache read it while
+    another one writes to it. Entries are validated against the content hashes
+    of the tool file and of the macro files it imports, the hash of a macro
+    file shared by many tools is only computed once per cache instance.
+    """
+
     def __init__(self, cache_dir):
         self.cache_dir = cache_dir
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
-        self.cache_file = os.path.join(self.cache_dir, "cache.sqlite")
-        self.writeable_cache_file = None
-        self._cache = None
+        self.cache_file = os.path.join(self.cache_dir, TOOL_DOCUMENT_CACHE_FILENAME)
         self.disabled = False
-        self._get_cache(create_if_necessary=True)
+        self._lock = Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writeable = False
+        # macro path -> content hash
+        self._macro_hashes: Dict[str, Optional[str]] = {}
+        self._open()
 
-    def close(self):
-        self._cache and self._cache.close()
+    @property
+    def cache_file_is_writeable(self):
+        if os.path.exists(self.cache_file):
+            return os.access(self.cache_file, os.W_OK)
+        return os.access(self.cache_dir, os.W_OK)
 
-    def _get_cache(self, flag="r", create_if_necessary=False):
+    def _open(self):
         try:
-            if create_if_necessary and not os.path.exists(self.cache_file):
-                # Create database if necessary using 'c' flag
-                self._cache = SqliteDict(self.cache_file, flag="c", encode=encoder, decode=decoder, autocommit=False)
-                if flag == "r":
-                    self._cache.flag = flag
+            self._writeable = self.cache_file_is_writeable
+            if self._writeable:
+                connection = sqlite3.connect(
+                    self.cache_file, timeout=CACHE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.execute(TOOL_DOCUMENT_CACHE_SCHEMA)
             else:
-                cache_file = self.writeable_cache_file.name if self.writeable_cache_file else self.cache_file
-                self._cache = SqliteDict(cache_file, flag=flag, encode=encoder, decode=decoder, autocommit=False)
-        except sqlite3.OperationalError:
+                # A cache shipped on read-only storage, entries are trusted without validation
+                connection = sqlite3.connect(
+                    f"file:{quote(self.cache_file)}?immutable=1", uri=True, check_same_thread=False
+                )
+                connection.execute("SELECT 1 FROM tool_document LIMIT 1")
+            self._connection = connection
+            self.disabled = False
+        except sqlite3.Error:
             log.warning("Tool document cache unavailable")
-            self._cache = None
+            self._connection = None
             self.disabled = True
 
-    @property
-    def cache_file_is_writeable(self):
-        return os.access(self.cache_file, os.W_OK)
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
 
     def reopen_ro(self):
-        self._get_cache(flag="r")
-        self.writeable_cache_file = None
+        """Reopen the cache, e.g. after forking."""
+        self.close()
+        self._open()
+
+    def persist(self):
+        """Entries are committed as they are added, kept for compatibility with the toolbox API."""
 
     def get(self, config_file):
         try:
-            tool_document = self._cache.get(config_file)
-        except sqlite3.OperationalError:
+            with self._lock:
+                if self._connection is None:
+                    return None
+                row = self._connection.execute(
+                    "SELECT content_hash, document FROM tool_document WHERE config_file = ? AND tool_cache_version = ?",
+                    (config_file, CURRENT_TOOL_CACHE_VERSION),
+                ).fetchone()
+        except sqlite3.Error:
             log.debug("Tool document cache unavailable")
             return None
-        if not tool_document:
+        if row is None:
             return None
-        if tool_document.get("tool_cache_version") != CURRENT_TOOL_CACHE_VERSION:
-            return None
-        if self.cache_file_is_writeable:
-            for path, modtime in tool_document["paths_and_modtimes"].items():
-                if os.path.getmtime(path) != modtime:
+        content_hash, document = row
+        tool_document = decoder(document)
+        if self._writeable:
+            if md5_hash_file(config_file) != content_hash:
+                return None
+            for path, macro_hash in tool_document["macro_hashes"].items():
+                if self._macro_hash(path) != macro_hash:
                     return None
         return tool_document
 
-    def _make_writable(self):
-        if not self.writeable_cache_file:
-            self.writeable_cache_file = tempfile.NamedTemporaryFile(
-                dir=self.cache_dir, suffix="cache.sqlite.tmp", delete=False
-            )
-            if os.path.exists(self.cache_file):
-                shutil.copy(self.cache_file, self.writeable_cache_file.name)
-            self._get_cache(flag="c")
-
-    def persist(self):
-        if self.writeable_cache_file:
-            self._cache.commit()
-            os.rename(self.writeable_cache_file.name, self.cache_file)
-            self.reopen_ro()
-
     def set(self, config_file, tool_source):
+        if not self._writeable or self._connection is None:
+            return
+        to_persist = {
+            "document": tool_source.to_string(),
+            "macro_paths": tool_source.macro_paths,
+            "macro_hashes": {path: self._macro_hash(path) for path in tool_source.macro_paths},
+        }
         try:
-            if self.cache_file_is_writeable:
-                self._make_writable()
-                to_persist = {
-                    "document": tool_source.to_string(),
-                    "macro_paths": tool_source.macro_paths,
-                    "paths_and_modtimes": tool_source.paths_and_modtimes(),
-                    "tool_cache_version": CURRENT_TOOL_CACHE_VERSION,
-                }
-                try:
-                    self._cache[config_file] = to_persist
-                except RuntimeError:
-                    log.debug("Tool document cache not writeable")
-        except sqlite3.OperationalError:
-            log.debug("Tool document cache unavailable")
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO tool_document VALUES (?, ?, ?, ?)",
+                    (config_file, md5_hash_file(config_file), CURRENT_TOOL_CACHE_VERSION, encoder(to_persist)),
+                )
+        except sqlite3.Error:
+            log.debug("Tool document cache not writeable")
 
     def delete(self, config_file):
-        if self.cache_file_is_writeable:
-            self._make_writable()
-            try:
-                del self._cache[config_file]
-            except (KeyError, RuntimeError):
-                pass
-
-    def __del__(self):
-        if self.writeable_cache_file:
-            try:
-                os.unlink(self.writeable_cache_file.name)
-            except Exception:
-                pass
+        if not self._writeable or self._connection is None:
+            return
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT document FROM tool_document WHERE config_file = ?", (config_file,)
+                ).fetchone()
+                self._connection.execute("DELETE FROM tool_document WHERE config_file = ?", (config_file,))
+        except sqlite3.Error:
+            log.debug("Tool document cache not writeable")
+            return
+        if row is not None:
+            # The tool may have been removed because one of its macros changed
+            for path in decoder(row[0])["macro_paths"]:
+                self._macro_hashes.pop(path, None)
+
+    def _macro_hash(self, path):
+        if path not in self._macro_hashes:
+            self._macro_hashes[path] = md5_hash_file(path)
+        return self._macro_hashes[path]
 
 
 class ToolCache:
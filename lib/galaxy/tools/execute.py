@@ -124,6 +124,8 @@ def execute(
             preferred_object_store_id=preferred_object_store_id,
             flush_job=False,
             skip=skip,
+            # Outputs of all jobs are added to the history at once below, allocating their hids in a single query
+            defer_history_additions=rerun_remap_job_id is None,
         )
         if job:
             log.debug(job_timer.to_str(tool_id=tool.id, job_id=job.id))
@@ -158,6 +160,7 @@ def execute(
     has_remaining_jobs = False
     execution_slice = None
     job_datasets: Dict[str, List[model.DatasetInstance]] = {}  # job: list of dataset instances created by job
+    histories: List[model.History] = []  # histories with outputs pending addition
 
     for i, execution_slice in enumerate(execution_tracker.new_execution_slices()):
         if max_num_jobs is not None and jobs_executed >= max_num_jobs:
@@ -167,6 +170,8 @@ def execute(
             skip = execution_slice.param_combination.pop("__when_value__", None) is False
             execute_single_job(execution_slice, completed_jobs[i], skip=skip)
             history = execution_slice.history or history
+            if history not in histories:
+                histories.append(history)
             jobs_executed += 1
 
     if job_datasets:
@@ -174,8 +179,8 @@ def execute(
             for dataset_instance in datasets:
                 dataset_instance.dataset.job = job
 
-    if execution_slice:
-        history.add_pending_items()
+    for pending_history in histories:
+        pending_history.add_pending_items()
     # Make sure collections, implicit jobs etc are flushed even if there are no precreated output datasets
     trans.sa_session.flush()
 
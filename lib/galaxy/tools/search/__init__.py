@@ -24,6 +24,7 @@ Filters - various filters are available for processing content as the index is
     stemming -> stem; opened -> open; philosophy -> philosoph.
 
 """
+import json
 import logging
 import os
 import re
@@ -45,6 +46,7 @@ from whoosh.fields import (
     Schema,
     TEXT,
 )
+from whoosh.index import LockError
 from whoosh.qparser import (
     MultifieldParser,
     OrGroup,
@@ -54,14 +56,17 @@ from whoosh.scoring import (
     Frequency,
     MultiWeighting,
 )
-from whoosh.writing import AsyncWriter
 
 from galaxy.config import GalaxyAppConfiguration
 from galaxy.util import ExecutionTimer
+from galaxy.util.hash_util import md5_hash_str
 from galaxy.web.framework.helpers import to_unicode
 
 log = logging.getLogger(__name__)
 
+# How long to wait for another Galaxy process to finish writing the shared index
+INDEX_WRITE_LOCK_TIMEOUT = 300.0
+
 CanConvertToFloat = Union[str, int, float]
 CanConvertToInt = Union[str, int, float]
 
@@ -136,6 +141,8 @@ class ToolPanelViewSearch:
         schema_conf = {
             # The stored ID field is not searchable
             "id": ID(stored=True, unique=True),
+            # Hash of the tool version and the document, used to skip tools that are indexed already
+            "hash": ID(stored=True),
             # This exact field is searchable by exact matches only
             "id_exact": TEXT(
                 field_boost=(config.tool_id_boost * config.tool_name_exact_multiplier),
@@ -196,36 +203,76 @@ class ToolPanelViewSearch:
         return get_or_create_index(self.index_dir, self.schema)
 
     def build_index(self, tool_cache, toolbox, index_help: bool = True) -> None:
-        """Prepare search index for tools loaded in toolbox.
+        """Update search index for tools loaded in toolbox.
 
         Use `tool_cache` to determine which tools need indexing and which
-        should be removed.
+        should be removed. Only documents whose tool version or content
+        changed are written, all changes are committed at once. The index
+        directory is shared by all Galaxy processes: the hashes of the indexed
+        documents are compared without taking the index lock, and the lock is
+        only taken if documents need to be added or removed.
         """
         log.debug(f"Starting to build toolbox index of panel {self.panel_view_id}.")
         execution_timer = ExecutionTimer()
 
         with self.index.reader() as reader:
-            # Index ocasionally contains empty stored fields
-            self.indexed_tool_ids = {f["id"] for f in reader.all_stored_fields() if f}
-
+            indexed_hashes = self._indexed_hashes(reader)
+        self.indexed_tool_ids = set(indexed_hashes)
+        # tool id -> (document without help, raw help, hash of both)
+        docs = {}
+        for tool in self._get_tool_list(toolbox, tool_cache):
+            add_doc_kwds = self._create_doc(tool=tool, index_help=False)
+            if add_doc_kwds:
+                raw_help = tool.raw_help if index_help else None
+                docs[add_doc_kwds["id"]] = (add_doc_kwds, raw_help, self._doc_hash(tool, add_doc_kwds, raw_help))
         tool_ids_to_remove = self._get_tools_to_remove(tool_cache)
-        tools_to_index = self._get_tool_list(
-            toolbox,
-            tool_cache,
-        )
 
-        with AsyncWriter(self.index) as writer:
-            for tool_id in tool_ids_to_remove:
-                writer.delete_by_term("id", tool_id)
-            for tool in tools_to_index:
-                add_doc_kwds = self._create_doc(
-                    tool=tool,
-                    index_help=index_help,
+        def pending_changes(indexed_hashes):
+            return (
+                [tool_id for tool_id in tool_ids_to_remove if tool_id in indexed_hashes and tool_id not in docs],
+                [tool_id for tool_id, (_, _, doc_hash) in docs.items() if indexed_hashes.get(tool_id) != doc_hash],
+            )
+
+        tool_ids_to_remove, tool_ids_to_index = pending_changes(indexed_hashes)
+        if tool_ids_to_remove or tool_ids_to_index:
+            try:
+                writer = self.index.writer(timeout=INDEX_WRITE_LOCK_TIMEOUT)
+            except LockError:
+                log.warning(
+                    f"Toolbox index of panel {self.panel_view_id} is locked by another process, not updating it"
                 )
-                # Add tool document to index (or overwrite if existing)
-                writer.update_document(**add_doc_kwds)
+                return
+            try:
+                # Another process may have written the same changes while this one waited for the lock
+                with writer.reader() as reader:
+                    tool_ids_to_remove, tool_ids_to_index = pending_changes(self._indexed_hashes(reader))
+                for tool_id in tool_ids_to_remove:
+                    writer.delete_by_term("id", tool_id)
+                for tool_id in tool_ids_to_index:
+                    add_doc_kwds, raw_help, doc_hash = docs[tool_id]
+                    self._add_help(add_doc_kwds, raw_help)
+                    add_doc_kwds["hash"] = doc_hash
+                    # Add tool document to index (or overwrite if existing)
+                    writer.update_document(**add_doc_kwds)
+            except Exception:
+                writer.cancel()
+                raise
+            if tool_ids_to_remove or tool_ids_to_index:
+                writer.commit()
+            else:
+                writer.cancel()
+
+        log.debug(
+            f"Toolbox index of panel {self.panel_view_id} finished {execution_timer}"
+            f" ({len(tool_ids_to_index)} tools indexed, {len(tool_ids_to_remove)} removed)"
+        )
 
-        log.debug(f"Toolbox index of panel {self.panel_view_id}" f" finished {execution_timer}")
+    def _indexed_hashes(self, reader) -> Dict[str, str]:
+        # Index ocasionally contains empty stored fields
+        return {f["id"]: f.get("hash") for f in reader.all_stored_fields() if f}
+
+    def _doc_hash(self, tool, add_doc_kwds, raw_help) -> str:
+        return md5_hash_str(json.dumps([tool.version, add_doc_kwds, raw_help], sort_keys=True))
 
     def _get_tools_to_remove(self, tool_cache) -> list:
         """Return list of tool IDs to be removed from index."""
@@ -249,7 +296,7 @@ class ToolPanelViewSearch:
         """Return list of tools to add and remove from index."""
         tools_to_index = []
 
-        for tool_id in tool_cache._new_tool_ids - self.indexed_tool_ids:
+        for tool_id in tool_cache._new_tool_ids:
             tool = toolbox.get_tool(tool_id)
             if tool and tool.is_latest_version and toolbox.panel_has_tool(tool, self.panel_view_id):
                 if tool.hidden:
@@ -301,18 +348,20 @@ class ToolPanelViewSearch:
         if tool.labels:
             add_doc_kwds["labels"] = to_unicode(" ".join(tool.labels))
         if index_help:
-            raw_help = tool.raw_help
-            if raw_help:
-                try:
-                    add_doc_kwds["help"] = to_unicode(raw_help)
-                except Exception:
-                    # Don't fail to build index when help fails to parse
-                    pass
+            self._add_help(add_doc_kwds, tool.raw_help)
 
         add_doc_kwds["name_exact"] = add_doc_kwds["name"]
 
         return add_doc_kwds
 
+    def _add_help(self, add_doc_kwds: Dict[str, str], raw_help) -> None:
+        if raw_help:
+            try:
+                add_doc_kwds["help"] = to_unicode(raw_help)
+            except Exception:
+                # Don't fail to build index when help fails to parse
+                pass
+
     def search(
         self,
         q: str,
@@ -20,11 +20,20 @@ def load_with_references(path):
     referenced files that were imported (macros).
     """
     tree = raw_xml_tree(path)
+    macro_paths = expand_references(tree, path)
+    return tree, macro_paths
+
+
+def expand_references(tree, path):
+    """Preprocess the XML macros of a raw tree loaded from ``path`` in place.
+
+    Return the paths to referenced files that were imported (macros).
+    """
     root = tree.getroot()
 
     macros_el = _macros_el(root)
     if macros_el is None:
-        return tree, []
+        return []
 
     macros: Dict[str, List[Element]] = {}
     macro_paths = _import_macros(macros_el, path, macros)
@@ -46,7 +55,7 @@ def load_with_references(path):
     for m in macros.get("template", []):
         macros_el.append(m)
     _expand_tokens_for_el(root, tokens)
-    return tree, macro_paths
+    return macro_paths
 
 
 def load(path):
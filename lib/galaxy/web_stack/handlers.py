@@ -14,6 +14,7 @@ from sqlalchemy.orm import object_session
 
 from galaxy.exceptions import HandlerAssignmentError
 from galaxy.util import (
+    asbool,
     ExecutionTimer,
     listify,
 )
@@ -86,6 +87,15 @@ class ConfiguresHandlers:
             ready_window_size_str = config_element.attrib.get("ready_window_size", None)
             if ready_window_size_str:
                 handling_config_dict["ready_window_size"] = int(ready_window_size_str)
+            readiness_index_str = config_element.attrib.get("readiness_index", None)
+            if readiness_index_str:
+                handling_config_dict["readiness_index"] = asbool(readiness_index_str)
+            prefetch_inputs_str = config_element.attrib.get("prefetch_inputs", None)
+            if prefetch_inputs_str:
+                handling_config_dict["prefetch_inputs"] = asbool(prefetch_inputs_str)
+            prefetch_concurrency_str = config_element.attrib.get("prefetch_concurrency", None)
+            if prefetch_concurrency_str:
+                handling_config_dict["prefetch_concurrency"] = int(prefetch_concurrency_str)
 
         return handling_config_dict
 
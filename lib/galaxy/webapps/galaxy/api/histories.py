@@ -36,6 +36,7 @@ from galaxy.schema.schema import (
     AnyHistoryView,
     AsyncFile,
     AsyncTaskResultSummary,
+    CopyHistoryPayload,
     CreateHistoryFromStore,
     CreateHistoryPayload,
     CustomBuildsMetadataResponse,
@@ -327,6 +328,19 @@ class FastAPIHistories:
     ) -> AsyncTaskResultSummary:
         return self.service.create_from_store_async(trans, payload)
 
+    @router.post(
+        "/api/histories/{history_id}/copy_async",
+        summary="Launch a task to copy a history.",
+    )
+    def copy_async(
+        self,
+        trans: ProvidesHistoryContext = DependsOnTrans,
+        history_id: DecodedDatabaseIdField = HistoryIDPathParam,
+        payload: CopyHistoryPayload = Body(...),
+    ) -> AsyncTaskResultSummary:
+        """The task reports the number of copied items with the `PROGRESS` state while copying."""
+        return self.service.copy_async(trans, history_id, payload)
+
     @router.get(
         "/api/histories/{history_id}/exports",
         name="get_history_exports",
@@ -130,18 +130,31 @@ def get_index_query_params(
         ),
         deprecated=True,  # TODO: remove 'dataset_details' when the UI doesn't need it
     ),
+    after: Optional[str] = Query(
+        default=None,
+        title="After",
+        description=(
+            "Return the contents following the item at this position in the order, instead of using `offset`. "
+            "The position is the `hid` of the last item of the previous page when ordering by `hid`, and its "
+            "`create_time` or `update_time` and `hid` separated by a comma when ordering by time. "
+            "Only supported when ordering by one of `hid`, `create_time` or `update_time`."
+        ),
+        example="2023-03-14T10:00:00.123456,42",
+    ),
 ) -> HistoryContentsIndexParams:
     """This function is meant to be used as a dependency to render the OpenAPI documentation
     correctly"""
     return parse_index_query_params(
         v=v,
         dataset_details=dataset_details,
+        after=after,
     )
 
 
 def parse_index_query_params(
     v: Optional[str] = None,
     dataset_details: Optional[str] = None,
+    after: Optional[str] = None,
     **_,  # Additional params are ignored
 ) -> HistoryContentsIndexParams:
     """Parses query parameters for the history contents `index` operation
@@ -150,6 +163,7 @@ def parse_index_query_params(
         return HistoryContentsIndexParams(
             v=v,
             dataset_details=parse_dataset_details(dataset_details),
+            after=after,
         )
     except ValidationError as e:
         raise validation_error_to_message_exception(e)
@@ -0,0 +1,16 @@
+from galaxy.managers.jobs import (
+    JobLimitsUsage,
+    JobManager,
+)
+from . import (
+    depends,
+    Router,
+)
+
+router = Router(tags=["job_limits"])
+
+
+@router.get("/api/job_limits", require_admin=True)
+def job_limits_usage(job_manager: JobManager = depends(JobManager)) -> JobLimitsUsage:
+    """Get the configured job concurrency limits and the number of active jobs counted against them."""
+    return job_manager.job_limits()
@@ -52,6 +52,7 @@ api_tags_metadata = [
     {"name": "histories"},
     {"name": "libraries"},
     {"name": "data libraries folders"},
+    {"name": "job_limits"},
     {"name": "job_lock"},
     {"name": "metrics"},
     {"name": "default"},
@@ -24,6 +24,7 @@ from galaxy import (
     model,
 )
 from galaxy.celery.tasks import (
+    copy_history,
     import_model_store,
     prepare_history_download,
     write_history_to,
@@ -49,6 +50,7 @@ from galaxy.schema.schema import (
     AnyHistoryView,
     AsyncFile,
     AsyncTaskResultSummary,
+    CopyHistoryPayload,
     CreateHistoryFromStore,
     CreateHistoryPayload,
     CustomBuildsMetadataResponse,
@@ -63,6 +65,7 @@ from galaxy.schema.schema import (
     WriteStoreToPayload,
 )
 from galaxy.schema.tasks import (
+    CopyHistoryTaskRequest,
     GenerateHistoryDownload,
     ImportModelStoreTaskRequest,
     WriteHistoryTo,
@@ -239,8 +242,8 @@ class HistoriesService(ServiceBase, ConsumesModelStores, ServesExportStores):
                 copy_this_history_id, trans.user, current_history=trans.history
             )
             hist_name = hist_name or (f"Copy of '{original_history.name}'")
-            new_history = original_history.copy(
-                name=hist_name, target_user=trans.user, all_datasets=payload.all_datasets
+            new_history = self.manager.copy(
+                original_history, trans.user, name=hist_name, all_datasets=payload.all_datasets
             )
 
         # otherwise, create a new empty history
@@ -286,6 +289,24 @@ class HistoriesService(ServiceBase, ConsumesModelStores, ServesExportStores):
         result = import_model_store.delay(request=request)
         return async_task_summary(result)
 
+    def copy_async(
+        self,
+        trans,
+        history_id: DecodedDatabaseIdField,
+        payload: CopyHistoryPayload,
+    ) -> AsyncTaskResultSummary:
+        self._ensure_can_create_history(trans)
+        original_history = self.manager.get_accessible(history_id, trans.user, current_history=trans.history)
+        name = restore_text(payload.name) if payload.name is not None else f"Copy of '{original_history.name}'"
+        request = CopyHistoryTaskRequest(
+            history_id=original_history.id,
+            user=trans.async_request_user,
+            name=name,
+            all_datasets=payload.all_datasets,
+        )
+        result = copy_history.delay(request=request)
+        return async_task_summary(result)
+
     def _ensure_can_create_history(self, trans):
         if trans.anonymous:
             raise glx_exceptions.AuthenticationRequired("You need to be logged in to create histories.")
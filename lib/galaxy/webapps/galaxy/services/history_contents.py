@@ -133,6 +133,7 @@ class HistoryContentsIndexParams(Model):
 
     v: Optional[Literal["dev"]]
     dataset_details: Optional[DatasetDetailsType]
+    after: Optional[str]
 
 
 class LegacyHistoryContentsIndexParams(Model):
@@ -967,14 +968,18 @@ class HistoriesContentsService(ServiceBase, ServesExportStores, ConsumesModelSto
         serialization_params = self._handle_extra_serialization_for_media_type(serialization_params, accept)
         filter_query_params.order = filter_query_params.order or "hid-asc"
         order_by = self.build_order_by(self.history_contents_manager, filter_query_params.order)
+        keyset = self.history_contents_manager.parse_keyset(filter_query_params.order, params.after)
         contents = self.history_contents_manager.contents(
             history,
             filters=filters,
             limit=filter_query_params.limit,
             offset=filter_query_params.offset,
             order_by=order_by,
+            keyset=keyset,
             serialization_params=serialization_params,
         )
+        # encode the ids of all contents with a single cipher call
+        self.hda_serializer.encode_ids_of(contents, keys=("id", "history_id"))
         items = [
             self._serialize_content_item(
                 trans,
@@ -2443,7 +2443,7 @@ class WorkflowModuleInjector:
         self.trans = trans
         self.allow_tool_state_corrections = allow_tool_state_corrections
 
-    def inject(self, step: WorkflowStep, step_args=None, steps=None, **kwargs):
+    def inject(self, step: WorkflowStep, step_args=None, steps=None, populate_subworkflow=True, **kwargs):
         """Pre-condition: `step` is an ORM object coming from the database, if
         supplied `step_args` is the representation of the inputs for that step
         supplied via web form.
@@ -2454,6 +2454,9 @@ class WorkflowModuleInjector:
 
         If step_args is provided from a web form this is applied to generate
         'state' else it is just obtained from the database.
+
+        If `populate_subworkflow` is False, the modules and state of the steps
+        of a subworkflow step's subworkflow are not populated.
         """
         step.upgrade_messages = {}
 
@@ -2468,7 +2471,7 @@ class WorkflowModuleInjector:
         module.add_dummy_datasets(connections=step.input_connections, steps=steps)
 
         # Populate subworkflow components
-        if step.type == "subworkflow":
+        if step.type == "subworkflow" and populate_subworkflow:
             subworkflow_param_map = step_args or {}
             unjsonified_subworkflow_param_map = {}
             for key, value in subworkflow_param_map.items():
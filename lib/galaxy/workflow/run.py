@@ -3,6 +3,7 @@ import uuid
 from typing import (
     Any,
     Dict,
+    Iterator,
     List,
     Optional,
     Tuple,
@@ -228,6 +229,7 @@ class WorkflowInvoker:
                     workflow_invocation.steps.append(workflow_invocation_step)
 
                 assert workflow_invocation_step
+                self.__check_delayed_dependencies(step)
                 incomplete_or_none = self._invoke_step(workflow_invocation_step)
                 if incomplete_or_none is False:
                     step_delayed = delayed_steps = True
@@ -272,6 +274,15 @@ class WorkflowInvoker:
                 output_id = input_connection.output_step.id
                 self.__check_implicitly_dependent_step(output_id, step.id)
 
+    def __check_delayed_dependencies(self, step):
+        """Delay the step if a step it is connected to was delayed in this
+        scheduling pass, before its module is used.
+        """
+        delayed_step_id = self.progress.delayed_dependency(step)
+        if delayed_step_id is not None:
+            delayed_why = f"dependent step [{delayed_step_id}] delayed, so this step must be delayed"
+            raise modules.DelayedWorkflowEvaluation(why=delayed_why)
+
     def __check_implicitly_dependent_step(self, output_id: int, step_id: int):
         step_invocation = self.workflow_invocation.step_invocation_for_step_id(output_id)
 
@@ -317,7 +328,7 @@ STEP_OUTPUT_DELAYED = object()
 
 
 class ModuleInjector(Protocol):
-    def inject(self, step, step_args=None, steps=None, **kwargs):
+    def inject(self, step, step_args=None, steps=None, populate_subworkflow=True, **kwargs):
         pass
 
     def inject_all(self, workflow: "Workflow", param_map=None, ignore_tool_missing_exception=True, **kwargs):
@@ -367,35 +378,65 @@ class WorkflowProgress:
 
     def remaining_steps(
         self,
-    ) -> List[Tuple["WorkflowStep", Optional[WorkflowInvocationStep]]]:
+    ) -> Iterator[Tuple["WorkflowStep", Optional[WorkflowInvocationStep]]]:
+        """
+        Walk the steps of the workflow in order, recovering the outputs of
+        the scheduled steps and yielding the steps that remain to be scheduled.
+
+        Modules are injected into all steps, and the runtime state of the
+        steps that remain to be scheduled is computed, before the first step
+        is yielded: the runtime state of a step may depend on the modules of
+        the steps connected to it, and missing tools or failing state upgrades
+        are reported before any step of the pass is scheduled. Only the
+        remaining work is done as the walk reaches each step, so steps past
+        the blocked frontier of the invocation are cheaper to revisit on each
+        scheduling pass:
+
+        - scheduled steps only get a module to recover their outputs, their
+          runtime state is not computed and subworkflows are not populated;
+        - the persisted runtime state of steps connected to a step delayed in
+          this pass is not decoded, the invoker delays them without executing
+          them.
+        """
         # Previously computed and persisted step states.
         step_states = self.workflow_invocation.step_states_by_step_id()
         steps = self.workflow_invocation.workflow.steps
-
-        # TODO: Wouldn't a generator be much better here so we don't have to reason about
-        # steps we are no where near ready to schedule?
-        remaining_steps = []
         step_invocations_by_id = self.workflow_invocation.step_invocations_by_step_id()
-        self.module_injector.inject_all(self.workflow_invocation.workflow, param_map=self.param_map)
+        walk = []
         for step in steps:
             step_id = step.id
-            step_args = self.param_map.get(step_id, {})
-            self.module_injector.compute_runtime_state(step, step_args=step_args)
             if step_id not in step_states:
                 # Can this ever happen?
                 public_message = f"Workflow invocation has no step state for step {step.order_index + 1}"
                 log.error(f"{public_message}. State is known for these step ids: {list(step_states.keys())}.")
                 raise MessageException(public_message)
-            runtime_state = step_states[step_id].value
-            assert step.module
-            step.state = step.module.decode_runtime_state(runtime_state)
-
+            step_args = self.param_map.get(step_id, {})
             invocation_step = step_invocations_by_id.get(step_id, None)
-            if invocation_step and invocation_step.state == "scheduled":
+            scheduled = bool(invocation_step and invocation_step.state == "scheduled")
+            self.module_injector.inject(step, step_args=step_args, steps=steps, populate_subworkflow=not scheduled)
+            walk.append((step, invocation_step, scheduled))
+        for step, _, scheduled in walk:
+            if not scheduled:
+                self.module_injector.compute_runtime_state(step, step_args=self.param_map.get(step.id, {}))
+        for step, invocation_step, scheduled in walk:
+            if scheduled:
                 self._recover_mapping(invocation_step)
-            else:
-                remaining_steps.append((step, invocation_step))
-        return remaining_steps
+                continue
+            if self.delayed_dependency(step) is None:
+                runtime_state = step_states[step.id].value
+                assert step.module
+                step.state = step.module.decode_runtime_state(runtime_state)
+            yield step, invocation_step
+
+    def delayed_dependency(self, step: "WorkflowStep") -> Optional[int]:
+        """Return the id of a step ``step`` is connected to that was delayed
+        in this scheduling pass, None if there is no such step.
+        """
+        for connection in step.input_connections:
+            output_step_id = connection.output_step.id
+            if self.outputs.get(output_step_id) is STEP_OUTPUT_DELAYED:
+                return output_step_id
+        return None
 
     def replacement_for_input(self, step: "WorkflowStep", input_dict: Dict[str, Any]) -> Any:
         replacement: Union[
@@ -1,10 +1,18 @@
 import os
+import threading
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import timedelta
 from functools import partial
 
 import galaxy.workflow.schedulers
 from galaxy import model
 from galaxy.exceptions import HandlerAssignmentError
 from galaxy.jobs.handler import ItemGrabber
+from galaxy.model.orm.now import now
 from galaxy.util import plugin_config
 from galaxy.util.custom_logging import get_logger
 from galaxy.util.monitors import Monitors
@@ -26,6 +34,52 @@ EXCEPTION_MESSAGE_DUPLICATE_SCHEDULERS = (
     "Failed to defined workflow schedulers - workflow scheduling plugin id '%s' duplicated."
 )
 EXCEPTION_MESSAGE_SERIALIZE = "Parallelization is not desired but handler assignment methods are non-deterministic. Set DB_PREASSIGN in workflow_schedulers_conf.xml."
+# Changes are looked for from a bit before the previous monitor iteration started to
+# account for clock differences between this handler and the processes updating jobs.
+WAKEUP_CLOCK_SKEW = timedelta(seconds=5)
+
+
+def fair_history_batches(invocations, last_served=None):
+    """
+    Group workflow invocations by history and order the groups so that the
+    owners of the histories take turns, owners served least recently first.
+
+    ``invocations`` maps invocation ids to ``(history_id, user_id)`` tuples
+    and ``last_served`` maps owners to a number increasing each time they
+    are served. Invocations of anonymous users are owned by their history.
+    Invocations of a history are kept in id order so that they are still
+    scheduled in the order they were created.
+
+    >>> invocations = {1: (10, 1), 2: (10, 1), 3: (11, 1), 4: (20, 2), 5: (30, None)}
+    >>> for batch in fair_history_batches(invocations):
+    ...     print(batch)
+    (('history', 30), 30, [5])
+    (('user', 1), 10, [1, 2])
+    (('user', 2), 20, [4])
+    (('user', 1), 11, [3])
+    >>> [batch[1] for batch in fair_history_batches(invocations, {("user", 1): 2, ("history", 30): 1})]
+    [20, 30, 10, 11]
+    """
+    last_served = last_served or {}
+    histories_by_owner = {}
+    for invocation_id in sorted(invocations):
+        history_id, user_id = invocations[invocation_id]
+        owner = ("user", user_id) if user_id is not None else ("history", history_id)
+        histories_by_owner.setdefault(owner, {}).setdefault(history_id, []).append(invocation_id)
+    owners = sorted(histories_by_owner, key=lambda owner: (last_served.get(owner, -1), owner))
+    batches = []
+    turn = 0
+    while owners:
+        remaining_owners = []
+        for owner in owners:
+            histories = list(histories_by_owner[owner].items())
+            if turn < len(histories):
+                history_id, invocation_ids = histories[turn]
+                batches.append((owner, history_id, invocation_ids))
+                remaining_owners.append(owner)
+        owners = remaining_owners
+        turn += 1
+    return batches
 
 
 class WorkflowSchedulingManager(ConfiguresHandlers):
@@ -294,6 +348,28 @@ class WorkflowRequestMonitor(Monitors):
                 self_handler_tags=self_handler_tags,
                 handler_tags=self_handler_tags,
             )
+        self._last_iteration_start = None
+        self._last_sweep = None
+        # Number of invocations evaluated in the last iteration of the monitor
+        self.invocations_evaluated = 0
+        self._init_scheduling(app.config.workflow_scheduling_threads or 1)
+
+    def _init_scheduling(self, scheduling_threads):
+        # Invocations to evaluate in the next iteration (per scheduler id), that were left
+        # over because of the time budget, because their history was busy or that finished
+        # a long scheduling pass in the pool
+        self._deferred_invocation_ids = {}
+        self._owner_last_served = {}
+        self._served_count = 0
+        self._lock = threading.Lock()
+        self._in_flight_histories = set()
+        self._scheduling_futures = set()
+        self.scheduling_pool = None
+        if scheduling_threads > 1:
+            self.scheduling_pool = ThreadPoolExecutor(
+                max_workers=scheduling_threads, thread_name_prefix="WorkflowRequestMonitor.scheduling_pool"
+            )
+            self._free_workers = threading.BoundedSemaphore(scheduling_threads)
 
     def __monitor(self):
         to_monitor = self.workflow_scheduling_manager.active_workflow_schedulers
@@ -306,25 +382,153 @@ class WorkflowRequestMonitor(Monitors):
                     "internal.galaxy.workflows.scheduling_manager.monitor_step",
                     "Workflow scheduling manager monitor step complete.",
                 )
+                since = self._wakeup_since()
+                time_budget = self.app.config.workflow_monitor_time_budget
+                deadline = time.monotonic() + time_budget if time_budget and time_budget > 0 else None
+                invocations_evaluated = 0
                 for workflow_scheduler_id, workflow_scheduler in to_monitor.items():
                     if not self.monitor_running:
                         return
 
-                    self.__schedule(workflow_scheduler_id, workflow_scheduler)
+                    invocations_evaluated += self._schedule(workflow_scheduler_id, workflow_scheduler, since, deadline)
                 log.trace(monitor_step_timer.to_str())
+                self._record_invocations_evaluated(invocations_evaluated, sweep=since is None)
             except Exception:
                 log.exception("An exception occured scheduling while scheduling workflows")
             self._monitor_sleep(self.app.config.workflow_monitor_sleep)
 
-    def __schedule(self, workflow_scheduler_id, workflow_scheduler):
-        invocation_ids = self.__active_invocation_ids(workflow_scheduler_id)
+    def _wakeup_since(self):
+        """
+        Return the time from which job and invocation changes wake up active
+        invocations in this iteration of the monitor, or None if all active
+        invocations should be evaluated (a sweep).
+
+        Sweeps happen on the first iteration and every
+        ``workflow_monitor_sweep_interval`` seconds, and catch invocations
+        blocked on anything that does not wake them up (e.g. datasets
+        produced in another history). A non-positive interval evaluates all
+        active invocations on every iteration.
+        """
+        iteration_start = now()
+        last_iteration_start, self._last_iteration_start = self._last_iteration_start, iteration_start
+        sweep_interval = self.app.config.workflow_monitor_sweep_interval
+        if (
+            not sweep_interval
+            or sweep_interval <= 0
+            or last_iteration_start is None
+            or self._last_sweep is None
+            or iteration_start - self._last_sweep >= timedelta(seconds=sweep_interval)
+        ):
+            self._last_sweep = iteration_start
+            return None
+        return last_iteration_start - WAKEUP_CLOCK_SKEW
+
+    def _record_invocations_evaluated(self, invocations_evaluated, sweep):
+        self.invocations_evaluated = invocations_evaluated
+        if invocations_evaluated:
+            log.trace(
+                "Workflow scheduling manager evaluated %d invocations (%s).",
+                invocations_evaluated,
+                "sweep" if sweep else "woken up",
+            )
+        statsd_client = self.app.execution_timer_factory.galaxy_statsd_client
+        if statsd_client:
+            statsd_client.incr(
+                "internal.galaxy.workflows.scheduling_manager.invocations_evaluated",
+                invocations_evaluated,
+                tags={"sweep": sweep},
+            )
+
+    def _schedule(self, workflow_scheduler_id, workflow_scheduler, since=None, deadline=None):
+        invocation_ids = set(self._active_invocation_ids(workflow_scheduler_id, since))
+        with self._lock:
+            previously_deferred = self._deferred_invocation_ids.pop(workflow_scheduler_id, set())
+        invocation_ids.update(previously_deferred)
+        if not invocation_ids:
+            return 0
+        invocations = self._history_and_user_ids(invocation_ids)
+        if since is None:
+            # Only keep track of owners that still have active invocations
+            owners = {("user", u) if u is not None else ("history", h) for h, u in invocations.values()}
+            self._owner_last_served = {o: n for o, n in self._owner_last_served.items() if o in owners}
+        batches = fair_history_batches(invocations, self._owner_last_served)
+        if previously_deferred:
+            # Histories with invocations left over from previous iterations go first, in fair order
+            deferred_histories = {invocations[i][0] for i in previously_deferred if i in invocations}
+            batches.sort(key=lambda batch: batch[1] not in deferred_histories)
+        evaluated = 0
+        deferred = set()
+        for owner, history_id, history_invocation_ids in batches:
+            if not self.monitor_running:
+                break
+            if not self._dispatch(
+                workflow_scheduler_id, workflow_scheduler, history_id, history_invocation_ids, deadline
+            ):
+                deferred.update(history_invocation_ids)
+                continue
+            self._served_count += 1
+            self._owner_last_served[owner] = self._served_count
+            evaluated += len(history_invocation_ids)
+        if deferred:
+            with self._lock:
+                self._deferred_invocation_ids.setdefault(workflow_scheduler_id, set()).update(deferred)
+        return evaluated
+
+    def _dispatch(self, workflow_scheduler_id, workflow_scheduler, history_id, invocation_ids, deadline=None):
+        """
+        Schedule the invocations of a history, in the scheduling pool if there
+        is one. Return False if they could not be dispatched in this iteration
+        because the time budget ran out or the history is being scheduled by a
+        worker already.
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        if self.scheduling_pool is None:
+            self._schedule_history(invocation_ids, workflow_scheduler)
+            return True
+        with self._lock:
+            if history_id in self._in_flight_histories:
+                return False
+        # Wait for a free worker
+        while not self._free_workers.acquire(timeout=1.0 if deadline is None else max(deadline - time.monotonic(), 0)):
+            if not self.monitor_running or (deadline is not None and time.monotonic() >= deadline):
+                return False
+        with self._lock:
+            self._in_flight_histories.add(history_id)
+            future = self.scheduling_pool.submit(
+                self._schedule_history_in_pool, workflow_scheduler_id, workflow_scheduler, history_id, invocation_ids
+            )
+            self._scheduling_futures.add(future)
+        future.add_done_callback(self._scheduling_done)
+        return True
+
+    def _scheduling_done(self, future):
+        with self._lock:
+            self._scheduling_futures.discard(future)
+
+    def _schedule_history(self, invocation_ids, workflow_scheduler):
         for invocation_id in invocation_ids:
             log.debug("Attempting to schedule workflow invocation [%s]", invocation_id)
-            self.__attempt_schedule(invocation_id, workflow_scheduler)
+            self._attempt_schedule(invocation_id, workflow_scheduler)
             if not self.monitor_running:
                 return
 
-    def __attempt_schedule(self, invocation_id, workflow_scheduler):
+    def _schedule_history_in_pool(self, workflow_scheduler_id, workflow_scheduler, history_id, invocation_ids):
+        start = time.monotonic()
+        try:
+            self._schedule_history(invocation_ids, workflow_scheduler)
+        except Exception:
+            log.exception("An exception occured while scheduling workflows in scheduling pool")
+        finally:
+            with self._lock:
+                self._in_flight_histories.discard(history_id)
+                if time.monotonic() - start > WAKEUP_CLOCK_SKEW.total_seconds():
+                    # Changes made early in a long scheduling pass may predate the changes
+                    # the next iterations of the monitor look for, evaluate them again.
+                    self._deferred_invocation_ids.setdefault(workflow_scheduler_id, set()).update(invocation_ids)
+            self._free_workers.release()
+
+    def _attempt_schedule(self, invocation_id, workflow_scheduler):
         with self.app.model.context() as session, session.begin():
             workflow_invocation = session.get(model.WorkflowInvocation, invocation_id)
 
@@ -349,8 +553,18 @@ class WorkflowRequestMonitor(Monitors):
         # A workflow was obtained and scheduled...
         return True
 
-    def __active_invocation_ids(self, scheduler_id):
+    def _history_and_user_ids(self, invocation_ids):
+        return model.WorkflowInvocation.history_and_user_ids(self.app.model.engine, invocation_ids)
+
+    def _active_invocation_ids(self, scheduler_id, since=None):
         handler = self.app.config.server_name
+        if since is not None:
+            return model.WorkflowInvocation.poll_woken_workflow_ids(
+                self.app.model.engine,
+                since,
+                scheduler=scheduler_id,
+                handler=handler,
+            )
         return model.WorkflowInvocation.poll_active_workflow_ids(
             self.app.model.engine,
             scheduler=scheduler_id,
@@ -362,3 +576,16 @@ class WorkflowRequestMonitor(Monitors):
 
     def shutdown(self):
         self.shutdown_monitor()
+        if self.scheduling_pool:
+            with self._lock:
+                futures = list(self._scheduling_futures)
+            # Workers stop after the invocation they are scheduling, histories not started yet are dropped
+            for future in futures:
+                future.cancel()
+            _, not_done = wait(futures, timeout=self.monitor_join_sleep)
+            if not_done:
+                log.warning(
+                    "%d workflow scheduling thread(s) still running after shutdown of the workflow scheduling manager",
+                    len(not_done),
+                )
+            self.scheduling_pool.shutdown(wait=False)
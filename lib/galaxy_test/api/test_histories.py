@@ -294,6 +294,38 @@ class TestHistoriesApi(ApiTestCase, BaseHistories):
         assert source_hda["history_id"] != copied_hda["history_id"]
         assert source_hda["hid"] == copied_hda["hid"] == 2
 
+    def test_copy_history_async(self):
+        history_id = self.dataset_populator.new_history()
+        fetch_response = self.dataset_collection_populator.create_list_in_history(
+            history_id, contents=["Hello", "World"], direct_upload=True
+        )
+        dataset_collection = self.dataset_collection_populator.wait_for_fetched_collection(fetch_response.json())
+        copied_history_name = f"copied_async_{uuid4()}"
+        copy_response = self._post(f"histories/{history_id}/copy_async", data={"name": copied_history_name}, json=True)
+        self._assert_status_code_is(copy_response, 200)
+        assert self.dataset_populator.wait_on_task(copy_response)
+        copied_history = self.dataset_populator.history_names()[copied_history_name]
+        copied_history_id = copied_history["id"]
+        assert copied_history_id != history_id
+
+        source_contents = self.dataset_populator.get_history_contents(history_id)
+        copied_contents = self.dataset_populator.get_history_contents(copied_history_id)
+        assert len(source_contents) == len(copied_contents) == 3
+        for source_item, copied_item in zip(source_contents, copied_contents):
+            assert source_item["hid"] == copied_item["hid"]
+            assert source_item["name"] == copied_item["name"]
+            assert source_item["history_content_type"] == copied_item["history_content_type"]
+            assert source_item["visible"] == copied_item["visible"]
+            assert source_item["id"] != copied_item["id"]
+
+        copied_collection = self.dataset_populator.get_history_collection_details(history_id=copied_history_id)
+        assert dataset_collection["name"] == copied_collection["name"]
+        assert [e["element_identifier"] for e in copied_collection["elements"]] == ["data0", "data1"]
+        copied_hda = copied_collection["elements"][1]["object"]
+        assert copied_hda["history_id"] == copied_history_id
+        content = self.dataset_populator.get_history_dataset_content(copied_history_id, dataset_id=copied_hda["id"])
+        assert content.strip() == "World"
+
     # TODO: (CE) test_create_from_copy
     def test_import_from_model_store_dict(self):
         response = self.dataset_populator.create_from_store(store_dict=history_model_store_dict())
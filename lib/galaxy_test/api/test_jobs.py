@@ -61,6 +61,19 @@ class TestJobsApi(ApiTestCase, TestsTools):
         job = jobs[0]
         self._assert_has_keys(job, "command_line", "external_id", "handler")
 
+    def test_job_limits_admin_only(self):
+        job_limits_response = self._get("job_limits", admin=False)
+        self._assert_status_code_is(job_limits_response, 403)
+
+        job_limits_response = self._get("job_limits", admin=True)
+        self._assert_status_code_is(job_limits_response, 200)
+        job_limits = job_limits_response.json()
+        self._assert_has_keys(job_limits, "limits", "destinations", "tools", "groups", "users")
+        assert isinstance(job_limits["limits"], dict)
+        assert isinstance(job_limits["users"], list)
+        for user in job_limits["users"]:
+            self._assert_has_keys(user, "id", "active_jobs", "destinations", "tools")
+
     @pytest.mark.require_new_history
     def test_index_state_filter(self, history_id):
         # Initial number of ok jobs
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Measure the time it takes to build large list collections from element identifiers.
+
+Generates a history of datasets and times ``DatasetCollectionManager.create``
+building a list of all of them from ``{"src": "hda", "id": ...}`` element
+identifiers, as the collections API and ``__BUILD_LIST__`` do, as a non-admin
+user so that access checks are exercised.
+
+% python test/manual/collection_build_benchmark.py --elements 1000 10000 100000
+% python test/manual/collection_build_benchmark.py --elements 10000 --tags --hide-source-items --database_connection postgresql://galaxy@localhost/collections
+"""
+import datetime
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import (
+    func,
+    insert,
+    select,
+)
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy import model
+from galaxy.app_unittest_utils.galaxy_mock import (
+    MockApp,
+    MockTrans,
+)
+from galaxy.managers.collections import DatasetCollectionManager
+
+DESCRIPTION = "Benchmark building large list collections from element identifiers."
+ROW_BATCH_SIZE = 10000
+START_TIME = datetime.datetime(2023, 1, 1)
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--database_connection", default=None)
+    arg_parser.add_argument("--elements", type=int, nargs="+", default=[1000, 10000, 100000])
+    arg_parser.add_argument("--tags", action="store_true", help="tag every element with a distinct name: tag")
+    arg_parser.add_argument("--hide-source-items", action="store_true", help="hide the datasets of the collection")
+    args = arg_parser.parse_args(argv)
+
+    app_kwds = {}
+    if args.database_connection:
+        app_kwds["database_connection"] = args.database_connection
+    app = MockApp(admin_users="", admin_users_list=[], **app_kwds)
+    session = app.model.context
+    user = model.User(email="bench@example.org", password="password")
+    session.add(user)
+    session.flush()
+    user_id = user.id
+    collection_manager = app[DatasetCollectionManager]
+
+    for elements in args.elements:
+        session.expunge_all()
+        user = session.query(model.User).get(user_id)
+        history = model.History(name="collection benchmark", user=user)
+        session.add(history)
+        session.flush()
+        hda_ids = _seed(app.model.engine, session, history, elements)
+        element_identifiers = [
+            dict(src="hda", id=hda_id, name=f"element {index}") for index, hda_id in enumerate(hda_ids)
+        ]
+        if args.tags:
+            for index, element_identifier in enumerate(element_identifiers):
+                element_identifier["tags"] = [f"name:sample{index}"]
+        trans = MockTrans(app=app, user=user, history=history)
+        start = time.perf_counter()
+        hdca = collection_manager.create(
+            trans,
+            history,
+            "benchmark list",
+            "list",
+            element_identifiers=element_identifiers,
+            hide_source_items=args.hide_source_items,
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{elements} elements: {elapsed:.2f}s ({hdca.collection.element_count} elements)")
+
+
+def _seed(engine, session, history, elements):
+    print(f"Generating a history of {elements} datasets...")
+    tables = (model.Dataset.table, model.HistoryDatasetAssociation.table)
+    base = max(session.execute(select(func.max(table.c.id))).scalar() or 0 for table in tables)
+    for first in range(1, elements + 1, ROW_BATCH_SIZE):
+        hids = range(first, min(first + ROW_BATCH_SIZE, elements + 1))
+        with engine.begin() as connection:
+            connection.execute(
+                insert(model.Dataset.table),
+                [dict(id=base + hid, state=model.Dataset.states.OK, deleted=False, purged=False) for hid in hids],
+            )
+            connection.execute(
+                insert(model.HistoryDatasetAssociation.table),
+                [
+                    dict(
+                        id=base + hid,
+                        hid=hid,
+                        dataset_id=base + hid,
+                        history_id=history.id,
+                        name=f"dataset {hid}",
+                        extension="txt",
+                        deleted=False,
+                        purged=False,
+                        visible=True,
+                        create_time=START_TIME,
+                        update_time=START_TIME,
+                    )
+                    for hid in hids
+                ],
+            )
+    history.hid_counter = elements + 1
+    session.flush()
+    return [base + hid for hid in range(1, elements + 1)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""Measure the latency of listing pages of a large history's contents.
+
+Generates a history of datasets and collections and times loading a page of its
+contents at increasing depths, using ``offset`` and keyset (``after``) pagination,
+as the history panel does when scrolling through the history.
+
+% python test/manual/history_contents_benchmark.py --items 100000
+% python test/manual/history_contents_benchmark.py --items 100000 --database_connection postgresql://galaxy@localhost/contents
+"""
+import datetime
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import insert
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy import model
+from galaxy.app_unittest_utils.galaxy_mock import MockApp
+from galaxy.managers.history_contents import HistoryContentsManager
+
+DESCRIPTION = "Benchmark paginated listing of the contents of a large history."
+ROW_BATCH_SIZE = 10000
+# every COLLECTION_EVERY-th item of the history is a collection
+COLLECTION_EVERY = 10
+START_TIME = datetime.datetime(2023, 1, 1)
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--database_connection", default=None)
+    arg_parser.add_argument("--items", type=int, default=100000)
+    arg_parser.add_argument("--page_size", type=int, default=50)
+    arg_parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10000, 50000, 99000])
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args(argv)
+
+    app_kwds = {}
+    if args.database_connection:
+        app_kwds["database_connection"] = args.database_connection
+    app = MockApp(**app_kwds)
+    contents_manager = app[HistoryContentsManager]
+    session = app.model.context
+    history_id = _seed(app.model.engine, session, args.items)
+
+    for order in ("hid-asc", "update_time-dsc"):
+        for depth in args.depths:
+            if depth >= args.items:
+                continue
+            offset_keyset = contents_manager.parse_keyset(order)
+            after_keyset = contents_manager.parse_keyset(order, _after(order, depth, args.items))
+            timings = {}
+            for pagination, kwds in (
+                ("offset", dict(keyset=offset_keyset, offset=depth)),
+                ("keyset", dict(keyset=after_keyset)),
+            ):
+                timings[pagination] = []
+                for _ in range(args.repeat):
+                    session.expunge_all()
+                    history = session.query(model.History).get(history_id)
+                    start = time.perf_counter()
+                    page = contents_manager.contents(history, limit=args.page_size, **kwds)
+                    timings[pagination].append(time.perf_counter() - start)
+                    assert len(page) == min(args.page_size, args.items - depth)
+            print(
+                f"{order} depth {depth}: "
+                + ", ".join(
+                    f"{pagination} p50 {_percentile(values, 50):.4f}s p99 {_percentile(values, 99):.4f}s"
+                    for pagination, values in timings.items()
+                )
+            )
+
+
+def _seed(engine, session, items):
+    print(f"Generating a history of {items} items...")
+    user = model.User(email="bench@example.org", password="password")
+    history = model.History(name="contents benchmark", user=user)
+    session.add(history)
+    session.flush()
+    for first in range(1, items + 1, ROW_BATCH_SIZE):
+        hids = range(first, min(first + ROW_BATCH_SIZE, items + 1))
+        with engine.begin() as connection:
+            _insert_batch(connection, hids, history.id)
+    history.hid_counter = items + 1
+    session.flush()
+    return history.id
+
+
+def _insert_batch(connection, hids, history_id):
+    dataset_hids = [hid for hid in hids if hid % COLLECTION_EVERY]
+    collection_hids = [hid for hid in hids if not hid % COLLECTION_EVERY]
+    connection.execute(
+        insert(model.Dataset.table),
+        [dict(id=hid, state=model.Dataset.states.OK, deleted=False, purged=False) for hid in dataset_hids],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetAssociation.table),
+        [
+            dict(
+                id=hid,
+                hid=hid,
+                dataset_id=hid,
+                history_id=history_id,
+                name=f"dataset {hid}",
+                extension="txt",
+                deleted=False,
+                purged=False,
+                visible=True,
+                create_time=_time(hid),
+                update_time=_time(hid),
+            )
+            for hid in dataset_hids
+        ],
+    )
+    connection.execute(
+        insert(model.DatasetCollection.table),
+        [
+            dict(id=hid, collection_type="list", populated_state="ok", element_count=0, create_time=_time(hid))
+            for hid in collection_hids
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetCollectionAssociation.table),
+        [
+            dict(
+                id=hid,
+                hid=hid,
+                collection_id=hid,
+                history_id=history_id,
+                name=f"collection {hid}",
+                deleted=False,
+                visible=True,
+                create_time=_time(hid),
+                update_time=_time(hid),
+            )
+            for hid in collection_hids
+        ],
+    )
+
+
+def _time(hid):
+    return START_TIME + datetime.timedelta(seconds=hid)
+
+
+def _after(order, depth, items):
+    """Return the position of the item before the page starting at `depth`."""
+    if depth == 0:
+        return None
+    if order == "hid-asc":
+        return str(depth)
+    hid = items - depth + 1
+    return f"{_time(hid).isoformat()},{hid}"
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+if __name__ == "__main__":
+    main()
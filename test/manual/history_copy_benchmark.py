@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""Measure the time it takes to copy large histories.
+
+Generates histories of datasets and list collections (whose elements are
+datasets of the same history), with a tag and an annotation on every dataset,
+and times copying them through the ORM (``History.copy``) and with the
+set-based ``HistoryCopier``.
+
+% python test/manual/history_copy_benchmark.py --items 1000 10000 50000
+% python test/manual/history_copy_benchmark.py --items 50000 --skip-orm --database_connection postgresql://galaxy@localhost/copy
+"""
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from sqlalchemy import (
+    func,
+    insert,
+    select,
+)
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy import model
+from galaxy.app_unittest_utils.galaxy_mock import MockApp
+from galaxy.model.history_copy import HistoryCopier
+
+DESCRIPTION = "Benchmark copying large histories."
+ROW_BATCH_SIZE = 10000
+# every COLLECTION_EVERY-th item of the history is a list of the datasets before it
+COLLECTION_EVERY = 10
+START_TIME = datetime.datetime(2023, 1, 1)
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--database_connection", default=None)
+    arg_parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000, 50000])
+    arg_parser.add_argument("--skip-orm", action="store_true", help="only time the set-based copy")
+    arg_parser.add_argument("--trace-memory", action="store_true", help="report peak Python memory of each copy")
+    args = arg_parser.parse_args(argv)
+
+    app_kwds = {}
+    if args.database_connection:
+        app_kwds["database_connection"] = args.database_connection
+    app = MockApp(**app_kwds)
+    session = app.model.context
+    user = model.User(email="bench@example.org", password="password")
+    target_user = model.User(email="copier@example.org", password="password")
+    tag = model.Tag(name="group")
+    session.add_all([user, target_user, tag])
+    session.flush()
+    user_id, target_user_id, tag_id = user.id, target_user.id, tag.id
+
+    copies = [("bulk", lambda history, target_user: HistoryCopier(history).copy(target_user=target_user))]
+    if not args.skip_orm:
+        copies.insert(0, ("orm", lambda history, target_user: history.copy(target_user=target_user)))
+    for items in args.items:
+        history_id = _seed(app.model.engine, session, user_id, tag_id, items)
+        for name, copy in copies:
+            session.expunge_all()
+            history = session.query(model.History).get(history_id)
+            target_user = session.query(model.User).get(target_user_id)
+            if args.trace_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            new_history = copy(history, target_user)
+            session.flush()
+            elapsed = time.perf_counter() - start
+            memory = ""
+            if args.trace_memory:
+                memory = f", peak memory {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MB"
+                tracemalloc.stop()
+            copied = session.execute(
+                select(func.count()).where(model.HistoryDatasetAssociation.table.c.history_id == new_history.id)
+            ).scalar()
+            print(f"{items} items, {name} copy: {elapsed:.2f}s ({copied} datasets){memory}")
+
+
+def _seed(engine, session, user_id, tag_id, items):
+    print(f"Generating a history of {items} items...")
+    history = model.History(name="copy benchmark", user=session.query(model.User).get(user_id))
+    session.add(history)
+    session.flush()
+    # give the rows of every history their own ids
+    tables = (
+        model.Dataset.table,
+        model.HistoryDatasetAssociation.table,
+        model.DatasetCollection.table,
+        model.HistoryDatasetCollectionAssociation.table,
+    )
+    base = max(session.execute(select(func.max(table.c.id))).scalar() or 0 for table in tables)
+    for first in range(1, items + 1, ROW_BATCH_SIZE):
+        hids = range(first, min(first + ROW_BATCH_SIZE, items + 1))
+        with engine.begin() as connection:
+            _insert_batch(connection, hids, base, history.id, user_id, tag_id)
+    history.hid_counter = items + 1
+    session.flush()
+    return history.id
+
+
+def _insert_batch(connection, hids, base, history_id, user_id, tag_id):
+    dataset_hids = [hid for hid in hids if hid % COLLECTION_EVERY]
+    collection_hids = [hid for hid in hids if not hid % COLLECTION_EVERY]
+    connection.execute(
+        insert(model.Dataset.table),
+        [
+            dict(id=base + hid, state=model.Dataset.states.OK, deleted=False, purged=False, file_size=hid)
+            for hid in dataset_hids
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetAssociation.table),
+        [
+            dict(
+                id=base + hid,
+                hid=hid,
+                dataset_id=base + hid,
+                history_id=history_id,
+                name=f"dataset {hid}",
+                extension="txt",
+                deleted=False,
+                purged=False,
+                visible=True,
+                create_time=_time(hid),
+                update_time=_time(hid),
+            )
+            for hid in dataset_hids
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetAssociationTagAssociation.table),
+        [
+            dict(history_dataset_association_id=base + hid, tag_id=tag_id, user_id=user_id, user_tname="group")
+            for hid in dataset_hids
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetAssociationAnnotationAssociation.table),
+        [
+            dict(history_dataset_association_id=base + hid, user_id=user_id, annotation=f"annotation {hid}")
+            for hid in dataset_hids
+        ],
+    )
+    connection.execute(
+        insert(model.DatasetCollection.table),
+        [
+            dict(
+                id=base + hid,
+                collection_type="list",
+                populated_state="ok",
+                element_count=COLLECTION_EVERY - 1,
+                create_time=_time(hid),
+            )
+            for hid in collection_hids
+        ],
+    )
+    connection.execute(
+        insert(model.DatasetCollectionElement.table),
+        [
+            dict(
+                dataset_collection_id=base + hid,
+                hda_id=base + element_hid,
+                element_index=index,
+                element_identifier=f"element {element_hid}",
+            )
+            for hid in collection_hids
+            for index, element_hid in enumerate(range(hid - COLLECTION_EVERY + 1, hid))
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetCollectionAssociation.table),
+        [
+            dict(
+                id=base + hid,
+                hid=hid,
+                collection_id=base + hid,
+                history_id=history_id,
+                name=f"collection {hid}",
+                deleted=False,
+                visible=True,
+                create_time=_time(hid),
+                update_time=_time(hid),
+            )
+            for hid in collection_hids
+        ],
+    )
+
+
+def _time(hid):
+    return START_TIME + datetime.timedelta(seconds=hid)
+
+
+if __name__ == "__main__":
+    main()
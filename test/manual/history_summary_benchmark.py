@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""Measure the latency of polling the state and size of large histories.
+
+Generates histories of datasets in various states and polls their content counts
+and size from many threads at once, as the history panels of many users do, using
+the summaries maintained by the database and, for comparison, aggregating over
+the contents of the histories.
+
+% python test/manual/history_summary_benchmark.py --histories 5 --items 100000
+% python test/manual/history_summary_benchmark.py --pollers 500 --database_connection postgresql://galaxy@localhost/summary
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import (
+    cast,
+    false,
+    func,
+    insert,
+    Integer,
+    select,
+    true,
+)
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy import model
+from galaxy.app_unittest_utils.galaxy_mock import MockApp
+from galaxy.managers.history_contents import HistoryContentsManager
+
+DESCRIPTION = "Benchmark polling the content counts and size of large histories."
+ROW_BATCH_SIZE = 10000
+STATES = [
+    model.Dataset.states.OK,
+    model.Dataset.states.QUEUED,
+    model.Dataset.states.RUNNING,
+    model.Dataset.states.ERROR,
+]
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--database_connection", default=None)
+    arg_parser.add_argument("--histories", type=int, default=5)
+    arg_parser.add_argument("--items", type=int, default=100000)
+    arg_parser.add_argument("--pollers", type=int, default=500)
+    arg_parser.add_argument("--polls", type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    database_connection = args.database_connection
+    if database_connection is None:
+        # threads need to share the database, which an in-memory sqlite database can't do
+        database_connection = f"sqlite:///{tempfile.mkdtemp()}/summary.sqlite"
+    app = MockApp(database_connection=database_connection)
+    contents_manager = app[HistoryContentsManager]
+    history_ids = _seed(app.model.engine, app.model.context, args.histories, args.items)
+
+    def poll(poll_history):
+        session = app.model.context
+        latencies = []
+        for _ in range(args.polls):
+            history = session.query(model.History).get(random.choice(history_ids))
+            start = time.perf_counter()
+            poll_history(session, history)
+            latencies.append(time.perf_counter() - start)
+            session.expunge_all()
+        app.model.context.remove()
+        return latencies
+
+    for name, poll_history in (("summary", _poll_summary(contents_manager)), ("aggregate", _poll_aggregate)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.pollers) as executor:
+            latencies = sorted(sum(executor.map(lambda _: poll(poll_history), range(args.pollers)), []))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name}: {len(latencies)} polls in {elapsed:.2f}s, "
+            f"p50 {_percentile(latencies, 50):.4f}s p99 {_percentile(latencies, 99):.4f}s"
+        )
+
+
+def _poll_summary(contents_manager):
+    def poll_history(session, history):
+        return history.disk_size, contents_manager.active_counts(history), contents_manager.state_counts(history)
+
+    return poll_history
+
+
+def _poll_aggregate(session, history):
+    """Compute the same values by aggregating over the contents of the history"""
+    hda = model.HistoryDatasetAssociation
+    dataset = model.Dataset
+    distinct_datasets = (
+        select(dataset.id, dataset.total_size)
+        .join(hda, hda.dataset_id == dataset.id)
+        .where(hda.history_id == history.id, hda.purged != true(), dataset.purged != true())
+        .distinct()
+        .subquery()
+    )
+    size = session.execute(select(func.sum(distinct_datasets.c.total_size))).scalar()
+    active_counts = session.execute(
+        select(
+            func.sum(cast(hda.deleted, Integer)),
+            func.sum(cast(hda.visible == false(), Integer)),
+            func.sum(func.abs(cast(hda.visible, Integer) * (cast(hda.deleted, Integer) - 1))),
+        ).where(hda.history_id == history.id)
+    ).one()
+    state_counts = session.execute(
+        select(dataset.state, func.count())
+        .join(hda, hda.dataset_id == dataset.id)
+        .where(hda.history_id == history.id, hda.deleted == false(), hda.visible == true())
+        .group_by(dataset.state)
+    ).fetchall()
+    return size, active_counts, state_counts
+
+
+def _seed(engine, session, histories, items):
+    print(f"Generating {histories} histories of {items} datasets...")
+    user = model.User(email="bench@example.org", password="password")
+    session.add(user)
+    history_ids = []
+    random_ = random.Random(1)
+    next_id = 1
+    for index in range(histories):
+        history = model.History(name=f"summary benchmark {index}", user=user)
+        session.add(history)
+        session.flush()
+        history_ids.append(history.id)
+        for first in range(1, items + 1, ROW_BATCH_SIZE):
+            hids = range(first, min(first + ROW_BATCH_SIZE, items + 1))
+            with engine.begin() as connection:
+                _insert_batch(connection, history.id, hids, next_id, random_)
+            next_id += len(hids)
+    return history_ids
+
+
+def _insert_batch(connection, history_id, hids, first_id, random_):
+    ids = range(first_id, first_id + len(hids))
+    connection.execute(
+        insert(model.Dataset.table),
+        [
+            dict(id=i, state=random_.choice(STATES), deleted=False, purged=False, total_size=random_.randrange(1 << 20))
+            for i in ids
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetAssociation.table),
+        [
+            dict(
+                id=i,
+                hid=hid,
+                dataset_id=i,
+                history_id=history_id,
+                deleted=random_.random() < 0.1,
+                purged=False,
+                visible=random_.random() > 0.2,
+            )
+            for i, hid in zip(ids, hids)
+        ],
+    )
+
+
+def _percentile(values, percent):
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""Measure the time taken to encode and decode database ids for the API.
+
+Encodes and decodes a range of ids one by one, as serializers did, and in bulk
+with ``encode_ids`` and ``decode_ids``, with the id caches empty (first pass)
+and filled (second pass).
+
+% python test/manual/id_encoding_benchmark.py --ids 1000000
+% python test/manual/id_encoding_benchmark.py --ids 100000 --kind history
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.security.idencoding import IdEncodingHelper
+
+DESCRIPTION = "Benchmark encoding and decoding many database ids."
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--ids", type=int, default=1000000)
+    arg_parser.add_argument("--kind", default=None)
+    args = arg_parser.parse_args(argv)
+
+    ids = list(range(1, args.ids + 1))
+    # keep all ids cached for the second pass
+    helper = IdEncodingHelper(id_secret="benchmark", id_cache_size=args.ids)
+    uncached_helper = IdEncodingHelper(id_secret="benchmark", id_cache_size=0)
+    encoded_ids = _time("encode_id, no cache", lambda: [uncached_helper.encode_id(i, kind=args.kind) for i in ids])
+    _time("decode_id, no cache", lambda: [uncached_helper.decode_id(i, kind=args.kind) for i in encoded_ids])
+    for cache_pass in ("first", "second"):
+        assert _time(f"encode_ids, {cache_pass} pass", lambda: helper.encode_ids(ids, kind=args.kind)) == encoded_ids
+        assert _time(f"decode_ids, {cache_pass} pass", lambda: helper.decode_ids(encoded_ids, kind=args.kind)) == ids
+    _time("encode_id, cached", lambda: [helper.encode_id(i, kind=args.kind) for i in ids])
+    _time("decode_id, cached", lambda: [helper.decode_id(i, kind=args.kind) for i in encoded_ids])
+
+
+def _time(description, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print(f"{description}: {elapsed:.2f}s ({len(result) / elapsed:,.0f} ids/s)")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""Compare per-cycle latency of the job handler's readiness strategies.
+
+Seeds a database with ``new`` jobs whose inputs are mostly not ready yet (as is
+the case for jobs queued behind running workflow steps) and times repeated
+monitor cycles using the anti-join query and the incremental readiness index.
+
+% python test/manual/job_readiness_benchmark.py --jobs 100000
+% python test/manual/job_readiness_benchmark.py --jobs 100000 --database_connection postgresql://galaxy@localhost/readiness
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import insert
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy import model
+from galaxy.jobs.readiness import (
+    JobReadinessIndex,
+    query_ready_jobs,
+)
+from galaxy.model import mapping
+
+DESCRIPTION = "Benchmark job readiness checks of the job handler monitor loop."
+HANDLER = "benchmark_handler"
+ROW_BATCH_SIZE = 10000
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--database_connection", default=None)
+    arg_parser.add_argument("--jobs", type=int, default=100000)
+    arg_parser.add_argument("--users", type=int, default=50)
+    arg_parser.add_argument("--ready_fraction", type=float, default=0.01)
+    arg_parser.add_argument("--ready_window_size", type=int, default=100)
+    arg_parser.add_argument("--cycles", type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    database_connection = args.database_connection
+    if database_connection is None:
+        database_connection = f"sqlite:///{tempfile.mkdtemp()}/readiness.sqlite"
+    galaxy_model = mapping.init(tempfile.gettempdir(), database_connection, create_tables=True)
+    session = galaxy_model.session
+    unready_datasets = _seed(galaxy_model.engine, session, args)
+
+    timings = {"query": [], "index": []}
+    index = JobReadinessIndex(HANDLER, args.ready_window_size)
+    for cycle in range(args.cycles):
+        # Simulate progress of the upstream jobs between monitor cycles.
+        _finish_some(galaxy_model.engine, unready_datasets, args.ready_fraction)
+        session.expunge_all()
+        start = time.perf_counter()
+        query_jobs = query_ready_jobs(session, HANDLER, args.ready_window_size)
+        timings["query"].append(time.perf_counter() - start)
+        session.expunge_all()
+        start = time.perf_counter()
+        index_jobs = index.ready_jobs(session)
+        timings["index"].append(time.perf_counter() - start)
+        # Dispatch the ready jobs, as the handler would.
+        _dispatch(galaxy_model.engine, query_jobs)
+        print(
+            f"cycle {cycle}: query {timings['query'][-1]:.3f}s ({len(query_jobs)} jobs), "
+            f"index {timings['index'][-1]:.3f}s ({len(index_jobs)} jobs)"
+        )
+    for strategy, values in timings.items():
+        warm = values[1:] or values
+        print(f"{strategy}: first cycle {values[0]:.3f}s, mean of later cycles {sum(warm) / len(warm):.3f}s")
+
+
+def _seed(engine, session, args):
+    print(f"Seeding {args.jobs} new jobs for {args.users} users...")
+    user_ids = []
+    for i in range(args.users):
+        user = model.User(email=f"user{i}@example.org", password="password")
+        session.add(user)
+        session.flush()
+        user_ids.append(user.id)
+    history = model.History(name="readiness benchmark")
+    session.add(history)
+    session.flush()
+    random_ = random.Random(1)
+    for first in range(0, args.jobs, ROW_BATCH_SIZE):
+        count = min(ROW_BATCH_SIZE, args.jobs - first)
+        ids = range(first + 1, first + count + 1)
+        with engine.begin() as connection:
+            _insert_batch(connection, ids, history.id, user_ids, random_)
+    return list(range(1, args.jobs + 1))
+
+
+def _insert_batch(connection, ids, history_id, user_ids, random_):
+    # Jobs have been queued for a while, as is the case behind long running workflow steps.
+    queued_time = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    connection.execute(
+        insert(model.Dataset.table),
+        [
+            dict(id=i, state=model.Dataset.states.RUNNING, deleted=False, purged=False, update_time=queued_time)
+            for i in ids
+        ],
+    )
+    connection.execute(
+        insert(model.HistoryDatasetAssociation.table),
+        [dict(id=i, dataset_id=i, history_id=history_id, deleted=False, visible=True) for i in ids],
+    )
+    connection.execute(
+        insert(model.Job.table),
+        [
+            dict(
+                id=i,
+                state=model.Job.states.NEW,
+                handler=HANDLER,
+                user_id=random_.choice(user_ids),
+                update_time=queued_time,
+            )
+            for i in ids
+        ],
+    )
+    connection.execute(
+        insert(model.JobToInputDatasetAssociation.table),
+        [dict(job_id=i, dataset_id=i, name="input1") for i in ids],
+    )
+
+
+def _dispatch(engine, jobs):
+    with engine.begin() as connection:
+        connection.execute(
+            model.Job.table.update()
+            .where(model.Job.table.c.id.in_([job.id for job in jobs]))
+            .values(state=model.Job.states.QUEUED)
+        )
+
+
+def _finish_some(engine, unready_datasets, fraction):
+    count = max(1, int(len(unready_datasets) * fraction))
+    finished = unready_datasets[:count]
+    del unready_datasets[:count]
+    with engine.begin() as connection:
+        connection.execute(
+            model.Dataset.table.update()
+            .where(model.Dataset.table.c.id.in_(finished))
+            .values(state=model.Dataset.states.OK)
+        )
+
+
+if __name__ == "__main__":
+    main()
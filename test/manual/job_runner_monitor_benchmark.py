@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Compare the duration of a job runner monitor pass with per-job and batched state checks.
+
+Runs the monitor logic of an asynchronous job runner against a fake resource
+manager that charges a fixed latency per request (e.g. a ``qstat``/``squeue``
+process spawn or a Kubernetes API round trip) plus a small cost per job
+returned, and reports how long one pass over all watched jobs takes when each
+job is checked individually and when jobs are checked in batches.
+
+% python test/manual/job_runner_monitor_benchmark.py --watched 100 1000 5000
+% python test/manual/job_runner_monitor_benchmark.py --request_latency 0.02 --batch_size 500
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.jobs.runners import AsynchronousJobRunner
+from galaxy.util.bunch import Bunch
+
+DESCRIPTION = "Benchmark per-job and batched state checks of a job runner monitor pass."
+
+
+class FakeResourceManager:
+    def __init__(self, request_latency, job_latency):
+        self.request_latency = request_latency
+        self.job_latency = job_latency
+        self.requests = 0
+
+    def job_status(self, job_id):
+        return self.job_statuses([job_id])[job_id]
+
+    def job_statuses(self, job_ids):
+        self.requests += 1
+        time.sleep(self.request_latency + self.job_latency * len(job_ids))
+        return {job_id: "running" for job_id in job_ids}
+
+
+class FakeJobRunner(AsynchronousJobRunner):
+    runner_name = "FakeJobRunner"
+
+    def __init__(self, resource_manager, batch_size):
+        app = Bunch(config=Bunch(redact_email_in_job_name=False), model=Bunch(context=None))
+        super().__init__(app, 1)
+        self.resource_manager = resource_manager
+        self.MAX_WATCHED_ITEMS_PER_BATCH = batch_size
+
+    def check_watched_item(self, job_state):
+        self.resource_manager.job_status(job_state)
+        return job_state
+
+
+class FakeBatchJobRunner(FakeJobRunner):
+    runner_name = "FakeBatchJobRunner"
+
+    def check_watched_items_batch(self, job_states):
+        states = self.resource_manager.job_statuses(job_states)
+        return [job_state for job_state in job_states if states[job_state] == "running"]
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--watched", type=int, nargs="+", default=[100, 1000, 5000])
+    arg_parser.add_argument("--request_latency", type=float, default=0.005)
+    arg_parser.add_argument("--job_latency", type=float, default=0.00001)
+    arg_parser.add_argument("--batch_size", type=int, default=AsynchronousJobRunner.MAX_WATCHED_ITEMS_PER_BATCH)
+    args = arg_parser.parse_args(argv)
+
+    for watched in args.watched:
+        results = []
+        for runner_class in (FakeJobRunner, FakeBatchJobRunner):
+            resource_manager = FakeResourceManager(args.request_latency, args.job_latency)
+            runner = runner_class(resource_manager, args.batch_size)
+            runner.watched = list(range(1, watched + 1))
+            start = time.perf_counter()
+            runner.check_watched_items()
+            elapsed = time.perf_counter() - start
+            assert len(runner.watched) == watched
+            results.append(f"{runner_class.runner_name} {elapsed:.3f}s ({resource_manager.requests} requests)")
+        print(f"{watched} watched jobs: {', '.join(results)}")
+
+
+if __name__ == "__main__":
+    main()
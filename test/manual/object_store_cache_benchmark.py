@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Compare scan-based and index-based eviction for the object store cache.
+
+Creates a synthetic cache tree laid out like an object store cache (hashed
+``000/dataset_N.dat`` directories) and times one cache check that evicts a
+fraction of the files, using the directory walk formerly performed by the
+S3/cloud/Azure cache monitors and the SQLite cache index.
+
+% python test/manual/object_store_cache_benchmark.py --files 1000000
+% python test/manual/object_store_cache_benchmark.py --files 100000 --cache_path /mnt/scratch/cache_bench
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.objectstore.caching import (
+    CACHE_INDEX_FILENAME,
+    CacheIndex,
+    CacheTarget,
+    check_cache,
+)
+from galaxy.util import directory_hash_id
+
+DESCRIPTION = "Benchmark object store cache eviction with a directory scan and with the cache index."
+FILE_SIZE = 1024
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--files", type=int, default=1000000)
+    arg_parser.add_argument("--evict_fraction", type=float, default=0.01)
+    arg_parser.add_argument("--cache_path", default=None)
+    args = arg_parser.parse_args(argv)
+
+    cache_path = args.cache_path or tempfile.mkdtemp()
+    try:
+        print(f"Creating {args.files} cached files in {cache_path}...")
+        _populate(cache_path, args.files)
+        total_size = args.files * FILE_SIZE
+        # Size the cache so that a check evicts ``evict_fraction`` of the files
+        cache_size = int(total_size * (1 - args.evict_fraction))
+        target = CacheTarget(path=cache_path, size=cache_size, high_watermark=0.9999, low_watermark=0.9999)
+
+        start = time.perf_counter()
+        freed = _scan_and_evict(cache_path, target)
+        print(f"scan: evicted {freed} bytes in {time.perf_counter() - start:.2f}s")
+
+        # Repopulate the evicted files so both strategies start from the same state
+        _populate(cache_path, args.files)
+        index = CacheIndex(cache_path)
+        start = time.perf_counter()
+        index.rebuild()
+        print(f"index: initial build {time.perf_counter() - start:.2f}s (once, when the index is created)")
+        start = time.perf_counter()
+        freed = check_cache(target, index)
+        print(f"index: evicted {freed} bytes in {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        check_cache(target, index)
+        print(f"index: check below the high watermark {time.perf_counter() - start:.4f}s")
+    finally:
+        if args.cache_path is None:
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+
+def _populate(cache_path, files):
+    content = b"x" * FILE_SIZE
+    for i in range(files):
+        rel_path = os.path.join(*directory_hash_id(i), f"dataset_{i}.dat")
+        path = os.path.join(cache_path, rel_path)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+
+def _scan_and_evict(cache_path, target):
+    # The eviction strategy the cache monitors used before the cache index.
+    total_size = 0
+    file_list = []
+    for dirpath, _, filenames in os.walk(cache_path):
+        for filename in filenames:
+            if filename.startswith(CACHE_INDEX_FILENAME):
+                continue
+            filepath = os.path.join(dirpath, filename)
+            file_size = os.path.getsize(filepath)
+            total_size += file_size
+            last_access_time = time.localtime(os.stat(filepath)[7])
+            file_list.append((last_access_time, filepath, file_size))
+    file_list.sort()
+    if total_size <= target.high_watermark_size:
+        return 0
+    delete_this_much = total_size - target.low_watermark_size
+    deleted_amount = 0
+    for _, filepath, file_size in file_list:
+        if deleted_amount >= delete_this_much:
+            break
+        deleted_amount += file_size
+        os.remove(filepath)
+    return deleted_amount
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Measure the time taken to split a FASTQ file into parts for parallel tasks.
+
+Writes a FASTQ file of the requested size (unless it exists), plans the split
+as the job handler does (counting lines, or using line offsets metadata if
+``--set-meta`` is given) and extracts all parts as tasks do, with ``--processes``
+parts extracted at the same time. ``--legacy`` extracts parts with the
+previous ``tail | head`` commands instead.
+
+% python test/manual/sequence_split_benchmark.py --size 50GB --parts 100 --processes 16 /scratch/reads.fastq
+% python test/manual/sequence_split_benchmark.py --size 1GB --parts 100 --legacy /tmp/reads.fastq
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.datatypes.sequence import (
+    FastqSanger,
+    Sequence,
+)
+from galaxy.util import size_to_bytes
+
+DESCRIPTION = "Benchmark splitting a FASTQ file into parts."
+
+
+class Metadata:
+    sequences = None
+    line_offsets = None
+
+
+class Dataset:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.metadata = Metadata()
+        self.copied_from_library_dataset_dataset_association = None
+
+    def get_size(self):
+        return os.path.getsize(self.file_name)
+
+    def get_converted_files_by_type(self, file_type):
+        return None
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("path", help="FASTQ file to split, written if it does not exist")
+    arg_parser.add_argument("--size", default="1GB", help="size of the FASTQ file to write")
+    arg_parser.add_argument("--parts", type=int, default=100)
+    arg_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    arg_parser.add_argument("--set-meta", action="store_true", help="set line offsets metadata before splitting")
+    arg_parser.add_argument("--legacy", action="store_true", help="extract parts with tail and head commands")
+    args = arg_parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        _time("write FASTQ", lambda: _write_fastq(args.path, size_to_bytes(args.size)))
+    dataset = Dataset(args.path)
+    if args.set_meta:
+        _time("set metadata", lambda: FastqSanger().set_meta(dataset))
+    with tempfile.TemporaryDirectory() as work_dir:
+        part_dirs = []
+
+        def subdir():
+            part_dir = os.path.join(work_dir, f"task_{len(part_dirs)}")
+            os.mkdir(part_dir)
+            part_dirs.append(part_dir)
+            return part_dir
+
+        split_params = dict(split_mode="number_of_parts", split_size=args.parts)
+        _time("plan split", lambda: FastqSanger.split([dataset], subdir, split_params))
+        split_infos = []
+        for part_dir in part_dirs:
+            with open(os.path.join(part_dir, f"split_info_{os.path.basename(args.path)}.json")) as f:
+                split_infos.append(json.load(f))
+        extract = _extract_legacy if args.legacy else FastqSanger.process_split_file
+        with Pool(args.processes) as pool:
+            _time(f"extract {len(split_infos)} parts", lambda: pool.map(extract, split_infos))
+        total_size = sum(os.path.getsize(split_info["output_name"]) for split_info in split_infos)
+        assert total_size == os.path.getsize(args.path), "parts do not add up to the input file"
+
+
+def _write_fastq(path, size):
+    random.seed(1)
+    records = []
+    for i in range(10000):
+        length = random.randint(100, 150)
+        bases = "".join(random.choice("ACGT") for _ in range(length))
+        records.append(f"@read{i}\n{bases}\n+\n{'I' * length}\n")
+    block = "".join(records).encode()
+    with open(path, "wb") as f:
+        while f.tell() < size:
+            f.write(block)
+
+
+def _extract_legacy(split_info):
+    args = split_info["args"]
+    for cmd in Sequence.get_split_commands_sequential(
+        False, split_info["input_name"], split_info["output_name"], args["start_sequence"], args["num_sequences"]
+    ):
+        subprocess.check_call(cmd, shell=True)
+
+
+def _time(description, function):
+    start = time.perf_counter()
+    function()
+    print(f"{description}: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Measure the time taken to set the metadata of large tabular datasets.
+
+Generates a tab separated file with columns of ints, floats, lists and strings,
+and a few comment lines, and times ``Tabular.set_meta`` reading all its lines
+and sampling its first data lines.
+
+% python test/manual/tabular_set_meta_benchmark.py --lines 5000000
+% python test/manual/tabular_set_meta_benchmark.py --file big.tsv --max_data_lines 100000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.datatypes.tabular import (
+    MAX_DATA_LINES,
+    Tabular,
+)
+
+DESCRIPTION = "Benchmark setting the metadata of a large tabular dataset."
+
+
+class Metadata:
+    pass
+
+
+class Dataset:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.metadata = Metadata()
+
+    def has_data(self):
+        return True
+
+    def get_size(self):
+        return os.path.getsize(self.file_name)
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--file", default=None, help="existing tabular file to use instead of a generated one")
+    arg_parser.add_argument("--lines", type=int, default=1000000)
+    arg_parser.add_argument("--max_data_lines", type=int, default=MAX_DATA_LINES)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    file_name = args.file
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if file_name is None:
+            file_name = os.path.join(temp_dir, "benchmark.tabular")
+            _generate(file_name, args.lines)
+        size = os.path.getsize(file_name) / 2**20
+        for mode, max_data_lines in (("all lines", None), ("sampled", args.max_data_lines)):
+            timings = []
+            for _ in range(args.repeat):
+                dataset = Dataset(file_name)
+                start = time.perf_counter()
+                Tabular().set_meta(dataset, max_data_lines=max_data_lines)  # type: ignore[arg-type]
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            metadata = dataset.metadata
+            print(
+                f"{mode}: {best:.2f}s ({size / best:.1f} MB/s), {metadata.data_lines} data lines, "
+                f"{metadata.comment_lines} comment lines, column types {metadata.column_types}"
+            )
+
+
+def _generate(file_name, lines):
+    print(f"Generating a tabular file of {lines} lines...")
+    random_ = random.Random(1)
+    with open(file_name, "w") as out:
+        out.write("#chrom\tstart\tscore\tids\tname\n")
+        for i in range(lines):
+            if i and not i % 100000:
+                out.write("# progress\n")
+            out.write(
+                f"chr{random_.randrange(1, 23)}\t{random_.randrange(10**9)}\t{random_.random():.6g}\t"
+                f"{i},{i + 1}\tfeature_{i}\n"
+            )
+
+
+if __name__ == "__main__":
+    main()
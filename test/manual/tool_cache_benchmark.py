@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""Measure tool source loading with and without the tool document cache.
+
+Generates a toolbox of tools grouped in repositories that share a macro file
+(as is common for Tool Shed repositories) and times loading the expanded tool
+sources of all tools without the cache, with a cold cache (populating it) and
+with a warm cache, following the code path of ``ToolBox.create_tool``.
+
+% python test/manual/tool_cache_benchmark.py --tools 5000
+% python test/manual/tool_cache_benchmark.py --tools 5000 --tools_per_repository 20 --cache_dir /mnt/nfs/tool_cache
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.tool_util.parser import get_tool_source
+from galaxy.tools.cache import ToolDocumentCache
+from galaxy.util import etree
+
+DESCRIPTION = "Benchmark loading tool sources with and without the tool document cache."
+
+MACROS_XML = """<macros>
+    <token name="@VERSION@">1.0</token>
+    <xml name="requirements">
+        <requirements>
+            <requirement type="package" version="@VERSION@">bench</requirement>
+        </requirements>
+    </xml>
+    <xml name="inputs">
+        <param name="input" type="data" format="tabular" label="Input" />
+        <param name="columns" type="data_column" data_ref="input" multiple="true" />
+        <conditional name="mode">
+            <param name="select" type="select">
+                <option value="fast">Fast</option>
+                <option value="slow">Slow</option>
+            </param>
+            <when value="fast" />
+            <when value="slow">
+                <param name="iterations" type="integer" value="10" />
+            </when>
+        </conditional>
+    </xml>
+</macros>
+"""
+
+TOOL_XML = """<tool id="bench_tool_%(index)d" name="Benchmark tool %(index)d" version="@VERSION@">
+    <macros>
+        <import>macros.xml</import>
+    </macros>
+    <expand macro="requirements" />
+    <command>bench '$input' > '$output'</command>
+    <inputs>
+        <expand macro="inputs" />
+    </inputs>
+    <outputs>
+        <data name="output" format="tabular" />
+    </outputs>
+    <help>Tool %(index)d</help>
+</tool>
+"""
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--tools", type=int, default=5000)
+    arg_parser.add_argument("--tools_per_repository", type=int, default=10)
+    arg_parser.add_argument("--cache_dir", default=None)
+    args = arg_parser.parse_args(argv)
+
+    tool_dir = tempfile.mkdtemp()
+    cache_dir = args.cache_dir or tempfile.mkdtemp()
+    try:
+        config_files = _generate_tools(tool_dir, args.tools, args.tools_per_repository)
+        print(f"Generated {len(config_files)} tools in {tool_dir}")
+
+        start = time.perf_counter()
+        for config_file in config_files:
+            get_tool_source(config_file)
+        print(f"no cache: {time.perf_counter() - start:.2f}s")
+
+        cache = ToolDocumentCache(cache_dir)
+        start = time.perf_counter()
+        _load(cache, config_files)
+        print(f"cold cache: {time.perf_counter() - start:.2f}s")
+        cache.close()
+
+        cache = ToolDocumentCache(cache_dir)
+        start = time.perf_counter()
+        hits = _load(cache, config_files)
+        print(f"warm cache: {time.perf_counter() - start:.2f}s ({hits} hits)")
+        cache.close()
+    finally:
+        shutil.rmtree(tool_dir, ignore_errors=True)
+        if args.cache_dir is None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _load(cache, config_files):
+    hits = 0
+    for config_file in config_files:
+        tool_document = cache.get(config_file)
+        if tool_document:
+            hits += 1
+            get_tool_source(
+                config_file=config_file,
+                xml_tree=etree.ElementTree(etree.fromstring(tool_document["document"].encode("utf-8"))),
+                macro_paths=tool_document["macro_paths"],
+            )
+        else:
+            cache.set(config_file, get_tool_source(config_file))
+    return hits
+
+
+def _generate_tools(tool_dir, tools, tools_per_repository):
+    config_files = []
+    for index in range(tools):
+        repository_dir = os.path.join(tool_dir, f"repository_{index // tools_per_repository}")
+        if not os.path.exists(repository_dir):
+            os.makedirs(repository_dir)
+            with open(os.path.join(repository_dir, "macros.xml"), "w") as f:
+                f.write(MACROS_XML)
+        config_file = os.path.join(repository_dir, f"tool_{index}.xml")
+        with open(config_file, "w") as f:
+            f.write(TOOL_XML % {"index": index})
+        config_files.append(config_file)
+    return config_files
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""Measure creating the jobs of a tool mapped over a large collection.
+
+Creates a list collection of private datasets and times ``galaxy.tools.execute.execute``
+creating one job per element, as happens when a tool is run over a collection from the
+tool form or a workflow step. The time per job should not grow with the collection size.
+
+% python test/manual/tool_execute_benchmark.py --elements 1000 10000
+% python test/manual/tool_execute_benchmark.py --elements 10000 --database_connection postgresql://galaxy@localhost/execute
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy import model
+from galaxy.app_unittest_utils.galaxy_mock import MockApp
+from galaxy.app_unittest_utils.tools_support import datatypes_registry  # noqa: F401 - sets the model's datatypes
+from galaxy.managers.collections import DatasetCollectionManager
+from galaxy.model.dataset_collections.matching import (
+    CollectionsToMatch,
+    MatchingCollections,
+)
+from galaxy.tool_util.parser import get_tool_source
+from galaxy.tools import create_tool_from_source
+from galaxy.tools.execute import (
+    execute,
+    MappingParameters,
+)
+
+DESCRIPTION = "Benchmark creating the jobs of a tool mapped over a large collection."
+
+TOOL_XML = """<tool id="bench_cat" name="Benchmark cat" version="1.0">
+    <command>cat '$input1' > '$out1'</command>
+    <inputs>
+        <param name="input1" type="data" format="txt" />
+        <param name="lines" type="integer" value="10" />
+    </inputs>
+    <outputs>
+        <data name="out1" format="txt" />
+    </outputs>
+</tool>
+"""
+
+
+class BenchmarkTrans:
+    def __init__(self, app, history, user, roles):
+        self.app = app
+        self.history = history
+        self.user = user
+        self.sa_session = app.model.context
+        self.model = app.model
+        self.user_is_admin = False
+        self.user_is_active = True
+        self._roles = roles
+
+    def check_user_activation(self):
+        pass
+
+    def db_dataset_for(self, input_db_key):
+        return None
+
+    def get_galaxy_session(self):
+        return model.GalaxySession()
+
+    def get_current_user_roles(self):
+        return self._roles
+
+    def log_event(self, *args, **kwargs):
+        pass
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--elements", type=int, nargs="+", default=[1000, 10000])
+    arg_parser.add_argument("--database_connection", default=None)
+    args = arg_parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        app_kwds = {}
+        if args.database_connection:
+            app_kwds["database_connection"] = args.database_connection
+        app = MockApp(**app_kwds)
+        app.config.new_file_path = os.path.join(work_dir, "new_files")
+        app.dataset_collection_manager = app[DatasetCollectionManager]
+        tool_file = os.path.join(work_dir, "bench_cat.xml")
+        with open(tool_file, "w") as f:
+            f.write(TOOL_XML)
+        tool = create_tool_from_source(app, get_tool_source(tool_file), config_file=tool_file)
+
+        session = app.model.context
+        user = model.User(email="bench@example.org", password="password")
+        role = model.Role(name="bench@example.org", type=model.Role.types.PRIVATE)
+        session.add_all([user, role])
+        session.flush()
+        for elements in args.elements:
+            history = model.History(name=f"map over {elements}", user=user)
+            session.add(history)
+            session.flush()
+            trans = BenchmarkTrans(app, history, user, [role])
+            hdca, hdas = _collection(session, history, role, work_dir, elements)
+            collections_to_match = CollectionsToMatch()
+            collections_to_match.add("input1", hdca)
+            collection_info = MatchingCollections.for_collections(
+                collections_to_match, app.dataset_collection_manager.collection_type_descriptions
+            )
+            mapping_params = MappingParameters(
+                {"input1": None, "lines": 10}, [{"input1": hda, "lines": 10} for hda in hdas]
+            )
+            start = time.perf_counter()
+            execution_tracker = execute(
+                trans,
+                tool,
+                mapping_params,
+                history,
+                collection_info=collection_info,
+                completed_jobs=dict.fromkeys(range(elements)),
+            )
+            elapsed = time.perf_counter() - start
+            assert not execution_tracker.execution_errors, execution_tracker.execution_errors
+            print(
+                f"{len(execution_tracker.successful_jobs)} jobs: {elapsed:.2f}s ({1000 * elapsed / elements:.2f}ms per job)"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _collection(session, history, role, work_dir, elements):
+    path = os.path.join(work_dir, "input.txt")
+    with open(path, "w") as f:
+        f.write("line\n")
+    collection = model.DatasetCollection(collection_type="list")
+    hdas = []
+    for index in range(elements):
+        hda = model.HistoryDatasetAssociation(extension="txt", visible=False)
+        hda.dataset = model.Dataset(state=model.Dataset.states.OK, external_filename=path)
+        for action in (
+            model.Dataset.permitted_actions.DATASET_ACCESS,
+            model.Dataset.permitted_actions.DATASET_MANAGE_PERMISSIONS,
+        ):
+            session.add(model.DatasetPermissions(action.action, hda.dataset, role))
+        model.DatasetCollectionElement(
+            collection=collection, element=hda, element_identifier=f"e{index}", element_index=index
+        )
+        hdas.append(hda)
+    history.add_datasets(session, hdas, quota=False)
+    hdca = model.HistoryDatasetCollectionAssociation(collection=collection, name="inputs")
+    history.add_dataset_collection(hdca)
+    session.flush()
+    return hdca, hdas
+
+
+if __name__ == "__main__":
+    main()
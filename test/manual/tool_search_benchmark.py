@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""Measure updating the toolbox search index after installing a tool.
+
+Indexes a toolbox of generated tools, then times updating the index after
+installing one more tool, and after another Galaxy process sharing the index
+directory updates it with the same toolbox (as happens when every web worker
+handles the ``rebuild_toolbox_search_index`` control task).
+
+% python test/manual/tool_search_benchmark.py --tools 5000
+% python test/manual/tool_search_benchmark.py --tools 5000 --index_dir /mnt/nfs/tool_search_index
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.config import GalaxyAppConfiguration
+from galaxy.tools.search import ToolPanelViewSearch
+from galaxy.util.bunch import Bunch
+
+DESCRIPTION = "Benchmark updating the toolbox search index after installing a tool."
+
+HELP = """
+**What it does**
+
+Runs benchmark tool %(index)d on the input dataset, writing one line per
+record with the selected columns. Options control the ordering of records.
+"""
+
+
+class BenchmarkToolCache:
+    def __init__(self):
+        self._tools_by_id = {}
+        self._tool_paths_by_id = {}
+        self._new_tool_ids = set()
+        self._removed_tool_ids = set()
+
+    def add(self, tool):
+        self._tools_by_id[tool.id] = tool
+        self._tool_paths_by_id[tool.id] = f"{tool.id}.xml"
+        self._new_tool_ids.add(tool.id)
+
+    def get_tool_by_id(self, tool_id):
+        return self._tools_by_id.get(tool_id)
+
+    def reset_status(self):
+        self._new_tool_ids = set()
+        self._removed_tool_ids = set()
+
+
+class BenchmarkToolBox:
+    def __init__(self, tool_cache):
+        self.tool_cache = tool_cache
+
+    def get_tool(self, tool_id):
+        return self.tool_cache.get_tool_by_id(tool_id)
+
+    def panel_has_tool(self, tool, panel_view_id):
+        return True
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--tools", type=int, default=5000)
+    arg_parser.add_argument("--index_dir", default=None)
+    args = arg_parser.parse_args(argv)
+
+    index_dir = args.index_dir or tempfile.mkdtemp()
+    try:
+        config = GalaxyAppConfiguration(override_tempdir=False)
+        tool_cache = BenchmarkToolCache()
+        for index in range(args.tools):
+            tool_cache.add(_tool(index))
+        toolbox = BenchmarkToolBox(tool_cache)
+
+        panel_search = ToolPanelViewSearch("default", index_dir, config=config)
+        start = time.perf_counter()
+        panel_search.build_index(tool_cache, toolbox)
+        print(f"initial index of {args.tools} tools: {time.perf_counter() - start:.2f}s")
+
+        # Installing a tool reloads the toolbox, only the new tool is new in the tool cache
+        tool_cache.reset_status()
+        tool_cache.add(_tool(args.tools))
+        start = time.perf_counter()
+        panel_search.build_index(tool_cache, toolbox)
+        print(f"reindex after installing one tool: {time.perf_counter() - start:.2f}s")
+
+        # A freshly started process sees all tools as new
+        other_tool_cache = BenchmarkToolCache()
+        for tool in tool_cache._tools_by_id.values():
+            other_tool_cache.add(tool)
+        other_panel_search = ToolPanelViewSearch("default", index_dir, config=config)
+        start = time.perf_counter()
+        other_panel_search.build_index(other_tool_cache, BenchmarkToolBox(other_tool_cache))
+        print(f"reindex by another process sharing the index: {time.perf_counter() - start:.2f}s")
+    finally:
+        if args.index_dir is None:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+
+def _tool(index):
+    return Bunch(
+        id=f"bench_tool_{index}",
+        name=f"Benchmark tool {index}",
+        version="1.0",
+        description=f"sorts and filters records ({index % 50})",
+        tool_type="default",
+        guid=None,
+        labels=[],
+        raw_help=HELP % {"index": index},
+        edam_operations="",
+        edam_topics="",
+        hidden=False,
+        is_latest_version=True,
+        get_panel_section=lambda: (f"section_{index % 20}", f"Section {index % 20}"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Measure workflow invocation scheduling throughput and latency on a handler.
+
+Runs the scheduling loop of the workflow request monitor against synthetic
+invocations: each invocation needs ``--passes`` scheduling passes that take
+``--pass-ms`` milliseconds each, except for the invocations of one heavy user
+(e.g. mapping over a huge collection) whose passes take ``--heavy-pass-ms``.
+Reports the number of passes per second and the time it took for the
+invocations to finish, for all invocations and for the light users only.
+
+% python test/manual/workflow_scheduling_benchmark.py --invocations 2000 --users 50 --threads 1
+% python test/manual/workflow_scheduling_benchmark.py --invocations 2000 --users 50 --threads 8 --time-budget 1
+"""
+import os
+import random
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [os.path.join(galaxy_root, "lib")]
+
+from galaxy.workflow.scheduling_manager import WorkflowRequestMonitor
+
+DESCRIPTION = "Benchmark scheduling synthetic workflow invocations."
+HEAVY_USER_ID = 0
+
+
+class SyntheticWorkflowRequestMonitor(WorkflowRequestMonitor):
+    def __init__(self, invocations, passes, pass_seconds, heavy_pass_seconds, threads):
+        self.monitor_running = True
+        self.invocations = invocations
+        self.remaining_passes = {invocation_id: passes for invocation_id in invocations}
+        self.pass_seconds = pass_seconds
+        self.heavy_pass_seconds = heavy_pass_seconds
+        self.finished = {}
+        self.passes = 0
+        self.passes_lock = threading.Lock()
+        self._init_scheduling(threads)
+
+    def _active_invocation_ids(self, scheduler_id, since=None):
+        with self.passes_lock:
+            return [invocation_id for invocation_id, passes in self.remaining_passes.items() if passes]
+
+    def _history_and_user_ids(self, invocation_ids):
+        return {invocation_id: self.invocations[invocation_id] for invocation_id in invocation_ids}
+
+    def _attempt_schedule(self, invocation_id, workflow_scheduler):
+        if not self.remaining_passes[invocation_id]:
+            # no longer active, e.g. deferred from an earlier iteration
+            return False
+        user_id = self.invocations[invocation_id][1]
+        time.sleep(self.heavy_pass_seconds if user_id == HEAVY_USER_ID else self.pass_seconds)
+        with self.passes_lock:
+            self.passes += 1
+            self.remaining_passes[invocation_id] -= 1
+            if not self.remaining_passes[invocation_id]:
+                self.finished[invocation_id] = time.monotonic()
+        return True
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--invocations", type=int, default=1000)
+    arg_parser.add_argument("--users", type=int, default=20)
+    arg_parser.add_argument("--histories-per-user", type=int, default=5)
+    arg_parser.add_argument("--heavy-invocations", type=int, default=20, help="invocations of the heavy user")
+    arg_parser.add_argument("--passes", type=int, default=3, help="scheduling passes per invocation")
+    arg_parser.add_argument("--pass-ms", type=float, default=5)
+    arg_parser.add_argument("--heavy-pass-ms", type=float, default=500)
+    arg_parser.add_argument("--threads", type=int, default=1, help="workflow_scheduling_threads")
+    arg_parser.add_argument("--time-budget", type=float, default=0, help="workflow_monitor_time_budget")
+    arg_parser.add_argument("--sleep", type=float, default=1.0, help="workflow_monitor_sleep")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    args = arg_parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    invocations = {}
+    for invocation_id in range(args.heavy_invocations):
+        invocations[invocation_id] = (rng.randrange(args.histories_per_user), HEAVY_USER_ID)
+    for invocation_id in range(args.heavy_invocations, args.heavy_invocations + args.invocations):
+        user_id = rng.randrange(1, args.users + 1)
+        invocations[invocation_id] = (
+            user_id * args.histories_per_user + rng.randrange(args.histories_per_user),
+            user_id,
+        )
+
+    monitor = SyntheticWorkflowRequestMonitor(
+        invocations, args.passes, args.pass_ms / 1000.0, args.heavy_pass_ms / 1000.0, args.threads
+    )
+    start = time.monotonic()
+    iterations = 0
+    while len(monitor.finished) < len(invocations):
+        deadline = time.monotonic() + args.time_budget if args.time_budget > 0 else None
+        monitor._schedule("default", None, since=None, deadline=deadline)
+        iterations += 1
+        time.sleep(args.sleep)
+    elapsed = time.monotonic() - start
+    monitor.monitor_running = False
+    if monitor.scheduling_pool:
+        monitor.scheduling_pool.shutdown()
+
+    latencies = [finished - start for finished in monitor.finished.values()]
+    light_latencies = [
+        finished - start
+        for invocation_id, finished in monitor.finished.items()
+        if invocations[invocation_id][1] != HEAVY_USER_ID
+    ]
+    print(f"{len(invocations)} invocations, {monitor.passes} scheduling passes in {elapsed:.1f}s")
+    print(f"{iterations} iterations, {monitor.passes / elapsed:.1f} passes/s")
+    for name, values in (("all", latencies), ("light users", light_latencies)):
+        if values:
+            print(
+                f"{name}: p50 {percentile(values, 0.5):.1f}s, p95 {percentile(values, 0.95):.1f}s, "
+                f"p99 {percentile(values, 0.99):.1f}s, max {max(values):.1f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -208,6 +208,9 @@ class TestSimpleJobConfXmlParser(BaseJobConfXmlParserTestCase):
         assert limits.output_size is None
         assert limits.destination_user_concurrent_jobs == {}
         assert limits.destination_total_concurrent_jobs == {}
+        assert limits.tool_user_concurrent_jobs == {}
+        assert limits.tool_total_concurrent_jobs == {}
+        assert limits.group_concurrent_jobs == {}
 
     def test_conditional_runners(self):
         self._write_config_from(CONDITIONAL_RUNNER_JOB_CONF)
@@ -285,10 +288,53 @@ class TestAdvancedJobConfXmlParser(BaseJobConfXmlParserTestCase):
         assert limits.destination_user_concurrent_jobs["local"] == 1
         assert limits.destination_user_concurrent_jobs["mycluster"] == 2
         assert limits.destination_user_concurrent_jobs["longjobs"] == 1
+        assert limits.tool_user_concurrent_jobs["bwa"] == 2
+        assert limits.tool_total_concurrent_jobs["bwa"] == 20
+        assert limits.group_concurrent_jobs["training"] == 10
         assert limits.walltime_delta == datetime.timedelta(0, 0, 0, 0, 0, 24)
         assert limits.total_walltime["delta"] == datetime.timedelta(0, 0, 0, 0, 0, 24)
         assert limits.total_walltime["window"] == 30
 
+    def test_limit_without_id_is_ignored(self):
+        if self.extension == "xml":
+            self._write_config(
+                """<?xml version="1.0"?>
+<job_conf>
+    <plugins>
+        <plugin id="local" type="runner" load="galaxy.jobs.runners.local:LocalJobRunner" workers="4"/>
+    </plugins>
+    <destinations>
+        <destination id="local" runner="local"/>
+    </destinations>
+    <limits>
+        <limit type="tool_user_concurrent_jobs">2</limit>
+        <limit type="tool_total_concurrent_jobs" id="bwa">20</limit>
+    </limits>
+</job_conf>
+"""
+            )
+        else:
+            self._write_config(
+                """runners:
+  local:
+    load: galaxy.jobs.runners.local:LocalJobRunner
+execution:
+  default: local
+  environments:
+    local:
+      runner: local
+limits:
+- type: tool_user_concurrent_jobs
+  value: 2
+- type: tool_total_concurrent_jobs
+  id: bwa
+  value: 20
+"""
+            )
+        limits = self.job_config.limits
+        assert limits.tool_user_concurrent_jobs == {}
+        assert limits.tool_total_concurrent_jobs["bwa"] == 20
+
     def test_env_parsing(self):
         self._with_advanced_config()
         env_dest = self.job_config.destinations["java_cluster"][0]
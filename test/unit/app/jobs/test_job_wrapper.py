@@ -125,6 +125,9 @@ class MockJobQueue:
         self.app = app
         self.dispatcher = MockJobDispatcher(app)
 
+    def get_rule_job_counts(self):
+        return None
+
 
 class MockJobDispatcher:
     def __init__(self, app):
@@ -0,0 +1,161 @@
+from galaxy import model
+from galaxy.jobs import JobDestination
+from galaxy.jobs.limits import JobLimitCounts
+from galaxy.model import mapping
+from galaxy.util import bunch
+
+
+def test_no_limits():
+    job_limit_counts, users, _ = __job_limit_counts()
+    assert not job_limit_counts.has_concurrency_limits
+    assert job_limit_counts.exceeded_limit(__job(users[0], "cat1"), __destination("local")) is None
+    # nothing is counted without limits
+    job_limit_counts.add_job(users[0].id, "local", "cat1")
+    assert job_limit_counts._usage is None
+
+
+def test_user_limits():
+    job_limit_counts, users, _ = __job_limit_counts(registered_user_concurrent_jobs=3)
+    # user 1 has three running and queued jobs and a resubmitted one
+    assert job_limit_counts.exceeded_limit(__job(users[0], "cat1"), __destination("local")) == (
+        "registered_user_concurrent_jobs"
+    )
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) == (
+        "registered_user_concurrent_jobs"
+    )
+
+
+def test_destination_limits():
+    job_limit_counts, users, _ = __job_limit_counts(
+        destination_user_concurrent_jobs={"cluster": 2, "big": 3}, destination_total_concurrent_jobs={"local": 2}
+    )
+    assert job_limit_counts.exceeded_limit(__job(users[0], "cat1"), __destination("cluster")) == (
+        "destination_user_concurrent_jobs"
+    )
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("cluster")) is None
+    # limits on tags count the jobs of all destinations with the tag
+    assert job_limit_counts.exceeded_limit(__job(users[0], "cat1"), __destination("local2", tags=["big"])) == (
+        "destination_user_concurrent_jobs"
+    )
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) == (
+        "destination_total_concurrent_jobs"
+    )
+
+
+def test_tool_and_group_limits():
+    job_limit_counts, users, _ = __job_limit_counts(
+        tool_user_concurrent_jobs={"cat1": 2},
+        tool_total_concurrent_jobs={"bwa": 2},
+        group_concurrent_jobs={"lab": 2},
+    )
+    assert job_limit_counts.exceeded_limit(__job(users[0], "cat1"), __destination("local")) == (
+        "tool_user_concurrent_jobs"
+    )
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    assert job_limit_counts.exceeded_limit(__job(users[2], "bwa"), __destination("local")) is None
+    job_limit_counts.add_job(users[2].id, "local", "bwa")
+    assert job_limit_counts.exceeded_limit(__job(users[1], "bwa"), __destination("local")) == (
+        "tool_total_concurrent_jobs"
+    )
+    # users 2 and 3 are in the lab group
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) == "group_concurrent_jobs"
+    assert job_limit_counts.exceeded_limit(__job(users[0], "cat2"), __destination("local")) is None
+
+
+def test_uncached_user_counts():
+    job_limit_counts, users, app = __job_limit_counts(registered_user_concurrent_jobs=2, cache_user_job_count=False)
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) is None
+    # jobs dispatched by other handlers are counted
+    app.add(__new_job(user=users[1], destination_id="local", tool_id="cat1", state="queued"))
+    assert job_limit_counts.exceeded_limit(__job(users[1], "cat1"), __destination("local")) == (
+        "registered_user_concurrent_jobs"
+    )
+
+
+def test_to_dict():
+    job_limit_counts, users, _ = __job_limit_counts(group_concurrent_jobs={"lab": 4})
+    job_limit_counts.add_job(users[1].id, "local", "cat1")
+    usage = job_limit_counts.to_dict()
+    assert usage["limits"] == {"group_concurrent_jobs": {"lab": 4}}
+    assert usage["destinations"] == {"cluster": 3, "local": 2}
+    assert usage["tools"] == {"cat1": 4, "bwa": 1}
+    assert usage["groups"] == {"lab": 1}
+    assert usage["users"] == [
+        {"id": users[0].id, "active_jobs": 4, "destinations": {"cluster": 3}, "tools": {"cat1": 2, "bwa": 1}},
+        {"id": users[1].id, "active_jobs": 1, "destinations": {"local": 1}, "tools": {"cat1": 1}},
+    ]
+
+
+def __job_limit_counts(cache_user_job_count=True, **limits):
+    app = MockApp()
+    users = [model.User(email=f"u{i}@example.com", password="password") for i in range(1, 4)]
+    app.add(*users)
+    group = model.Group(name="lab")
+    app.add(group, model.UserGroupAssociation(users[1], group), model.UserGroupAssociation(users[2], group))
+    app.add(
+        __new_job(user=users[0], destination_id="cluster", tool_id="cat1", state="running"),
+        __new_job(user=users[0], destination_id="cluster", tool_id="cat1", state="queued"),
+        __new_job(user=users[0], destination_id="cluster", tool_id="bwa", state="queued"),
+        __new_job(user=users[0], destination_id="cluster", tool_id="cat1", state="resubmitted"),
+        __new_job(user=users[0], destination_id="cluster", tool_id="cat1", state="ok"),
+        __new_job(destination_id="local", tool_id="cat1", state="running"),
+        __new_job(user=users[2], tool_id="cat1", state="new"),
+    )
+    job_config = MockJobConfig(**limits)
+    return JobLimitCounts(app.model.context, job_config, cache_user_job_count=cache_user_job_count), users, app
+
+
+def __new_job(**kwds):
+    job = model.Job()
+    for key, value in kwds.items():
+        setattr(job, key, value)
+    return job
+
+
+def __job(user, tool_id):
+    return bunch.Bunch(id=None, user_id=user.id, tool_id=tool_id, galaxy_session=None)
+
+
+def __destination(id, tags=None):
+    return JobDestination(id=id, tags=tags)
+
+
+class MockJobConfig:
+    def __init__(self, **limits):
+        self.limits = bunch.Bunch(
+            registered_user_concurrent_jobs=None,
+            anonymous_user_concurrent_jobs=None,
+            destination_user_concurrent_jobs={},
+            destination_total_concurrent_jobs={},
+            tool_user_concurrent_jobs={},
+            tool_total_concurrent_jobs={},
+            group_concurrent_jobs={},
+        )
+        self.limits.__dict__.update(limits)
+        self.destinations = {
+            "big": [JobDestination(id="cluster", tags=["big"]), JobDestination(id="local2", tags=["big"])]
+        }
+
+    def get_destinations(self, id_or_tag):
+        return self.destinations.get(id_or_tag, [JobDestination(id=id_or_tag)])
+
+
+class MockApp:
+    def __init__(self):
+        self.model = mapping.init("/tmp", "sqlite:///:memory:", create_tables=True)
+
+    def add(self, *args):
+        for arg in args:
+            self.model.context.add(arg)
+        self.model.context.flush()
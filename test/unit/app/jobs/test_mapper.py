@@ -1,3 +1,4 @@
+import importlib
 import uuid
 
 from galaxy.jobs import (
@@ -8,8 +9,12 @@ from galaxy.jobs.mapper import (
     ERROR_MESSAGE_NO_RULE_FUNCTION,
     ERROR_MESSAGE_RULE_FUNCTION_NOT_FOUND,
     JobRunnerMapper,
+    RuleDecisionCache,
+)
+from galaxy.util import (
+    bunch,
+    StructuredExecutionTimer,
 )
-from galaxy.util import bunch
 from . import (
     test_rules,
     test_rules_override,
@@ -123,6 +128,65 @@ def test_dynamic_mapping_externally_set_job_destination():
     assert mapper.job_config.rule_response == "local_runner"
 
 
+def test_dynamic_mapping_rule_decision_cache():
+    calls = importlib.import_module(f"{test_rules.__name__}.10_site").CACHED_RULE_CALLS
+    calls.clear()
+    job_config = MockJobConfig()
+    destination = __dynamic_destination(dict(function="cached_rule", cache_ttl="60"))
+    for _ in range(3):
+        mapper = __mapper(destination, job_config=job_config)
+        assert mapper.get_job_destination({}) is DYNAMICALLY_GENERATED_DESTINATION
+        assert job_config.rule_response == "cached_1"
+    assert calls == [("testtoolshed/devteam/tool1/23abcd13123", "test@example.com")]
+    # the tool version and the user are part of the key
+    mapper = __mapper(destination, job_config=job_config)
+    mapper.job_wrapper.tool.version = "2.0"
+    mapper.get_job_destination({})
+    assert job_config.rule_response == "cached_2"
+    mapper = __mapper(destination, job_config=job_config)
+    mapper.job_wrapper.user_id = 1
+    mapper.get_job_destination({})
+    assert job_config.rule_response == "cached_3"
+    # and results expire
+    job_config.rule_decision_cache = RuleDecisionCache()
+    mapper = __mapper(__dynamic_destination(dict(function="cached_rule", cache_ttl="0")), job_config=job_config)
+    mapper.get_job_destination({})
+    mapper = __mapper(__dynamic_destination(dict(function="cached_rule", cache_ttl="0")), job_config=job_config)
+    mapper.get_job_destination({})
+    assert job_config.rule_response == "cached_5"
+
+
+def test_dynamic_mapping_rule_decision_cache_per_job_args():
+    calls = importlib.import_module(f"{test_rules.__name__}.10_site").CACHED_RULE_CALLS
+    calls.clear()
+    job_config = MockJobConfig()
+    destination = __dynamic_destination(dict(function="uncacheable_rule", cache_ttl="60"))
+    for _ in range(2):
+        __mapper(destination, job_config=job_config).get_job_destination({})
+    assert calls == [12345, 12345]
+    assert job_config.rule_response == "uncacheable_2"
+
+
+def test_rule_decision_cache_size():
+    cache = RuleDecisionCache(max_size=2)
+    cache.put(("a",), "a", 60)
+    cache.put(("b",), "b", 0)
+    cache.put(("c",), "c", 60)
+    assert cache.get(("a",)) == "a"
+    assert cache.get(("b",)) is None
+    assert cache.get(("c",)) == "c"
+
+
+def test_dynamic_mapping_shared_job_counts():
+    job_counts = MockJobCounts()
+    mapper = __mapper(__dynamic_destination(dict(function="check_rule_helper_job_counts")))
+    mapper.get_job_counts = lambda: job_counts
+    assert mapper.get_job_destination({}) is DYNAMICALLY_GENERATED_DESTINATION
+    assert mapper.job_config.rule_response == "counted_3"
+    # the job is counted for the next rules
+    assert job_counts.added == [("test@example.com", DYNAMICALLY_GENERATED_DESTINATION.id)]
+
+
 def __assert_mapper_errors_with_message(mapper, message):
     exception = None
     try:
@@ -133,9 +197,9 @@ def __assert_mapper_errors_with_message(mapper, message):
     assert str(exception) == message, f"{str(exception)} != {message}"
 
 
-def __mapper(tool_job_destination=TOOL_JOB_DESTINATION):
+def __mapper(tool_job_destination=TOOL_JOB_DESTINATION, job_config=None):
     job_wrapper = MockJobWrapper(tool_job_destination)
-    job_config = MockJobConfig()
+    job_config = job_config or MockJobConfig()
 
     mapper = JobRunnerMapper(job_wrapper, {}, job_config)
     mapper.rules_module = test_rules
@@ -147,10 +211,27 @@ def __dynamic_destination(params=None):
     return JobDestination(runner="dynamic", params=params)
 
 
+class MockJobCounts:
+    loaded = True
+
+    def __init__(self):
+        self.added = []
+
+    def can_count(self, **kwds):
+        return True
+
+    def count(self, **kwds):
+        return 3
+
+    def add_job(self, user_email, destination_id):
+        self.added.append((user_email, destination_id))
+
+
 class MockJobConfig:
     def __init__(self):
         self.rule_response = None
         self.dynamic_params = None
+        self.rule_decision_cache = RuleDecisionCache()
 
     def get_destination(self, rep):
         # Called to transform dynamic job destination rule response
@@ -163,7 +244,8 @@ class MockJobWrapper(HasResourceParameters):
     def __init__(self, tool_job_destination):
         self.tool = MockTool(tool_job_destination)
         self.job_id = 12345
-        self.app = object()
+        self.user_id = 6789
+        self.app = bunch.Bunch(execution_timer_factory=bunch.Bunch(get_timer=StructuredExecutionTimer))
 
     def is_mock_job_wrapper(self):
         return True
@@ -181,7 +263,8 @@ class MockJobWrapper(HasResourceParameters):
             return params
 
         return bunch.Bunch(
-            user=bunch.Bunch(id=6789, email="test@example.com"),
+            user=bunch.Bunch(id=self.user_id, email="test@example.com"),
+            user_id=self.user_id,
             raw_param_dict=lambda: raw_params,
             get_param_values=get_param_values,
         )
@@ -190,6 +273,7 @@ class MockJobWrapper(HasResourceParameters):
 class MockTool:
     def __init__(self, tool_job_destination):
         self.id = "testtoolshed/devteam/tool1/23abcd13123"
+        self.version = "1.0"
         self.call_count = 0
         self.tool_job_destination = tool_job_destination
         self.all_ids = ["testtoolshed/devteam/tool1/23abcd13123", "tool1"]
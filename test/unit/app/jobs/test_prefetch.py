@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import Counter
+
+from galaxy import model
+from galaxy.jobs.prefetch import JobInputPrefetcher
+from galaxy.util.bunch import Bunch
+
+
+class GatedObjectStore:
+    def __init__(self):
+        self.fetched = Counter()
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def get_filename(self, obj):
+        self.release.wait(5)
+        with self.lock:
+            self.fetched[obj.id] += 1
+        return f"/cache/dataset_{obj.id}.dat"
+
+
+def test_job_held_until_inputs_fetched():
+    object_store = GatedObjectStore()
+    wakes = []
+    prefetcher = JobInputPrefetcher(object_store, 2, on_fetched=lambda: wakes.append(True))
+    job = _job(1, _dataset(1), _dataset(2))
+
+    assert not prefetcher.inputs_ready(job)
+    assert not prefetcher.inputs_ready(job)
+    object_store.release.set()
+    _wait_for(lambda: prefetcher.inputs_ready(job))
+    assert object_store.fetched == {1: 1, 2: 1}
+    assert wakes
+    prefetcher.shutdown()
+
+
+def test_fetches_shared_between_jobs():
+    object_store = GatedObjectStore()
+    prefetcher = JobInputPrefetcher(object_store, 4)
+    shared = _dataset(1)
+    job1 = _job(1, shared, _dataset(2))
+    job2 = _job(2, shared)
+
+    assert not prefetcher.inputs_ready(job1)
+    assert not prefetcher.inputs_ready(job2)
+    object_store.release.set()
+    _wait_for(lambda: prefetcher.inputs_ready(job1))
+    _wait_for(lambda: prefetcher.inputs_ready(job2))
+    assert object_store.fetched[1] == 1
+    prefetcher.shutdown()
+
+
+def test_jobs_without_fetchable_inputs_are_ready():
+    object_store = GatedObjectStore()
+    prefetcher = JobInputPrefetcher(object_store)
+    deferred = _dataset(1, state=model.Dataset.states.DEFERRED)
+    external = _dataset(2, external_filename="/data/external.txt")
+    assert prefetcher.inputs_ready(_job(1, deferred, external))
+    assert prefetcher.inputs_ready(_job(2))
+    assert not object_store.fetched
+    prefetcher.shutdown()
+
+
+def test_retain_forgets_jobs():
+    object_store = GatedObjectStore()
+    prefetcher = JobInputPrefetcher(object_store)
+    prefetcher.inputs_ready(_job(1, _dataset(1)))
+    prefetcher.inputs_ready(_job(2, _dataset(2)))
+    prefetcher.retain([2])
+    assert set(prefetcher._jobs) == {2}
+    object_store.release.set()
+    prefetcher.shutdown()
+
+
+def _dataset(id, state=model.Dataset.states.OK, external_filename=None):
+    return Bunch(
+        id=id,
+        uuid=None,
+        object_store_id=None,
+        state=state,
+        purged=False,
+        external_filename=external_filename,
+    )
+
+
+def _job(id, *datasets):
+    return Bunch(
+        id=id,
+        input_datasets=[Bunch(dataset=Bunch(dataset=dataset)) for dataset in datasets],
+        input_library_datasets=[],
+    )
+
+
+def _wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end, "timed out"
+        time.sleep(0.01)
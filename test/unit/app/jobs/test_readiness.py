@@ -0,0 +1,171 @@
+import galaxy.datatypes.registry
+from galaxy import model
+from galaxy.jobs.readiness import (
+    JobReadinessIndex,
+    query_ready_jobs,
+)
+from galaxy.model import mapping
+
+HANDLER = "main.handler0"
+
+datatypes_registry = galaxy.datatypes.registry.Registry()
+datatypes_registry.load_datatypes()
+model.set_datatypes_registry(datatypes_registry)
+
+
+def test_job_without_inputs_is_ready():
+    session = __session()
+    job = __new_job(session)
+
+    index = JobReadinessIndex(HANDLER, 100)
+    assert index.update(session) == [job.id]
+    assert index.unready_count(job.id) == 0
+
+
+def test_job_becomes_ready_when_inputs_ready():
+    session = __session()
+    hda1 = __new_hda(session, model.Dataset.states.RUNNING)
+    hda2 = __new_hda(session, model.Dataset.states.QUEUED)
+    job = __new_job(session, hda1, hda2)
+
+    index = JobReadinessIndex(HANDLER, 100)
+    assert index.update(session) == []
+    assert index.unready_count(job.id) == 2
+
+    __set_state(session, hda1, model.Dataset.states.OK)
+    assert index.update(session) == []
+    assert index.unready_count(job.id) == 1
+
+    __set_state(session, hda2, model.Dataset.states.ERROR)
+    assert index.update(session) == [job.id]
+    assert index.unready_count(job.id) == 0
+
+
+def test_job_blocked_again_when_input_becomes_unready():
+    session = __session()
+    hda1 = __new_hda(session, model.Dataset.states.RUNNING)
+    hda2 = __new_hda(session, model.Dataset.states.OK)
+    job = __new_job(session, hda1, hda2)
+
+    index = JobReadinessIndex(HANDLER, 100)
+    assert index.update(session) == []
+    assert index.unready_count(job.id) == 1
+
+    # e.g. the input that was already ready is rerun
+    __set_state(session, hda2, model.Dataset.states.QUEUED)
+    __set_state(session, hda1, model.Dataset.states.OK)
+    assert index.update(session) == []
+    assert index.unready_count(job.id) == 1
+
+    __set_state(session, hda2, model.Dataset.states.OK)
+    assert index.update(session) == [job.id]
+
+
+def test_shared_input_releases_all_waiting_jobs():
+    session = __session()
+    hda = __new_hda(session, model.Dataset.states.RUNNING)
+    job1 = __new_job(session, hda)
+    job2 = __new_job(session, hda)
+
+    index = JobReadinessIndex(HANDLER, 100)
+    assert index.update(session) == []
+
+    __set_state(session, hda, model.Dataset.states.OK)
+    assert index.update(session) == [job1.id, job2.id]
+
+
+def test_jobs_leaving_new_state_are_dropped():
+    session = __session()
+    hda = __new_hda(session, model.Dataset.states.RUNNING)
+    job = __new_job(session, hda)
+    other_handler_job = __new_job(session, handler="main.handler1")
+
+    index = JobReadinessIndex(HANDLER, 100)
+    index.update(session)
+    assert job.id in index
+    assert other_handler_job.id not in index
+
+    job.state = model.Job.states.DELETED
+    session.flush()
+    index.update(session)
+    assert job.id not in index
+    assert len(index) == 0
+
+
+def test_invalidated_jobs_are_reloaded():
+    session = __session()
+    hda = __new_hda(session, model.Dataset.states.OK)
+    job = __new_job(session, hda)
+
+    index = JobReadinessIndex(HANDLER, 100)
+    assert index.update(session) == [job.id]
+
+    # e.g. the input got remapped to a rerun job and is not ready anymore
+    __set_state(session, hda, model.Dataset.states.QUEUED)
+    index.invalidate([job.id])
+    assert index.update(session) == []
+    assert index.unready_count(job.id) == 1
+
+
+def test_ready_window_size_per_user():
+    session = __session()
+    user1 = model.User(email="u1@example.com", password="pass1")
+    user2 = model.User(email="u2@example.com", password="pass2")
+    session.add_all([user1, user2])
+    user1_jobs = [__new_job(session, user=user1) for _ in range(3)]
+    user2_jobs = [__new_job(session, user=user2) for _ in range(2)]
+
+    index = JobReadinessIndex(HANDLER, 2)
+    ready_jobs = index.ready_jobs(session)
+    assert [j.id for j in ready_jobs] == [j.id for j in user1_jobs[:2] + user2_jobs]
+
+
+def test_index_matches_query():
+    session = __session()
+    states = model.Dataset.states
+    ok = __new_hda(session, states.OK)
+    running = __new_hda(session, states.RUNNING)
+    error = __new_hda(session, states.ERROR)
+    __new_job(session, ok)
+    __new_job(session, ok, running)
+    __new_job(session, error)
+    __new_job(session, running)
+    __new_job(session)
+
+    index = JobReadinessIndex(HANDLER, 100)
+    expected = [j.id for j in query_ready_jobs(session, HANDLER, 100)]
+    assert [j.id for j in index.ready_jobs(session)] == expected
+
+    __set_state(session, running, states.OK)
+    expected = [j.id for j in query_ready_jobs(session, HANDLER, 100)]
+    assert len(expected) == 5
+    assert [j.id for j in index.ready_jobs(session)] == expected
+
+
+def __session():
+    return mapping.init("/tmp", "sqlite:///:memory:", create_tables=True).session
+
+
+def __new_hda(session, state):
+    hda = model.HistoryDatasetAssociation(create_dataset=True, sa_session=session)
+    hda.dataset.state = state
+    session.add(hda)
+    session.flush()
+    return hda
+
+
+def __set_state(session, hda, state):
+    hda.dataset.state = state
+    session.flush()
+
+
+def __new_job(session, *inputs, handler=HANDLER, user=None):
+    job = model.Job()
+    job.state = model.Job.states.NEW
+    job.handler = handler
+    job.user = user
+    for i, hda in enumerate(inputs):
+        job.add_input_dataset(f"input{i}", hda)
+    session.add(job)
+    session.flush()
+    return job
@@ -1,7 +1,10 @@
 import uuid
 
 from galaxy import model
-from galaxy.jobs.rule_helper import RuleHelper
+from galaxy.jobs.rule_helper import (
+    JobCounts,
+    RuleHelper,
+)
 from galaxy.model import mapping
 from galaxy.util import bunch
 
@@ -54,6 +57,47 @@ def test_job_count():
     )
 
 
+def test_job_count_from_job_counts():
+    rule_helper = __rule_helper()
+    __setup_fixtures(rule_helper.app)
+    job_counts = JobCounts(rule_helper.app.model.context)
+    counted_rule_helper = RuleHelper(rule_helper.app, job_counts=job_counts)
+    for kwds in [
+        dict(for_user_email=USER_EMAIL_1, for_job_states=["queued", "running"]),
+        dict(for_user_email=USER_EMAIL_3, for_job_states=["queued"]),
+        dict(for_destination="cluster1", for_job_states=["queued"]),
+        dict(for_destinations=["cluster1", "local"], for_user_email=USER_EMAIL_1, for_job_states=["running", "error"]),
+        dict(for_destination="local", for_job_states=["new"]),
+    ]:
+        assert counted_rule_helper.job_count(**kwds) == rule_helper.job_count(**kwds), kwds
+    assert job_counts.loaded
+    # jobs mapped since the counts were read are counted
+    job_counts.add_job(USER_EMAIL_2, "local")
+    assert counted_rule_helper.job_count(for_destination="local", for_job_states=["queued"]) == 2
+    # finished jobs are counted in the database
+    assert not job_counts.can_count(for_job_states=["ok"])
+    assert not job_counts.can_count()
+    assert counted_rule_helper.job_count(for_user_email=USER_EMAIL_1) == 7
+
+
+def test_job_counts_move_mapped_jobs_from_new():
+    rule_helper = __rule_helper()
+    __setup_fixtures(rule_helper.app)
+    user = rule_helper.app.model.context.query(model.User).filter_by(email=USER_EMAIL_1).first()
+    rule_helper.app.add(__new_job(user=user, state="new"))
+    job_counts = JobCounts(rule_helper.app.model.context)
+    counted_rule_helper = RuleHelper(rule_helper.app, job_counts=job_counts)
+    new_and_queued = dict(for_user_email=USER_EMAIL_1, for_job_states=["new", "queued"])
+    assert counted_rule_helper.job_count(**new_and_queued) == 5
+    # the new job is mapped and counted as queued at its destination only
+    job_counts.add_job(USER_EMAIL_1, "local")
+    assert counted_rule_helper.job_count(**new_and_queued) == 5
+    assert counted_rule_helper.job_count(for_user_email=USER_EMAIL_1, for_job_states=["new"]) == 0
+    # a job created after the counts were read is only added
+    job_counts.add_job(USER_EMAIL_1, "local")
+    assert counted_rule_helper.job_count(**new_and_queued) == 6
+
+
 def __assert_job_count_is(expected_count, rule_helper, **kwds):
     acutal_count = rule_helper.job_count(**kwds)
 
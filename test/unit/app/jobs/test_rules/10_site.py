@@ -69,3 +69,20 @@ def check_resource_params(resource_params):
 
 def check_workflow_invocation_uuid(workflow_invocation_uuid):
     return workflow_invocation_uuid
+
+
+CACHED_RULE_CALLS = []
+
+
+def cached_rule(tool_id, user_email):
+    CACHED_RULE_CALLS.append((tool_id, user_email))
+    return f"cached_{len(CACHED_RULE_CALLS)}"
+
+
+def uncacheable_rule(job_id):
+    CACHED_RULE_CALLS.append(job_id)
+    return f"uncacheable_{len(CACHED_RULE_CALLS)}"
+
+
+def check_rule_helper_job_counts(rule_helper):
+    return f"counted_{rule_helper.job_count(for_destination='cluster', for_job_states=['queued'])}"
@@ -0,0 +1,63 @@
+from galaxy.jobs.runners import AsynchronousJobRunner
+from galaxy.jobs.runners.slurm import parse_squeue_states
+from galaxy.util.bunch import Bunch
+
+
+class ItemRunner(AsynchronousJobRunner):
+    runner_name = "ItemRunner"
+
+    def __init__(self):
+        app = Bunch(config=Bunch(redact_email_in_job_name=False), model=Bunch(context=None))
+        super().__init__(app, 1)
+        self.checked = []
+
+    def check_watched_item(self, job_state):
+        self.checked.append(job_state)
+        # jobs with an even id finish
+        return None if job_state % 2 == 0 else job_state
+
+
+class BatchRunner(ItemRunner):
+    runner_name = "BatchRunner"
+    MAX_WATCHED_ITEMS_PER_BATCH = 3
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def check_watched_items_batch(self, job_states):
+        self.batches.append(job_states)
+        return [job_state for job_state in job_states if job_state % 2]
+
+
+def test_check_watched_items_defaults_to_single_checks():
+    runner = ItemRunner()
+    runner.watched = list(range(5))
+    runner.check_watched_items()
+    assert runner.checked == [0, 1, 2, 3, 4]
+    assert runner.watched == [1, 3]
+
+
+def test_check_watched_items_in_batches():
+    runner = BatchRunner()
+    runner.watched = list(range(7))
+    runner.check_watched_items()
+    assert runner.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert runner.checked == []
+    assert runner.watched == [1, 3, 5]
+
+
+def test_check_watched_items_unlimited_batch():
+    runner = BatchRunner()
+    runner.MAX_WATCHED_ITEMS_PER_BATCH = None
+    runner.watched = list(range(7))
+    runner.check_watched_items()
+    assert runner.batches == [list(range(7))]
+    runner.watched = []
+    runner.check_watched_items()
+    assert runner.watched == []
+
+
+def test_parse_squeue_states():
+    stdout = "CLUSTER: cluster1\n1234 PENDING\n1235 RUNNING\n\n1236 COMPLETING\n"
+    assert parse_squeue_states(stdout) == {"1234": "PENDING", "1235": "RUNNING", "1236": "COMPLETING"}
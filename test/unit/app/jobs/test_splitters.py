@@ -0,0 +1,64 @@
+import os
+
+from galaxy.datatypes.tabular import Tabular
+from galaxy.jobs.splitters import multi
+from galaxy.util import bunch
+
+
+def test_merge_streams_parts_of_finished_tasks(tmp_path):
+    job_wrapper, task_wrappers = __split_job(tmp_path, 3)
+    merger = multi.output_merger(job_wrapper, task_wrappers)
+    output_path = tmp_path / "out.tabular"
+    merger.task_finished(1)
+    # parts are appended in order
+    assert output_path.read_text() == ""
+    merger.task_finished(0)
+    assert output_path.read_text() == "part 0\npart 1\n"
+    stdout, stderr = merger.finish()
+    assert output_path.read_text() == "part 0\npart 1\npart 2\n"
+    assert stdout == f"\n{task_wrappers[0].working_directory}:\nok 0"
+    assert stderr == ""
+
+
+def test_merge_without_streaming(tmp_path):
+    job_wrapper, task_wrappers = __split_job(tmp_path, 3, external_chown_script="chown.sh")
+    merger = multi.output_merger(job_wrapper, task_wrappers)
+    merger.task_finished(0)
+    assert (tmp_path / "out.tabular").read_text() == ""
+    merger.finish()
+    assert (tmp_path / "out.tabular").read_text() == "part 0\npart 1\npart 2\n"
+
+
+def test_merge_missing_parts(tmp_path):
+    job_wrapper, task_wrappers = __split_job(tmp_path, 3)
+    os.remove(tmp_path / "task_1" / "out.tabular")
+    merger = multi.output_merger(job_wrapper, task_wrappers)
+    merger.task_finished(0)
+    merger.task_finished(1)
+    merger.finish()
+    assert (tmp_path / "out.tabular").read_text() == "part 0\npart 2\n"
+    assert multi.do_merge(job_wrapper, task_wrappers)[1] == ""
+    assert (tmp_path / "out.tabular").read_text() == "part 0\npart 2\n"
+
+
+def __split_job(tmp_path, parts, external_chown_script=None):
+    output_path = tmp_path / "out.tabular"
+    output_path.write_text("")
+    task_wrappers = []
+    for index in range(parts):
+        task_dir = tmp_path / f"task_{index}"
+        task_dir.mkdir()
+        (task_dir / "out.tabular").write_text(f"part {index}\n")
+        task = bunch.Bunch(stdout="ok 0" if index == 0 else "", stderr="")
+        task_wrappers.append(bunch.Bunch(working_directory=str(task_dir), get_task=lambda task=task: task))
+    job_io = bunch.Bunch(
+        get_output_hdas_and_fnames=lambda: {"out": (bunch.Bunch(datatype=Tabular()), str(output_path))},
+        get_output_fnames=lambda: [str(output_path)],
+    )
+    job_wrapper = bunch.Bunch(
+        working_directory=str(tmp_path),
+        job_io=job_io,
+        get_parallelism=lambda: bunch.Bunch(attributes={"merge_outputs": "out"}),
+        get_destination_configuration=lambda key, default: external_chown_script,
+    )
+    return job_wrapper, task_wrappers
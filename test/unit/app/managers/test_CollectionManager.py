@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 """
 """
-from galaxy import model
+import pytest
+
+from galaxy import (
+    exceptions,
+    model,
+)
 from galaxy.managers.collections import DatasetCollectionManager
 from galaxy.managers.datasets import DatasetManager
 from galaxy.managers.hdas import HDAManager
@@ -78,6 +83,54 @@ class TestDatasetCollectionManager(BaseTestCase, CreatesCollectionsMixin):
         hdca2 = self.collection_manager.create(self.trans, history, "test collection 2", "list", elements=elements)
         assert isinstance(hdca2, model.HistoryDatasetCollectionAssociation)
 
+    def test_create_list_with_tags_and_hidden_sources(self):
+        owner = self.user_manager.create(**user2_data)
+        self.trans.set_user(owner)
+        history = self.history_manager.create(name="history1", user=owner)
+        hdas = [
+            self.hda_manager.create(name=name, history=history, dataset=self.dataset_manager.create())
+            for name in ("one", "two", "three")
+        ]
+        element_identifiers = self.build_element_identifiers(hdas)
+        for index, element_identifier in enumerate(element_identifiers):
+            element_identifier["tags"] = ["group:pair", f"name:sample{index}"]
+
+        hdca = self.collection_manager.create(
+            self.trans,
+            history,
+            "tagged collection",
+            "list",
+            element_identifiers=element_identifiers,
+            hide_source_items=True,
+        )
+        assert [element.element_object for element in hdca.collection.elements] == hdas
+        for index, hda in enumerate(hdas):
+            assert not hda.visible
+            assert sorted(hda.make_tag_string_list()) == ["group:pair", f"name:sample{index}"]
+        # the tags are shared by all elements
+        assert len({tag.tag for hda in hdas for tag in hda.tags}) == 2
+
+        self.log("should only hide datasets owned by the user")
+        other_user = self.user_manager.create(**user3_data)
+        self.trans.set_user(other_user)
+        other_history = self.history_manager.create(name="history2", user=other_user)
+        with pytest.raises(exceptions.ItemOwnershipException):
+            self.collection_manager.create(
+                self.trans,
+                other_history,
+                "hiding collection",
+                "list",
+                element_identifiers=self.build_element_identifiers(hdas),
+                hide_source_items=True,
+            )
+
+        self.log("should fail for unknown datasets")
+        element_identifiers = [dict(src="hda", name="missing", id=hdas[-1].id + 1000)]
+        with pytest.raises(exceptions.ObjectNotFound):
+            self.collection_manager.create(
+                self.trans, other_history, "missing collection", "list", element_identifiers=element_identifiers
+            )
+
     def test_update_from_dict(self):
         owner = self.user_manager.create(**user2_data)
 
@@ -6,10 +6,15 @@ import random
 from sqlalchemy import (
     column,
     desc,
+    event,
     false,
     true,
 )
 
+from galaxy import (
+    exceptions,
+    model,
+)
 from galaxy.managers import (
     base,
     collections,
@@ -328,6 +333,99 @@ class TestHistoryAsContainer(HistoryAsContainerBaseTestCase):
         filters = [parsed_filter("orm", column("type_id").in_(["dataset-2", "dataset_collection-2"]))]
         assert self.contents_manager.contents(history, filters=filters) == [contents[1], contents[6]]
 
+    def test_keyset(self):
+        user2 = self.user_manager.create(**user2_data)
+        history = self.history_manager.create(name="history", user=user2)
+        contents = []
+        contents.extend([self.add_hda_to_history(history, name=("hda-" + str(x))) for x in range(3)])
+        contents.append(self.add_list_collection_to_history(history, contents[:3]))
+        contents.extend([self.add_hda_to_history(history, name=("hda-" + str(x))) for x in range(4, 6)])
+        contents.append(self.add_list_collection_to_history(history, contents[4:6]))
+        parse_keyset = self.contents_manager.parse_keyset
+
+        self.log("should page through contents in hid order")
+        assert self.contents_manager.contents(history, keyset=parse_keyset("hid-asc"), limit=3) == contents[:3]
+        keyset = parse_keyset("hid-asc", str(contents[2].hid))
+        assert self.contents_manager.contents(history, keyset=keyset, limit=3) == contents[3:6]
+        keyset = parse_keyset("hid", str(contents[5].hid))
+        assert self.contents_manager.contents(history, keyset=keyset) == contents[4::-1]
+
+        self.log("should page through contents with equal times in time and hid order")
+        same_time = datetime.datetime(2023, 3, 14, 10, 0, 0)
+        for item in contents:
+            item.update_time = same_time
+        contents[1].update_time = same_time + datetime.timedelta(seconds=1)
+        self.app.model.context.flush()
+        newest_first = [contents[1], *contents[:1:-1], contents[0]]
+        keyset = parse_keyset("update_time-dsc")
+        assert self.contents_manager.contents(history, keyset=keyset) == newest_first
+        keyset = parse_keyset("update_time-dsc", f"{same_time.isoformat()},{contents[6].hid}")
+        assert self.contents_manager.contents(history, keyset=keyset, limit=3) == newest_first[2:5]
+        keyset = parse_keyset("update_time-asc", f"{same_time.isoformat()}Z,{contents[5].hid}")
+        assert self.contents_manager.contents(history, keyset=keyset) == [contents[6], contents[1]]
+
+        self.log("should only allow keyset pagination for a single hid or time order")
+        assert parse_keyset("name-asc") is None
+        assert parse_keyset("hid,create_time") is None
+        with self.assertRaises(exceptions.RequestParameterInvalidException):
+            parse_keyset("name-asc", "1")
+        with self.assertRaises(exceptions.RequestParameterInvalidException):
+            parse_keyset("update_time-asc", "1")
+
+    def test_annotation_filter(self):
+        parse_filter = self.history_contents_filters.parse_filter
+        user2 = self.user_manager.create(**user2_data)
+        user3 = self.user_manager.create(**user3_data)
+        history = self.history_manager.create(name="history", user=user2)
+        contents = []
+        contents.extend([self.add_hda_to_history(history, name=("hda-" + str(x))) for x in range(3)])
+        contents.append(self.add_list_collection_to_history(history, contents[:3]))
+        session = self.app.model.context
+        contents[0].add_item_annotation(session, user2, contents[0], "aligned reads")
+        contents[1].add_item_annotation(session, user3, contents[1], "aligned reads")
+        contents[2].add_item_annotation(session, user2, contents[2], "unaligned 100%")
+        contents[3].add_item_annotation(session, user2, contents[3], "all aligned reads")
+        session.flush()
+
+        self.log("should filter by the owner's annotation in the database")
+        filters = [parse_filter("annotation", "has", "aligned reads")]
+        assert filters[0].filter_type == "orm_function"
+        assert self.contents_manager.contents(history, filters=filters) == [contents[0], contents[3]]
+        assert self.contents_manager.contents(history, filters=filters, limit=1, offset=1) == [contents[3]]
+        assert self.contents_manager.contents_count(history, filters=filters) == 2
+        filters = [parse_filter("annotation", "contains", "100%")]
+        assert self.contents_manager.contents(history, filters=filters) == [contents[2]]
+
+    def test_contents_single_query(self):
+        user2 = self.user_manager.create(**user2_data)
+        history = self.history_manager.create(name="history", user=user2)
+        contents = []
+        contents.extend([self.add_hda_to_history(history, name=("hda-" + str(x))) for x in range(3)])
+        contents.append(self.add_list_collection_to_history(history, contents[:3]))
+        session = self.app.model.context
+        session.flush()
+        history_id = history.id
+        session.expunge_all()
+        history = session.query(model.History).get(history_id)
+
+        self.log("should load a page of contents and their serialized relations with a single query")
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            results = self.contents_manager.contents(history, limit=3, offset=1)
+            assert [item.hid for item in results] == [2, 3, 4]
+            assert [item.dataset.state for item in results[:2]] == ["new", "new"]
+            assert results[2].collection.populated_state == "ok"
+            assert [len(item.tags) + len(item.annotations) for item in results] == [0, 0, 0]
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+        assert len(statements) == 1
+
 
 class TestHistoryContentsFilterParser(HistoryAsContainerBaseTestCase):
     def set_up_managers(self):
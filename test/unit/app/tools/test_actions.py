@@ -111,6 +111,19 @@ class TestDefaultToolAction(TestCase, tools_support.UsesTools):
         # Again this is a stupid way to ensure data parameters are wrapped.
         assert output["out1"].name == f"Output ({hda1.dataset.get_file_name()})"
 
+    def test_deferred_history_additions(self):
+        self._init_tool(tools_support.SIMPLE_TOOL_CONTENTS)
+        _, output, _ = self.action.execute(
+            tool=self.tool,
+            trans=self.trans,
+            history=self.history,
+            incoming=dict(param1="moo"),
+            defer_history_additions=True,
+        )
+        assert output["out1"].hid is None
+        self.history.add_pending_items()
+        assert output["out1"].hid == 1
+
     def test_inactive_user_job_create_failure(self):
         self.trans.user_is_active = False
         try:
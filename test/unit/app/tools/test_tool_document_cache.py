@@ -0,0 +1,93 @@
+import os
+from tempfile import mkdtemp
+
+from galaxy.tool_util.parser import get_tool_source
+from galaxy.tools.cache import ToolDocumentCache
+
+TOOL_XML = """<tool id="cat" name="cat" version="1.0">
+    <macros>
+        <import>macros.xml</import>
+    </macros>
+    <command>cat '$input' > '$output'</command>
+    <inputs>
+        <expand macro="input" />
+    </inputs>
+    <outputs>
+        <data name="output" format="txt" />
+    </outputs>
+</tool>
+"""
+
+MACROS_XML = """<macros>
+    <xml name="input">
+        <param name="input" type="data" format="%s" />
+    </xml>
+</macros>
+"""
+
+
+def test_roundtrip_shared_between_instances():
+    tool_dir, cache_dir = mkdtemp(), mkdtemp()
+    config_file = _write_tool(tool_dir)
+    cache = ToolDocumentCache(cache_dir)
+    assert cache.get(config_file) is None
+    cache.set(config_file, get_tool_source(config_file))
+
+    # entries are visible to other processes sharing the cache without persisting
+    tool_document = ToolDocumentCache(cache_dir).get(config_file)
+    assert 'format="txt"' in tool_document["document"]
+    assert '<expand macro="input"' not in tool_document["document"]
+    assert tool_document["macro_paths"] == [os.path.join(tool_dir, "macros.xml")]
+
+
+def test_entries_validated_by_content():
+    tool_dir, cache_dir = mkdtemp(), mkdtemp()
+    config_file = _write_tool(tool_dir)
+    ToolDocumentCache(cache_dir).set(config_file, get_tool_source(config_file))
+
+    # a new modification time alone keeps the entry valid
+    os.utime(config_file, (0, 0))
+    assert ToolDocumentCache(cache_dir).get(config_file) is not None
+
+    _write_tool(tool_dir, input_format="tabular")
+    assert ToolDocumentCache(cache_dir).get(config_file) is None
+
+    ToolDocumentCache(cache_dir).set(config_file, get_tool_source(config_file))
+    with open(config_file, "a") as f:
+        f.write("<!-- changed -->\n")
+    assert ToolDocumentCache(cache_dir).get(config_file) is None
+
+
+def test_delete():
+    tool_dir, cache_dir = mkdtemp(), mkdtemp()
+    config_file = _write_tool(tool_dir)
+    cache = ToolDocumentCache(cache_dir)
+    cache.set(config_file, get_tool_source(config_file))
+    assert cache.get(config_file) is not None
+
+    # the macro changed while the cache was in use, deleting the entry forgets the macro hash
+    _write_tool(tool_dir, input_format="tabular")
+    cache.delete(config_file)
+    assert cache.get(config_file) is None
+    cache.set(config_file, get_tool_source(config_file))
+    assert 'format="tabular"' in cache.get(config_file)["document"]
+
+
+def test_reopen():
+    tool_dir, cache_dir = mkdtemp(), mkdtemp()
+    config_file = _write_tool(tool_dir)
+    cache = ToolDocumentCache(cache_dir)
+    cache.set(config_file, get_tool_source(config_file))
+    cache.close()
+    assert cache.get(config_file) is None
+    cache.reopen_ro()
+    assert cache.get(config_file) is not None
+
+
+def _write_tool(tool_dir, input_format="txt"):
+    with open(os.path.join(tool_dir, "macros.xml"), "w") as f:
+        f.write(MACROS_XML % input_format)
+    config_file = os.path.join(tool_dir, "cat.xml")
+    with open(config_file, "w") as f:
+        f.write(TOOL_XML)
+    return config_file
@@ -0,0 +1,126 @@
+from functools import lru_cache
+from tempfile import mkdtemp
+
+from galaxy import config
+from galaxy.tools import search
+from galaxy.tools.search import ToolPanelViewSearch
+from galaxy.util.bunch import Bunch
+
+
+class FakeToolCache:
+    def __init__(self, tools):
+        self._tools_by_id = {tool.id: tool for tool in tools}
+        self._tool_paths_by_id = {tool.id: f"{tool.id}.xml" for tool in tools}
+        self._new_tool_ids = set(self._tools_by_id)
+        self._removed_tool_ids = set()
+
+    def get_tool_by_id(self, tool_id):
+        return self._tools_by_id.get(tool_id)
+
+    def remove(self, tool_id):
+        del self._tools_by_id[tool_id]
+        del self._tool_paths_by_id[tool_id]
+        self._removed_tool_ids.add(tool_id)
+
+    def reset_status(self):
+        self._new_tool_ids = set()
+        self._removed_tool_ids = set()
+
+
+class FakeToolBox:
+    def __init__(self, tool_cache):
+        self.tool_cache = tool_cache
+
+    def get_tool(self, tool_id):
+        return self.tool_cache.get_tool_by_id(tool_id)
+
+    def panel_has_tool(self, tool, panel_view_id):
+        return True
+
+
+def test_only_changed_tools_are_written():
+    index_dir = mkdtemp()
+    tool_cache = FakeToolCache([_tool("cat", "Concatenate datasets"), _tool("sort", "Sort lines")])
+    toolbox = FakeToolBox(tool_cache)
+    panel_search = _panel_search(index_dir)
+    panel_search.build_index(tool_cache, toolbox)
+    assert panel_search.search("concatenate", config=_app_config()) == ["cat"]
+    generation = panel_search.index.latest_generation()
+
+    # Another process sharing the index finds the same tools indexed already
+    other_panel_search = _panel_search(index_dir)
+    other_panel_search.build_index(FakeToolCache(tool_cache._tools_by_id.values()), toolbox)
+    assert other_panel_search.index.latest_generation() == generation
+
+    tool_cache.reset_status()
+    tool_cache._tools_by_id["sort"].description = "Order lines"
+    tool_cache._new_tool_ids.add("sort")
+    panel_search.build_index(tool_cache, toolbox)
+    assert panel_search.index.latest_generation() == generation + 1
+    assert other_panel_search.search("order", config=_app_config()) == ["sort"]
+
+    tool_cache.reset_status()
+    tool_cache.remove("cat")
+    panel_search.build_index(tool_cache, toolbox)
+    assert panel_search.search("concatenate", config=_app_config()) == []
+    assert panel_search.indexed_tool_ids == {"cat", "sort"}
+    with panel_search.index.reader() as reader:
+        assert [fields["id"] for fields in reader.all_stored_fields()] == ["sort"]
+
+
+def test_locked_index_is_skipped(monkeypatch):
+    monkeypatch.setattr(search, "INDEX_WRITE_LOCK_TIMEOUT", 0.0)
+    index_dir = mkdtemp()
+    tool_cache = FakeToolCache([_tool("cat", "Concatenate datasets")])
+    panel_search = _panel_search(index_dir)
+    writer = panel_search.index.writer()
+    try:
+        panel_search.build_index(tool_cache, FakeToolBox(tool_cache))
+    finally:
+        writer.cancel()
+    assert panel_search.search("concatenate", config=_app_config()) == []
+
+
+def test_unchanged_index_is_not_locked(monkeypatch):
+    monkeypatch.setattr(search, "INDEX_WRITE_LOCK_TIMEOUT", 0.0)
+    index_dir = mkdtemp()
+    tool_cache = FakeToolCache([_tool("cat", "Concatenate datasets")])
+    toolbox = FakeToolBox(tool_cache)
+    _panel_search(index_dir).build_index(tool_cache, toolbox)
+
+    # Another process starting while the index is locked does not wait for the lock
+    panel_search = _panel_search(index_dir)
+    writer = panel_search.index.writer()
+    try:
+        panel_search.build_index(FakeToolCache(tool_cache._tools_by_id.values()), toolbox)
+    finally:
+        writer.cancel()
+    assert panel_search.indexed_tool_ids == {"cat"}
+    assert panel_search.search("concatenate", config=_app_config()) == ["cat"]
+
+
+def _panel_search(index_dir):
+    return ToolPanelViewSearch("default", index_dir, config=_app_config())
+
+
+@lru_cache(maxsize=None)
+def _app_config():
+    return config.GalaxyAppConfiguration(override_tempdir=False)
+
+
+def _tool(tool_id, description):
+    return Bunch(
+        id=tool_id,
+        name=tool_id,
+        version="1.0",
+        description=description,
+        tool_type="default",
+        guid=None,
+        labels=[],
+        raw_help=None,
+        edam_operations="",
+        edam_topics="",
+        hidden=False,
+        is_latest_version=True,
+        get_panel_section=lambda: ("text", "Text Manipulation"),
+    )
@@ -379,6 +379,56 @@ class TestToolBox(BaseToolBoxTestCase):
         assert toolbox.get_tool("test_tool") is not None
         assert toolbox.get_tool("not_a_test_tool") is None
 
+    def test_parallel_load_preserves_order(self):
+        self._init_tools_for_parallel_load()
+        serial_toolbox = self.toolbox
+        serial_panel = self._panel_keys(serial_toolbox)
+
+        self.app.config.tool_loading_workers = 4
+        self._toolbox = None
+        self.app.tool_cache = ToolCache()
+        toolbox = self.toolbox
+        assert toolbox is not serial_toolbox
+        assert self._panel_keys(toolbox) == serial_panel
+        assert [key for key, _, _ in toolbox._integrated_tool_panel["t"].elems.panel_items_iter()] == [
+            f"tool_tool_{i}" for i in range(10, 20)
+        ]
+        assert len(toolbox.get_tool("tool_with_macro")._macro_paths) == 1
+        assert toolbox.get_tool("broken_tool") is None
+        assert toolbox._tool_source_preloader is None
+        assert toolbox._tool_load_timings.seconds("parse") > 0
+        assert toolbox._tool_load_timings.seconds("macro expand") > 0
+        assert toolbox._tool_load_timings.seconds("tool construct") > 0
+        assert toolbox._tool_load_timings.seconds("panel insert") > 0
+
+    def _init_tools_for_parallel_load(self):
+        tool_items = []
+        for i in range(20):
+            self._init_tool(filename=f"tool_{i}.xml", tool_id=f"tool_{i}")
+            tool_items.append(f'<tool file="tool_{i}.xml" />')
+        self._init_tool(
+            filename="tool_with_macro.xml",
+            tool_contents=SIMPLE_TOOL_WITH_MACRO,
+            extra_file_contents=SIMPLE_MACRO.substitute(tool_version="2.0"),
+            extra_file_path="external.xml",
+        )
+        with open(self._tool_path("broken_tool.xml"), "w") as f:
+            f.write("certainly not a valid tool")
+        self._add_config(
+            """<toolbox>
+    %s
+    <tool file="broken_tool.xml" />
+    <section id="t" name="test">
+        %s
+    </section>
+    <tool file="tool_with_macro.xml" />
+</toolbox>"""
+            % ("\n    ".join(tool_items[:10]), "\n        ".join(tool_items[10:]))
+        )
+
+    def _panel_keys(self, toolbox):
+        return [key for key, _, _ in toolbox._integrated_tool_panel.panel_items_iter()]
+
     def test_writes_integrate_tool_panel(self):
         self._init_tool()
         self._add_config("""<toolbox><tool file="tool.xml" /></toolbox>""")
@@ -55,6 +55,17 @@ def test_valid_collection_subcollection_matching():
     assert_can_match((nested_list, "paired"), flat_list)
 
 
+def test_map_over_permissions_aggregated_once():
+    hdca = list_instance(ids=["data1", "data2"])
+    hdca.collection.dataset_action_tuples = [("access", 1), ("manage permissions", 1), ("access", 2), ("access", 1)]
+    to_match = build_collections_to_match(hdca)
+    matched = matching.MatchingCollections.for_collections(to_match, TYPE_DESCRIPTION_FACTORY)
+    expected = {"access": {1, 2}, "manage permissions": {1}}
+    assert matched.map_over_permissions("input_0") == expected
+    hdca.collection.dataset_action_tuples = []
+    assert matched.map_over_permissions("input_0") == expected
+
+
 def assert_can_match(*items):
     to_match = build_collections_to_match(*items)
     matching.MatchingCollections.for_collections(to_match, TYPE_DESCRIPTION_FACTORY)
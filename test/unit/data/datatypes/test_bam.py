@@ -1,9 +1,14 @@
+import os
+import threading
+
 from pysam import (  # type: ignore[attr-defined]
     AlignmentFile,
+    index,
     view,
 )
 
 from galaxy.datatypes.binary import Bam
+from galaxy.datatypes.metadata import MetadataMetrics
 from .util import (
     get_dataset,
     get_input_files,
@@ -50,6 +55,57 @@ def test_set_meta_presorted():
         assert bam_file.has_index() is True
 
 
+def test_set_meta_records_index_time():
+    b = Bam()
+    with get_dataset("1.bam") as dataset, MetadataMetrics.collect() as metrics:
+        b.set_meta(dataset=dataset)
+    assert metrics["bam_index_seconds"] >= 0
+    assert "bam_indexes_reused" not in metrics
+
+
+def test_set_meta_reuses_tool_provided_index():
+    b = Bam()
+    with get_dataset("1.bam") as dataset, MetadataMetrics.collect() as metrics:
+        tool_index = f"{dataset.file_name}.bai"
+        index("-o", tool_index, dataset.file_name)
+        b.set_meta(dataset=dataset)
+        assert not os.path.exists(tool_index)
+        bam_file = AlignmentFile(dataset.file_name, mode="rb", index_filename=dataset.metadata.bam_index.file_name)
+        assert bam_file.has_index() is True
+    assert metrics["bam_indexes_reused"] == 1
+    assert "bam_index_seconds" not in metrics
+
+
+def test_set_meta_metrics_are_collected_per_context():
+    b = Bam()
+    with MetadataMetrics.collect() as outer_metrics:
+        with get_dataset("1.bam") as dataset, MetadataMetrics.collect() as metrics:
+            b.set_meta(dataset=dataset)
+        # nested collectors don't share metrics
+        assert metrics["bam_index_seconds"] >= 0
+        assert not outer_metrics
+        # the metrics of other threads (e.g. other Celery tasks or server requests) are not collected
+        thread = threading.Thread(target=MetadataMetrics.add, args=("bam_index_seconds", 1.0))
+        thread.start()
+        thread.join()
+        assert not outer_metrics
+    # metrics added without a collector are dropped
+    MetadataMetrics.add("bam_index_seconds", 1.0)
+    assert "bam_index_seconds" not in outer_metrics
+
+
+def test_get_tool_provided_index_outdated():
+    b = Bam()
+    with get_input_files("1.bam") as input_files:
+        bam = input_files[0]
+        index("-o", f"{bam}.bai", bam)
+        assert b.get_tool_provided_index(bam, "-b") == f"{bam}.bai"
+        assert b.get_tool_provided_index(bam, "-c") is None
+        stat = os.stat(bam)
+        os.utime(f"{bam}.bai", (stat.st_atime, stat.st_mtime - 10))
+        assert b.get_tool_provided_index(bam, "-b") is None
+
+
 def test_set_meta_header_info():
     """
     check if information from the bam header is set
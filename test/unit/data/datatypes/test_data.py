@@ -3,17 +3,37 @@ Unit tests for base DataTypes.
 .. seealso:: galaxy.datatypes.data
 """
 import os
+import tempfile
 
+import pytest
+
+from galaxy import model
+from galaxy.datatypes import data
 from galaxy.datatypes.anvio import AnvioStructureDB
 from galaxy.datatypes.data import (
+    count_lines,
     Data,
     get_file_peek,
+    LineCounts,
+    summarize_text_file,
 )
 from galaxy.datatypes.interval import (
     Bed,
     BedStrict,
 )
-from galaxy.util import galaxy_directory
+from galaxy.datatypes.sniff import get_test_fname
+from galaxy.util import (
+    compression_utils,
+    galaxy_directory,
+)
+from galaxy.util.bunch import Bunch
+
+TEST_FILES = sorted(
+    os.path.join(directory, name)
+    for directory in (get_test_fname(""), os.path.join(galaxy_directory(), "test-data"))
+    for name in os.listdir(directory)
+    if os.path.isfile(os.path.join(directory, name))
+)
 
 
 def test_get_file_peek():
@@ -32,3 +52,112 @@ def test_is_datatype_change_allowed():
     assert AnvioStructureDB.is_datatype_change_allowed() is False
     # BedStrict explictly disallows datatype change with `allow_datatype_change = False`
     assert BedStrict.is_datatype_change_allowed() is False
+
+
+def _text_mode_line_counts(file_name):
+    """Count data, comment and sequence header lines as reading the file in text mode does."""
+    lines = comment_lines = blank_lines = sequences = 0
+    with compression_utils.get_fileobj(file_name) as fh:
+        for line in fh:
+            line = line.strip()
+            lines += 1
+            if not line:
+                blank_lines += 1
+            elif line.startswith("#"):
+                comment_lines += 1
+            elif line.startswith(">"):
+                sequences += 1
+    return LineCounts(lines, blank_lines, {b"#": comment_lines, b">": sequences})
+
+
+LINE_COUNT_CASES = [
+    b"",
+    b"a",
+    b"a\nb\n",
+    b"#a\n\n  \t\n  # b\n>c\nd",
+    b"a\r\nb\r\n\r\n#c\r\n",
+    b"a\rb\r\r#c\r",
+    b"\xc2\xa0\n\xe3\x80\x80#x\n\xe2\x80\x8a>y\n\x1c\n\xc3\xa9\n",
+    b"a\n" + b" " * 50 + b"\n#" + b"x" * 50 + b"\n",
+]
+
+
+@pytest.mark.parametrize("contents", LINE_COUNT_CASES)
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, data.COUNT_LINES_CHUNK_SIZE])
+def test_count_lines(contents, chunk_size, monkeypatch):
+    monkeypatch.setattr(data, "COUNT_LINES_CHUNK_SIZE", chunk_size)
+    with tempfile.NamedTemporaryFile() as test_file:
+        test_file.write(contents)
+        test_file.flush()
+        assert count_lines(test_file.name, (b"#", b">")) == _text_mode_line_counts(test_file.name)
+
+
+def test_display_data_previews_large_non_utf8_file():
+    with tempfile.NamedTemporaryFile() as test_file:
+        test_file.write(b"\xff\xfe" * data.DEFAULT_MAX_PEEK_SIZE)
+        test_file.flush()
+        templates = []
+        trans = Bunch(
+            app=Bunch(datatypes_registry=Bunch(get_composite_extensions=lambda: [])),
+            log_event=lambda message: None,
+            fill_template_mako=lambda template, **kwd: templates.append((template, kwd)) or "preview",
+        )
+        dataset = Bunch(
+            id=1,
+            datatype=Data(),
+            dataset=model.Dataset(external_filename=test_file.name),
+            get_mime=lambda: "text/plain",
+            get_size=lambda: 2 * data.DEFAULT_MAX_PEEK_SIZE,
+        )
+        assert Data().display_data(trans, dataset, preview=True) == (
+            "preview",
+            {
+                "X-Content-Type-Options": "nosniff",
+                "content-type": "text/html",
+            },
+        )
+        template, kwd = templates[0]
+        assert template == "/dataset/large_file.mako"
+        # the preview is the first max_peek_size bytes, however they decode
+        assert kwd["truncated_data"] == b"\xff\xfe" * (data.DEFAULT_MAX_PEEK_SIZE // 2)
+
+
+def test_count_lines_not_utf8():
+    with tempfile.NamedTemporaryFile() as test_file:
+        test_file.write(b"a\n\xff\n")
+        test_file.flush()
+        with pytest.raises(UnicodeDecodeError):
+            count_lines(test_file.name)
+
+
+@pytest.mark.parametrize("file_name", TEST_FILES, ids=os.path.basename)
+def test_count_lines_test_files(file_name, monkeypatch):
+    monkeypatch.setattr(data, "COUNT_LINES_CHUNK_SIZE", 4096)
+    try:
+        expected = _text_mode_line_counts(file_name)
+    except UnicodeDecodeError:
+        with pytest.raises(UnicodeDecodeError):
+            count_lines(file_name)
+        return
+    assert count_lines(file_name, (b"#", b">")) == expected
+
+
+@pytest.mark.parametrize("file_name", TEST_FILES, ids=os.path.basename)
+@pytest.mark.parametrize("peek_kwds", [{}, {"line_wrap": False, "width": 10}, {"skipchars": ["#"]}])
+def test_summarize_text_file(file_name, peek_kwds, monkeypatch):
+    monkeypatch.setattr(data, "COUNT_LINES_CHUNK_SIZE", 16384)
+    try:
+        peek = get_file_peek(file_name, **peek_kwds)
+    except UnicodeDecodeError:
+        with pytest.raises(UnicodeDecodeError):
+            summarize_text_file(file_name, **peek_kwds)
+        return
+    summary = summarize_text_file(file_name, **peek_kwds)
+    assert summary.peek == peek
+    try:
+        expected = _text_mode_line_counts(file_name)
+    except UnicodeDecodeError:
+        assert summary.line_counts is None
+    else:
+        assert summary.line_counts is not None
+        assert summary.line_counts.data_lines == expected.data_lines
@@ -0,0 +1,168 @@
+import gzip
+import json
+
+from galaxy.datatypes import sequence
+from galaxy.datatypes.sequence import (
+    Fasta,
+    FastqSanger,
+    Sequence,
+)
+from .util import (
+    MockDataset,
+    MockDatasetDataset,
+)
+
+FASTQ_RECORD = "@read{0}\nACGT{0}\n+\nIIII{0}\n"
+FASTA_RECORD = ">seq{0}\nACGT\nTT{0}\n"
+
+
+def test_fastq_line_offsets(tmp_path, monkeypatch):
+    monkeypatch.setattr(sequence, "LINE_OFFSETS_INTERVAL", 2)
+    monkeypatch.setattr(sequence, "MAX_LINE_OFFSETS", 4)
+    dataset = __fastq_dataset(tmp_path, 5)
+    contents = (tmp_path / "input.fastqsanger").read_bytes()
+    line_starts = [0] + [i + 1 for i, c in enumerate(contents) if c == ord("\n")][:-1]
+    assert dataset.metadata.sequences == 5
+    assert dataset.metadata.data_lines == 20
+    # the interval doubled twice to keep at most 4 offsets
+    assert dataset.metadata.line_offsets == dict(interval=8, offsets=line_starts[::8])
+    assert sequence._line_start_offsets(dataset.file_name, [0, 5, 9, 20, 24], dataset.metadata.line_offsets) == (
+        [line_starts[0], line_starts[5], line_starts[9], len(contents), len(contents)]
+    )
+    assert sequence._line_start_offsets(dataset.file_name, [0, 5, 9, 20, 24]) == (
+        [line_starts[0], line_starts[5], line_starts[9], len(contents), len(contents)]
+    )
+
+
+def test_fastq_line_offsets_not_stored_for_small_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(sequence, "LINE_OFFSETS_INTERVAL", 8)
+    # 2 records are 8 lines, so only the offset of the first line would be stored
+    dataset = __fastq_dataset(tmp_path, 2)
+    assert dataset.metadata.sequences == 2
+    assert dataset.metadata.line_offsets is None
+
+
+def test_fastq_split(tmp_path):
+    dataset = __fastq_dataset(tmp_path, 10)
+    part_dirs = []
+
+    def subdir():
+        part_dir = tmp_path / f"task_{len(part_dirs)}"
+        part_dir.mkdir()
+        part_dirs.append(part_dir)
+        return str(part_dir)
+
+    FastqSanger.split([dataset], subdir, dict(split_mode="number_of_parts", split_size=3))
+    parts = []
+    for part_dir in part_dirs:
+        with open(part_dir / "split_info_input.fastqsanger.json") as f:
+            split_data = json.load(f)
+        assert "start_offset" in split_data["args"]
+        assert FastqSanger.process_split_file(split_data)
+        parts.append((part_dir / "input.fastqsanger").read_text())
+    assert parts == [
+        "".join(FASTQ_RECORD.format(i) for i in range(0, 4)),
+        "".join(FASTQ_RECORD.format(i) for i in range(4, 7)),
+        "".join(FASTQ_RECORD.format(i) for i in range(7, 10)),
+    ]
+
+
+def test_fastq_split_without_trailing_newline(tmp_path):
+    input_path = tmp_path / "input.fastqsanger"
+    input_path.write_text("".join(FASTQ_RECORD.format(i) for i in range(5)).rstrip("\n"))
+    dataset = MockDataset(1)
+    dataset.file_name = str(input_path)
+    dataset.metadata.sequences = None
+    dataset.metadata.line_offsets = None
+    dataset.get_converted_files_by_type = lambda file_type: None
+    dataset.copied_from_library_dataset_dataset_association = None
+    part_paths = []
+
+    def subdir():
+        part_dir = tmp_path / f"task_{len(part_paths)}"
+        part_dir.mkdir()
+        part_paths.append(part_dir / input_path.name)
+        return str(part_dir)
+
+    FastqSanger.split([dataset], subdir, dict(split_mode="to_size", split_size=2))
+    for part_path in part_paths:
+        with open(part_path.parent / "split_info_input.fastqsanger.json") as f:
+            assert FastqSanger.process_split_file(json.load(f))
+    # the last record is kept
+    assert [part_path.read_text() for part_path in part_paths] == [
+        "".join(FASTQ_RECORD.format(i) for i in range(0, 2)),
+        "".join(FASTQ_RECORD.format(i) for i in range(2, 4)),
+        FASTQ_RECORD.format(4).rstrip("\n"),
+    ]
+
+
+def test_fastq_split_with_toc(tmp_path):
+    input_path = tmp_path / "input.fastqsanger.gz"
+    sections = []
+    with open(input_path, "wb") as f:
+        for block in range(3):
+            start = f.tell()
+            f.write(gzip.compress("".join(FASTQ_RECORD.format(block * 10 + i) for i in range(10)).encode()))
+            sections.append(dict(start=start, end=f.tell(), sequences=10))
+    output_path = tmp_path / "output.fastqsanger.gz"
+    for start_sequence, sequence_count in [(0, 20), (5, 20), (25, 5), (12, 3)]:
+        ranges = Sequence.get_split_ranges_with_toc(dict(sections=sections), start_sequence, sequence_count)
+        sequence._extract_gzip_ranges(str(input_path), str(output_path), ranges)
+        with gzip.open(output_path, "rt") as f:
+            assert f.read() == "".join(
+                FASTQ_RECORD.format(i) for i in range(start_sequence, start_sequence + sequence_count)
+            )
+
+
+def test_fasta_count_split(tmp_path):
+    input_path = tmp_path / "input.fasta"
+    input_path.write_text("".join(FASTA_RECORD.format(i) for i in range(10)))
+    parts = __fasta_split(tmp_path, input_path, dict(split_mode="to_size", split_size=4))
+    assert parts == [
+        "".join(FASTA_RECORD.format(i) for i in range(0, 4)),
+        "".join(FASTA_RECORD.format(i) for i in range(4, 8)),
+        "".join(FASTA_RECORD.format(i) for i in range(8, 10)),
+    ]
+
+
+def test_fasta_size_split(tmp_path):
+    input_path = tmp_path / "input.fasta"
+    input_path.write_text("".join(FASTA_RECORD.format(i) for i in range(10)))
+    parts = __fasta_split(tmp_path, input_path, dict(split_mode="number_of_parts", split_size=3))
+    assert "".join(parts) == input_path.read_text()
+    assert len(parts) == 3
+    assert all(part.startswith(">") for part in parts)
+
+
+def test_fasta_split_empty(tmp_path):
+    input_path = tmp_path / "input.fasta"
+    input_path.write_text("")
+    assert __fasta_split(tmp_path, input_path, dict(split_mode="to_size", split_size=4)) == [""]
+
+
+def __fasta_split(tmp_path, input_path, split_params):
+    part_paths = []
+
+    def subdir():
+        part_dir = tmp_path / f"task_{len(part_paths)}"
+        part_dir.mkdir()
+        part_paths.append(part_dir / input_path.name)
+        return str(part_dir)
+
+    dataset = MockDataset(1)
+    dataset.file_name = str(input_path)
+    dataset.metadata.sequences = None
+    Fasta.split([dataset], subdir, split_params)
+    return [part_path.read_text() for part_path in part_paths]
+
+
+def __fastq_dataset(tmp_path, records):
+    input_path = tmp_path / "input.fastqsanger"
+    input_path.write_text("".join(FASTQ_RECORD.format(i) for i in range(records)))
+    dataset = MockDataset(1)
+    dataset.file_name = str(input_path)
+    dataset.dataset = MockDatasetDataset(dataset.file_name)
+    dataset.get_converted_files_by_type = lambda file_type: None
+    dataset.copied_from_library_dataset_dataset_association = None
+    FastqSanger().set_meta(dataset)
+    return dataset
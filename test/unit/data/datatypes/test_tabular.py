@@ -1,17 +1,177 @@
+import os
 import tempfile
 
+import pytest
+
+from galaxy.datatypes import tabular
+from galaxy.datatypes.sniff import get_test_fname
 from galaxy.datatypes.tabular import (
     MAX_DATA_LINES,
     Tabular,
 )
-from .util import MockDataset
+from galaxy.util import (
+    compression_utils,
+    galaxy_directory,
+)
+from .util import (
+    MockDataset,
+    MockDatasetDataset,
+)
+
+TEST_FILES = sorted(
+    [get_test_fname(name) for name in os.listdir(get_test_fname(""))]
+    + [os.path.join(galaxy_directory(), "test-data", name) for name in os.listdir(galaxy_directory() + "/test-data")]
+)
+TEST_FILES = [path for path in TEST_FILES if os.path.isfile(path)]
+
+EDGE_CASES = {
+    "header": "name\tcount\tratio\nA\t1\t0.5\nB\t2\t1e-3\n",
+    "types": "#comment\n1\t1.5\t1,2\tNA\t1_000\t١\t inf\t+3\n\n-4\t.5\ta\tna\t2\t2\tnan\t-3.\n",
+    "ragged": "1\n1\t2\t3\n\n1\t2\n#\n1\tx\t\t4\n",
+    "crlf": "a\tb\r\n1\t2\r\n#c\r\n3\t4.5\r\n",
+    "unterminated": "1\t2\n3\t4\n#5",
+    "duplicates": "#\nX\tY\nX\tY\nX\tY\n#\n\nX\tY\n",
+    "whitespace": "   \t1\n \t2\n",
+}
+
+
+@pytest.fixture
+def max_optional_metadata_filesize():
+    """Set the maximum size of datasets getting optional metadata, unlimited by default."""
+    datatype = Tabular()
+    original = datatype.max_optional_metadata_filesize
+
+    def set_max(max_value=-1):
+        datatype.max_optional_metadata_filesize = max_value
+
+    set_max()
+    yield set_max
+    set_max(original)
+
+
+def _legacy_guess_column_type(column_text):
+    if not column_text:
+        return None
+    for column_type, check in (("int", int), ("float", float)):
+        if "_" not in column_text:
+            try:
+                check(column_text)
+                return column_type
+            except ValueError:
+                pass
+    if column_text.strip().lower() == "na" and "_" not in column_text:
+        return "float"
+    return "list" if "," in column_text else "str"
+
+
+def _legacy_set_meta(file_name, skip=None, max_data_lines=None, max_guess_type_data_lines=None):
+    """Line by line implementation of ``Tabular.set_meta`` used as reference."""
+    requested_skip = skip
+    skip = skip or 0
+    ranks = {None: -1, "int": 0, "float": 1, "list": 2, "str": 3}
+    data_lines = comment_lines = 0
+    column_types = []
+    first_line_column_types = ["str"]
+    with compression_utils.get_fileobj(file_name) as fh:
+        for i, line in enumerate(iter(fh.readline, "")):
+            line = line.rstrip("\r\n")
+            if i < skip or not line or line.startswith("#"):
+                comment_lines += 1
+            else:
+                data_lines += 1
+                if max_guess_type_data_lines is None or data_lines <= max_guess_type_data_lines:
+                    for field_count, field in enumerate(line.split("\t")):
+                        if field_count >= len(column_types):
+                            column_types.append(None)
+                        column_type = _legacy_guess_column_type(field)
+                        if ranks[column_type] > ranks[column_types[field_count]]:
+                            column_types[field_count] = column_type
+                if i == 0 and requested_skip is None:
+                    first_line_column_types = column_types
+                    column_types = [None for col in first_line_column_types]
+            if max_data_lines is not None and data_lines >= max_data_lines:
+                break
+    if len(first_line_column_types) > len(column_types):
+        column_types.extend(first_line_column_types[len(column_types) :])
+    for i, column_type in enumerate(column_types):
+        if column_type is None:
+            if len(first_line_column_types) <= i or first_line_column_types[i] is None:
+                column_types[i] = "str"
+            else:
+                column_types[i] = first_line_column_types[i]
+    return data_lines, comment_lines, column_types
 
 
-def test_tabular_set_meta_large_file():
+def _set_meta(file_name, **kwd):
+    dataset = MockDataset(id=1)
+    dataset.file_name = file_name
+    dataset.dataset = MockDatasetDataset(file_name)
+    Tabular().set_meta(dataset, **kwd)  # type: ignore [arg-type]
+    return dataset.metadata
+
+
+def _assert_same_metadata(file_name, **kwd):
+    try:
+        data_lines, comment_lines, column_types = _legacy_set_meta(file_name, **kwd)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            _set_meta(file_name, **kwd)
+        return
+    metadata = _set_meta(file_name, **kwd)
+    assert metadata.column_types == column_types
+    assert metadata.columns == len(column_types)
+    if kwd.get("max_data_lines") is None:
+        assert (metadata.data_lines, metadata.comment_lines) == (data_lines, comment_lines)
+    else:
+        # the remaining lines are counted without being parsed, if they can be decoded
+        assert metadata.data_lines is None or metadata.data_lines >= data_lines
+
+
+def test_tabular_set_meta_large_file(max_optional_metadata_filesize):
     with tempfile.NamedTemporaryFile(mode="w") as test_file:
         for _ in range(MAX_DATA_LINES + 1):
             test_file.write("A\tB\n")
+        test_file.write("#\n")
+        test_file.flush()
+        metadata = _set_meta(test_file.name)
+        assert metadata.data_lines == MAX_DATA_LINES + 1
+        assert metadata.comment_lines == 1
+        assert metadata.column_types == ["str", "str"]
+
+
+@pytest.mark.parametrize("file_name", TEST_FILES, ids=os.path.basename)
+@pytest.mark.parametrize("skip", [None, 2])
+def test_tabular_set_meta_test_files(file_name, skip, max_optional_metadata_filesize):
+    _assert_same_metadata(file_name, skip=skip)
+    _assert_same_metadata(file_name, skip=skip, max_data_lines=3, max_guess_type_data_lines=2)
+
+
+@pytest.mark.parametrize("case", EDGE_CASES)
+@pytest.mark.parametrize("chunk_size", [1, 7, tabular.SET_META_CHUNK_SIZE])
+def test_tabular_set_meta_edge_cases(case, chunk_size, monkeypatch, max_optional_metadata_filesize):
+    monkeypatch.setattr(tabular, "SET_META_CHUNK_SIZE", chunk_size)
+    with tempfile.NamedTemporaryFile(mode="w", newline="") as test_file:
+        test_file.write(EDGE_CASES[case])
+        test_file.flush()
+        for skip in (None, 0, 1, 3):
+            for max_data_lines in (None, 1, 2, 3):
+                for max_guess_type_data_lines in (None, 0, 1, 2):
+                    _assert_same_metadata(
+                        test_file.name,
+                        skip=skip,
+                        max_data_lines=max_data_lines,
+                        max_guess_type_data_lines=max_guess_type_data_lines,
+                    )
+
+
+def test_tabular_set_meta_sampled_line_counts(max_optional_metadata_filesize):
+    with tempfile.NamedTemporaryFile(mode="w") as test_file:
+        test_file.write("#header\n" + "1\t2\n" * 10 + "#\n\n" + "x\ty\n" * 5)
         test_file.flush()
-        dataset = MockDataset(id=1)
-        dataset.file_name = test_file.name
-        Tabular().set_meta(dataset)  # type: ignore [arg-type]
+        metadata = _set_meta(test_file.name, max_data_lines=3)
+        assert (metadata.data_lines, metadata.comment_lines) == (15, 3)
+        # types are only guessed from the sampled lines
+        assert metadata.column_types == ["int", "int"]
+        max_optional_metadata_filesize(10)
+        metadata = _set_meta(test_file.name, max_data_lines=3)
+        assert (metadata.data_lines, metadata.comment_lines) == (None, None)
@@ -1,7 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from galaxy.exceptions import MalformedId
 from galaxy.security import idencoding
 
 test_helper_1 = idencoding.IdEncodingHelper(id_secret="secu1")
 test_helper_2 = idencoding.IdEncodingHelper(id_secret="secu2")
+# never caches ids
+test_helper_3 = idencoding.IdEncodingHelper(id_secret="secu3", id_cache_size=0)
 
 
 def test_maximum_length_handling_ascii():
@@ -139,3 +146,69 @@ def test_encode_decode_guid():
     encoded_key = test_helper_1.encode_guid(session_key)
     decoded_key = test_helper_1.decode_guid(encoded_key)
     assert session_key == decoded_key, f"{session_key} != {decoded_key}"
+
+
+def test_encode_decode_ids():
+    ids = [1, 2, 1, 12345678, 10**20, "3"]
+    helper = idencoding.IdEncodingHelper(id_secret="secu3")
+    encoded_ids = helper.encode_ids(ids)
+    # same as encoding ids one by one, without a cache
+    assert encoded_ids == [test_helper_3.encode_id(i) for i in ids]
+    assert helper.encode_ids(ids) == encoded_ids
+    assert helper.decode_ids(encoded_ids) == [int(i) for i in ids]
+    assert helper.decode_ids(encoded_ids) == [int(i) for i in ids]
+    assert helper.encode_ids([]) == helper.decode_ids([]) == []
+    encoded_kind_ids = helper.encode_ids(ids, kind="k1")
+    assert encoded_kind_ids == [test_helper_3.encode_id(i, kind="k1") for i in ids]
+    assert helper.decode_ids(encoded_kind_ids, kind="k1") == [int(i) for i in ids]
+
+
+def test_encode_ids_none():
+    with pytest.raises(MalformedId):
+        test_helper_1.encode_ids([1, None])
+
+
+def test_decode_ids_invalid():
+    encoded_id = test_helper_1.encode_id(1)
+    # a 1 byte id and a 7 byte id would make up a block together
+    for invalid_ids in (
+        [encoded_id, "xyz"],
+        [encoded_id, None],
+        [encoded_id, "aa", "11223344556677"],
+        [encoded_id, test_helper_2.encode_id(1)],
+    ):
+        with pytest.raises(MalformedId):
+            test_helper_1.decode_ids(invalid_ids)
+
+
+def test_id_cache_size():
+    helper = idencoding.IdEncodingHelper(id_secret="secu3", id_cache_size=2)
+    for i in range(5):
+        assert helper.decode_id(helper.encode_id(i)) == i
+    assert list(helper.encoded_ids_for_kind[None]._items) == [3, 4]
+    assert helper.decode_ids(helper.encode_ids(range(5, 10))) == list(range(5, 10))
+    assert list(helper.decoded_ids_for_kind[None]._items.values()) == [8, 9]
+    # recently used ids are kept
+    helper.encode_id(8)
+    helper.encode_id(10)
+    assert list(helper.encoded_ids_for_kind[None]._items) == [8, 10]
+
+
+def test_id_cache_shared_between_threads():
+    helper = idencoding.IdEncodingHelper(id_secret="secu3", id_cache_size=10)
+    expected = test_helper_3.encode_ids(range(100))
+
+    def encode():
+        for _ in range(50):
+            assert [helper.encode_id(i) for i in range(100)] == expected
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for future in [executor.submit(encode) for _ in range(8)]:
+            future.result()
+    assert len(helper.encoded_ids_for_kind[None]._items) == 10
+
+
+def test_kind_ciphers_are_cached():
+    helper = idencoding.IdEncodingHelper(id_secret="secu3")
+    helper.encode_id(1, kind="k1")
+    assert "k1" in helper.id_ciphers_for_kind
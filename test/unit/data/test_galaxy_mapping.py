@@ -1,4 +1,5 @@
 import collections
+import datetime
 import os
 import random
 import uuid
@@ -9,11 +10,13 @@ import pytest
 from sqlalchemy import (
     inspect,
     select,
+    update,
 )
 
 import galaxy.datatypes.registry
 import galaxy.model
 import galaxy.model.mapping as mapping
+import galaxy.model.orm.now
 from galaxy import model
 from galaxy.model.database_utils import create_database
 from galaxy.model.metadata import MetadataTempFile
@@ -681,6 +684,55 @@ class TestMappings(BaseModelTestCase):
         assert h1_audits[0] == h1_latest
         assert h2_audits[0] == h2_latest
 
+    def test_history_summary(self):
+        u = model.User(email="summary@foo.bar.baz", password="password")
+        h1 = model.History(name="HistorySummaryHistory", user=u)
+        self.persist(u, h1, expunge=False)
+
+        def get_counts():
+            return {
+                (row.history_content_type, row.state, row.deleted, row.visible): row.count
+                for row in self.session()
+                .query(model.HistoryContentSummary)
+                .filter(model.HistoryContentSummary.history_id == h1.id)
+                if row.count
+            }
+
+        d1 = self.new_hda(h1, name="1")
+        d2 = self.new_hda(h1, name="2", visible=False)
+        d3 = h1.add_dataset(d1.copy())
+        for hda in (d1, d2):
+            hda.dataset.state = model.Dataset.states.QUEUED
+            hda.dataset.total_size = 10
+        self.session().flush()
+        assert get_counts() == {("dataset", "queued", False, True): 2, ("dataset", "queued", False, False): 1}
+        assert h1.disk_size == 20
+
+        # job state changes update the datasets without the ORM
+        self.session().execute(
+            update(model.Dataset.table)
+            .where(model.Dataset.table.c.id == d1.dataset.id)
+            .values(state=model.Dataset.states.RUNNING)
+        )
+        d2.deleted = True
+        d3.purged = True
+        c1 = model.DatasetCollection(collection_type="list")
+        self.persist(model.HistoryDatasetCollectionAssociation(collection=c1, history=h1, hid=4, visible=True))
+        assert get_counts() == {
+            ("dataset", "running", False, True): 2,
+            ("dataset", "queued", True, False): 1,
+            ("dataset_collection", "ok", False, True): 1,
+        }
+        assert h1.disk_size == 20
+        d1.purged = True
+        self.session().flush()
+        assert h1.disk_size == 10
+
+        summary = get_counts()
+        model.HistoryContentSummary.recalculate(self.session(), h1.id)
+        assert get_counts() == summary
+        assert h1.disk_size == 10
+
     def _non_empty_flush(self):
         lf = model.LibraryFolder(name="RootFolder")
         session = self.session()
@@ -848,6 +900,55 @@ class TestMappings(BaseModelTestCase):
         annotations = copied_workflow.steps[0].annotations
         assert len(annotations) == 1
 
+    def test_poll_woken_workflow_ids(self):
+        user = model.User(email="testwokenworkflows@bx.psu.edu", password="password")
+        workflow = _workflow_from_steps(user, [])
+        handler = "test_woken_handler"
+        invocations = []
+        for _ in range(2):
+            workflow_invocation = _invocation_for_workflow(user, workflow)
+            workflow_invocation.state = model.WorkflowInvocation.states.READY
+            workflow_invocation.scheduler = "core"
+            workflow_invocation.handler = handler
+            invocations.append(workflow_invocation)
+        self.persist(*invocations)
+        invocation, other_invocation = invocations
+        session = self.session()
+        long_ago = galaxy.model.orm.now.now() - datetime.timedelta(days=1)
+        session.execute(
+            update(model.WorkflowInvocation.table)
+            .where(model.WorkflowInvocation.id.in_([i.id for i in invocations]))
+            .values(update_time=long_ago)
+        )
+        since = galaxy.model.orm.now.now() - datetime.timedelta(minutes=1)
+
+        def woken_ids():
+            return model.WorkflowInvocation.poll_woken_workflow_ids(
+                self.model.engine, since, scheduler="core", handler=handler
+            )
+
+        assert woken_ids() == []
+        assert model.WorkflowInvocation.poll_active_workflow_ids(
+            self.model.engine, scheduler="core", handler=handler
+        ) == [invocation.id, other_invocation.id]
+
+        job = model.Job()
+        job.history = invocation.history
+        job.state = model.Job.states.RUNNING
+        self.persist(job)
+        assert woken_ids() == []
+
+        job.state = model.Job.states.OK
+        self.persist(job)
+        assert woken_ids() == [invocation.id]
+
+        invocation_step = model.WorkflowInvocationStep()
+        invocation_step.workflow_invocation = other_invocation
+        invocation_step.workflow_step = model.WorkflowStep()
+        invocation_step.workflow_step.workflow = workflow
+        self.persist(invocation_step)
+        assert woken_ids() == [invocation.id, other_invocation.id]
+
     def test_role_creation(self):
         security_agent = GalaxyRBACAgent(self.model)
 
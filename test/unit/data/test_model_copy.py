@@ -3,6 +3,7 @@ import os
 import threading
 from typing import Union
 
+import pytest
 from sqlalchemy.orm.scoping import scoped_session
 
 import galaxy.datatypes.registry
@@ -13,6 +14,7 @@ from galaxy.model import (
     HistoryDatasetAssociation,
     User,
 )
+from galaxy.model.history_copy import HistoryCopier
 from galaxy.model.metadata import MetadataTempFile
 from galaxy.objectstore.unittest_utils import (
     Config as TestConfig,
@@ -31,7 +33,19 @@ INCLUDE_METADATA_FILE = True
 THREAD_LOCAL_LOG = threading.local()
 
 
-def test_history_dataset_copy(num_datasets=NUM_DATASETS, include_metadata_file=INCLUDE_METADATA_FILE):
+def _orm_copy(history, **kwds):
+    return history.copy(**kwds)
+
+
+def _bulk_copy(history, **kwds):
+    return HistoryCopier(history, chunk_size=2).copy(**kwds)
+
+
+COPY_FUNCTIONS = pytest.mark.parametrize("copy_history", [_orm_copy, _bulk_copy])
+
+
+@COPY_FUNCTIONS
+def test_history_dataset_copy(copy_history, num_datasets=NUM_DATASETS, include_metadata_file=INCLUDE_METADATA_FILE):
     with _setup_mapping_and_user() as (test_config, object_store, model, old_history):
         for i in range(num_datasets):
             hda_path = test_config.write("moo", "test_metadata_original_%d" % i)
@@ -40,7 +54,7 @@ def test_history_dataset_copy(num_datasets=NUM_DATASETS, include_metadata_file=I
         model.context.flush()
 
         history_copy_timer = ExecutionTimer()
-        new_history = old_history.copy(target_user=old_history.user)
+        new_history = copy_history(old_history, target_user=old_history.user)
         print("history copied %s" % history_copy_timer)
         assert new_history.name == "HistoryCopyHistory1"
         assert new_history.user == old_history.user
@@ -52,7 +66,8 @@ def test_history_dataset_copy(num_datasets=NUM_DATASETS, include_metadata_file=I
             assert annotation_str == "annotation #%d" % hda.hid, annotation_str
 
 
-def test_history_collection_copy(list_size=NUM_DATASETS):
+@COPY_FUNCTIONS
+def test_history_collection_copy(copy_history, list_size=NUM_DATASETS):
     with _setup_mapping_and_user() as (test_config, object_store, model, old_history):
         for i in range(NUM_COLLECTIONS):
             hdas = []
@@ -102,7 +117,7 @@ def test_history_collection_copy(list_size=NUM_DATASETS):
         #         print("Flushing just %s" % instances)
 
         history_copy_timer = ExecutionTimer()
-        new_history = old_history.copy(target_user=old_history.user)
+        new_history = copy_history(old_history, target_user=old_history.user)
         print("history copied %s" % history_copy_timer)
 
         for hda in new_history.active_datasets:
@@ -116,6 +131,134 @@ def test_history_collection_copy(list_size=NUM_DATASETS):
             assert annotation_str == "annotation #%d" % hdca.hid, annotation_str
 
 
+def test_history_bulk_copy_matches_orm_copy():
+    with _setup_mapping_and_user() as (test_config, object_store, model, old_history):
+        session = model.context
+        other_history = History(name="other", user=old_history.user)
+        session.add(other_history)
+        hdas = []
+        for i in range(4):
+            hda_path = test_config.write("moo", "test_metadata_original_%d" % i)
+            hdas.append(_create_hda(model, object_store, old_history, hda_path))
+        hdas[1].deleted = True
+        hdas[2].visible = False
+        foreign_hda = _create_hda(model, object_store, other_history, test_config.write("moo", "foreign"))
+        foreign_hda.visible = False
+        session.flush()
+        tag = model.Tag(name="group")
+        hdas[0].tags.append(
+            model.HistoryDatasetAssociationTagAssociation(
+                user=old_history.user, tag=tag, user_tname="group", value="x", user_value="x"
+            )
+        )
+        collection = model.DatasetCollection(collection_type="list")
+        for index, element in enumerate([hdas[2], foreign_hda]):
+            session.add(
+                model.DatasetCollectionElement(
+                    collection=collection, element=element, element_index=index, element_identifier=f"e{index}"
+                )
+            )
+        hdca = model.HistoryDatasetCollectionAssociation(collection=collection, name="list", visible=True)
+        old_history.add_dataset_collection(hdca)
+        hdca.tags.append(
+            model.HistoryDatasetCollectionTagAssociation(user=old_history.user, tag=tag, user_tname="group")
+        )
+        session.flush()
+        hdca.add_item_annotation(session, old_history.user, hdca, "collection annotation")
+        session.flush()
+
+        orm_copy = _orm_copy(old_history, target_user=old_history.user)
+        session.flush()
+        bulk_copy = _bulk_copy(old_history, target_user=old_history.user)
+        hid_counter = old_history.hid_counter
+        orm_copy_id, bulk_copy_id = orm_copy.id, bulk_copy.id
+        session.expunge_all()
+        orm_copy = session.query(History).get(orm_copy_id)
+        bulk_copy = session.query(History).get(bulk_copy_id)
+        assert _history_summary(session, bulk_copy) == _history_summary(session, orm_copy)
+        summary = _history_summary(session, bulk_copy)
+        # the deleted dataset is not copied, the element from the other history is copied hidden
+        assert [hda[:3] for hda in summary[0]] == [
+            (1, False, False),
+            (1, True, False),
+            (3, False, False),
+            (4, True, False),
+        ]
+        assert summary[1] == [(5, "list", ["e0", "e1"], [3, 1], ["group"], "collection annotation")]
+        assert bulk_copy.hid_counter == hid_counter
+
+
+def test_history_bulk_copy_to_other_user_disk_usage():
+    # the ORM copy adjusts the disk usage per dataset without flushing, so only the last adjustment sticks
+    with _setup_mapping_and_user() as (test_config, object_store, model, old_history):
+        session = model.context
+        for i in range(2):
+            _create_hda(model, object_store, old_history, test_config.write("moo", "test_disk_usage_%d" % i))
+        other_user = User(email="othercopy@example.com", password="password")
+        session.add(other_user)
+        session.flush()
+
+        _bulk_copy(old_history, target_user=other_user)
+        session.flush()
+        assert other_user.get_disk_usage() == 6
+        # the datasets are already counted for the other user
+        _bulk_copy(old_history, target_user=other_user)
+        session.flush()
+        assert other_user.get_disk_usage() == 6
+
+
+def test_history_bulk_copy_reports_progress_per_chunk():
+    with _setup_mapping_and_user() as (test_config, object_store, model, old_history):
+        session = model.context
+        for i in range(5):
+            _create_hda(model, object_store, old_history, test_config.write("moo", "test_progress_%d" % i))
+        for i in range(3):
+            collection = model.DatasetCollection(collection_type="list")
+            old_history.add_dataset_collection(
+                model.HistoryDatasetCollectionAssociation(collection=collection, name=f"list{i}", visible=True)
+            )
+        session.flush()
+
+        progress = []
+        HistoryCopier(old_history, chunk_size=2, progress=lambda *args: progress.append(args)).copy(
+            target_user=old_history.user
+        )
+        # datasets in chunks of 2, 2 and 1, then collections in chunks of 2 and 1
+        assert progress == [(2, 8), (4, 8), (5, 8), (7, 8), (8, 8)]
+
+
+def _history_summary(session, history):
+    hdas = sorted(
+        (
+            hda.hid,
+            hda.visible,
+            hda.deleted,
+            hda.dataset_id,
+            sorted(tag.user_tname for tag in hda.tags),
+            hda.get_item_annotation_str(session, history.user, hda),
+        )
+        for hda in history.datasets
+    )
+    hdcas = [
+        (
+            hdca.hid,
+            hdca.name,
+            [element.element_identifier for element in hdca.collection.elements],
+            [element.hda.hid for element in hdca.collection.elements],
+            # the ORM copy tags collections twice
+            sorted({tag.user_tname for tag in hdca.tags}),
+            hdca.get_item_annotation_str(session, history.user, hdca),
+        )
+        for hdca in history.dataset_collections
+    ]
+    for hda in history.datasets:
+        assert hda.dataset.id == hda.copied_from_history_dataset_association.dataset.id
+    for hdca in history.dataset_collections:
+        for element in hdca.collection.elements:
+            assert element.hda.history == history
+    return hdas, hdcas
+
+
 @contextlib.contextmanager
 def _setup_mapping_and_user():
     with TestConfig(DISK_TEST_CONFIG) as (test_config, object_store):
@@ -0,0 +1,164 @@
+import os
+import time
+from tempfile import mkdtemp
+
+from galaxy.objectstore.caching import (
+    CACHE_INDEX_FILENAME,
+    CacheIndex,
+    CacheTarget,
+    check_cache,
+    IndexedCacheMixin,
+    InProcessCacheMonitor,
+)
+
+
+def test_touch_tracks_size_and_total():
+    cache_path = mkdtemp()
+    index = CacheIndex(cache_path)
+    _write(cache_path, "000/dataset_1.dat", 10)
+    _write(cache_path, "000/dataset_2.dat", 20)
+    index.touch("000/dataset_1.dat")
+    index.touch(os.path.join(cache_path, "000/dataset_2.dat"))
+    assert len(index) == 2
+    assert index.total_size == 30
+
+    # file grew since it was last recorded
+    _write(cache_path, "000/dataset_1.dat", 15)
+    index.touch("000/dataset_1.dat")
+    assert index.total_size == 35
+
+    # files that do not exist are dropped from the index
+    os.remove(os.path.join(cache_path, "000/dataset_2.dat"))
+    index.touch("000/dataset_2.dat")
+    assert len(index) == 1
+    assert index.total_size == 15
+
+
+def test_remove_entire_dir():
+    cache_path = mkdtemp()
+    index = CacheIndex(cache_path)
+    index.touch("000/dataset_1_files/a.txt", size=1)
+    index.touch("000/dataset_1_files/b/c.txt", size=2)
+    index.touch("000/dataset_1_files0", size=4)
+    index.touch("000/dataset_1.dat", size=8)
+    index.remove("000/dataset_1_files/", entire_dir=True)
+    assert index.total_size == 12
+    index.remove("000/dataset_1.dat")
+    assert index.total_size == 4
+
+
+def test_index_shared_between_instances():
+    cache_path = mkdtemp()
+    CacheIndex(cache_path).touch("000/dataset_1.dat", size=5)
+    assert CacheIndex(cache_path).total_size == 5
+
+
+def test_rebuild():
+    cache_path = mkdtemp()
+    _write(cache_path, "000/dataset_1.dat", 10)
+    _write(cache_path, "001/dataset_1001.dat", 20)
+    index = CacheIndex(cache_path)
+    assert not index.is_built
+    index.rebuild()
+    assert index.is_built
+    assert len(index) == 2
+    assert index.total_size == 30
+    # the index files themselves are not tracked
+    assert all(not path.startswith(CACHE_INDEX_FILENAME) for path, _ in index.least_recently_used())
+
+
+def test_rebuild_keeps_recorded_last_access():
+    cache_path = mkdtemp()
+    _write(cache_path, "000/dataset_1.dat", 10)
+    index = CacheIndex(cache_path)
+    last_access = time.time() + 3600
+    index.touch("000/dataset_1.dat", last_access=last_access)
+    _write(cache_path, "000/dataset_2.dat", 20)
+    index.rebuild()
+    assert index.total_size == 30
+    assert index.least_recently_used()[-1][0] == "000/dataset_1.dat"
+
+
+def test_touch_many():
+    cache_path = mkdtemp()
+    index = CacheIndex(cache_path)
+    _write(cache_path, "000/dataset_1.dat", 10)
+    index.touch("000/dataset_2.dat", size=20)
+    index.touch_many({"000/dataset_1.dat": 2000, "000/dataset_2.dat": 1000})
+    # dataset_2 no longer exists
+    assert len(index) == 1
+    assert index.total_size == 10
+
+
+def test_monitor_buffers_accesses():
+    cache_path = mkdtemp()
+    index = CacheIndex(cache_path)
+    target = CacheTarget(path=cache_path, size=100)
+    monitor = InProcessCacheMonitor(target, index, interval=3600, reindex_interval=3600)
+    try:
+        _write(cache_path, "000/dataset_1.dat", 10)
+        _write(cache_path, "000/dataset_1_files/a.txt", 20)
+        _write(cache_path, "000/dataset_2.dat", 40)
+        monitor.record_access("000/dataset_1.dat")
+        monitor.record_access("000/dataset_1_files/a.txt")
+        monitor.record_access("000/dataset_2.dat")
+        # accesses are only written to the index when flushed by the monitor
+        assert len(index) == 0
+        monitor.discard("000/dataset_1_files", entire_dir=True)
+        monitor.flush()
+        assert len(index) == 2
+        assert index.total_size == 50
+    finally:
+        monitor.shutdown()
+
+
+def test_no_index_without_cache_monitor():
+    cache_path = mkdtemp()
+
+    class ObjectStore(IndexedCacheMixin):
+        staging_path = cache_path
+        cache_size = 1
+        enable_cache_monitor = False
+
+    object_store = ObjectStore()
+    object_store.start_cache_monitor()
+    _write(cache_path, "000/dataset_1.dat", 10)
+    object_store._cache_pulled("000/dataset_1.dat")
+    object_store._cache_removed("000/dataset_1.dat")
+    assert object_store.cache_index is None
+    assert not os.path.exists(os.path.join(cache_path, CACHE_INDEX_FILENAME))
+
+
+def test_check_cache_evicts_least_recently_used_to_low_watermark():
+    cache_path = mkdtemp()
+    index = CacheIndex(cache_path)
+    for i in range(10):
+        _write(cache_path, f"000/dataset_{i}.dat", 10)
+        index.touch(f"000/dataset_{i}.dat", last_access=1000 + i)
+    # dataset_0 is used again and should be kept
+    index.touch("000/dataset_0.dat", last_access=2000)
+    target = CacheTarget(path=cache_path, size=100, high_watermark=0.9, low_watermark=0.5)
+
+    assert check_cache(target, index) == 50
+    assert index.total_size == 50
+    remaining = sorted(os.listdir(os.path.join(cache_path, "000")))
+    assert remaining == [f"dataset_{i}.dat" for i in (0, 6, 7, 8, 9)]
+
+    # below the high watermark nothing is evicted
+    assert check_cache(target, index) == 0
+
+
+def test_check_cache_handles_missing_files():
+    cache_path = mkdtemp()
+    index = CacheIndex(cache_path)
+    index.touch("000/gone.dat", size=100, last_access=1)
+    target = CacheTarget(path=cache_path, size=100, high_watermark=0.5, low_watermark=0.1)
+    assert check_cache(target, index) == 100
+    assert len(index) == 0
+
+
+def _write(cache_path, rel_path, size):
+    path = os.path.join(cache_path, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
@@ -1,4 +1,5 @@
 import os
+import threading
 from tempfile import (
     mkdtemp,
     mkstemp,
@@ -8,10 +9,12 @@ from uuid import uuid4
 import pytest
 
 from galaxy.exceptions import ObjectInvalid
+from galaxy.objectstore import s3
 from galaxy.objectstore.azure_blob import AzureBlobObjectStore
 from galaxy.objectstore.cloud import Cloud
 from galaxy.objectstore.pithos import PithosObjectStore
 from galaxy.objectstore.s3 import S3ObjectStore
+from galaxy.objectstore.transfer import TransferConfig
 from galaxy.objectstore.unittest_utils import (
     Config as TestConfig,
     DISK_TEST_CONFIG,
@@ -56,10 +59,10 @@ def test_disk_store():
 
             # Test get_data
             data = object_store.get_data(hello_world_dataset)
-            assert data == "Hello World!"
+            assert data == b"Hello World!"
 
             data = object_store.get_data(hello_world_dataset, start=1, count=6)
-            assert data == "ello W"
+            assert data == b"ello W"
 
             # Test Size
 
@@ -128,10 +131,10 @@ def test_disk_store_by_uuid():
 
             # Test get_data
             data = object_store.get_data(hello_world_dataset)
-            assert data == "Hello World!"
+            assert data == b"Hello World!"
 
             data = object_store.get_data(hello_world_dataset, start=1, count=6)
-            assert data == "ello W"
+            assert data == b"ello W"
 
             # Test Size
 
@@ -171,6 +174,15 @@ def test_disk_store_by_uuid():
             assert not os.path.exists(to_delete_real_path)
 
 
+def test_disk_store_get_data_non_utf8():
+    with TestConfig(DISK_TEST_CONFIG) as (directory, object_store):
+        dataset = MockDataset(1)
+        directory.write("", "files1/000/dataset_1.dat")
+        with open(object_store.get_filename(dataset), "wb") as f:
+            f.write(b"\xff\xfe\xfd\xfc")
+        assert object_store.get_data(dataset, start=1, count=2) == b"\xfe\xfd"
+
+
 def test_disk_store_alt_name_relpath():
     """Test that alt_name cannot be used to access arbitrary paths using a
     relative path
@@ -181,7 +193,7 @@ def test_disk_store_alt_name_relpath():
         directory.write("foo", "foo.txt")
         try:
             assert (
-                object_store.get_data(empty_dataset, extra_dir="dataset_1_files", alt_name="../../../foo.txt") != "foo"
+                object_store.get_data(empty_dataset, extra_dir="dataset_1_files", alt_name="../../../foo.txt") != b"foo"
             )
         except ObjectInvalid:
             pass
@@ -198,7 +210,7 @@ def test_disk_store_alt_name_abspath():
         with open(absfoo, "w") as f:
             f.write("foo")
         try:
-            assert object_store.get_data(empty_dataset, extra_dir="dataset_1_files", alt_name=absfoo) != "foo"
+            assert object_store.get_data(empty_dataset, extra_dir="dataset_1_files", alt_name=absfoo) != b"foo"
         except ObjectInvalid:
             pass
 
@@ -681,7 +693,8 @@ def test_config_parse_pithos():
 S3_TEST_CONFIG = """<object_store type="s3" private="true">
      <auth access_key="access_moo" secret_key="secret_cow" />
      <bucket name="unique_bucket_name_all_lowercase" use_reduced_redundancy="False" />
-     <cache path="database/object_store_cache" size="1000" />
+     <cache path="database/object_store_cache" size="1000" high_watermark="0.95" />
+     <transfer part_size="32" concurrency="4" />
      <extra_dir type="job_work" path="database/job_working_directory_s3"/>
      <extra_dir type="temp" path="database/tmp_s3"/>
 </object_store>
@@ -702,6 +715,11 @@ bucket:
 cache:
   path: database/object_store_cache
   size: 1000
+  high_watermark: 0.95
+
+transfer:
+  part_size: 32
+  concurrency: 4
 
 extra_dirs:
 - type: job_work
@@ -729,6 +747,10 @@ def test_config_parse_s3():
 
             assert object_store.cache_size == 1000
             assert object_store.staging_path == "database/object_store_cache"
+            assert object_store.cache_high_watermark == 0.95
+            assert object_store.cache_low_watermark == 0.8
+            assert object_store.transfer_config.part_size == 32 * 1024 * 1024
+            assert object_store.transfer_config.concurrency == 4
             assert object_store.extra_dirs["job_work"] == "database/job_working_directory_s3"
             assert object_store.extra_dirs["temp"] == "database/tmp_s3"
 
@@ -755,11 +777,130 @@ def test_config_parse_s3():
 
             _assert_key_has_value(cache_dict, "size", 1000)
             _assert_key_has_value(cache_dict, "path", "database/object_store_cache")
+            _assert_key_has_value(cache_dict, "high_watermark", 0.95)
+            _assert_key_has_value(cache_dict, "low_watermark", 0.8)
+
+            _assert_key_has_value(as_dict["transfer"], "part_size", 32)
+            _assert_key_has_value(as_dict["transfer"], "concurrency", 4)
 
             extra_dirs = as_dict["extra_dirs"]
             assert len(extra_dirs) == 2
 
 
+class MockS3Key:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.size = len(bucket.contents[name])
+        self.etag = bucket.etags[name]
+
+    def get_contents_as_string(self, headers=None):
+        start, end = headers["Range"][len("bytes=") :].split("-")
+        data = self.bucket.contents[self.name][int(start) : int(end) + 1]
+        self.bucket.transferred += len(data)
+        return data
+
+    def get_file(self, fileobj, headers=None):
+        self.bucket.threads.add(threading.get_ident())
+        if self.bucket.fail:
+            raise OSError("Connection reset by peer")
+        fileobj.write(self.get_contents_as_string(headers=headers))
+
+
+class MockS3Bucket:
+    def __init__(self, contents=None, etags=None):
+        self.name = "bucket"
+        self.contents = {} if contents is None else contents
+        self.etags = {} if etags is None else etags
+        self.transferred = 0
+        self.threads = set()
+        self.fail = False
+
+    def get_key(self, name):
+        return MockS3Key(self, name) if name in self.contents else None
+
+
+class MockS3Connection:
+    def __init__(self, bucket, connections):
+        self.bucket = bucket
+        connections.append(self)
+
+    def get_bucket(self, bucket_name, validate=True):
+        self.worker_bucket = MockS3Bucket(self.bucket.contents, self.bucket.etags)
+        self.worker_bucket.fail = self.bucket.fail
+        return self.worker_bucket
+
+
+def test_s3_parallel_download_uses_connection_per_thread(monkeypatch):
+    with TestConfig(S3_TEST_CONFIG, clazz=UnitializeS3ObjectStore) as (directory, object_store):
+        object_store.staging_path = directory.temp_directory
+        object_store.s3server = {}
+        object_store._bucket = bucket = MockS3Bucket()
+        connections = []
+        monkeypatch.setattr(s3, "Key", MockS3Key)
+        monkeypatch.setattr(s3, "connection_from_s3server", lambda s3server: MockS3Connection(bucket, connections))
+        dataset = MockDataset(1)
+        rel_path = object_store._construct_path(dataset)
+        object_store.transfer_config = TransferConfig(part_size=1024, concurrency=4)
+        object_store.cache_size = -1
+        content = os.urandom(1024 * 16 + 10)
+        bucket.contents[rel_path] = content
+        bucket.etags[rel_path] = "v1"
+        cache_path = object_store._get_cache_path(rel_path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        bucket.fail = True
+        assert not object_store._download(rel_path)
+        assert connections
+        assert not os.path.exists(cache_path)
+
+        bucket.fail = False
+        connections.clear()
+        assert object_store._download(rel_path)
+        with open(cache_path, "rb") as f:
+            assert f.read() == content
+        # the shared connection is not used by the download workers
+        assert not bucket.threads
+        assert connections
+        # each connection is used by a single thread
+        assert all(len(connection.worker_bucket.threads) == 1 for connection in connections)
+        assert len({thread for c in connections for thread in c.worker_bucket.threads}) == len(connections)
+
+
+def test_s3_get_data_reads_ranges():
+    with TestConfig(S3_TEST_CONFIG, clazz=UnitializeS3ObjectStore) as (directory, object_store):
+        object_store.staging_path = directory.temp_directory
+        object_store._bucket = bucket = MockS3Bucket()
+        dataset = MockDataset(1)
+        rel_path = object_store._construct_path(dataset)
+        content = b"0123456789" * 500000
+        bucket.contents[rel_path] = content
+        bucket.etags[rel_path] = "v1"
+        block_size = object_store._block_cache.block_size
+
+        assert object_store.get_data(dataset, start=10, count=100) == content[10:110]
+        # only the block containing the requested range is transferred
+        assert bucket.transferred == block_size
+        # and the object is not pulled into the cache
+        assert not os.path.exists(object_store._get_cache_path(rel_path))
+
+        # the block is served from memory on the next read
+        assert object_store.get_data(dataset, start=0, count=1000) == content[:1000]
+        assert bucket.transferred == block_size
+
+        # a range spanning a cached and a new block only transfers the new block
+        assert (
+            object_store.get_data(dataset, start=block_size - 5, count=10) == content[block_size - 5 : block_size + 5]
+        )
+        assert bucket.transferred == 2 * block_size
+
+        # a new version of the object is read again
+        bucket.contents[rel_path] = content[::-1]
+        bucket.etags[rel_path] = "v2"
+        assert object_store.get_data(dataset, start=10, count=100) == content[::-1][10:110]
+        assert bucket.transferred == 3 * block_size
+
+
 CLOUD_AWS_TEST_CONFIG = """<object_store type="cloud" provider="aws">
      <auth access_key="access_moo" secret_key="secret_cow" />
      <bucket name="unique_bucket_name_all_lowercase" use_reduced_redundancy="False" />
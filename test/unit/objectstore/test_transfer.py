@@ -0,0 +1,138 @@
+import os
+import threading
+from tempfile import mkdtemp
+
+import pytest
+
+from galaxy.objectstore.transfer import (
+    BlockCache,
+    JOURNAL_SUFFIX,
+    MIN_UPLOAD_PART_SIZE,
+    parallel_download,
+    parallel_upload,
+    PARTIAL_SUFFIX,
+    TransferConfig,
+)
+
+CONTENT = bytes(range(256)) * 40
+
+
+class FakeRemoteObject:
+    def __init__(self, content, fail_on=None):
+        self.content = content
+        self.fail_on = fail_on or set()
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def read_range(self, start, end, fileobj):
+        with self.lock:
+            self.requested.append(start)
+        if start in self.fail_on:
+            raise Exception("connection reset")
+        fileobj.write(self.content[start : end + 1])
+
+
+def test_parallel_download():
+    destination = os.path.join(mkdtemp(), "dataset_1.dat")
+    remote = FakeRemoteObject(CONTENT)
+    progress = []
+    parallel_download(
+        remote.read_range,
+        len(CONTENT),
+        destination,
+        TransferConfig(part_size=1000, concurrency=4),
+        progress_callback=lambda transferred, total: progress.append(transferred),
+    )
+    with open(destination, "rb") as f:
+        assert f.read() == CONTENT
+    assert sorted(remote.requested) == list(range(0, len(CONTENT), 1000))
+    assert max(progress) == len(CONTENT)
+    assert not os.path.exists(destination + PARTIAL_SUFFIX)
+    assert not os.path.exists(destination + JOURNAL_SUFFIX)
+
+
+def test_parallel_download_resumes_missing_parts():
+    destination = os.path.join(mkdtemp(), "dataset_1.dat")
+    config = TransferConfig(part_size=1000, concurrency=1)
+    remote = FakeRemoteObject(CONTENT, fail_on={5000})
+    with pytest.raises(Exception):
+        parallel_download(remote.read_range, len(CONTENT), destination, config, version="v1")
+    assert not os.path.exists(destination)
+    assert os.path.exists(destination + PARTIAL_SUFFIX)
+
+    remote = FakeRemoteObject(CONTENT)
+    parallel_download(remote.read_range, len(CONTENT), destination, config, version="v1")
+    with open(destination, "rb") as f:
+        assert f.read() == CONTENT
+    # the parts transferred before the failure are not fetched again
+    assert 5000 in remote.requested
+    assert not set(remote.requested) & set(range(0, 5000, 1000))
+
+
+def test_parallel_download_restarts_if_object_changed():
+    destination = os.path.join(mkdtemp(), "dataset_1.dat")
+    config = TransferConfig(part_size=1000, concurrency=1)
+    remote = FakeRemoteObject(CONTENT, fail_on={5000})
+    with pytest.raises(Exception):
+        parallel_download(remote.read_range, len(CONTENT), destination, config, version="v1")
+
+    new_content = CONTENT[::-1]
+    remote = FakeRemoteObject(new_content)
+    parallel_download(remote.read_range, len(new_content), destination, config, version="v2")
+    with open(destination, "rb") as f:
+        assert f.read() == new_content
+    assert remote.requested == list(range(0, len(CONTENT), 1000))
+
+
+def test_parallel_download_rejects_short_reads():
+    destination = os.path.join(mkdtemp(), "dataset_1.dat")
+
+    def read_range(start, end, fileobj):
+        fileobj.write(CONTENT[start:end])
+
+    with pytest.raises(Exception):
+        parallel_download(read_range, len(CONTENT), destination, TransferConfig(part_size=1000))
+    assert not os.path.exists(destination)
+
+
+def test_parallel_upload():
+    source = os.path.join(mkdtemp(), "dataset_1.dat")
+    content = os.urandom(2 * MIN_UPLOAD_PART_SIZE + 10)
+    with open(source, "wb") as f:
+        f.write(content)
+    uploaded = {}
+
+    def upload_part(part_number, data):
+        uploaded[part_number] = data
+        return part_number
+
+    # the part size is raised to the minimum part size accepted by S3
+    results = parallel_upload(upload_part, source, TransferConfig(part_size=1000, concurrency=3))
+    assert results == [1, 2, 3]
+    assert [len(uploaded[i]) for i in results] == [MIN_UPLOAD_PART_SIZE, MIN_UPLOAD_PART_SIZE, 10]
+    assert b"".join(uploaded[i] for i in results) == content
+
+
+def test_block_cache():
+    cache = BlockCache(block_size=100, max_blocks=2)
+    reads = []
+
+    def read_block(start, end):
+        reads.append((start, end))
+        return CONTENT[start : end + 1]
+
+    size = len(CONTENT)
+    assert cache.read("a", size, 150, 100, read_block) == CONTENT[150:250]
+    # adjacent missing blocks are fetched with a single read
+    assert reads == [(100, 299)]
+    assert cache.read("a", size, 120, 10, read_block) == CONTENT[120:130]
+    assert len(reads) == 1
+    assert cache.read("a", size, size - 10, 100, read_block) == CONTENT[-10:]
+    assert reads[-1] == (size - size % 100, size - 1)
+    # block 2 was the least recently used and has been evicted
+    assert cache.read("a", size, 200, 10, read_block) == CONTENT[200:210]
+    assert reads[-1] == (200, 299)
+    # blocks are cached per key
+    assert cache.read("b", size, 100, 10, read_block) == CONTENT[100:110]
+    assert len(reads) == 4
+    assert cache.read("b", size, size, 10, read_block) == b""
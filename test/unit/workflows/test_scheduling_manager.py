@@ -0,0 +1,119 @@
+import threading
+import time
+
+from galaxy.util.bunch import Bunch
+from galaxy.workflow.scheduling_manager import WorkflowRequestMonitor
+
+SCHEDULER_ID = "default"
+
+
+class StubWorkflowScheduler:
+    """Records the invocations it schedules and whether invocations of a history overlapped."""
+
+    def __init__(self, invocations, duration=0.0):
+        self.invocations = invocations
+        self.duration = duration
+        self.scheduled = []
+        self.overlapping_histories = set()
+        self._running_histories = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, invocation_id):
+        history_id = self.invocations[invocation_id][0]
+        with self._lock:
+            if history_id in self._running_histories:
+                self.overlapping_histories.add(history_id)
+            self._running_histories.add(history_id)
+        time.sleep(self.duration)
+        with self._lock:
+            self._running_histories.discard(history_id)
+            self.scheduled.append(invocation_id)
+
+
+class StubWorkflowRequestMonitor(WorkflowRequestMonitor):
+    def __init__(self, invocations, scheduling_threads=1):
+        self.app = Bunch(config=Bunch(history_local_serial_workflow_scheduling=False))
+        self._init_noop_monitor()
+        self.monitor_running = True
+        self.monitor_join_sleep = 5
+        # invocation id -> (history id, user id)
+        self.invocations = invocations
+        # ids of the invocations that are active, or woken up if ``since`` is set
+        self.active = set(invocations)
+        self.woken = set()
+        self._init_scheduling(scheduling_threads)
+
+    def _active_invocation_ids(self, scheduler_id, since=None):
+        return set(self.woken if since is not None else self.active)
+
+    def _history_and_user_ids(self, invocation_ids):
+        return {invocation_id: self.invocations[invocation_id] for invocation_id in invocation_ids}
+
+    def _attempt_schedule(self, invocation_id, workflow_scheduler):
+        workflow_scheduler.schedule(invocation_id)
+        return True
+
+    def wait_for_pool(self):
+        while self._scheduling_futures:
+            time.sleep(0.01)
+
+
+def test_invocations_of_a_history_are_not_scheduled_concurrently():
+    invocations = {1: (10, 1), 2: (10, 1), 3: (11, 1), 4: (20, 2), 5: (30, 3)}
+    monitor = StubWorkflowRequestMonitor(invocations, scheduling_threads=4)
+    scheduler = StubWorkflowScheduler(invocations, duration=0.2)
+    try:
+        assert monitor._schedule(SCHEDULER_ID, scheduler) == 5
+        # the histories are still being scheduled, so all of their invocations are deferred
+        assert monitor._schedule(SCHEDULER_ID, scheduler) == 0
+        assert monitor._deferred_invocation_ids[SCHEDULER_ID] == {1, 2, 3, 4, 5}
+        monitor.wait_for_pool()
+    finally:
+        monitor.shutdown()
+    assert not scheduler.overlapping_histories
+    # invocations of a history are scheduled in order
+    assert [i for i in scheduler.scheduled if i in (1, 2)] == [1, 2]
+    assert sorted(scheduler.scheduled) == [1, 2, 3, 4, 5]
+
+
+def test_leftovers_are_deferred_when_time_budget_runs_out():
+    invocations = {1: (10, 1), 2: (20, 2), 3: (30, 3)}
+    monitor = StubWorkflowRequestMonitor(invocations)
+    scheduler = StubWorkflowScheduler(invocations, duration=0.2)
+    deadline = time.monotonic() + 0.1
+    assert monitor._schedule(SCHEDULER_ID, scheduler, deadline=deadline) == 1
+    assert scheduler.scheduled == [1]
+    assert monitor._deferred_invocation_ids[SCHEDULER_ID] == {2, 3}
+
+
+def test_deferred_invocations_are_scheduled_first_in_next_iteration():
+    # the owner of the deferred invocation was served more recently than the owners of the new ones
+    invocations = {1: (10, 1), 2: (20, 1), 3: (30, 3), 4: (40, 4)}
+    monitor = StubWorkflowRequestMonitor(invocations)
+    monitor.active = {1, 2}
+    scheduler = StubWorkflowScheduler(invocations, duration=0.2)
+    assert monitor._schedule(SCHEDULER_ID, scheduler, deadline=time.monotonic() + 0.1) == 1
+    assert monitor._deferred_invocation_ids[SCHEDULER_ID] == {2}
+
+    # invocation 2 is not woken up in the next iteration
+    monitor.woken = {3, 4}
+    assert monitor._schedule(SCHEDULER_ID, scheduler, since=object(), deadline=time.monotonic() + 0.1) == 1
+    assert scheduler.scheduled == [1, 2]
+    assert monitor._deferred_invocation_ids[SCHEDULER_ID] == {3, 4}
+
+    monitor.woken = set()
+    assert monitor._schedule(SCHEDULER_ID, scheduler, since=object()) == 2
+    assert scheduler.scheduled == [1, 2, 3, 4]
+    assert not monitor._deferred_invocation_ids
+
+
+def test_shutdown_drops_histories_not_started():
+    invocations = {i: (i, i) for i in range(1, 5)}
+    monitor = StubWorkflowRequestMonitor(invocations, scheduling_threads=2)
+    scheduler = StubWorkflowScheduler(invocations, duration=0.2)
+    # keep the monitor loop from waiting on free workers
+    monitor._free_workers = threading.BoundedSemaphore(4)
+    monitor._schedule(SCHEDULER_ID, scheduler)
+    monitor.shutdown()
+    assert not monitor._scheduling_futures
+    assert len(scheduler.scheduled) == 2
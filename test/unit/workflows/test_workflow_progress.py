@@ -1,8 +1,11 @@
 from galaxy import model
+from galaxy.exceptions import ToolMissingException
 from galaxy.util.unittest import TestCase
+from galaxy.workflow.modules import WorkflowModuleInjector
 from galaxy.workflow.run import WorkflowProgress
 from .workflow_support import (
     MockApp,
+    MockTrans,
     yaml_to_model,
 )
 
@@ -60,6 +63,18 @@ steps:
           "@input_subworkflow_step": 0
 """
 
+TEST_PAUSE_WORKFLOW_YAML = """
+steps:
+  - type: "data_input"
+    tool_inputs: {"name": "input1"}
+  - type: "pause"
+    inputs:
+      input:
+        connections:
+        - "@output_step": 0
+          output_name: "output"
+"""
+
 UNSCHEDULED_STEP = object()
 
 
@@ -159,7 +174,7 @@ class TestWorkflowProgress(TestCase):
             ]
         )
         progress = self._new_workflow_progress()
-        steps = progress.remaining_steps()
+        steps = list(progress.remaining_steps())
         assert len(steps) == 1, steps
         step, invocation_step = steps[0]
         assert step is self.invocation.workflow.steps[4]
@@ -171,6 +186,58 @@ class TestWorkflowProgress(TestCase):
         replacement = progress.replacement_for_input(self._step(4), step_dict)
         assert replacement is hda3
 
+    def test_remaining_steps_skips_state_past_delayed_steps(self):
+        self._setup_workflow(TEST_WORKFLOW_YAML)
+        self._set_previous_progress(
+            [
+                (100, {"output": model.HistoryDatasetAssociation()}),
+                (101, {"output": model.HistoryDatasetAssociation()}),
+                (102, UNSCHEDULED_STEP),
+                (103, UNSCHEDULED_STEP),
+                (104, UNSCHEDULED_STEP),
+            ]
+        )
+        progress = self._new_workflow_progress()
+        module_injector = progress.module_injector
+        remaining_steps = progress.remaining_steps()
+        step, _ = next(remaining_steps)
+        assert step is self._step(2)
+        # all modules are injected and runtime states computed before the first step is scheduled,
+        # scheduled steps only get modules to recover their outputs
+        assert module_injector.injected == [(100, False), (101, False), (102, True), (103, True), (104, True)]
+        assert module_injector.computed == [102, 103, 104]
+        assert module_injector.decoded == [102]
+        progress.mark_step_outputs_delayed(step, why="waiting for job")
+        step, _ = next(remaining_steps)
+        # connected to the first input, not to the delayed step
+        assert step is self._step(3)
+        assert progress.delayed_dependency(step) is None
+        step, _ = next(remaining_steps)
+        assert step is self._step(4)
+        assert progress.delayed_dependency(step) == 102
+        assert list(remaining_steps) == []
+        assert module_injector.decoded == [102, 103]
+
+    def test_remaining_steps_errors_before_first_step(self):
+        self._setup_workflow(TEST_WORKFLOW_YAML)
+        self._set_previous_progress([(step.id, UNSCHEDULED_STEP) for step in self.invocation.workflow.steps])
+        progress = self._new_workflow_progress()
+        progress.module_injector.missing_tool_step_id = 104
+        remaining_steps = progress.remaining_steps()
+        with self.assertRaises(ToolMissingException):
+            next(remaining_steps)
+
+    def test_remaining_steps_with_module_injector(self):
+        self._setup_workflow(TEST_PAUSE_WORKFLOW_YAML)
+        self._set_previous_progress([(100, UNSCHEDULED_STEP), (101, UNSCHEDULED_STEP)])
+        for step_state in self.invocation.step_states:
+            step_state.value = {}
+        progress = WorkflowProgress(self.invocation, self.inputs_by_step_id, WorkflowModuleInjector(MockTrans()), {})
+        # the runtime state of the input depends on the module of the step it is connected to
+        steps = [step for step, _ in progress.remaining_steps()]
+        assert steps == [self._step(0), self._step(1)]
+        assert all(step.module for step in steps)
+
     # TODO: Replace multiple true HDA with HDCA
     # TODO: Test explicit delay
     # TODO: Test cancel on collection invalid
@@ -191,7 +258,7 @@ class TestWorkflowProgress(TestCase):
         self.app.model.session.add(subworkflow_invocation)
         self.app.model.session.flush()
         progress = self._new_workflow_progress()
-        remaining_steps = progress.remaining_steps()
+        remaining_steps = list(progress.remaining_steps())
         (subworkflow_step, subworkflow_invocation_step) = remaining_steps[0]
         subworkflow_progress = progress.subworkflow_progress(subworkflow_invocation, subworkflow_step, {})
         subworkflow = subworkflow_step.subworkflow
@@ -221,9 +288,14 @@ class TestWorkflowProgress(TestCase):
 class MockModuleInjector:
     def __init__(self, progress):
         self.progress = progress
+        self.injected = []
+        self.computed = []
+        self.decoded = []
+        self.missing_tool_step_id = None
 
-    def inject(self, step, step_args=None, steps=None, **kwargs):
-        step.module = MockModule(self.progress)
+    def inject(self, step, step_args=None, steps=None, populate_subworkflow=True, **kwargs):
+        self.injected.append((step.id, populate_subworkflow))
+        step.module = MockModule(self.progress, step.id, self.decoded)
 
     def inject_all(self, workflow, param_map=None, ignore_tool_missing_exception=True, **kwargs):
         param_map = param_map or {}
@@ -232,14 +304,19 @@ class MockModuleInjector:
             self.inject(step, step_args=step_args)
 
     def compute_runtime_state(self, step, step_args=None):
-        pass
+        if step.id == self.missing_tool_step_id:
+            raise ToolMissingException("Tool cat1 missing.", tool_id="cat1")
+        self.computed.append(step.id)
 
 
 class MockModule:
-    def __init__(self, progress):
+    def __init__(self, progress, step_id=None, decoded=None):
         self.progress = progress
+        self.step_id = step_id
+        self.decoded = decoded if decoded is not None else []
 
     def decode_runtime_state(self, runtime_state):
+        self.decoded.append(self.step_id)
         return True
 
     def recover_mapping(self, invocation_step, progress):